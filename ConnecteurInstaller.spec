@@ -9,7 +9,9 @@ a = Analysis(
         ('app/static', 'app/static'),
         ('app/templates', 'app/templates')
     ],
-    hiddenimports=[],
+    # ijson charge ses backends dynamiquement (importlib) : à déclarer explicitement
+    hiddenimports=['pypyodbc', 'pyodbc', 'psycopg2', 'orjson', 'ijson',
+                   'ijson.backends.yajl2_c', 'ijson.backends.yajl2_cffi', 'ijson.backends.python'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+# Point d'entrée en ligne de commande (sans interface web)
+# --------------------------------------------------------
+# Permet de lancer une synchronisation depuis une tâche planifiée (cron,
+# planificateur de tâches Windows) sans démarrer FastAPI, le middleware de
+# session ni le chargement des templates :
+#
+#   python -m app.cli sync --flow batigest-to-batisimply --entities chantiers,heures
+#   python -m app.cli sync-all        # aller-retour complet, connexions partagées
+#
+# Seul le module du flux demandé est importé. Chaque phase écrit une ligne
+# JSON sur la sortie standard (durée, succès, message) ; les logs des
+# fonctions de synchronisation sont écrits sur la sortie d'erreur.
+#
+# Codes de retour :
+#   0  toutes les phases ont réussi
+#   1  au moins une phase a échoué
+#   2  arguments invalides
+#   3  licence invalide
+
+import argparse
+import importlib
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+
+from app.utils.logger import level_for_message, setup_logging
+
+logger = logging.getLogger("app.cli")
+
+EXIT_OK = 0
+EXIT_SYNC_FAILED = 1
+EXIT_USAGE = 2
+EXIT_LICENSE_INVALID = 3
+
+# ============================================================================
+# DÉFINITION DES FLUX
+# ============================================================================
+# Pour chaque flux : module à importer, entités disponibles (étapes exécutées
+# dans l'ordre, la chaîne d'une entité s'arrête à la première étape en échec)
+# et entités synchronisées par défaut.
+
+FLOWS = {
+    "batigest-to-batisimply": {
+        "module": "app.services.batigest.sqlserver_to_batisimply",
+        "entities": {
+            "chantiers": [
+                "transfer_chantiers_sqlserver_to_postgres",
+                "transfer_chantiers_postgres_to_batisimply",
+            ],
+            "heures": [
+                "transfer_heures_sqlserver_to_postgres",
+                "transfer_heures_postgres_to_batisimply",
+            ],
+            "devis": [
+                "transfer_devis_sqlserver_to_postgres",
+                "transfer_devis_postgres_to_batisimply",
+            ],
+        },
+        "default": ["chantiers"],
+    },
+    "batisimply-to-batigest": {
+        "module": "app.services.batigest.batisimply_to_sqlserver",
+        "entities": {
+            "chantiers": [
+                "transfer_chantiers_batisimply_to_postgres",
+                "transfer_chantiers_postgres_to_sqlserver",
+            ],
+            "heures": [
+                "transfer_heures_batisimply_to_postgres",
+                "update_code_projet_chantiers",
+                "transfer_heures_postgres_to_sqlserver",
+            ],
+            "devis": [
+                "transfer_devis_batisimply_to_postgres",
+                "transfer_devis_postgres_to_sqlserver",
+            ],
+        },
+        "default": ["chantiers", "heures"],
+    },
+    "codial-to-batisimply": {
+        "module": "app.services.codial.hfsql_to_batisimply",
+        "entities": {
+            "chantiers": [
+                "transfer_chantiers_hfsql_to_postgres",
+                "transfer_chantiers_postgres_to_batisimply",
+            ],
+            "heures": [
+                "transfer_heures_hfsql_to_postgres",
+                "transfer_heures_postgres_to_batisimply",
+            ],
+        },
+        "default": ["chantiers", "heures"],
+    },
+    "batisimply-to-codial": {
+        "module": "app.services.codial.batisimply_to_hfsql",
+        "entities": {
+            "chantiers": [
+                "transfer_chantiers_batisimply_to_postgres",
+                "transfer_chantiers_postgres_to_hfsql",
+            ],
+            "heures": [
+                "transfer_heures_batisimply_to_postgres",
+                "transfer_heures_postgres_to_hfsql",
+            ],
+        },
+        "default": ["chantiers", "heures"],
+    },
+}
+
+# Étapes dont l'échec n'interrompt pas la chaîne (comme dans sync_batisimply_to_sqlserver)
+NON_BLOCKING_STEPS = {"update_code_projet_chantiers"}
+
+# Aller-retour complet (sync_all) par logiciel
+FULL_SYNC_MODULES = {
+    "batigest": "app.services.batigest.full_sync",
+    "codial": "app.services.codial.full_sync",
+}
+
+
+def _emit(out, record: dict) -> None:
+    """Écrit un enregistrement JSON (une ligne) sur le flux de sortie."""
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+
+
+def _default_entities(flow: str) -> list:
+    """
+    Entités synchronisées par défaut pour un flux.
+    Comme les synchronisations complètes, les devis Batigest ne sont inclus
+    qu'en mode 'devis' (credentials.json).
+    """
+    entities = list(FLOWS[flow]["default"])
+    if flow.startswith("batigest-") or flow.endswith("-batigest"):
+        from app.services.connex import load_credentials
+        creds = load_credentials() or {}
+        if (creds.get("mode") or "chantier").strip().lower() == "devis":
+            entities.append("devis")
+    return entities
+
+
+def _parse_entities(flow: str, raw: str) -> list:
+    """
+    Convertit la liste "chantiers,heures" en entités validées pour le flux.
+
+    Raises:
+        ValueError: si une entité n'existe pas pour ce flux
+    """
+    available = FLOWS[flow]["entities"]
+    entities = []
+    for name in (raw or "").split(","):
+        name = name.strip().lower()
+        if not name or name in entities:
+            continue
+        if name not in available:
+            raise ValueError(
+                f"entité '{name}' inconnue pour le flux {flow} "
+                f"(disponibles : {', '.join(available)})"
+            )
+        entities.append(name)
+    if not entities:
+        raise ValueError("aucune entité fournie")
+    return entities
+
+
+def _check_license() -> bool:
+    """
+    Vérifie la licence comme le fait le middleware : licence locale d'abord,
+    puis revalidation réseau si la licence locale n'est plus valide.
+    """
+    from app.services.license import is_license_valid, load_license_info, refresh_license_validation
+
+    if is_license_valid():
+        return True
+    license_info = load_license_info() or {}
+    license_key = license_info.get("key")
+    if not license_key:
+        return False
+    is_valid, _ = refresh_license_validation(license_key)
+    return is_valid
+
+
+def run_sync(flow: str, entities: list, out=None) -> bool:
+    """
+    Exécute les étapes des entités demandées pour un flux et émet une ligne
+    JSON par phase.
+
+    Args:
+        flow (str): Nom du flux (clé de FLOWS)
+        entities (list): Entités à synchroniser, dans l'ordre
+        out: Flux recevant les lignes JSON (sortie standard par défaut)
+
+    Returns:
+        bool: True si toutes les phases ont réussi
+    """
+    out = out or sys.stdout
+    started = time.perf_counter()
+    t0 = time.perf_counter()
+    module = importlib.import_module(FLOWS[flow]["module"])
+    _emit(out, {
+        "event": "phase",
+        "flow": flow,
+        "entity": None,
+        "phase": "import",
+        "success": True,
+        "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+    })
+
+    overall_success = True
+    for entity in entities:
+        for step in FLOWS[flow]["entities"][entity]:
+            t0 = time.perf_counter()
+            try:
+                success, message = getattr(module, step)()
+            except Exception as e:
+                success, message = False, f"[ERREUR] {step} : {str(e)}"
+            logger.log(level_for_message(message), message)
+            _emit(out, {
+                "event": "phase",
+                "flow": flow,
+                "entity": entity,
+                "phase": step,
+                "success": bool(success),
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "message": message,
+            })
+            if not success and step not in NON_BLOCKING_STEPS:
+                overall_success = False
+                break
+
+    _emit(out, {
+        "event": "summary",
+        "flow": flow,
+        "entities": entities,
+        "success": overall_success,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "timestamp": datetime.now().isoformat(),
+    })
+    return overall_success
+
+
+def _preflight(out, flow: str, entities) -> int:
+    """Licence puis schéma de la base tampon ; retourne EXIT_OK ou le code d'erreur (résumé émis)."""
+    if not _check_license():
+        logger.error("[ERREUR] Licence invalide ou expirée")
+        _emit(out, {"event": "summary", "flow": flow, "entities": entities,
+                    "success": False, "error": "license_invalid",
+                    "timestamp": datetime.now().isoformat()})
+        return EXIT_LICENSE_INVALID
+
+    from app.services.migrations import ensure_schema
+    schema_ok, schema_message = ensure_schema()
+    logger.log(level_for_message(schema_message), schema_message)
+    if not schema_ok:
+        _emit(out, {"event": "summary", "flow": flow, "entities": entities,
+                    "success": False, "error": "schema", "message": schema_message,
+                    "timestamp": datetime.now().isoformat()})
+        return EXIT_SYNC_FAILED
+    return EXIT_OK
+
+
+def _cmd_sync(args) -> int:
+    """Commande 'sync'."""
+    # Logs sur stderr (avertissements et erreurs seulement avec --quiet)
+    # pour que stdout ne contienne que les lignes JSON.
+    setup_logging(level=logging.WARNING if args.quiet else None, stream=sys.stderr)
+    out = sys.stdout
+
+    try:
+        entities = (
+            _parse_entities(args.flow, args.entities)
+            if args.entities
+            else _default_entities(args.flow)
+        )
+    except ValueError as e:
+        print(f"[ERREUR] {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    status = _preflight(out, args.flow, entities)
+    if status != EXIT_OK:
+        return status
+
+    success = run_sync(args.flow, entities, out)
+    return EXIT_OK if success else EXIT_SYNC_FAILED
+
+
+def _cmd_sync_all(args) -> int:
+    """Commande 'sync-all' : aller-retour complet du logiciel configuré."""
+    setup_logging(level=logging.WARNING if args.quiet else None, stream=sys.stderr)
+    out = sys.stdout
+
+    software = args.software
+    if not software:
+        from app.services.connex import load_credentials
+        software = ((load_credentials() or {}).get("software") or "batigest").strip().lower()
+    if software not in FULL_SYNC_MODULES:
+        print(f"[ERREUR] logiciel '{software}' inconnu (disponibles : {', '.join(FULL_SYNC_MODULES)})",
+              file=sys.stderr)
+        return EXIT_USAGE
+    flow = f"{software}-all"
+
+    status = _preflight(out, flow, None)
+    if status != EXIT_OK:
+        return status
+
+    started = time.perf_counter()
+    module = importlib.import_module(FULL_SYNC_MODULES[software])
+    try:
+        success, message = module.sync_all()
+    except Exception as e:
+        success, message = False, f"[ERREUR] sync_all : {str(e)}"
+    logger.log(level_for_message(message), message)
+    _emit(out, {
+        "event": "summary",
+        "flow": flow,
+        "entities": None,
+        "success": bool(success),
+        "message": message,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "timestamp": datetime.now().isoformat(),
+    })
+    return EXIT_OK if success else EXIT_SYNC_FAILED
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Construit le parseur d'arguments de la ligne de commande."""
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description="Connecteur Sages - synchronisations sans interface web",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = subparsers.add_parser("sync", help="Lancer une synchronisation")
+    sync_parser.add_argument("--flow", required=True, choices=list(FLOWS),
+                             help="Flux de synchronisation")
+    sync_parser.add_argument("--entities",
+                             help="Entités séparées par des virgules (ex: chantiers,heures). "
+                                  "Par défaut : celles de la synchronisation complète")
+    sync_parser.add_argument("--quiet", action="store_true",
+                             help="N'afficher que les lignes JSON (et les erreurs sur stderr)")
+    sync_parser.set_defaults(handler=_cmd_sync)
+
+    sync_all_parser = subparsers.add_parser(
+        "sync-all", help="Aller-retour complet (une connexion par base pour toute l'exécution)"
+    )
+    sync_all_parser.add_argument("--software", choices=list(FULL_SYNC_MODULES),
+                                 help="Logiciel (par défaut : celui de credentials.json)")
+    sync_all_parser.add_argument("--quiet", action="store_true",
+                                 help="N'afficher que la ligne JSON de résumé (et les erreurs sur stderr)")
+    sync_all_parser.set_defaults(handler=_cmd_sync_all)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,37 +7,74 @@
 # 3. Inclure les routeurs des différentes sections de l'application (licences, formulaires).
 # 4. Définir une route racine pour la redirection initiale.
 
+import asyncio
 import webbrowser
 import threading
+from contextlib import asynccontextmanager
 import uvicorn
 import logging
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
-import pypyodbc  # pour PyInstaller
 import os
 import sys
 from dotenv import load_dotenv
-from app.utils.console import install_console_colors
+from app.utils.logger import level_for_message, setup_logging
 
 from app.routes import form_routes
 from app.utils.paths import templates_path, static_path
 from app.middleware.license_middleware import LicenseMiddleware
+from app.services.license import (
+    LICENSE_HEARTBEAT_INTERVAL_SECONDS,
+    license_revalidation_loop,
+    revalidate_license_state,
+    schedule_license_revalidation
+)
 
 # ============================================================================
 # CONFIGURATION DE L'APPLICATION
 # ============================================================================
 # Charger les variables d'environnement
 load_dotenv()
-install_console_colors()
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Cycle de vie de l'application: vérifie le schéma PostgreSQL, calcule le
+    verdict de licence initial puis le revalide périodiquement en tâche de
+    fond pour le middleware.
+    """
+    try:
+        from app.services.migrations import ensure_schema
+        _, schema_message = await asyncio.to_thread(ensure_schema)
+        logger.log(level_for_message(schema_message), schema_message)
+    except Exception as e:
+        logger.warning("[ATTENTION] Vérification du schéma PostgreSQL impossible: %s", e)
+    try:
+        await revalidate_license_state()
+    except Exception as e:
+        logger.warning("[ATTENTION] Vérification initiale de la licence impossible: %s", e)
+    # Verdict initial lu localement; confirmation auprès des services de licence en fond
+    schedule_license_revalidation(check_server=True)
+    revalidation_task = asyncio.create_task(
+        license_revalidation_loop(LICENSE_HEARTBEAT_INTERVAL_SECONDS)
+    )
+    try:
+        yield
+    finally:
+        revalidation_task.cancel()
 
 # Création de l'instance FastAPI
 app = FastAPI(
     title="Connecteur Sages",
     description="Service pour le connecteur Sages.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Ajout du middleware de session
@@ -62,6 +99,12 @@ templates = Jinja2Templates(directory=templates_path)
 def health_check():
     return {"status": "healthy", "message": "Connecteur SAGES opérationnel"}
 
+# Métriques des synchronisations (format texte Prometheus)
+@app.get("/metrics")
+def metrics_endpoint():
+    from app.services import metrics
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Route d'API de santé
 @app.get("/api/health")
 def api_health_check():
@@ -122,8 +165,10 @@ if __name__ == "__main__":
     if not is_frozen:
         threading.Timer(1.0, open_browser).start()
 
+    # En exécutable, passer l'objet directement évite de réimporter le module
+    # (le rechargement à chaud du mode dev exige une chaîne d'import)
     uvicorn.run(
-        "app.main:app",
+        app if is_frozen else "app.main:app",
         host=os.getenv("HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", 8000)),
         reload=not is_frozen,
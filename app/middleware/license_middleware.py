@@ -4,7 +4,7 @@
 from fastapi import Request, HTTPException
 from fastapi.responses import RedirectResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-from app.services.license import is_license_valid, refresh_license_validation, load_license_info
+from app.services.license import license_state, revalidate_license_state, schedule_license_revalidation
 from app.utils.paths import templates_path
 from fastapi.templating import Jinja2Templates
 
@@ -14,6 +14,10 @@ class LicenseMiddleware(BaseHTTPMiddleware):
     """
     Middleware pour vérifier la validité de la licence.
     Redirige vers la page de licence expirée si la licence n'est pas valide.
+
+    Le verdict est lu en mémoire (license_state): aucune lecture de fichier ni
+    appel réseau sur le chemin des requêtes. La revalidation est faite en tâche
+    de fond (voir license_revalidation_loop dans app.main).
     """
     
     def __init__(self, app):
@@ -60,27 +64,28 @@ class LicenseMiddleware(BaseHTTPMiddleware):
         
         # Vérifier si la route nécessite une licence valide
         if any(path == protected for protected in self.protected_routes):
-            # Vérifier d'abord la licence locale
-            if not is_license_valid():
-                # Si la licence locale n'est pas valide, essayer de la rafraîchir
-                license_info = load_license_info()
+            if not license_state.loaded:
+                # Premier passage sans état initialisé: calcul hors de la boucle d'événements
+                await revalidate_license_state()
+            elif license_state.is_stale():
+                # Verdict expiré: on répond avec le dernier verdict connu et on revalide en fond
+                schedule_license_revalidation()
+
+            is_valid, license_info = license_state.snapshot()
+            if not is_valid:
                 if license_info and license_info.get("key"):
-                    # Tenter de rafraîchir la validation avec la clé locale
-                    is_valid, _ = refresh_license_validation(license_info.get("key"))
-                    if not is_valid:
-                        # Afficher directement la page license_expired.html avec les infos de la licence
-                        return templates.TemplateResponse(
-                            "license_expired.html",
-                            {
-                                "request": request,
-                                "license_expiry_date": license_info.get("expires_at"),
-                                "client_name": license_info.get("client_name"),
-                                "license_key": license_info.get("key")
-                            },
-                            status_code=403
-                        )
-                else:
-                    # Pas de licence locale, rediriger vers la configuration
-                    return RedirectResponse(url="/configuration", status_code=303)
-        
-        return await call_next(request) 
\ No newline at end of file
+                    # Afficher directement la page license_expired.html avec les infos de la licence
+                    return templates.TemplateResponse(
+                        "license_expired.html",
+                        {
+                            "request": request,
+                            "license_expiry_date": license_info.get("expiry_date") or license_info.get("expires_at"),
+                            "client_name": license_info.get("client_name"),
+                            "license_key": license_info.get("key")
+                        },
+                        status_code=403
+                    )
+                # Pas de licence locale, rediriger vers la configuration
+                return RedirectResponse(url="/configuration", status_code=303)
+
+        return await call_next(request)
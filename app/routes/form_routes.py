@@ -11,10 +11,12 @@ from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 import os
 import io
+import logging
 from contextlib import redirect_stdout, redirect_stderr
 
 # Import du moteur de templates depuis main.py pour garantir le bon chemin
 from app.utils.paths import templates_path
+from app.utils.logger import capture_logs
 templates = Jinja2Templates(directory=templates_path)
 
 # Services - Connexion
@@ -27,8 +29,15 @@ from app.services.connex import (
     check_connection_status
 )
 
-import app.services.batigest as batigest_services
-import app.services.codial as codial_services
+# Services - Logiciels : chargés au premier usage (une installation n'utilise
+# qu'un seul logiciel, inutile d'importer l'autre package au démarrage)
+def _batigest_services():
+    import app.services.batigest as batigest_services
+    return batigest_services
+
+def _codial_services():
+    import app.services.codial as codial_services
+    return codial_services
 
 # Services - Licence
 from app.services.license import (
@@ -38,7 +47,8 @@ from app.services.license import (
     is_license_valid,
     get_license_expiry_date,
     get_client_name,
-    refresh_license_validation
+    refresh_license_validation_async,
+    get_license_verdict
 )
 
 # ============================================================================
@@ -48,6 +58,8 @@ from app.services.license import (
 # Création du routeur FastAPI
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 # =============================================================
 # DEBUG MODE (activable via DEBUG_CONNECTEUR=true)
 # =============================================================
@@ -55,10 +67,12 @@ def _is_debug_mode():
     return os.getenv("DEBUG_CONNECTEUR", "false").lower() == "true"
 
 def _capture_output(func, *args, **kwargs):
+    # Les services journalisent via logging (messages DEBUG inclus en mode debug) ;
+    # stdout/stderr restent capturés pour les éventuels print résiduels
     buffer = io.StringIO()
-    with redirect_stdout(buffer), redirect_stderr(buffer):
+    with capture_logs() as logs, redirect_stdout(buffer), redirect_stderr(buffer):
         result = func(*args, **kwargs)
-    return result, buffer.getvalue()
+    return result, logs.getvalue() + buffer.getvalue()
 
 def _effective_debug_mode():
     creds = load_credentials() or {}
@@ -375,10 +389,10 @@ async def transfer_data(request: Request):
         message = "[ERREUR] Merci de renseigner les informations de connexion SQL Server et PostgreSQL avant de lancer le transfert."
     else:
         if debug_mode:
-            (success, message), logs = _capture_output(batigest_services.transfer_chantiers_sqlserver_to_postgres)
+            (success, message), logs = _capture_output(_batigest_services().transfer_chantiers_sqlserver_to_postgres)
             debug_output = f"=== Debug: /transfer ===\n{logs}"
         else:
-            success, message = batigest_services.transfer_chantiers_sqlserver_to_postgres()
+            success, message = _batigest_services().transfer_chantiers_sqlserver_to_postgres()
     
     sql_connected, pg_connected = check_connection_status()
     creds = load_credentials() or {}
@@ -453,10 +467,10 @@ async def recup_heures_batisimply(request: Request):
     debug_output = None
     try:
         if debug_mode:
-            success, logs = _capture_output(batigest_services.transfer_heures_sqlserver_to_postgres)
+            success, logs = _capture_output(_batigest_services().transfer_heures_sqlserver_to_postgres)
             debug_output = f"=== Debug: /recup-heures ===\n{logs}"
         else:
-            success, message = batigest_services.transfer_heures_sqlserver_to_postgres()
+            success, message = _batigest_services().transfer_heures_sqlserver_to_postgres()
         if success:
             message = "[OK] Heures récupérées et insérées dans PostgreSQL avec succès."
         else:
@@ -576,10 +590,10 @@ async def sync_batigest_to_batisimply_route(request: Request):
     debug_output = None
     try:
         if debug_mode:
-            (success, message), logs = _capture_output(batigest_services.sync_sqlserver_to_batisimply)
+            (success, message), logs = _capture_output(_batigest_services().sync_sqlserver_to_batisimply)
             debug_output = f"=== Debug: /sync-batigest-to-batisimply ===\n{logs}"
         else:
-            success, message = batigest_services.sync_sqlserver_to_batisimply()
+            success, message = _batigest_services().sync_sqlserver_to_batisimply()
     except Exception as e:
         success = False
         message = f"[ERREUR] Erreur lors de la synchronisation : {e}"
@@ -611,10 +625,10 @@ async def sync_batisimply_to_batigest_route(request: Request):
     debug_output = None
     try:
         if debug_mode:
-            (success, message), logs = _capture_output(batigest_services.sync_batisimply_to_sqlserver)
+            (success, message), logs = _capture_output(_batigest_services().sync_batisimply_to_sqlserver)
             debug_output = f"=== Debug: /sync-batisimply-to-batigest ===\n{logs}"
         else:
-            success, message = batigest_services.sync_batisimply_to_sqlserver()
+            success, message = _batigest_services().sync_batisimply_to_sqlserver()
     except Exception as e:
         success = False
         message = f"[ERREUR] Erreur lors de la synchronisation : {e}"
@@ -650,10 +664,10 @@ async def sync_codial_to_batisimply_route(request: Request):
     debug_output = None
     try:
         if debug_mode:
-            (success, message), logs = _capture_output(codial_services.sync_hfsql_to_batisimply)
+            (success, message), logs = _capture_output(_codial_services().sync_hfsql_to_batisimply)
             debug_output = f"=== Debug: /sync-codial-to-batisimply ===\n{logs}"
         else:
-            success, message = codial_services.sync_hfsql_to_batisimply()
+            success, message = _codial_services().sync_hfsql_to_batisimply()
     except Exception as e:
         success = False
         message = f"[ERREUR] Erreur lors de la synchronisation Codial -> BatiSimply : {e}"
@@ -685,10 +699,10 @@ async def sync_batisimply_to_codial_route(request: Request):
     debug_output = None
     try:
         if debug_mode:
-            (success, message), logs = _capture_output(codial_services.sync_batisimply_to_hfsql)
+            (success, message), logs = _capture_output(_codial_services().sync_batisimply_to_hfsql)
             debug_output = f"=== Debug: /sync-batisimply-to-codial ===\n{logs}"
         else:
-            success, message = codial_services.sync_batisimply_to_hfsql()
+            success, message = _codial_services().sync_batisimply_to_hfsql()
     except Exception as e:
         success = False
         message = f"[ERREUR] Erreur lors de la synchronisation BatiSimply -> Codial : {e}"
@@ -717,7 +731,7 @@ async def init_batigest_tables_route(request: Request):
         TemplateResponse: Page HTML avec le message de résultat
     """
     try:
-        success = batigest_services.init_batigest_tables()()
+        success = _batigest_services().init_batigest_tables()
         if success:
             message = "[OK] Tables PostgreSQL Batigest initialisées avec succès"
         else:
@@ -749,7 +763,7 @@ async def init_codial_tables_route(request: Request):
         TemplateResponse: Page HTML avec le message de résultat
     """
     try:
-        success = codial_services.init_codial_tables()
+        success = _codial_services().init_codial_tables()
         if success:
             message = "[OK] Tables PostgreSQL Codial initialisées avec succès"
         else:
@@ -964,7 +978,7 @@ def update_batisimply(
     })
 
 @router.post("/update-license")
-def update_license(request: Request, license_key: str = Form(...)):
+async def update_license(request: Request, license_key: str = Form(...)):
     """
     Route pour mettre à jour la clé de licence.
     
@@ -976,21 +990,21 @@ def update_license(request: Request, license_key: str = Form(...)):
         TemplateResponse: Page HTML de configuration
     """
     try:
-        print(f"[DEBUG] Tentative de mise à jour de la licence: {license_key[:8]}...")
+        logger.debug("[DEBUG] Tentative de mise à jour de la licence: %s...", license_key[:8])
         
-        # Valider la clé de licence avec rafraîchissement
-        is_valid, license_info = refresh_license_validation(license_key)
+        # Valider la clé de licence avec rafraîchissement (services interrogés en parallèle)
+        is_valid, license_info = await refresh_license_validation_async(license_key)
         
-        print(f"[INFO] Résultat de validation: {is_valid}")
+        logger.info("[INFO] Résultat de validation: %s", is_valid)
         if license_info:
-            print(f"[INFO] Données de licence: {license_info}")
+            logger.debug("[INFO] Données de licence: %s", license_info)
         
         if is_valid and license_info:
-            # La licence est déjà sauvegardée par refresh_license_validation
+            # La licence est déjà sauvegardée par refresh_license_validation_async
             message = "[OK] Clé de licence validée et enregistrée avec succès !"
             license_valid = True
             license_expiry_date = license_info.get("expires_at")
-            print("[OK] Licence sauvegardée avec succès")
+            logger.info("[OK] Licence sauvegardée avec succès")
         else:
             # Sauvegarder quand même la clé saisie (même invalide) pour que l'utilisateur puisse la voir
             if license_info:
@@ -1009,7 +1023,7 @@ def update_license(request: Request, license_key: str = Form(...)):
             message = "[ERREUR] Clé de licence invalide ou expirée. Veuillez vérifier votre clé."
             license_valid = False
             license_expiry_date = None
-            print("[ERREUR] Licence invalide mais sauvegardée")
+            logger.error("[ERREUR] Licence invalide mais sauvegardée")
         
         sql_connected, pg_connected = check_connection_status()
         creds = load_credentials()
@@ -1027,7 +1041,7 @@ def update_license(request: Request, license_key: str = Form(...)):
         })
         
     except Exception as e:
-        print(f"[ERREUR] Erreur lors de la mise à jour: {str(e)}")
+        logger.error("[ERREUR] Erreur lors de la mise à jour: %s", e)
         message = f"[ERREUR] Erreur lors de la validation : {str(e)}"
         license_valid = False
         license_expiry_date = None
@@ -1060,28 +1074,27 @@ async def refresh_license(request: Request, license_key: str = Form(...)):
         JSONResponse: Résultat de la validation
     """
     try:
-        print(f"[DEBUG] Tentative de rafraîchissement de la licence: {license_key[:8]}...")
+        logger.debug("[DEBUG] Tentative de rafraîchissement de la licence: %s...", license_key[:8])
         
-        # Valider la clé de licence
-        is_valid, license_data = refresh_license_validation(license_key)
+        # Vérification explicite auprès des services de licence (détection d'une révocation)
+        is_valid, license_data = await refresh_license_validation_async(license_key)
         
-        print(f"[INFO] Résultat de validation: {is_valid}")
+        logger.info("[INFO] Résultat de validation: %s", is_valid)
         if license_data:
-            print(f"[INFO] Données de licence: {license_data}")
+            logger.debug("[INFO] Données de licence: %s", license_data)
         
         if is_valid:
-            # Sauvegarder les informations de licence mises à jour
-            save_license_info(license_key, license_data)
-            print("[OK] Licence sauvegardée avec succès")
+            # Les informations sont déjà sauvegardées lors de la validation
+            logger.info("[OK] Licence validée")
             
             return JSONResponse({
                 "success": True,
                 "message": "Licence validée avec succès",
-                "expires_at": license_data.get("expires_at"),
+                "expires_at": license_data.get("expires_at") or license_data.get("expiry_date"),
                 "client_name": license_data.get("client_name")
             })
         else:
-            print("[ERREUR] Licence invalide ou expirée")
+            logger.error("[ERREUR] Licence invalide ou expirée")
             return JSONResponse({
                 "success": False,
                 "message": "Licence invalide ou expirée",
@@ -1089,7 +1102,7 @@ async def refresh_license(request: Request, license_key: str = Form(...)):
             }, status_code=400)
             
     except Exception as e:
-        print(f"[ERREUR] Erreur lors du rafraîchissement: {str(e)}")
+        logger.error("[ERREUR] Erreur lors du rafraîchissement: %s", e)
         return JSONResponse({
             "success": False,
             "message": f"Erreur lors de la validation : {str(e)}"
@@ -1119,7 +1132,7 @@ async def check_license_status():
     license_info = load_license_info()
     if license_info and license_info.get("key"):
         # Tenter de rafraîchir la validation avec la clé locale
-        is_valid, _ = refresh_license_validation(license_info.get("key"))
+        is_valid, _ = await get_license_verdict(license_info.get("key"))
         if is_valid:
             return JSONResponse({
                 "valid": True,
@@ -1176,7 +1189,7 @@ async def api_sync_batigest_to_batisimply():
         JSONResponse: Résultat de la synchronisation
     """
     try:
-        success, message = batigest_services.sync_sqlserver_to_batisimply()
+        success, message = _batigest_services().sync_sqlserver_to_batisimply()
         return JSONResponse({
             "success": success,
             "message": message,
@@ -1198,7 +1211,7 @@ async def api_sync_batisimply_to_batigest():
         JSONResponse: Résultat de la synchronisation
     """
     try:
-        success, message = batigest_services.sync_batisimply_to_sqlserver()
+        success, message = _batigest_services().sync_batisimply_to_sqlserver()
         return JSONResponse({
             "success": success,
             "message": message,
@@ -1220,7 +1233,7 @@ async def api_sync_codial_to_batisimply():
         JSONResponse: Résultat de la synchronisation
     """
     try:
-        success, message = codial_services.sync_hfsql_to_batisimply()
+        success, message = _codial_services().sync_hfsql_to_batisimply()
         return JSONResponse({
             "success": success,
             "message": message,
@@ -1242,7 +1255,7 @@ async def api_sync_batisimply_to_codial():
         JSONResponse: Résultat de la synchronisation
     """
     try:
-        success, message = codial_services.sync_batisimply_to_hfsql()
+        success, message = _codial_services().sync_batisimply_to_hfsql()
         return JSONResponse({
             "success": success,
             "message": message,
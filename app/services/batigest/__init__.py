@@ -24,6 +24,9 @@ from .batisimply_to_sqlserver import (
     sync_batisimply_to_sqlserver
 )
 
+# Aller-retour complet (connexions partagées)
+from .full_sync import sync_all
+
 # Utilitaires
 from .utils import (
     init_batigest_tables,
@@ -50,6 +53,9 @@ __all__ = [
     'transfer_devis_postgres_to_sqlserver',
     'sync_batisimply_to_sqlserver',
     
+    # Aller-retour complet
+    'sync_all',
+    
     # Utilitaires
     'init_batigest_tables',
     'check_batigest_connection'
@@ -3,20 +3,145 @@
 # Ce fichier contient les fonctions pour transférer les données depuis BatiSimply vers Batigest (SQL Server)
 
 import psycopg2
+from psycopg2.extras import execute_values
 import requests
-import json
+import logging
+import time
 from datetime import date, datetime, timedelta
-from app.services.connex import connect_to_sqlserver, connect_to_postgres, load_credentials, recup_batisimply_token
+from app.services import metrics
+from app.services.connex import connect_to_sqlserver, connect_to_postgres, load_credentials, recup_batisimply_token, get_batisimply_api_url, batisimply_request
+from app.services.batigest.utils import get_sqlserver_column_lengths, truncate_to_column
+from app.services.httpcache import HttpCache
+from app.services.jsonstream import JsonStreamError
+from app.services.pagination import BatiSimplyPageError, fetch_all, page_size
+from app.services.pipeline import Step, all_succeeded, format_report, run_steps, sync_workers
+from app.services.partitions import maintain_heures_partitions
+from app.utils.logger import level_for_message
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de paramètres d'une requête SQL Server : 2100
+SQLSERVER_IN_CHUNK = 1000
+# Devis lus dans PostgreSQL et fusionnés dans dbo.Devis par lots
+DEVIS_BATCH_SIZE = 1000
+# Heures BatiSimply chargées dans PostgreSQL par lots, au fil de la lecture de la réponse
+HEURES_LOAD_BATCH = 1000
+
+DEVIS_MERGE_QUERY = """
+MERGE dbo.Devis AS target
+USING #devis_staging AS source
+    ON target.Code = source.Code
+WHEN MATCHED THEN
+    UPDATE SET Nom = source.Nom, [Date] = source.[Date], Sujet = source.Sujet
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT (Code, Nom, [Date], Sujet)
+    VALUES (source.Code, source.Nom, source.[Date], source.Sujet);
+"""
+
+# ============================================================================
+# UTILITAIRES D'ÉCRITURE SQL SERVER
+# ============================================================================
+
+def _sqlserver_key(code) -> str:
+    """Clé de comparaison d'un code (collation Batigest insensible à la casse et aux espaces finaux)."""
+    return str(code).rstrip().upper()
+
+
+def _fetch_existing_chantier_codes(sqlserver_cursor, codes) -> set:
+    """Codes déjà présents dans dbo.ChantierDef, lus par lots de SQLSERVER_IN_CHUNK."""
+    existing = set()
+    for start in range(0, len(codes), SQLSERVER_IN_CHUNK):
+        chunk = codes[start:start + SQLSERVER_IN_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        sqlserver_cursor.execute(f"SELECT Code FROM dbo.ChantierDef WHERE Code IN ({placeholders})", chunk)
+        existing.update(_sqlserver_key(row[0]) for row in sqlserver_cursor.fetchall())
+    return existing
+
+
+def _executemany_by_key(sqlserver_conn, sqlserver_cursor, query: str, keyed_params) -> list:
+    """
+    Exécute une requête pour une liste de (clé, paramètres) en un seul envoi
+    (fast_executemany) et valide. Si le lot échoue, il est annulé puis rejoué
+    ligne par ligne pour isoler les lignes en erreur.
+
+    Returns:
+        list: Clés des lignes écrites
+    """
+    if not keyed_params:
+        return []
+    try:
+        sqlserver_cursor.fast_executemany = True
+        sqlserver_cursor.executemany(query, [params for _, params in keyed_params])
+        sqlserver_conn.commit()
+        return [key for key, _ in keyed_params]
+    except Exception as e:
+        sqlserver_conn.rollback()
+        logger.warning("[ATTENTION] Écriture groupée impossible (%s), reprise ligne par ligne", e)
+    finally:
+        sqlserver_cursor.fast_executemany = False
+
+    written = []
+    for key, params in keyed_params:
+        try:
+            sqlserver_cursor.execute(query, params)
+            sqlserver_conn.commit()
+            written.append(key)
+        except Exception as e:
+            sqlserver_conn.rollback()
+            logger.warning("[ATTENTION] Erreur lors de l'écriture de %s: %s", key, e)
+    return written
+
+
+def _merge_devis_batch(sqlserver_conn, sqlserver_cursor, staged) -> list:
+    """
+    Charge un lot de (code PostgreSQL, ligne Devis) dans #devis_staging puis le
+    fusionne dans dbo.Devis (MERGE) et valide. Si le lot échoue, il est rejoué
+    ligne par ligne pour n'écarter que les devis en erreur.
+
+    Returns:
+        list: Codes PostgreSQL des devis écrits
+    """
+    def merge(rows):
+        sqlserver_cursor.execute("TRUNCATE TABLE #devis_staging")
+        sqlserver_cursor.fast_executemany = True
+        try:
+            sqlserver_cursor.executemany(
+                "INSERT INTO #devis_staging (Code, Nom, [Date], Sujet) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        finally:
+            sqlserver_cursor.fast_executemany = False
+        sqlserver_cursor.execute(DEVIS_MERGE_QUERY)
+        sqlserver_conn.commit()
+
+    try:
+        merge([row for _, row in staged])
+        return [code for code, _ in staged]
+    except Exception as e:
+        sqlserver_conn.rollback()
+        logger.warning("[ATTENTION] Fusion groupée des devis impossible (%s), reprise devis par devis", e)
+
+    written = []
+    for code, row in staged:
+        try:
+            merge([row])
+            written.append(code)
+        except Exception as e:
+            sqlserver_conn.rollback()
+            logger.warning("[ATTENTION] Erreur lors de l'écriture du devis %s: %s", code, e)
+    return written
 
 # ============================================================================
 # TRANSFERT DES CHANTIERS BATISIMPLY -> POSTGRESQL -> SQL SERVER
 # ============================================================================
 
+@metrics.instrumented("batigest.chantiers.batisimply_to_postgres")
 def transfer_chantiers_batisimply_to_postgres():
     """
     Transfère les chantiers depuis BatiSimply vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -26,6 +151,7 @@ def transfer_chantiers_batisimply_to_postgres():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
         postgres_conn = connect_to_postgres(
@@ -41,48 +167,31 @@ def transfer_chantiers_batisimply_to_postgres():
         postgres_cursor = postgres_conn.cursor()
 
         # Récupération des chantiers depuis BatiSimply
+        metrics.phase("extract")
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
 
-        response = requests.get(
-            'https://api.staging.batisimply.fr/api/project',
-            headers=headers,
-            timeout=30
-        )
-
-        if response.status_code != 200:
-            return False, f"[ERREUR] Erreur API BatiSimply : {response.status_code}"
+        # Requête conditionnelle : liste inchangée depuis le dernier transfert -> rien à recharger
+        projects = fetch_all(f'{api_url}/api/project', headers, size=page_size(creds),
+                             cache=HttpCache(postgres_cursor, "batigest"))
 
-        try:
-            chantiers = response.json()
-        except json.JSONDecodeError as e:
-            return False, f"[ERREUR] Erreur de parsing JSON de l'API BatiSimply : {str(e)}. Réponse: {response.text[:200]}"
-
-        # Vérifier que chantiers est une liste ou un dictionnaire
-        if isinstance(chantiers, dict):
-            # Si c'est un dictionnaire, vérifier s'il contient une liste de chantiers
-            if 'elements' in chantiers:
-                chantiers = chantiers['elements']
-            elif 'content' in chantiers:
-                chantiers = chantiers['content']
-            elif 'data' in chantiers:
-                chantiers = chantiers['data']
-            elif 'items' in chantiers:
-                chantiers = chantiers['items']
-            else:
-                # Si c'est un dictionnaire simple, le traiter comme un seul chantier
-                chantiers = [chantiers]
-        elif not isinstance(chantiers, list):
-            return False, f"[ERREUR] Format de réponse inattendu de l'API BatiSimply. Attendu: liste ou dict, reçu: {type(chantiers)}"
+        if projects.status_code != 200:
+            return False, f"[ERREUR] Erreur API BatiSimply : {projects.status_code}"
+        if projects.not_modified:
+            postgres_cursor.close()
+            postgres_conn.close()
+            return True, "[OK] Chantiers BatiSimply inchangés depuis le dernier transfert"
 
-        # Insertion dans PostgreSQL avec gestion des conflits
+        # Insertion dans PostgreSQL avec gestion des conflits, au fil de la
+        # lecture des pages (liste à la racine ou dans elements/content/data/items)
+        metrics.phase("load")
         inserted_count = 0
-        for chantier in chantiers:
+        for chantier in projects:
             # Vérifier que chantier est un dictionnaire
             if not isinstance(chantier, dict):
-                print(f"[ATTENTION] Chantier ignoré (format inattendu): {type(chantier)} - {chantier}")
+                logger.warning("[ATTENTION] Chantier ignoré (format inattendu): %s - %s", type(chantier), chantier)
                 continue
             # Normaliser et valider les champs obligatoires
             raw_id = chantier.get('id')
@@ -104,7 +213,7 @@ def transfer_chantiers_batisimply_to_postgres():
             nom_client = str(raw_name).strip() if raw_name is not None else ""
 
             if not code or not nom_client:
-                print(f"[ATTENTION] Chantier ignoré (code/nom manquant) : id='{raw_id}' name='{raw_name}'")
+                logger.warning("[ATTENTION] Chantier ignoré (code/nom manquant) : id='%s' name='%s'", raw_id, raw_name)
                 continue
             date_debut = chantier.get('startDate')
             date_fin = chantier.get('endDate')
@@ -123,6 +232,7 @@ def transfer_chantiers_batisimply_to_postgres():
             
             postgres_cursor.execute(query_postgres, (code, date_debut, date_fin, nom_client, description))
             inserted_count += 1
+        metrics.add_rows(inserted_count)
 
         postgres_conn.commit()
         postgres_cursor.close()
@@ -133,11 +243,13 @@ def transfer_chantiers_batisimply_to_postgres():
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert BatiSimply -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("batigest.chantiers.postgres_to_sqlserver")
 def transfer_chantiers_postgres_to_sqlserver():
     """
     Transfère les chantiers depuis PostgreSQL vers SQL Server (Batigest).
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "sqlserver" not in creds or "postgres" not in creds:
@@ -165,24 +277,17 @@ def transfer_chantiers_postgres_to_sqlserver():
         sqlserver_cursor = sqlserver_conn.cursor()
         postgres_cursor = postgres_conn.cursor()
 
-        # Vérifier la structure de la table ChantierDef pour adapter les limites
-        try:
-            sqlserver_cursor.execute("""
-                SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'ChantierDef' AND TABLE_SCHEMA = 'dbo'
-            """)
-            columns_info = sqlserver_cursor.fetchall()
-            print("[INFO] Structure de la table ChantierDef :")
-            for col in columns_info:
-                print(f"  - {col[0]}: {col[1]} (max: {col[2]})")
-        except Exception as e:
-            print(f"[ATTENTION] Impossible de récupérer la structure de la table: {e}")
+        # Longueurs des colonnes ChantierDef (lues une fois par processus)
+        column_lengths = get_sqlserver_column_lengths(
+            sqlserver_cursor, "ChantierDef",
+            (creds["sqlserver"]["server"], creds["sqlserver"]["database"]),
+        )
 
         # Récupération des chantiers non synchronisés et valides
+        metrics.phase("extract")
         query = (
             """
-            SELECT *
+            SELECT id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest
             FROM batigest_chantiers
             WHERE NOT sync
               AND code IS NOT NULL AND code <> ''
@@ -191,62 +296,76 @@ def transfer_chantiers_postgres_to_sqlserver():
         )
         postgres_cursor.execute(query)
         chantiers = postgres_cursor.fetchall()
+        metrics.add_rows(len(chantiers))
 
-        # Insertion dans SQL Server
+        # Préparation des lignes ChantierDef (tronquées selon les colonnes SQL Server)
+        metrics.phase("transform")
+        rows_by_code = {}
         for chantier in chantiers:
             # Structure: id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest
             id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest = chantier
-            
-            # Tronquer les chaînes selon les limites de la table SQL Server
-            code_truncated = str(code)[:8] if code else ''  # Code: max 8 chars
-            nom_client_truncated = str(nom_client)[:30] if nom_client else ''  # NomClient: max 30 chars
-            # Pour Etat (1 char), on prend le premier caractère de la description ou un caractère par défaut
-            description_truncated = str(description)[:1] if description else 'A'  # Etat: max 1 char, défaut 'A'
-            
+
+            code_truncated = truncate_to_column(code, column_lengths, "Code", 8)
+            nom_client_truncated = truncate_to_column(nom_client, column_lengths, "NomClient", 30)
+            # Pour Etat, on prend le début de la description ou un caractère par défaut
+            description_truncated = truncate_to_column(description, column_lengths, "Etat", 1) or 'A'
+
             # Gérer les valeurs NULL pour DateDebut et DateFin
             date_debut_safe = date_debut if date_debut else datetime.now().date()
             date_fin_safe = date_fin if date_fin else datetime.now().date()
-            
-            # Debug: afficher les longueurs des chaînes
-            print(f"[DEBUG] Debug chantier: code='{code_truncated}' (len={len(code_truncated)}), nom_client='{nom_client_truncated}' (len={len(nom_client_truncated)}), etat='{description_truncated}' (len={len(description_truncated)})")
-            print(f"   Données originales: code='{code}', nom_client='{nom_client}', description='{description}'")
-            
+
             # Ignorer les chantiers avec des données vides
             if not code_truncated or not nom_client_truncated:
-                print(f"[ATTENTION] Chantier ignoré (données vides): code='{code_truncated}', nom='{nom_client_truncated}'")
-                continue
-            
-            # Vérifier si le chantier existe déjà dans SQL Server
-            check_query = "SELECT COUNT(*) FROM dbo.ChantierDef WHERE Code = ?"
-            sqlserver_cursor.execute(check_query, (code_truncated,))
-            exists = sqlserver_cursor.fetchone()[0] > 0
-            
-            try:
-                if exists:
-                    # Mise à jour
-                    update_query = """
-                    UPDATE dbo.ChantierDef 
-                    SET NomClient = ?, DateDebut = ?, DateFin = ?, Etat = ?
-                    WHERE Code = ?
-                    """
-                    sqlserver_cursor.execute(update_query, (nom_client_truncated, date_debut_safe, date_fin_safe, description_truncated, code_truncated))
-                else:
-                    # Insertion
-                    insert_query = """
-                    INSERT INTO dbo.ChantierDef (Code, NomClient, DateDebut, DateFin, Etat)
-                    VALUES (?, ?, ?, ?, ?)
-                    """
-                    sqlserver_cursor.execute(insert_query, (code_truncated, nom_client_truncated, date_debut_safe, date_fin_safe, description_truncated))
-            except Exception as e:
-                print(f"[ATTENTION] Erreur lors de l'insertion/mise à jour du chantier {code_truncated}: {e}")
-                print(f"   Données: code='{code_truncated}', nom='{nom_client_truncated}', desc='{description_truncated}'")
+                logger.warning("[ATTENTION] Chantier ignoré (données vides): code='%s', nom='%s'", code_truncated, nom_client_truncated)
                 continue
-            
-            # Marquer comme synchronisé dans PostgreSQL
-            update_postgres = "UPDATE batigest_chantiers SET sync = TRUE WHERE code = %s"
-            postgres_cursor.execute(update_postgres, (code,))
 
-        sqlserver_conn.commit()
+            # Deux codes PostgreSQL peuvent donner le même code tronqué : la dernière version l'emporte
+            entry = rows_by_code.setdefault(code_truncated, {"codes": []})
+            entry["codes"].append(code)
+            entry["values"] = (nom_client_truncated, date_debut_safe, date_fin_safe, description_truncated)
+        metrics.add_rows(len(rows_by_code))
+
+        # Écriture dans SQL Server : existence lue en une requête par lot,
+        # puis UPDATE et INSERT groupés (fast_executemany)
+        metrics.phase("load")
+        existing = _fetch_existing_chantier_codes(sqlserver_cursor, list(rows_by_code))
+        updates, inserts = [], []
+        for code_truncated, entry in rows_by_code.items():
+            nom_client_truncated, date_debut_safe, date_fin_safe, etat = entry["values"]
+            if _sqlserver_key(code_truncated) in existing:
+                updates.append((code_truncated, (nom_client_truncated, date_debut_safe, date_fin_safe, etat, code_truncated)))
+            else:
+                inserts.append((code_truncated, (code_truncated, nom_client_truncated, date_debut_safe, date_fin_safe, etat)))
+
+        written = _executemany_by_key(
+            sqlserver_conn, sqlserver_cursor,
+            """
+            UPDATE dbo.ChantierDef
+            SET NomClient = ?, DateDebut = ?, DateFin = ?, Etat = ?
+            WHERE Code = ?
+            """,
+            updates,
+        )
+        written += _executemany_by_key(
+            sqlserver_conn, sqlserver_cursor,
+            """
+            INSERT INTO dbo.ChantierDef (Code, NomClient, DateDebut, DateFin, Etat)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            inserts,
+        )
+        written_codes = [code for code_truncated in written for code in rows_by_code[code_truncated]["codes"]]
+        failed = len(chantiers) - len(written_codes)
+        metrics.add_rows(len(written), failed=len(rows_by_code) - len(written))
+
+        # Marquer comme synchronisés dans PostgreSQL les chantiers écrits dans SQL Server
+        metrics.phase("mark_synced")
+        if written_codes:
+            postgres_cursor.execute(
+                "UPDATE batigest_chantiers SET sync = TRUE WHERE code = ANY(%s)",
+                (written_codes,)
+            )
+            metrics.add_rows(len(written_codes))
         postgres_conn.commit()
         
         # Fermeture des connexions
@@ -255,7 +374,9 @@ def transfer_chantiers_postgres_to_sqlserver():
         sqlserver_conn.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(chantiers)} chantier(s) transféré(s) vers SQL Server"
+        if failed:
+            return True, f"[ATTENTION] {len(written_codes)} chantier(s) transféré(s) vers SQL Server, {failed} en échec"
+        return True, f"[OK] {len(written_codes)} chantier(s) transféré(s) vers SQL Server"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> SQL Server : {str(e)}"
@@ -264,11 +385,65 @@ def transfer_chantiers_postgres_to_sqlserver():
 # TRANSFERT DES HEURES BATISIMPLY -> POSTGRESQL -> SQL SERVER
 # ============================================================================
 
+def _load_heures_batch(postgres_cursor, upsert_rows):
+    """Charge un lot d'heures BatiSimply dans batigest_heures ; retourne le nombre de lignes."""
+    if not upsert_rows:
+        return 0
+
+    # batigest_heures est partitionnée sur date_debut : l'unicité porte sur
+    # (id_heure, date_debut). Une heure dont la date a changé dans BatiSimply
+    # est d'abord déplacée (sync remis à false) pour que l'upsert la retrouve.
+    execute_values(
+        postgres_cursor,
+        """
+        UPDATE batigest_heures AS h
+        SET date_debut = v.date_debut::timestamp, sync = FALSE
+        FROM (VALUES %s) AS v(id_heure, date_debut)
+        WHERE h.id_heure = v.id_heure::text
+          AND h.date_debut <> v.date_debut::timestamp
+        """,
+        [(row[0], row[1]) for row in upsert_rows],
+        page_size=1000,
+    )
+
+    for row in upsert_rows:
+        # Upsert: met à jour si l'heure existe déjà et remet sync=false si modification
+        postgres_cursor.execute("""
+            INSERT INTO batigest_heures(
+                id_heure, date_debut, date_fin, id_utilisateur,
+                id_projet, status_management,
+                total_heure, panier, trajet, code_projet, sync
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (id_heure, date_debut) DO UPDATE SET
+                date_fin = EXCLUDED.date_fin,
+                id_utilisateur = EXCLUDED.id_utilisateur,
+                id_projet = EXCLUDED.id_projet,
+                status_management = EXCLUDED.status_management,
+                total_heure = EXCLUDED.total_heure,
+                panier = EXCLUDED.panier,
+                trajet = EXCLUDED.trajet,
+                code_projet = COALESCE(EXCLUDED.code_projet, batigest_heures.code_projet),
+                sync = CASE WHEN (
+                    batigest_heures.date_fin IS DISTINCT FROM EXCLUDED.date_fin OR
+                    batigest_heures.id_utilisateur IS DISTINCT FROM EXCLUDED.id_utilisateur OR
+                    batigest_heures.id_projet IS DISTINCT FROM EXCLUDED.id_projet OR
+                    batigest_heures.status_management IS DISTINCT FROM EXCLUDED.status_management OR
+                    batigest_heures.total_heure IS DISTINCT FROM EXCLUDED.total_heure OR
+                    batigest_heures.panier IS DISTINCT FROM EXCLUDED.panier OR
+                    batigest_heures.trajet IS DISTINCT FROM EXCLUDED.trajet OR
+                    (EXCLUDED.code_projet IS NOT NULL AND batigest_heures.code_projet IS DISTINCT FROM EXCLUDED.code_projet)
+                ) THEN FALSE ELSE batigest_heures.sync END
+        """, row)
+    return len(upsert_rows)
+
+@metrics.instrumented("batigest.heures.batisimply_to_postgres")
 def transfer_heures_batisimply_to_postgres():
     """
     Transfère les heures depuis BatiSimply vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -278,6 +453,7 @@ def transfer_heures_batisimply_to_postgres():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
         postgres_conn = connect_to_postgres(
@@ -306,9 +482,10 @@ def transfer_heures_batisimply_to_postgres():
 
         start_date_str = start_utc.strftime("%Y-%m-%dT00:00:00Z")
         end_date_str = end_utc.strftime("%Y-%m-%dT23:59:59Z")
-        print(f"[CALENDRIER] Fenêtre d'import des heures: {start_date_str} -> {end_date_str}")
+        logger.info("[CALENDRIER] Fenêtre d'import des heures: %s -> %s", start_date_str, end_date_str)
 
         # Récupération des heures depuis BatiSimply
+        metrics.phase("extract")
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
@@ -319,33 +496,12 @@ def transfer_heures_batisimply_to_postgres():
             "endDate": end_date_str
         }
         
-        response = requests.get(
-            'https://api.staging.batisimply.fr/api/timeSlotManagement/allUsers',
-            headers=headers,
-            params=params,
-            timeout=30
-        )
+        heures = fetch_all(f'{api_url}/api/timeSlotManagement/allUsers', headers, params=params, size=page_size(creds))
 
-        if response.status_code != 200:
-            return False, f"[ERREUR] Erreur API BatiSimply : {response.status_code}. Réponse: {response.text[:200]}"
+        if heures.status_code != 200:
+            return False, f"[ERREUR] Erreur API BatiSimply : {heures.status_code}. Réponse: {heures.text[:200]}"
 
-        try:
-            heures = response.json()
-        except json.JSONDecodeError as e:
-            return False, f"[ERREUR] Erreur de parsing JSON de l'API BatiSimply : {str(e)}. Réponse: {response.text[:200]}"
-
-        # Vérifier que heures est une liste ou un dictionnaire
-        if isinstance(heures, dict):
-            if 'content' in heures:
-                heures = heures['content']
-            elif 'data' in heures:
-                heures = heures['data']
-            elif 'items' in heures:
-                heures = heures['items']
-            else:
-                heures = [heures]
-        elif not isinstance(heures, list):
-            return False, f"[ERREUR] Format de réponse inattendu de l'API BatiSimply. Attendu: liste ou dict, reçu: {type(heures)}"
+        # Heures lues au fil du téléchargement (toutes les pages) et chargées par lots
 
         # Configuration du timezone
         tz_name = creds.get("timezone", "Europe/Paris")
@@ -359,16 +515,29 @@ def transfer_heures_batisimply_to_postgres():
             local_tz = pytz.timezone(tz_name)
             utc_tz = pytz.UTC
 
+        # Partitions mensuelles de la fenêtre d'import et rétention
+        metrics.phase("maintenance")
+        maintain_heures_partitions(postgres_conn, "batigest", creds)
+
         # Insertion dans PostgreSQL avec gestion des conflits
+        metrics.phase("load")
+        upsert_rows = []
+        loaded_count = 0
+        skipped = 0
         for h in heures:
             # Vérifier que heure est un dictionnaire
             if not isinstance(h, dict):
-                print(f"[ATTENTION] Heure ignorée (format inattendu): {type(h)} - {h}")
+                logger.warning("[ATTENTION] Heure ignorée (format inattendu): %s - %s", type(h), h)
                 continue
                 
             heure_id = h.get("id")
             start_iso = h.get("startDate")
             end_iso = h.get("endDate")
+            if not start_iso:
+                # date_debut est la clé de partition (non nulle)
+                logger.warning("[ATTENTION] Heure %s ignorée: date de début absente", heure_id)
+                skipped += 1
+                continue
             
             project_obj = h.get("project", {}) or {}
             # Essayer de récupérer directement le code chantier fourni par l'API (projectCode)
@@ -418,8 +587,9 @@ def transfer_heures_batisimply_to_postgres():
             # Fallback 1: si aucun project_code mais id_projet fourni, tenter de récupérer le projet pour obtenir le code exact
             if (not project_code) and (id_projet is not None):
                 try:
-                    resp_proj = requests.get(
-                        f"https://api.staging.batisimply.fr/api/project/{id_projet}",
+                    resp_proj = batisimply_request(
+                        "GET",
+                        f"{api_url}/api/project/{id_projet}",
                         headers=headers,
                         timeout=12,
                     )
@@ -441,55 +611,36 @@ def transfer_heures_batisimply_to_postgres():
                 except Exception:
                     project_code = None
 
-            # Upsert: met à jour si l'heure existe déjà et remet sync=false si modification
-            postgres_cursor.execute("""
-                INSERT INTO batigest_heures(
-                    id_heure, date_debut, date_fin, id_utilisateur,
-                    id_projet, status_management,
-                    total_heure, panier, trajet, code_projet, sync
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id_heure) DO UPDATE SET
-                    date_debut = EXCLUDED.date_debut,
-                    date_fin = EXCLUDED.date_fin,
-                    id_utilisateur = EXCLUDED.id_utilisateur,
-                    id_projet = EXCLUDED.id_projet,
-                    status_management = EXCLUDED.status_management,
-                    total_heure = EXCLUDED.total_heure,
-                    panier = EXCLUDED.panier,
-                    trajet = EXCLUDED.trajet,
-                    code_projet = COALESCE(EXCLUDED.code_projet, batigest_heures.code_projet),
-                    sync = CASE WHEN (
-                        batigest_heures.date_debut IS DISTINCT FROM EXCLUDED.date_debut OR
-                        batigest_heures.date_fin IS DISTINCT FROM EXCLUDED.date_fin OR
-                        batigest_heures.id_utilisateur IS DISTINCT FROM EXCLUDED.id_utilisateur OR
-                        batigest_heures.id_projet IS DISTINCT FROM EXCLUDED.id_projet OR
-                        batigest_heures.status_management IS DISTINCT FROM EXCLUDED.status_management OR
-                        batigest_heures.total_heure IS DISTINCT FROM EXCLUDED.total_heure OR
-                        batigest_heures.panier IS DISTINCT FROM EXCLUDED.panier OR
-                        batigest_heures.trajet IS DISTINCT FROM EXCLUDED.trajet OR
-                        (EXCLUDED.code_projet IS NOT NULL AND batigest_heures.code_projet IS DISTINCT FROM EXCLUDED.code_projet)
-                    ) THEN FALSE ELSE batigest_heures.sync END
-            """, (
+            upsert_rows.append((
                 heure_id, date_debut, date_fin, user_id,
                 id_projet, status,
                 total_heure, panier, trajet, project_code, False
             ))
+            if len(upsert_rows) >= HEURES_LOAD_BATCH:
+                loaded_count += _load_heures_batch(postgres_cursor, upsert_rows)
+                upsert_rows = []
+
+        loaded_count += _load_heures_batch(postgres_cursor, upsert_rows)
+        metrics.add_rows(loaded_count, failed=skipped)
 
         postgres_conn.commit()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(heures)} heure(s) transférée(s) depuis BatiSimply vers PostgreSQL"
+        if skipped:
+            return True, f"[ATTENTION] {loaded_count} heure(s) transférée(s) depuis BatiSimply vers PostgreSQL, {skipped} ignorée(s) sans date de début"
+        return True, f"[OK] {loaded_count} heure(s) transférée(s) depuis BatiSimply vers PostgreSQL"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert BatiSimply -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("batigest.heures.postgres_to_sqlserver")
 def transfer_heures_postgres_to_sqlserver():
     """
     Transfère les heures depuis PostgreSQL vers SQL Server (Batigest).
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "sqlserver" not in creds or "postgres" not in creds:
@@ -517,32 +668,25 @@ def transfer_heures_postgres_to_sqlserver():
         sqlserver_cursor = sqlserver_conn.cursor()
         postgres_cursor = postgres_conn.cursor()
 
-        # Assurer l'existence de la table de mapping côté PostgreSQL
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS batigest_heures_map (
-                id_heure VARCHAR PRIMARY KEY,
-                code_chantier VARCHAR NOT NULL,
-                code_salarie VARCHAR NOT NULL,
-                date_sqlserver TIMESTAMP NOT NULL
-            )
-        """)
-
         # Récupération des heures non synchronisées avec code_projet
+        metrics.phase("extract")
         postgres_cursor.execute("""
             SELECT id_heure, date_debut, id_utilisateur, code_projet, total_heure, panier, trajet, id_projet
             FROM batigest_heures
             WHERE status_management = 'VALIDATED' AND NOT sync AND code_projet IS NOT NULL
         """)
         heures = postgres_cursor.fetchall()
-        print(f"[INFO] {len(heures)} heure(s) à traiter...")
+        logger.info("[INFO] %s heure(s) à traiter...", len(heures))
+        metrics.add_rows(len(heures))
 
+        metrics.phase("load")
         transferred_ids = []
 
         for h in heures:
             id_heure, date_debut, id_utilisateur, code_projet, total_heure, panier, trajet, id_projet = h
 
             # Recherche de l'utilisateur avec plus de détails
-            print(f"\n[DEBUG] Recherche de l'utilisateur {id_utilisateur} dans Salarie...")
+            logger.debug("[DEBUG] Recherche de l'utilisateur %s dans Salarie...", id_utilisateur)
             sqlserver_cursor.execute("""
                 SELECT TOP 5 * 
                 FROM Salarie 
@@ -552,16 +696,17 @@ def transfer_heures_postgres_to_sqlserver():
             # Affichage des résultats de la recherche
             results = sqlserver_cursor.fetchall()
             if results:
-                print("[OK] Utilisateurs trouvés :")
-                for row in results:
-                    print(f"  - {row}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[OK] Utilisateurs trouvés :")
+                    for row in results:
+                        logger.debug("  - %s", row)
             else:
-                print(f"[ATTENTION] Aucun utilisateur trouvé avec l'ID {id_utilisateur}")
+                logger.warning("[ATTENTION] Aucun utilisateur trouvé avec l'ID %s", id_utilisateur)
                 continue
 
             code_salarie = results[0][0]  # On prend le Code du premier résultat
             if not code_projet:
-                print(f"[IGNORE] id_heure {id_heure} ignorée: code_projet manquant")
+                logger.debug("[IGNORE] id_heure %s ignorée: code_projet manquant", id_heure)
                 continue
             # Normaliser le code chantier pour respecter Batigest (8 caractères)
             code_chantier = str(code_projet)
@@ -604,8 +749,7 @@ def transfer_heures_postgres_to_sqlserver():
                 )
 
                 if keys_changed:
-                    print("[SYNC] Clé modifiée pour id_heure", id_heure,
-                          f": ({old_code_chantier}, {old_code_salarie}, {old_date}) -> ({code_chantier}, {code_salarie}, {date_debut})")
+                    logger.debug("[SYNC] Clé modifiée pour id_heure %s : (%s, %s, %s) -> (%s, %s, %s)", id_heure, old_code_chantier, old_code_salarie, old_date, code_chantier, code_salarie, date_debut)
 
                     # Tenter une mise à jour de l'ancienne ligne vers la nouvelle clé et valeurs
                     sqlserver_cursor.execute(
@@ -713,15 +857,18 @@ def transfer_heures_postgres_to_sqlserver():
                 (id_heure, code_chantier, str(code_salarie), date_debut)
             )
             transferred_ids.append(id_heure)
+        metrics.add_rows(len(transferred_ids), failed=len(heures) - len(transferred_ids))
 
         sqlserver_conn.commit()
 
+        metrics.phase("mark_synced")
         if transferred_ids:
             postgres_cursor.execute(
                 "UPDATE batigest_heures SET sync = TRUE WHERE id_heure = ANY(%s)",
                 (transferred_ids,)
             )
             postgres_conn.commit()
+            metrics.add_rows(len(transferred_ids))
 
         sqlserver_cursor.close()
         postgres_cursor.close()
@@ -733,11 +880,13 @@ def transfer_heures_postgres_to_sqlserver():
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> SQL Server : {str(e)}"
 
+@metrics.instrumented("batigest.heures.update_code_projet")
 def update_code_projet_chantiers():
     """
     Met à jour les codes projet des heures en utilisant la correspondance avec les chantiers.
     """
     try:
+        metrics.phase("connect")
         creds = load_credentials()
         if not creds or "postgres" not in creds:
             return False, "[ERREUR] Informations de connexion PostgreSQL manquantes"
@@ -754,23 +903,22 @@ def update_code_projet_chantiers():
 
         postgres_cursor = postgres_conn.cursor()
 
-        # Mettre à jour les codes projet des heures avec plusieurs stratégies de correspondance:
-        # - id_projet::text = code (cas BatiSimply -> Postgres)
-        # - id_projet = code::bigint quand code est numérique
-        # - LPAD(id_projet::text, 8, '0') = code (cas codes Batigest '00000001')
+        # Mettre à jour les codes projet des heures par correspondance avec les chantiers.
+        # Les formes acceptées (code = id_projet, code numérique, code complété de zéros
+        # '00000001') se ramènent à id_projet = valeur numérique du code, précalculée
+        # dans batigest_chantiers.code_numerique (colonne générée et indexée).
+        metrics.phase("match_chantiers")
         postgres_cursor.execute("""
             UPDATE batigest_heures AS h
             SET code_projet = c.code
             FROM batigest_chantiers AS c
             WHERE h.code_projet IS NULL
-              AND (
-                    h.id_projet::text = c.code
-                 OR (c.code ~ '^[0-9]+$' AND h.id_projet = c.code::bigint)
-                 OR LPAD(h.id_projet::text, 8, '0') = c.code
-              )
+              AND h.id_projet = c.code_numerique
         """)
 
         updated_count = postgres_cursor.rowcount
+        first_pass_count = updated_count
+        metrics.add_rows(first_pass_count)
 
         # Deuxième passe: compléter/corriger via l'API pour:
         #  - code_projet manquant
@@ -789,62 +937,67 @@ def update_code_projet_chantiers():
         missing_rows = postgres_cursor.fetchall()
         missing_ids = [(row[0], row[1]) for row in missing_rows]
 
+        metrics.phase("match_api")
         if missing_ids:
             token = recup_batisimply_token()
             if token:
+                api_url = get_batisimply_api_url()
                 headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
                 try:
-                    # Récupérer la liste des projets accessibles (contient projectCode)
-                    list_resp = requests.get(
-                        "https://api.staging.batisimply.fr/api/project",
-                        headers=headers,
-                        timeout=15,
-                    )
-                    projects = []
-                    if list_resp.status_code == 200:
-                        try:
-                            pj = list_resp.json()
-                            if isinstance(pj, dict):
-                                # support elements/content/items/data formats
-                                for key in ("elements", "content", "items", "data"):
-                                    if key in pj and isinstance(pj[key], list):
-                                        projects = pj[key]
-                                        break
-                                if not projects and all(k in pj for k in ("id", "projectCode")):
-                                    projects = [pj]
-                            elif isinstance(pj, list):
-                                projects = pj
-                        except Exception:
-                            projects = []
-
-                    # Construire un mapping id -> projectCode/code
+                    # Récupérer la liste des projets accessibles (contient projectCode) ;
+                    # déjà lue par le transfert des chantiers : pages relues dans le cache (304).
+                    # Lecture seule : seul ce transfert, qui charge les chantiers, fait avancer les validateurs
+                    list_resp = fetch_all(f"{api_url}/api/project", headers, size=page_size(creds), timeout=15,
+                                          cache=HttpCache(postgres_cursor, "batigest", read_only=True))
+                    projects = list_resp if list_resp.status_code == 200 else []
+
+                    # Construire un mapping id -> projectCode/code, au fil de la lecture
+                    # (une réponse illisible laisse le mapping partiel)
                     id_to_code = {}
-                    for p in projects or []:
-                        try:
-                            pid_val = p.get("id")
-                            pcode = (
-                                str(p.get("projectCode") or p.get("code") or p.get("project_code") or "").strip()
-                            )
-                            if pid_val is not None and pcode:
-                                id_to_code[int(pid_val)] = pcode
-                        except Exception:
-                            continue
-
+                    try:
+                        for p in projects:
+                            if not isinstance(p, dict):
+                                continue
+                            try:
+                                pid_val = p.get("id")
+                                pcode = (
+                                    str(p.get("projectCode") or p.get("code") or p.get("project_code") or "").strip()
+                                )
+                                if pid_val is not None and pcode:
+                                    id_to_code[int(pid_val)] = pcode
+                            except Exception:
+                                continue
+                    except (JsonStreamError, BatiSimplyPageError) as e:
+                        logger.warning("[ATTENTION] Liste des projets BatiSimply incomplète : %s", e)
+
+                    # Correspondances à appliquer, en une seule requête
+                    corrections = {}
                     for pid, current_code in missing_ids:
                         pcode = id_to_code.get(int(pid))
                         if pcode and pcode != (current_code or ""):
-                            postgres_cursor.execute(
-                                "UPDATE batigest_heures SET code_projet = %s WHERE id_projet = %s AND code_projet IS NULL",
-                                (pcode, pid),
-                            )
-                            updated_count += postgres_cursor.rowcount
-                            postgres_cursor.execute(
-                                "UPDATE batigest_heures SET code_projet = %s WHERE id_projet = %s AND code_projet = LPAD(id_projet::text, 8, '0')",
-                                (pcode, pid),
-                            )
-                            updated_count += postgres_cursor.rowcount
+                            corrections[int(pid)] = pcode
+                    if corrections:
+                        # Une seule page : rowcount couvre alors toute la mise à jour
+                        execute_values(
+                            postgres_cursor,
+                            """
+                            UPDATE batigest_heures AS h
+                            SET code_projet = v.code
+                            FROM (VALUES %s) AS v(id_projet, code)
+                            WHERE h.id_projet = v.id_projet
+                              AND h.code_projet IS DISTINCT FROM v.code
+                              AND (
+                                    h.code_projet IS NULL
+                                 OR h.code_projet = LPAD(h.id_projet::text, 8, '0')
+                              )
+                            """,
+                            list(corrections.items()),
+                            page_size=len(corrections),
+                        )
+                        updated_count += postgres_cursor.rowcount
                 except requests.RequestException:
                     pass
+        metrics.add_rows(updated_count - first_pass_count)
 
         postgres_conn.commit()
         postgres_cursor.close()
@@ -859,6 +1012,7 @@ def update_code_projet_chantiers():
 # TRANSFERT DES DEVIS BATISIMPLY -> POSTGRESQL -> SQL SERVER
 # ============================================================================
 
+@metrics.instrumented("batigest.devis.batisimply_to_postgres")
 def transfer_devis_batisimply_to_postgres():
     """
     Transfère les devis depuis BatiSimply vers PostgreSQL.
@@ -868,6 +1022,7 @@ def transfer_devis_batisimply_to_postgres():
         _creds_mode = (load_credentials() or {}).get("mode", "chantier").strip().lower()
         if _creds_mode != "devis":
             return True, "[INFO] Mode 'chantier' actif: transfert des devis depuis BatiSimply ignoré"
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -877,6 +1032,7 @@ def transfer_devis_batisimply_to_postgres():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
         postgres_conn = connect_to_postgres(
@@ -892,6 +1048,7 @@ def transfer_devis_batisimply_to_postgres():
         postgres_cursor = postgres_conn.cursor()
 
         # Récupération des devis depuis BatiSimply
+        metrics.phase("extract")
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
@@ -899,57 +1056,40 @@ def transfer_devis_batisimply_to_postgres():
 
         # Essayer différents endpoints possibles pour les devis
         endpoints_to_try = [
-            'https://api.staging.batisimply.fr/api/quote',
-            'https://api.staging.batisimply.fr/api/quotes',
-            'https://api.staging.batisimply.fr/api/estimate',
-            'https://api.staging.batisimply.fr/api/estimates'
+            f'{api_url}/api/quote',
+            f'{api_url}/api/quotes',
+            f'{api_url}/api/estimate',
+            f'{api_url}/api/estimates'
         ]
         
-        response = None
+        devis = None
         for endpoint in endpoints_to_try:
             try:
-                response = requests.get(endpoint, headers=headers, timeout=30)
-                if response.status_code == 200 and response.headers.get('content-type', '').startswith('application/json'):
+                devis = fetch_all(endpoint, headers, size=page_size(creds))
+                if devis.status_code == 200 and devis.response.headers.get('content-type', '').startswith('application/json'):
                     break
+                devis.response.close()
             except Exception as e:
-                print(f"[ATTENTION] Erreur avec l'endpoint {endpoint}: {e}")
+                logger.warning("[ATTENTION] Erreur avec l'endpoint %s: %s", endpoint, e)
                 continue
         
-        if not response:
+        if devis is None or not devis.response.ok:
             return True, "[INFO] Aucun endpoint valide trouvé pour les devis - fonctionnalité non disponible"
 
-        if response.status_code != 200:
-            return False, f"[ERREUR] Erreur API BatiSimply : {response.status_code}. Réponse: {response.text[:200]}"
+        if devis.status_code != 200:
+            return False, f"[ERREUR] Erreur API BatiSimply : {devis.status_code}. Réponse: {devis.text[:200]}"
 
         # Vérifier si la réponse est du HTML (erreur 404 ou redirection)
-        if response.headers.get('content-type', '').startswith('text/html'):
+        if devis.response.headers.get('content-type', '').startswith('text/html'):
             return True, "[INFO] L'API des devis retourne du HTML - fonctionnalité non disponible via cette API"
 
-        try:
-            devis = response.json()
-        except json.JSONDecodeError as e:
-            return False, f"[ERREUR] Erreur de parsing JSON de l'API BatiSimply : {str(e)}. Réponse: {response.text[:200]}"
-
-        # Vérifier que devis est une liste ou un dictionnaire
-        if isinstance(devis, dict):
-            # Si c'est un dictionnaire, vérifier s'il contient une liste de devis
-            if 'content' in devis:
-                devis = devis['content']
-            elif 'data' in devis:
-                devis = devis['data']
-            elif 'items' in devis:
-                devis = devis['items']
-            else:
-                # Si c'est un dictionnaire simple, le traiter comme un seul devis
-                devis = [devis]
-        elif not isinstance(devis, list):
-            return False, f"[ERREUR] Format de réponse inattendu de l'API BatiSimply. Attendu: liste ou dict, reçu: {type(devis)}"
-
         # Insertion dans PostgreSQL avec gestion des conflits
+        metrics.phase("load")
+        loaded_count = 0
         for devi in devis:
             # Vérifier que devi est un dictionnaire
             if not isinstance(devi, dict):
-                print(f"[ATTENTION] Devis ignoré (format inattendu): {type(devi)} - {devi}")
+                logger.warning("[ATTENTION] Devis ignoré (format inattendu): %s - %s", type(devi), devi)
                 continue
             code = devi.get('id')  # L'ID BatiSimply devient le code
             nom = devi.get('name')
@@ -967,21 +1107,25 @@ def transfer_devis_batisimply_to_postgres():
             """
             
             postgres_cursor.execute(query_postgres, (code, date_creation, nom, sujet))
+            loaded_count += 1
+        metrics.add_rows(loaded_count)
 
         postgres_conn.commit()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(devis)} devi(s) transféré(s) depuis BatiSimply vers PostgreSQL"
+        return True, f"[OK] {loaded_count} devis transféré(s) depuis BatiSimply vers PostgreSQL"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert BatiSimply -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("batigest.devis.postgres_to_sqlserver")
 def transfer_devis_postgres_to_sqlserver():
     """
     Transfère les devis depuis PostgreSQL vers SQL Server (Batigest).
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "sqlserver" not in creds or "postgres" not in creds:
@@ -1009,51 +1153,76 @@ def transfer_devis_postgres_to_sqlserver():
         sqlserver_cursor = sqlserver_conn.cursor()
         postgres_cursor = postgres_conn.cursor()
 
-        # Récupération des devis non synchronisés
-        query = "SELECT * FROM batigest_devis WHERE sync = FALSE"
-        postgres_cursor.execute(query)
-        devis = postgres_cursor.fetchall()
+        # Table de travail SQL Server : mêmes types et collation que dbo.Devis
+        metrics.phase("prepare")
+        column_lengths = get_sqlserver_column_lengths(
+            sqlserver_cursor, "Devis",
+            (creds["sqlserver"]["server"], creds["sqlserver"]["database"]),
+        )
+        sqlserver_cursor.execute("IF OBJECT_ID('tempdb..#devis_staging') IS NOT NULL DROP TABLE #devis_staging")
+        sqlserver_cursor.execute("SELECT TOP 0 Code, Nom, [Date], Sujet INTO #devis_staging FROM dbo.Devis")
+        sqlserver_conn.commit()
 
-        # Insertion dans SQL Server
-        for devi in devis:
-            # Structure: code, date, nom, adr, cp, ville, sujet, dateconcretis, tempsmo, sync_date, sync
-            code, date, nom, adr, cp, ville, sujet, dateconcretis, tempsmo, sync_date, sync = devi
-            
-            # Vérifier si le devis existe déjà dans SQL Server
-            check_query = "SELECT COUNT(*) FROM dbo.Devis WHERE Code = ?"
-            sqlserver_cursor.execute(check_query, (code,))
-            exists = sqlserver_cursor.fetchone()[0] > 0
-            
-            if exists:
-                # Mise à jour
-                update_query = """
-                UPDATE dbo.Devis 
-                SET Nom = ?, Date = ?, Sujet = ?
-                WHERE Code = ?
-                """
-                sqlserver_cursor.execute(update_query, (nom, date, sujet, code))
-            else:
-                # Insertion
-                insert_query = """
-                INSERT INTO dbo.Devis (Code, Nom, Date, Sujet)
-                VALUES (?, ?, ?, ?)
-                """
-                sqlserver_cursor.execute(insert_query, (code, nom, date, sujet))
-            
-            # Marquer comme synchronisé dans PostgreSQL
-            update_postgres = "UPDATE batigest_devis SET sync = TRUE WHERE code = %s"
-            postgres_cursor.execute(update_postgres, (code,))
+        # Devis en attente lus par lots (curseur côté serveur, conservé entre les validations)
+        metrics.phase("extract")
+        pending_cursor = postgres_conn.cursor(name="batigest_devis_pending", withhold=True)
+        pending_cursor.itersize = DEVIS_BATCH_SIZE
+        pending_cursor.execute("SELECT code, date, nom, sujet FROM batigest_devis WHERE sync = FALSE ORDER BY code")
+
+        written_total = 0
+        failed_total = 0
+        while True:
+            metrics.phase("extract")
+            batch = pending_cursor.fetchmany(DEVIS_BATCH_SIZE)
+            if not batch:
+                break
+            metrics.add_rows(len(batch))
+
+            metrics.phase("transform")
+            staged = [
+                (
+                    code,
+                    (
+                        truncate_to_column(code, column_lengths, "Code"),
+                        truncate_to_column(nom, column_lengths, "Nom") or None,
+                        date,
+                        truncate_to_column(sujet, column_lengths, "Sujet") or None,
+                    ),
+                )
+                for code, date, nom, sujet in batch
+            ]
+            metrics.add_rows(len(staged))
+
+            # MERGE du lot dans dbo.Devis
+            metrics.phase("load")
+            written_codes = _merge_devis_batch(sqlserver_conn, sqlserver_cursor, staged)
+            written_total += len(written_codes)
+            failed_total += len(staged) - len(written_codes)
+            metrics.add_rows(len(written_codes), failed=len(staged) - len(written_codes))
+
+            # Marquer le lot comme synchronisé dans PostgreSQL
+            metrics.phase("mark_synced")
+            if written_codes:
+                postgres_cursor.execute(
+                    "UPDATE batigest_devis SET sync = TRUE WHERE code = ANY(%s)",
+                    (written_codes,)
+                )
+                metrics.add_rows(len(written_codes))
+            postgres_conn.commit()
 
+        pending_cursor.close()
+        sqlserver_cursor.execute("DROP TABLE #devis_staging")
         sqlserver_conn.commit()
-        postgres_conn.commit()
-        
+
         # Fermeture des connexions
         sqlserver_cursor.close()
         postgres_cursor.close()
         sqlserver_conn.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(devis)} devi(s) transféré(s) vers SQL Server"
+        if failed_total:
+            return True, f"[ATTENTION] {written_total} devis transféré(s) vers SQL Server, {failed_total} en échec"
+        return True, f"[OK] {written_total} devis transféré(s) vers SQL Server"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> SQL Server : {str(e)}"
@@ -1062,74 +1231,63 @@ def transfer_devis_postgres_to_sqlserver():
 # FONCTIONS DE SYNCHRONISATION COMPLÈTE
 # ============================================================================
 
+def batisimply_to_sqlserver_steps(mode: str) -> list:
+    """
+    Étapes de la synchronisation BatiSimply -> PostgreSQL -> SQL Server
+    (app/services/pipeline.py) ; devis uniquement en mode 'devis'.
+    """
+    steps = [
+        # 1. Transfert des chantiers
+        Step("chantiers.batisimply_to_postgres", transfer_chantiers_batisimply_to_postgres,
+             label="[SYNC] Synchronisation des chantiers..."),
+        Step("chantiers.postgres_to_sqlserver", transfer_chantiers_postgres_to_sqlserver,
+             requires=("chantiers.batisimply_to_postgres",)),
+        # 2. Transfert des heures ; les codes projet sont déduits de batigest_chantiers.
+        # La mise à jour des codes projet est une correction : son échec n'invalide pas la synchronisation
+        Step("heures.batisimply_to_postgres", transfer_heures_batisimply_to_postgres,
+             label="[SYNC] Synchronisation des heures..."),
+        Step("heures.code_projet", update_code_projet_chantiers,
+             requires=("heures.batisimply_to_postgres",), after=("chantiers.batisimply_to_postgres",),
+             label="[SYNC] Mise à jour des codes projet...", required=False),
+        Step("heures.postgres_to_sqlserver", transfer_heures_postgres_to_sqlserver,
+             requires=("heures.batisimply_to_postgres",),
+             after=("heures.code_projet", "chantiers.postgres_to_sqlserver")),
+    ]
+    # 3. Transfert des devis (uniquement en mode 'devis')
+    if mode == "devis":
+        steps += [
+            Step("devis.batisimply_to_postgres", transfer_devis_batisimply_to_postgres,
+                 label="[SYNC] Synchronisation des devis..."),
+            Step("devis.postgres_to_sqlserver", transfer_devis_postgres_to_sqlserver,
+                 requires=("devis.batisimply_to_postgres",)),
+        ]
+    return steps
+
+@metrics.instrumented("batigest.sync_batisimply_to_sqlserver")
 def sync_batisimply_to_sqlserver():
     """
     Synchronisation complète BatiSimply -> PostgreSQL -> SQL Server.
+
+    Les flux chantiers, heures et devis sont lancés en parallèle (sync_workers) ;
+    l'écriture des heures dans SQL Server attend celle des chantiers.
     """
-    print("=== DÉBUT DE LA SYNCHRONISATION BATISIMPLY -> SQL SERVER ===")
-    messages = []
-    overall_success = True
+    logger.info("=== DÉBUT DE LA SYNCHRONISATION BATISIMPLY -> SQL SERVER ===")
     
     try:
         # Respect du mode (chantier|devis) depuis credentials.json
         creds = load_credentials() or {}
         mode = (creds.get("mode") or "chantier").strip().lower()
-        print(f"[INFO] Mode courant: {mode}")
-        # 1. Transfert des chantiers
-        print("[SYNC] Synchronisation des chantiers...")
-        success, message = transfer_chantiers_batisimply_to_postgres()
-        print(message)
-        messages.append(message)
-        
-        if success:
-            success, message = transfer_chantiers_postgres_to_sqlserver()
-            print(message)
-            messages.append(message)
-            if not success:
-                overall_success = False
-        else:
-            overall_success = False
-        
-        # 2. Transfert des heures
-        print("[SYNC] Synchronisation des heures...")
-        success, message = transfer_heures_batisimply_to_postgres()
-        print(message)
-        messages.append(message)
-        
-        if success:
-            # Mettre à jour les codes projet des heures
-            print("[SYNC] Mise à jour des codes projet...")
-            success_update, message_update = update_code_projet_chantiers()
-            print(message_update)
-            messages.append(message_update)
-            
-            success, message = transfer_heures_postgres_to_sqlserver()
-            print(message)
-            messages.append(message)
-            if not success:
-                overall_success = False
-        else:
-            overall_success = False
-        
-        # 3. Transfert des devis (uniquement en mode 'devis')
-        if mode == "devis":
-            print("[SYNC] Synchronisation des devis...")
-            success, message = transfer_devis_batisimply_to_postgres()
-            print(message)
-            messages.append(message)
-            
-            if success:
-                success, message = transfer_devis_postgres_to_sqlserver()
-                print(message)
-                messages.append(message)
-                if not success:
-                    overall_success = False
-            else:
-                overall_success = False
-        else:
-            print("[INFO] Mode 'chantier' actif: envoi des devis désactivé.")
+        logger.info("[INFO] Mode courant: %s", mode)
+        if mode != "devis":
+            logger.info("[INFO] Mode 'chantier' actif: envoi des devis désactivé.")
+        steps = batisimply_to_sqlserver_steps(mode)
+
+        started = time.perf_counter()
+        results = run_steps(steps, sync_workers(creds))
+        logger.info(format_report(results, time.perf_counter() - started))
+        overall_success = all_succeeded(steps, results)
         
-        print("=== FIN DE LA SYNCHRONISATION BATISIMPLY -> SQL SERVER ===")
+        logger.info("=== FIN DE LA SYNCHRONISATION BATISIMPLY -> SQL SERVER ===")
         
         if overall_success:
             return True, "[OK] Synchronisation BatiSimply -> SQL Server terminée avec succès"
@@ -1138,5 +1296,5 @@ def sync_batisimply_to_sqlserver():
             
     except Exception as e:
         error_msg = f"[ERREUR] Erreur lors de la synchronisation BatiSimply -> SQL Server : {str(e)}"
-        print(error_msg)
+        logger.log(level_for_message(error_msg), error_msg)
         return False, error_msg
@@ -0,0 +1,57 @@
+# app/services/batigest/full_sync.py
+# Synchronisation aller-retour Batigest <-> BatiSimply
+# Ce fichier enchaîne les deux sens (SQL Server -> BatiSimply puis BatiSimply -> SQL Server)
+# dans une seule session : une connexion SQL Server, une connexion PostgreSQL et
+# un token BatiSimply pour toute l'exécution, au lieu d'une par étape.
+
+import logging
+import time
+from app.services import metrics
+from app.services.connex import load_credentials
+from app.services.pipeline import all_succeeded, format_report, run_steps
+from app.services.sync_session import SyncSession
+from app.services.batigest.sqlserver_to_batisimply import sqlserver_to_batisimply_steps
+from app.services.batigest.batisimply_to_sqlserver import batisimply_to_sqlserver_steps
+from app.utils.logger import level_for_message
+
+logger = logging.getLogger(__name__)
+
+
+@metrics.instrumented("batigest.sync_all")
+def sync_all():
+    """
+    Synchronisation complète dans les deux sens : SQL Server -> PostgreSQL -> BatiSimply,
+    puis BatiSimply -> PostgreSQL -> SQL Server.
+
+    Les étapes partagent les connexions de la session : elles s'exécutent l'une
+    après l'autre, chacune dans sa propre transaction.
+    """
+    logger.info("=== DÉBUT DE LA SYNCHRONISATION COMPLÈTE BATIGEST <-> BATISIMPLY ===")
+
+    try:
+        # Respect du mode (chantier|devis) depuis credentials.json
+        creds = load_credentials() or {}
+        mode = (creds.get("mode") or "chantier").strip().lower()
+        logger.info("[INFO] Mode courant: %s", mode)
+        if mode != "devis":
+            logger.info("[INFO] Mode 'chantier' actif: envoi des devis désactivé.")
+        steps = sqlserver_to_batisimply_steps(mode) + batisimply_to_sqlserver_steps(mode)
+
+        with SyncSession() as session:
+            started = time.perf_counter()
+            results = run_steps([step._replace(func=session.step(step.func)) for step in steps], max_workers=1)
+            logger.info(format_report(results, time.perf_counter() - started))
+            logger.info("[INFO] %s connexion(s) ouverte(s) pour %s étape(s)", session.opened, len(steps))
+        overall_success = all_succeeded(steps, results)
+
+        logger.info("=== FIN DE LA SYNCHRONISATION COMPLÈTE BATIGEST <-> BATISIMPLY ===")
+
+        if overall_success:
+            return True, "[OK] Synchronisation Batigest <-> BatiSimply terminée avec succès"
+        else:
+            return False, "[ATTENTION] Synchronisation Batigest <-> BatiSimply terminée avec des erreurs"
+
+    except Exception as e:
+        error_msg = f"[ERREUR] Erreur lors de la synchronisation Batigest <-> BatiSimply : {str(e)}"
+        logger.log(level_for_message(error_msg), error_msg)
+        return False, error_msg
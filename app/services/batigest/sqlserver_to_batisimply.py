@@ -3,12 +3,22 @@
 # Ce fichier contient les fonctions pour transférer les données depuis Batigest (SQL Server) vers BatiSimply
 
 import psycopg2
-import requests
+from psycopg2.extras import execute_values
 import json
+import logging
+import time
 from datetime import date, datetime
 from decimal import Decimal
 from typing import Dict, Iterable, Optional
-from app.services.connex import connect_to_sqlserver, connect_to_postgres, load_credentials, recup_batisimply_token
+from app.services.connex import connect_to_sqlserver, connect_to_postgres, load_credentials, recup_batisimply_token, get_batisimply_api_url, batisimply_request
+from app.services import metrics
+from app.services.payloads import JSON_HEADERS, ProjectPayloadBuilder
+from app.services.pipeline import Step, all_succeeded, format_report, run_steps, sync_workers
+from app.services.push import PUSH_BATCH_SIZE, push_concurrently, push_workers
+from app.services.ratelimit import CircuitOpenError
+from app.utils.logger import level_for_message
+
+logger = logging.getLogger(__name__)
 
 
 def _record_from_row(columns: Iterable[str], row) -> Dict[str, object]:
@@ -95,11 +105,13 @@ def _clean_str(value):
 # TRANSFERT DES CHANTIERS SQL SERVER -> POSTGRESQL -> BATISIMPLY
 # ============================================================================
 
+@metrics.instrumented("batigest.chantiers.sqlserver_to_postgres")
 def transfer_chantiers_sqlserver_to_postgres():
     """
     Transfère les chantiers depuis SQL Server (Batigest) vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "sqlserver" not in creds or "postgres" not in creds:
@@ -128,6 +140,7 @@ def transfer_chantiers_sqlserver_to_postgres():
         postgres_cursor = postgres_conn.cursor()
 
         # Requête pour récupérer les chantiers depuis SQL Server
+        metrics.phase("extract")
         # D'abord, listons les tables disponibles pour diagnostiquer
         query_tables = """
         SELECT TABLE_NAME 
@@ -138,9 +151,9 @@ def transfer_chantiers_sqlserver_to_postgres():
         try:
             sqlserver_cursor.execute(query_tables)
             tables = sqlserver_cursor.fetchall()
-            print(f"[DEBUG] Tables trouvées contenant 'chantier': {[t[0] for t in tables]}")
+            logger.debug("[DEBUG] Tables trouvées contenant 'chantier': %s", [t[0] for t in tables])
         except Exception as e:
-            print(f"[DEBUG] Erreur lors de la recherche des tables: {e}")
+            logger.debug("[DEBUG] Erreur lors de la recherche des tables: %s", e)
         
         # Requête principale pour récupérer TOUS les chantiers (sans filtre d'état)
         query_sqlserver = """
@@ -153,41 +166,43 @@ def transfer_chantiers_sqlserver_to_postgres():
             count_query = "SELECT COUNT(*) FROM dbo.ChantierDef"
             sqlserver_cursor.execute(count_query)
             total_count = sqlserver_cursor.fetchone()[0]
-            print(f"[DEBUG] Total des chantiers dans ChantierDef: {total_count}")
+            logger.debug("[DEBUG] Total des chantiers dans ChantierDef: %s", total_count)
             
             # Voir quels sont les états disponibles
             states_query = "SELECT DISTINCT Etat FROM dbo.ChantierDef"
             sqlserver_cursor.execute(states_query)
             states = sqlserver_cursor.fetchall()
-            print(f"[DEBUG] États disponibles dans ChantierDef: {[s[0] for s in states]}")
+            logger.debug("[DEBUG] États disponibles dans ChantierDef: %s", [s[0] for s in states])
             
             # Compter les chantiers avec Etat = 'E'
             count_e_query = "SELECT COUNT(*) FROM dbo.ChantierDef WHERE Etat = 'E'"
             sqlserver_cursor.execute(count_e_query)
             count_e = sqlserver_cursor.fetchone()[0]
-            print(f"[DEBUG] Chantiers avec Etat = 'E': {count_e}")
+            logger.debug("[DEBUG] Chantiers avec Etat = 'E': %s", count_e)
             
             # Récupérer TOUS les chantiers pour voir leur contenu
             all_query = "SELECT TOP 3 * FROM dbo.ChantierDef"
             sqlserver_cursor.execute(all_query)
             all_chantiers = sqlserver_cursor.fetchall()
             all_columns = [col[0] for col in sqlserver_cursor.description]
-            print(f"[DEBUG] Exemple de chantiers (3 premiers):")
+            logger.debug("[DEBUG] Exemple de chantiers (3 premiers):")
             for i, chantier in enumerate(all_chantiers):
                 record = _record_from_row(all_columns, chantier)
-                print(f"  Chantier {i+1}: Code='{record.get('code', 'N/A')}', Etat='{record.get('Etat', 'N/A')}', Nom='{record.get('nomclient', 'N/A')}'")
+                logger.debug("  Chantier %s: Code='%s', Etat='%s', Nom='%s'", i+1, record.get('code', 'N/A'), record.get('Etat', 'N/A'), record.get('nomclient', 'N/A'))
             
             # Exécuter la requête principale (TOUS les chantiers)
             sqlserver_cursor.execute(query_sqlserver)
             chantiers_rows = sqlserver_cursor.fetchall()
             columns = [col[0] for col in sqlserver_cursor.description]
-            print(f"[DEBUG] Chantiers récupérés (TOUS): {len(chantiers_rows)}")
+            logger.debug("[DEBUG] Chantiers récupérés (TOUS): %s", len(chantiers_rows))
+            metrics.add_rows(len(chantiers_rows))
             
         except Exception as sql_error:
             return False, f"[ERREUR] Erreur SQL Server - Table 'Chantier' introuvable. Vérifiez le nom de la table dans votre base de données. Erreur: {str(sql_error)}"
 
-        # Insertion dans PostgreSQL avec gestion des conflits
-        inserted_rows = 0
+        # Préparation des lignes (normalisation des colonnes Batigest)
+        metrics.phase("transform")
+        rows_to_load = []
         for chantier_row in chantiers_rows:
             record = _record_from_row(columns, chantier_row)
             code = _clean_str(record.get("code"))
@@ -235,9 +250,7 @@ def transfer_chantiers_sqlserver_to_postgres():
             )
 
             now_utc = datetime.utcnow()
-
-            query_postgres = """
-            INSERT INTO batigest_chantiers (
+            rows_to_load.append((
                 code,
                 date_debut,
                 date_fin,
@@ -247,42 +260,46 @@ def transfer_chantiers_sqlserver_to_postgres():
                 cp_chantier,
                 ville_chantier,
                 total_mo,
-                sync,
-                sync_date,
-                last_modified_batigest
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE, %s, %s)
-            ON CONFLICT (code) DO UPDATE SET
-                date_debut = EXCLUDED.date_debut,
-                date_fin = EXCLUDED.date_fin,
-                nom_client = EXCLUDED.nom_client,
-                description = EXCLUDED.description,
-                adr_chantier = EXCLUDED.adr_chantier,
-                cp_chantier = EXCLUDED.cp_chantier,
-                ville_chantier = EXCLUDED.ville_chantier,
-                total_mo = EXCLUDED.total_mo,
-                sync = FALSE,
-                sync_date = EXCLUDED.sync_date,
-                last_modified_batigest = EXCLUDED.last_modified_batigest
-            """
-            
-            postgres_cursor.execute(
-                query_postgres,
-                (
-                    code,
-                    date_debut,
-                    date_fin,
-                    nom_client,
-                    description,
-                    adr_chantier,
-                    cp_chantier,
-                    ville_chantier,
-                    total_mo,
-                    now_utc,
-                    now_utc,
-                )
-            )
-            inserted_rows += 1
+                now_utc,
+                now_utc,
+            ))
+        metrics.add_rows(len(rows_to_load))
+
+        # Insertion dans PostgreSQL avec gestion des conflits
+        metrics.phase("load")
+        query_postgres = """
+        INSERT INTO batigest_chantiers (
+            code,
+            date_debut,
+            date_fin,
+            nom_client,
+            description,
+            adr_chantier,
+            cp_chantier,
+            ville_chantier,
+            total_mo,
+            sync,
+            sync_date,
+            last_modified_batigest
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE, %s, %s)
+        ON CONFLICT (code) DO UPDATE SET
+            date_debut = EXCLUDED.date_debut,
+            date_fin = EXCLUDED.date_fin,
+            nom_client = EXCLUDED.nom_client,
+            description = EXCLUDED.description,
+            adr_chantier = EXCLUDED.adr_chantier,
+            cp_chantier = EXCLUDED.cp_chantier,
+            ville_chantier = EXCLUDED.ville_chantier,
+            total_mo = EXCLUDED.total_mo,
+            sync = FALSE,
+            sync_date = EXCLUDED.sync_date,
+            last_modified_batigest = EXCLUDED.last_modified_batigest
+        """
+        for params in rows_to_load:
+            postgres_cursor.execute(query_postgres, params)
+        inserted_rows = len(rows_to_load)
+        metrics.add_rows(inserted_rows)
 
         postgres_conn.commit()
         message_success = f"[OK] {inserted_rows} chantier(s) transféré(s) depuis SQL Server vers PostgreSQL"
@@ -298,11 +315,13 @@ def transfer_chantiers_sqlserver_to_postgres():
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert SQL Server -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("batigest.chantiers.postgres_to_batisimply")
 def transfer_chantiers_postgres_to_batisimply():
     """
     Transfère les chantiers depuis PostgreSQL vers BatiSimply.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -312,6 +331,7 @@ def transfer_chantiers_postgres_to_batisimply():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
         postgres_conn = connect_to_postgres(
@@ -327,78 +347,74 @@ def transfer_chantiers_postgres_to_batisimply():
         postgres_cursor = postgres_conn.cursor()
 
         # Récupération des chantiers non synchronisés
-        query = "SELECT * FROM batigest_chantiers WHERE sync = FALSE"
+        metrics.phase("extract")
+        query = """
+        SELECT id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest
+        FROM batigest_chantiers
+        WHERE sync = FALSE
+        """
         postgres_cursor.execute(query)
         chantiers = postgres_cursor.fetchall()
+        metrics.add_rows(len(chantiers))
 
-        # Envoi vers BatiSimply
+        # Préparation des données pour BatiSimply : seuls les champs propres au
+        # chantier sont renseignés, le reste vient de la configuration
+        metrics.phase("transform")
+        builder = ProjectPayloadBuilder.from_credentials(creds)
+        payloads = []
+        for chantier in chantiers:
+            # Structure: id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest
+            id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest = chantier
+            payloads.append((code, builder.build(
+                code, nom_client, description, adr_chantier, cp_chantier, ville_chantier,
+                date_debut, date_fin, total_mo
+            )))
+        metrics.add_rows(len(payloads))
+
+        # Envoi concurrent vers BatiSimply (corps déjà sérialisés)
+        metrics.phase("push")
         headers = {
             'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
+            **JSON_HEADERS
         }
 
-        for chantier in chantiers:
-            # Structure: id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest
-            id, code, date_debut, date_fin, nom_client, description, adr_chantier, cp_chantier, ville_chantier, sync_date, sync, total_mo, last_modified_batisimply, last_modified_batigest = chantier
-            
-            # Préparation des données pour BatiSimply (format qui fonctionnait)
-            # Formatage de l'adresse : "rue, code postal, ville, France"
-            adresse_complete = f"{adr_chantier or ''}, {cp_chantier or ''}, {ville_chantier or ''}, France"
-            # Nettoyage des virgules multiples et espaces
-            adresse_complete = ", ".join([part.strip() for part in adresse_complete.split(",") if part.strip()])
-            
-            data = {
-                "address": {
-                    "city": ville_chantier or "",
-                    "countryCode": "FR",
-                    "geoPoint": {
-                        "xLon": 3.8777,
-                        "yLat": 43.6119
-                    },
-                    "googleFormattedAddress": adresse_complete,
-                    "postalCode": cp_chantier or "",
-                    "street": adr_chantier or ""
-                },
-                "budget": {
-                    "amount": 500000.0,
-                    "currency": "EUR"
-                },
-                "endEstimated": date_fin.strftime("%Y-%m-%d") if date_fin else None,
-                "headQuarter": {
-                    "id": 33
-                },
-                "hoursSold": float(total_mo) if total_mo is not None else 0,
-                "projectCode": code,
-                "comment": description or f"Chantier {code}",
-                "projectName": nom_client or f"Chantier {code}",
-                "customerName": nom_client or f"Chantier {code}",
-                "projectManager": "DEFINIR",
-                "startEstimated": date_debut.strftime("%Y-%m-%d") if date_debut else None,
-                "isArchived": False,
-                "isFinished": False,
-                "projectColor": "#9b1ff1"
-            }
+        def send(session, body):
+            return session.post(f'{api_url}/api/project', headers=headers, data=body, timeout=30)
 
-            # Envoi vers l'API BatiSimply
-            response = requests.post(
-                'https://api.staging.batisimply.fr/api/project',
-                headers=headers,
-                json=data,
-                timeout=30
+        sent_codes = []
+        interrupted = None
+        try:
+            for outcome in push_concurrently(payloads, send, push_workers(creds)):
+                for response in outcome.responses:
+                    metrics.record_http(response)
+                if outcome.ok:
+                    sent_codes.append(outcome.key)
+                else:
+                    logger.warning("[ATTENTION] Erreur lors de l'envoi du chantier %s: %s", outcome.key, outcome.error)
+        except CircuitOpenError as e:
+            # Les chantiers acceptés avant l'interruption sont marqués ci-dessous (pas de renvoi en double)
+            interrupted = e
+        failed = len(payloads) - len(sent_codes)
+        metrics.add_rows(len(sent_codes), failed=failed)
+
+        # Marquer comme synchronisés les chantiers acceptés par BatiSimply
+        metrics.phase("mark_synced")
+        if sent_codes:
+            postgres_cursor.execute(
+                "UPDATE batigest_chantiers SET sync = TRUE WHERE code = ANY(%s)",
+                (sent_codes,)
             )
-
-            if response.status_code in [200, 201]:
-                # Marquer comme synchronisé
-                update_query = "UPDATE batigest_chantiers SET sync = TRUE WHERE code = %s"
-                postgres_cursor.execute(update_query, (code,))
-            else:
-                print(f"[ATTENTION] Erreur lors de l'envoi du chantier {code}: {response.status_code}")
+            metrics.add_rows(len(sent_codes))
 
         postgres_conn.commit()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(chantiers)} chantier(s) envoyé(s) vers BatiSimply"
+        if interrupted is not None:
+            return False, f"[ERREUR] Envoi des chantiers interrompu après {len(sent_codes)} chantier(s) envoyé(s) : {interrupted}"
+        if failed:
+            return True, f"[ATTENTION] {len(sent_codes)} chantier(s) envoyé(s) vers BatiSimply, {failed} en échec"
+        return True, f"[OK] {len(sent_codes)} chantier(s) envoyé(s) vers BatiSimply"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> BatiSimply : {str(e)}"
@@ -407,11 +423,13 @@ def transfer_chantiers_postgres_to_batisimply():
 # TRANSFERT DES HEURES SQL SERVER -> POSTGRESQL -> BATISIMPLY
 # ============================================================================
 
+@metrics.instrumented("batigest.heures.sqlserver_to_postgres")
 def transfer_heures_sqlserver_to_postgres():
     """
     Transfère les heures depuis SQL Server (Batigest) vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "sqlserver" not in creds or "postgres" not in creds:
@@ -440,6 +458,7 @@ def transfer_heures_sqlserver_to_postgres():
         postgres_cursor = postgres_conn.cursor()
 
         # Requête pour récupérer les heures depuis SQL Server
+        metrics.phase("extract")
         query_sqlserver = """
         SELECT CodeChantier, CodeSalarie, Date, Heures, Commentaire
         FROM dbo.SuiviMO
@@ -447,22 +466,23 @@ def transfer_heures_sqlserver_to_postgres():
         """
         
         sqlserver_cursor.execute(query_sqlserver)
-        heures = sqlserver_cursor.fetchall()
+        heures_rows = sqlserver_cursor.fetchall()
+        metrics.add_rows(len(heures_rows))
 
         # Insertion dans PostgreSQL avec gestion des conflits
-        for heure in heures:
+        metrics.phase("load")
+        query_postgres = """
+        INSERT INTO batigest_suivimo (code_chantier, code_salarie, date_heure, heures, commentaire, sync)
+        VALUES (%s, %s, %s, %s, %s, FALSE)
+        ON CONFLICT (code_chantier, code_salarie, date_heure) DO UPDATE SET
+            heures = EXCLUDED.heures,
+            commentaire = EXCLUDED.commentaire,
+            sync = FALSE
+        """
+        for heure in heures_rows:
             code_chantier, code_salarie, date_heure, heures, commentaire = heure
-            
-            query_postgres = """
-            INSERT INTO batigest_heures (code_chantier, code_salarie, date_heure, heures, commentaire, sync)
-            VALUES (%s, %s, %s, %s, %s, FALSE)
-            ON CONFLICT (code_chantier, code_salarie, date_heure) DO UPDATE SET
-                heures = EXCLUDED.heures,
-                commentaire = EXCLUDED.commentaire,
-                sync = FALSE
-            """
-            
             postgres_cursor.execute(query_postgres, (code_chantier, code_salarie, date_heure, heures, commentaire))
+        metrics.add_rows(len(heures_rows))
 
         postgres_conn.commit()
         
@@ -472,16 +492,18 @@ def transfer_heures_sqlserver_to_postgres():
         sqlserver_conn.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(heures)} heure(s) transférée(s) depuis SQL Server vers PostgreSQL"
+        return True, f"[OK] {len(heures_rows)} heure(s) transférée(s) depuis SQL Server vers PostgreSQL"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert SQL Server -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("batigest.heures.postgres_to_batisimply")
 def transfer_heures_postgres_to_batisimply():
     """
     Transfère les heures depuis PostgreSQL vers BatiSimply.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -491,6 +513,7 @@ def transfer_heures_postgres_to_batisimply():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
         postgres_conn = connect_to_postgres(
@@ -505,49 +528,99 @@ def transfer_heures_postgres_to_batisimply():
 
         postgres_cursor = postgres_conn.cursor()
 
-        # Récupération des heures non synchronisées
-        query = "SELECT * FROM batigest_heures WHERE sync = FALSE"
-        postgres_cursor.execute(query)
-        heures = postgres_cursor.fetchall()
+        # Heures en attente lues par lots (curseur côté serveur, conservé entre les validations)
+        metrics.phase("extract")
+        pending_cursor = postgres_conn.cursor(name="batigest_suivimo_pending", withhold=True)
+        pending_cursor.execute("""
+        SELECT code_chantier, code_salarie, date_heure, heures, commentaire
+        FROM batigest_suivimo
+        WHERE sync = FALSE
+        """)
 
-        # Envoi vers BatiSimply
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
 
-        for heure in heures:
-            code_chantier, code_salarie, date_heure, heures, commentaire, sync = heure
-            
-            # Préparation des données pour BatiSimply
-            data = {
-                "projectId": code_chantier,
-                "userId": code_salarie,
-                "date": date_heure.isoformat(),
-                "hours": float(heures),
-                "comment": commentaire
-            }
+        def send(session, data):
+            return session.post(f'{api_url}/api/timeSlotManagement', headers=headers, json=data, timeout=30)
 
-            # Envoi vers l'API BatiSimply
-            response = requests.post(
-                'https://api.staging.batisimply.fr/api/timeSlotManagement',
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-
-            if response.status_code in [200, 201]:
-                # Marquer comme synchronisé
-                update_query = "UPDATE batigest_heures SET sync = TRUE WHERE code_chantier = %s AND code_salarie = %s AND date_heure = %s"
-                postgres_cursor.execute(update_query, (code_chantier, code_salarie, date_heure))
-            else:
-                print(f"[ATTENTION] Erreur lors de l'envoi de l'heure {code_chantier}-{code_salarie}: {response.status_code}")
-
-        postgres_conn.commit()
+        workers = push_workers(creds)
+        sent = 0
+        failed = 0
+        interrupted = None
+        try:
+            while True:
+                metrics.phase("extract")
+                heures_rows = pending_cursor.fetchmany(PUSH_BATCH_SIZE)
+                if not heures_rows:
+                    break
+                metrics.add_rows(len(heures_rows))
+
+                # Préparation des données pour BatiSimply
+                metrics.phase("transform")
+                payloads = []
+                for code_chantier, code_salarie, date_heure, heures, commentaire in heures_rows:
+                    data = {
+                        "projectId": code_chantier,
+                        "userId": code_salarie,
+                        "date": date_heure.isoformat(),
+                        "hours": float(heures or 0),
+                        "comment": commentaire
+                    }
+                    payloads.append(((code_chantier, code_salarie, date_heure), data))
+                metrics.add_rows(len(payloads))
+
+                # Envoi concurrent vers BatiSimply (débit réduit sur 429)
+                metrics.phase("push")
+                sent_keys = []
+                try:
+                    for outcome in push_concurrently(payloads, send, workers):
+                        for response in outcome.responses:
+                            metrics.record_http(response)
+                        if outcome.ok:
+                            sent_keys.append(outcome.key)
+                        else:
+                            logger.warning("[ATTENTION] Erreur lors de l'envoi de l'heure %s-%s: %s", outcome.key[0], outcome.key[1], outcome.error)
+                except CircuitOpenError as e:
+                    # Les envois acceptés avant l'interruption sont marqués ci-dessous
+                    # (sinon renvoyés en double à la prochaine synchronisation)
+                    interrupted = e
+                batch_failed = len(payloads) - len(sent_keys)
+                metrics.add_rows(len(sent_keys), failed=batch_failed)
+                sent += len(sent_keys)
+                failed += batch_failed
+
+                # Marquer comme synchronisées les heures acceptées par BatiSimply (une requête par lot)
+                metrics.phase("mark_synced")
+                if sent_keys:
+                    execute_values(
+                        postgres_cursor,
+                        """
+                        UPDATE batigest_suivimo AS h
+                        SET sync = TRUE
+                        FROM (VALUES %s) AS v(code_chantier, code_salarie, date_heure)
+                        WHERE h.code_chantier = v.code_chantier
+                          AND h.code_salarie = v.code_salarie
+                          AND h.date_heure = v.date_heure::timestamp
+                        """,
+                        sent_keys,
+                        page_size=PUSH_BATCH_SIZE
+                    )
+                    metrics.add_rows(len(sent_keys))
+                postgres_conn.commit()
+                if interrupted is not None:
+                    break
+        finally:
+            pending_cursor.close()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(heures)} heure(s) envoyée(s) vers BatiSimply"
+        if interrupted is not None:
+            return False, f"[ERREUR] Envoi des heures interrompu après {sent} heure(s) envoyée(s) : {interrupted}"
+        if failed:
+            return True, f"[ATTENTION] {sent} heure(s) envoyée(s) vers BatiSimply, {failed} en échec"
+        return True, f"[OK] {sent} heure(s) envoyée(s) vers BatiSimply"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> BatiSimply : {str(e)}"
@@ -556,6 +629,7 @@ def transfer_heures_postgres_to_batisimply():
 # TRANSFERT DES DEVIS SQL SERVER -> POSTGRESQL -> BATISIMPLY
 # ============================================================================
 
+@metrics.instrumented("batigest.devis.sqlserver_to_postgres")
 def transfer_devis_sqlserver_to_postgres():
     """
     Transfère les devis depuis SQL Server (Batigest) vers PostgreSQL.
@@ -565,6 +639,7 @@ def transfer_devis_sqlserver_to_postgres():
         _creds_mode = (load_credentials() or {}).get("mode", "chantier").strip().lower()
         if _creds_mode != "devis":
             return True, "[INFO] Mode 'chantier' actif: transfert des devis vers PostgreSQL ignoré"
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "sqlserver" not in creds or "postgres" not in creds:
@@ -593,6 +668,7 @@ def transfer_devis_sqlserver_to_postgres():
         postgres_cursor = postgres_conn.cursor()
 
         # Requête pour récupérer les devis depuis SQL Server
+        metrics.phase("extract")
         query_sqlserver = """
         SELECT *
         FROM dbo.Devis
@@ -602,10 +678,11 @@ def transfer_devis_sqlserver_to_postgres():
         sqlserver_cursor.execute(query_sqlserver)
         devis_rows = sqlserver_cursor.fetchall()
         devis_columns = [col[0] for col in sqlserver_cursor.description]
+        metrics.add_rows(len(devis_rows))
 
-        inserted_rows = 0
-
-        # Insertion dans PostgreSQL avec gestion des conflits
+        # Normalisation des enregistrements
+        metrics.phase("transform")
+        rows_to_load = []
         for devi in devis_rows:
             record = _record_from_row(devis_columns, devi)
             code = _clean_str(record.get("code"))
@@ -654,36 +731,7 @@ def transfer_devis_sqlserver_to_postgres():
 
             now_utc = datetime.utcnow()
 
-            query_postgres = """
-            INSERT INTO batigest_devis (
-                code,
-                date,
-                nom,
-                adr,
-                cp,
-                ville,
-                sujet,
-                dateconcretis,
-                tempsmo,
-                sync_date,
-                sync
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE)
-            ON CONFLICT (code) DO UPDATE SET
-                date = EXCLUDED.date,
-                nom = EXCLUDED.nom,
-                adr = EXCLUDED.adr,
-                cp = EXCLUDED.cp,
-                ville = EXCLUDED.ville,
-                sujet = EXCLUDED.sujet,
-                dateconcretis = EXCLUDED.dateconcretis,
-                tempsmo = EXCLUDED.tempsmo,
-                sync_date = EXCLUDED.sync_date,
-                sync = FALSE
-            """
-            
-            postgres_cursor.execute(
-                query_postgres,
+            rows_to_load.append(
                 (
                     code,
                     date_devis,
@@ -697,7 +745,41 @@ def transfer_devis_sqlserver_to_postgres():
                     now_utc,
                 )
             )
-            inserted_rows += 1
+        metrics.add_rows(len(rows_to_load))
+
+        # Insertion dans PostgreSQL avec gestion des conflits
+        metrics.phase("load")
+        query_postgres = """
+        INSERT INTO batigest_devis (
+            code,
+            date,
+            nom,
+            adr,
+            cp,
+            ville,
+            sujet,
+            dateconcretis,
+            tempsmo,
+            sync_date,
+            sync
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE)
+        ON CONFLICT (code) DO UPDATE SET
+            date = EXCLUDED.date,
+            nom = EXCLUDED.nom,
+            adr = EXCLUDED.adr,
+            cp = EXCLUDED.cp,
+            ville = EXCLUDED.ville,
+            sujet = EXCLUDED.sujet,
+            dateconcretis = EXCLUDED.dateconcretis,
+            tempsmo = EXCLUDED.tempsmo,
+            sync_date = EXCLUDED.sync_date,
+            sync = FALSE
+        """
+        for params in rows_to_load:
+            postgres_cursor.execute(query_postgres, params)
+        inserted_rows = len(rows_to_load)
+        metrics.add_rows(inserted_rows)
 
         postgres_conn.commit()
         message_success = f"[OK] {inserted_rows} devis transféré(s) depuis SQL Server vers PostgreSQL"
@@ -713,11 +795,13 @@ def transfer_devis_sqlserver_to_postgres():
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert SQL Server -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("batigest.devis.postgres_to_batisimply")
 def transfer_devis_postgres_to_batisimply():
     """
     Transfère les devis depuis PostgreSQL vers BatiSimply.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -727,6 +811,7 @@ def transfer_devis_postgres_to_batisimply():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
         postgres_conn = connect_to_postgres(
@@ -742,16 +827,15 @@ def transfer_devis_postgres_to_batisimply():
         postgres_cursor = postgres_conn.cursor()
 
         # Récupération des devis non synchronisés
+        metrics.phase("extract")
         query = "SELECT * FROM batigest_devis WHERE sync = FALSE"
         postgres_cursor.execute(query)
         devis = postgres_cursor.fetchall()
+        metrics.add_rows(len(devis))
 
-        # Envoi vers BatiSimply
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-
+        # Préparation des données pour BatiSimply
+        metrics.phase("transform")
+        payloads = []
         for devi in devis:
             # Structure: code, date, nom, adr, cp, ville, sujet, dateconcretis, tempsmo, sync_date, sync
             code, date, nom, adr, cp, ville, sujet, dateconcretis, tempsmo, sync_date, sync = devi
@@ -764,27 +848,48 @@ def transfer_devis_postgres_to_batisimply():
                 "status": "En cours",
                 "clientCode": code
             }
+            payloads.append((code, data))
+        metrics.add_rows(len(payloads))
 
-            # Envoi vers l'API BatiSimply
-            response = requests.post(
-                'https://api.staging.batisimply.fr/api/quote',
+        # Envoi vers BatiSimply
+        metrics.phase("push")
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+        sent_codes = []
+        for code, data in payloads:
+            response = batisimply_request(
+                "POST",
+                f'{api_url}/api/quote',
                 headers=headers,
                 json=data,
                 timeout=30
             )
 
             if response.status_code in [200, 201]:
-                # Marquer comme synchronisé
-                update_query = "UPDATE batigest_devis SET sync = TRUE WHERE code = %s"
-                postgres_cursor.execute(update_query, (code,))
+                sent_codes.append(code)
             else:
-                print(f"[ATTENTION] Erreur lors de l'envoi du devis {code}: {response.status_code}")
+                logger.warning("[ATTENTION] Erreur lors de l'envoi du devis %s: %s", code, response.status_code)
+        failed = len(payloads) - len(sent_codes)
+        metrics.add_rows(len(sent_codes), failed=failed)
+
+        # Marquer comme synchronisés les devis acceptés par BatiSimply
+        metrics.phase("mark_synced")
+        if sent_codes:
+            postgres_cursor.execute(
+                "UPDATE batigest_devis SET sync = TRUE WHERE code = ANY(%s)",
+                (sent_codes,)
+            )
+            metrics.add_rows(len(sent_codes))
 
         postgres_conn.commit()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(devis)} devi(s) envoyé(s) vers BatiSimply"
+        if failed:
+            return True, f"[ATTENTION] {len(sent_codes)} devis envoyé(s) vers BatiSimply, {failed} en échec"
+        return True, f"[OK] {len(sent_codes)} devis envoyé(s) vers BatiSimply"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> BatiSimply : {str(e)}"
@@ -793,53 +898,52 @@ def transfer_devis_postgres_to_batisimply():
 # FONCTIONS DE SYNCHRONISATION COMPLÈTE
 # ============================================================================
 
+def sqlserver_to_batisimply_steps(mode: str) -> list:
+    """
+    Étapes de la synchronisation SQL Server -> PostgreSQL -> BatiSimply
+    (app/services/pipeline.py) ; devis uniquement en mode 'devis'.
+    """
+    steps = [
+        # 1. Transfert des chantiers
+        Step("chantiers.sqlserver_to_postgres", transfer_chantiers_sqlserver_to_postgres,
+             label="[SYNC] Synchronisation des chantiers..."),
+        Step("chantiers.postgres_to_batisimply", transfer_chantiers_postgres_to_batisimply,
+             requires=("chantiers.sqlserver_to_postgres",)),
+    ]
+    # 2. Transfert des devis (uniquement en mode 'devis')
+    if mode == "devis":
+        steps += [
+            Step("devis.sqlserver_to_postgres", transfer_devis_sqlserver_to_postgres,
+                 label="[SYNC] Synchronisation des devis..."),
+            Step("devis.postgres_to_batisimply", transfer_devis_postgres_to_batisimply,
+                 requires=("devis.sqlserver_to_postgres",)),
+        ]
+    return steps
+
+@metrics.instrumented("batigest.sync_sqlserver_to_batisimply")
 def sync_sqlserver_to_batisimply():
     """
     Synchronisation complète SQL Server -> PostgreSQL -> BatiSimply.
+
+    Les flux chantiers et devis sont indépendants : ils sont lancés en parallèle (sync_workers).
     """
-    print("=== DÉBUT DE LA SYNCHRONISATION SQL SERVER -> BATISIMPLY ===")
-    messages = []
-    overall_success = True
+    logger.info("=== DÉBUT DE LA SYNCHRONISATION SQL SERVER -> BATISIMPLY ===")
     
     try:
         # Respect du mode (chantier|devis) depuis credentials.json
         creds = load_credentials() or {}
         mode = (creds.get("mode") or "chantier").strip().lower()
-        print(f"[INFO] Mode courant: {mode}")
-        # 1. Transfert des chantiers
-        print("[SYNC] Synchronisation des chantiers...")
-        success, message = transfer_chantiers_sqlserver_to_postgres()
-        print(message)
-        messages.append(message)
-        
-        if success:
-            success, message = transfer_chantiers_postgres_to_batisimply()
-            print(message)
-            messages.append(message)
-            if not success:
-                overall_success = False
-        else:
-            overall_success = False
-        
-        # 2. Transfert des devis (uniquement en mode 'devis')
-        if mode == "devis":
-            print("[SYNC] Synchronisation des devis...")
-            success, message = transfer_devis_sqlserver_to_postgres()
-            print(message)
-            messages.append(message)
-            
-            if success:
-                success, message = transfer_devis_postgres_to_batisimply()
-                print(message)
-                messages.append(message)
-                if not success:
-                    overall_success = False
-            else:
-                overall_success = False
-        else:
-            print("[INFO] Mode 'chantier' actif: envoi des devis désactivé.")
+        logger.info("[INFO] Mode courant: %s", mode)
+        if mode != "devis":
+            logger.info("[INFO] Mode 'chantier' actif: envoi des devis désactivé.")
+        steps = sqlserver_to_batisimply_steps(mode)
+
+        started = time.perf_counter()
+        results = run_steps(steps, sync_workers(creds))
+        logger.info(format_report(results, time.perf_counter() - started))
+        overall_success = all_succeeded(steps, results)
         
-        print("=== FIN DE LA SYNCHRONISATION SQL SERVER -> BATISIMPLY ===")
+        logger.info("=== FIN DE LA SYNCHRONISATION SQL SERVER -> BATISIMPLY ===")
         
         if overall_success:
             return True, "[OK] Synchronisation SQL Server -> BatiSimply terminée avec succès"
@@ -848,5 +952,5 @@ def sync_sqlserver_to_batisimply():
             
     except Exception as e:
         error_msg = f"[ERREUR] Erreur lors de la synchronisation SQL Server -> BatiSimply : {str(e)}"
-        print(error_msg)
+        logger.log(level_for_message(error_msg), error_msg)
         return False, error_msg
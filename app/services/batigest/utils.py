@@ -2,7 +2,19 @@
 Utilitaires pour les services Batigest.
 """
 
+import logging
+import threading
+from typing import Dict, Hashable, Optional
+
 from app.services.connex import connect_to_postgres, load_credentials
+from app.services.migrations import apply_migrations
+
+logger = logging.getLogger(__name__)
+
+# Longueurs maximales des colonnes SQL Server, par (base, table) : lues une
+# seule fois par processus dans INFORMATION_SCHEMA.COLUMNS.
+_column_lengths_cache: Dict[tuple, Dict[str, Optional[int]]] = {}
+_column_lengths_lock = threading.Lock()
 
 def init_batigest_tables():
     """
@@ -13,12 +25,16 @@ def init_batigest_tables():
     2. Crée la table batigest_heures si elle n'existe pas
     3. Crée la table batigest_devis si elle n'existe pas
     4. Crée la table batigest_heures_map pour le mapping des heures
+    5. Crée la table batigest_suivimo (heures Batigest -> BatiSimply)
+    6. Applique les migrations de schéma (index des lignes en attente, etc.)
+
+    Le DDL est décrit dans app/services/migrations.py.
     """
     try:
         # Connexion à PostgreSQL
         creds = load_credentials()
         if not creds or "postgres" not in creds:
-            print("[ERREUR] Informations PostgreSQL manquantes")
+            logger.error("[ERREUR] Informations PostgreSQL manquantes")
             return False
 
         pg = creds["postgres"]
@@ -26,88 +42,76 @@ def init_batigest_tables():
             pg["host"], pg["user"], pg["password"], pg["database"], pg.get("port", "5432")
         )
         if not postgres_conn:
-            print("[ERREUR] Connexion à PostgreSQL échouée")
+            logger.error("[ERREUR] Connexion à PostgreSQL échouée")
             return False
 
-        postgres_cursor = postgres_conn.cursor()
-
-        # Création de la table batigest_chantiers (structure exacte de l'image)
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS batigest_chantiers (
-                id SERIAL PRIMARY KEY,
-                code VARCHAR(50) UNIQUE,
-                date_debut DATE,
-                date_fin DATE,
-                nom_client VARCHAR(100),
-                description VARCHAR(200),
-                adr_chantier TEXT,
-                cp_chantier VARCHAR(10),
-                ville_chantier VARCHAR(45),
-                sync_date TIMESTAMP,
-                sync BOOLEAN DEFAULT FALSE,
-                total_mo REAL,
-                last_modified_batisimply TIMESTAMP WITH TIME ZONE,
-                last_modified_batigest TIMESTAMP WITH TIME ZONE
-            )
-        """)
-
-        # Création de la table batigest_heures (structure exacte de l'image)
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS batigest_heures (
-                id SERIAL PRIMARY KEY,
-                id_heure VARCHAR(50) UNIQUE,
-                date_debut TIMESTAMP NOT NULL,
-                date_fin TIMESTAMP NOT NULL,
-                id_utilisateur UUID NOT NULL,
-                id_projet INTEGER,
-                status_management VARCHAR(50),
-                total_heure NUMERIC(5,2),
-                panier BOOLEAN,
-                trajet BOOLEAN,
-                code_projet VARCHAR(100),
-                sync BOOLEAN DEFAULT FALSE
-            )
-        """)
-
-        # Création de la table batigest_devis (structure exacte de l'image)
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS batigest_devis (
-                code VARCHAR(50) PRIMARY KEY,
-                date DATE,
-                nom VARCHAR(100),
-                adr TEXT,
-                cp VARCHAR(10),
-                ville VARCHAR(100),
-                sujet TEXT,
-                dateconcretis DATE,
-                tempsmo REAL,
-                sync_date TIMESTAMP,
-                sync BOOLEAN DEFAULT FALSE
-            )
-        """)
-
-        # Création de la table batigest_heures_map (structure exacte de l'image)
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS batigest_heures_map (
-                id_heure VARCHAR PRIMARY KEY,
-                code_chantier VARCHAR NOT NULL,
-                code_salarie VARCHAR NOT NULL,
-                date_sqlserver TIMESTAMP NOT NULL
-            )
-        """)
+        # Tables d'origine et migrations versionnées (app/services/migrations.py)
+        for component in ("core", "batigest"):
+            apply_migrations(postgres_conn, component)
 
         # Validation des modifications
         postgres_conn.commit()
-        postgres_cursor.close()
         postgres_conn.close()
 
-        print("[OK] Tables Batigest initialisées avec succès")
+        logger.info("[OK] Tables Batigest initialisées avec succès")
         return True
 
     except Exception as e:
-        print(f"[ERREUR] Erreur lors de l'initialisation de la table : {e}")
+        logger.error("[ERREUR] Erreur lors de l'initialisation de la table : %s", e)
         return False
 
+def get_sqlserver_column_lengths(sqlserver_cursor, table: str, cache_key: Hashable = None) -> Dict[str, Optional[int]]:
+    """
+    Longueurs maximales des colonnes texte d'une table Batigest (schéma dbo),
+    mises en cache par base.
+
+    Args:
+        sqlserver_cursor: Curseur SQL Server
+        table (str): Nom de la table (ex: 'ChantierDef')
+        cache_key: Identifiant de la base (ex: (serveur, base))
+
+    Returns:
+        Dict[str, Optional[int]]: {nom de colonne en minuscules: longueur}
+        (None pour les colonnes sans limite, dictionnaire vide si la lecture échoue)
+    """
+    key = (cache_key, table.lower())
+    with _column_lengths_lock:
+        if key in _column_lengths_cache:
+            return _column_lengths_cache[key]
+    try:
+        sqlserver_cursor.execute(
+            """
+            SELECT COLUMN_NAME, CHARACTER_MAXIMUM_LENGTH
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_NAME = ? AND TABLE_SCHEMA = 'dbo'
+            """,
+            (table,),
+        )
+        lengths = {
+            str(name).lower(): (int(length) if length and int(length) > 0 else None)
+            for name, length in sqlserver_cursor.fetchall()
+        }
+    except Exception as e:
+        logger.warning("[ATTENTION] Impossible de récupérer la structure de la table %s: %s", table, e)
+        return {}
+    with _column_lengths_lock:
+        _column_lengths_cache[key] = lengths
+    return lengths
+
+
+def truncate_to_column(value, lengths: Dict[str, Optional[int]], column: str, fallback: Optional[int] = None) -> str:
+    """
+    Tronque une valeur à la longueur de la colonne SQL Server ; `fallback` est
+    utilisé si la longueur de la colonne est inconnue.
+    """
+    if value is None:
+        return ''
+    text = str(value)
+    column = column.lower()
+    limit = lengths[column] if column in lengths else fallback
+    return text[:limit] if limit else text
+
+
 def check_batigest_connection():
     """
     Vérifie la connexion aux bases de données Batigest.
@@ -20,6 +20,9 @@ from .batisimply_to_hfsql import (
     sync_batisimply_to_hfsql
 )
 
+# Aller-retour complet (connexions partagées)
+from .full_sync import sync_all
+
 # Utilitaires
 from .utils import (
     init_codial_tables,
@@ -42,6 +45,9 @@ __all__ = [
     'transfer_heures_postgres_to_hfsql',
     'sync_batisimply_to_hfsql',
     
+    # Aller-retour complet
+    'sync_all',
+    
     # Utilitaires
     'init_codial_tables',
     'check_codial_connection'
@@ -3,51 +3,83 @@
 # Ce fichier contient les fonctions pour transférer les données depuis BatiSimply vers Codial (HFSQL)
 
 import psycopg2
-import requests
+from psycopg2.extras import execute_values
 import json
+import logging
+import time
 from datetime import date, datetime, timedelta
-from app.services.connex import connect_to_hfsql, connect_to_postgres, load_credentials, recup_batisimply_token
+from app.services import metrics
+from app.services.connex import connect_to_hfsql, connect_to_postgres, load_credentials, recup_batisimply_token, get_batisimply_api_url
+from app.services.codial.utils import HfsqlBatchWriter, hfsql_batch_size
+from app.services.httpcache import HttpCache
+from app.services.pagination import fetch_all, page_size
+from app.services.partitions import maintain_heures_partitions
+from app.services.pipeline import Step, all_succeeded, format_report, run_steps, sync_workers
+from app.utils.logger import level_for_message
+
+logger = logging.getLogger(__name__)
+
+# Heures BatiSimply chargées dans PostgreSQL par lots, au fil de la lecture de la réponse
+HEURES_LOAD_BATCH = 1000
 
 # ============================================================================
 # TRANSFERT DES CHANTIERS BATISIMPLY -> POSTGRESQL -> HFSQL
 # ============================================================================
 
+@metrics.instrumented("codial.chantiers.batisimply_to_postgres")
 def transfer_chantiers_batisimply_to_postgres():
     """
     Transfère les chantiers depuis BatiSimply vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
+        creds = load_credentials()
+        if not creds or "postgres" not in creds:
+            return False, "[ERREUR] Informations de connexion PostgreSQL manquantes"
+
         # Récupération du token BatiSimply
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
-        postgres_conn = connect_to_postgres()
+        postgres_conn = connect_to_postgres(
+            creds["postgres"]["host"],
+            creds["postgres"]["user"],
+            creds["postgres"]["password"],
+            creds["postgres"]["database"],
+            creds["postgres"].get("port", "5432")
+        )
         if not postgres_conn:
             return False, "[ERREUR] Connexion PostgreSQL échouée"
 
         postgres_cursor = postgres_conn.cursor()
 
         # Récupération des chantiers depuis BatiSimply
+        metrics.phase("extract")
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
 
-        response = requests.get(
-            'https://api.staging.batisimply.fr/api/project',
-            headers=headers,
-            timeout=30
-        )
-
-        if response.status_code != 200:
-            return False, f"[ERREUR] Erreur API BatiSimply : {response.status_code}"
-
-        chantiers = response.json()
-
-        # Insertion dans PostgreSQL avec gestion des conflits
-        for chantier in chantiers:
+        # Requête conditionnelle : liste inchangée depuis le dernier transfert -> rien à recharger
+        projects = fetch_all(f'{api_url}/api/project', headers, cache=HttpCache(postgres_cursor, "codial"))
+
+        if projects.status_code != 200:
+            return False, f"[ERREUR] Erreur API BatiSimply : {projects.status_code}"
+        if projects.not_modified:
+            postgres_cursor.close()
+            postgres_conn.close()
+            return True, "[OK] Chantiers BatiSimply inchangés depuis le dernier transfert"
+
+        # Insertion dans PostgreSQL avec gestion des conflits, au fil de la lecture des pages
+        metrics.phase("load")
+        loaded_count = 0
+        for chantier in projects:
+            if not isinstance(chantier, dict):
+                logger.warning("[ATTENTION] Chantier ignoré (format inattendu): %s - %s", type(chantier), chantier)
+                continue
             id_projet = chantier.get('id')
             nom = chantier.get('name')
             date_debut = chantier.get('startDate')
@@ -68,21 +100,25 @@ def transfer_chantiers_batisimply_to_postgres():
             """
             
             postgres_cursor.execute(query_postgres, (id_projet, nom, date_debut, date_fin, statut, code_client))
+            loaded_count += 1
+        metrics.add_rows(loaded_count)
 
         postgres_conn.commit()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(chantiers)} chantier(s) transféré(s) depuis BatiSimply vers PostgreSQL"
+        return True, f"[OK] {loaded_count} chantier(s) transféré(s) depuis BatiSimply vers PostgreSQL"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert BatiSimply -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("codial.chantiers.postgres_to_hfsql")
 def transfer_chantiers_postgres_to_hfsql():
     """
     Transfère les chantiers depuis PostgreSQL vers HFSQL (Codial).
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "hfsql" not in creds or "postgres" not in creds:
@@ -94,7 +130,8 @@ def transfer_chantiers_postgres_to_hfsql():
             creds["hfsql"].get("user", "admin"),
             creds["hfsql"].get("password", ""),
             creds["hfsql"].get("database", "HFSQL"),
-            creds["hfsql"].get("port", "4900")
+            creds["hfsql"].get("port", "4900"),
+            odbc=creds["hfsql"].get("odbc")
         )
         postgres_conn = connect_to_postgres(
             creds["postgres"]["host"],
@@ -107,69 +144,79 @@ def transfer_chantiers_postgres_to_hfsql():
         if not hfsql_conn or not postgres_conn:
             return False, "[ERREUR] Connexion aux bases échouée"
 
-        # Création des curseurs
-        hfsql_cursor = hfsql_conn.cursor()
         postgres_cursor = postgres_conn.cursor()
 
-        # Récupération des chantiers non synchronisés
-        query = "SELECT * FROM codial_chantiers WHERE sync = FALSE"
-        postgres_cursor.execute(query)
-        chantiers = postgres_cursor.fetchall()
-
-        # Insertion dans HFSQL
-        for chantier in chantiers:
-            id, id_projet, code, nom, date_debut, date_fin, description, reference, adresse_chantier, \
-            cp_chantier, ville_chantier, code_pays_chantier, coderep, client_nom, \
-            meca_prenom, meca_nom, statut, sync = chantier
-            
-            # Vérifier si le chantier existe déjà dans HFSQL
-            check_query = "SELECT COUNT(*) FROM cod_projet WHERE REFERENCE = %s"
-            hfsql_cursor.execute(check_query, (reference,))
-            exists = hfsql_cursor.fetchone()[0] > 0
-            
-            # Déterminer INT_TERMINE basé sur le statut
-            int_termine = 1 if statut == "Terminé" else 0
-            
-            if exists:
-                # Mise à jour
-                update_query = """
-                UPDATE cod_projet 
-                SET NOM = %s, DATE_DEBUT = %s, DATE_FIN = %s, DESCRIPTION = %s, 
-                    ADRESSE1_CHANTIER = %s, COP_CHANTIER = %s, VILLE_CHANTIER = %s, 
-                    CODE_PAYS_CHANTIER = %s, INT_TERMINE = %s
-                WHERE REFERENCE = %s
-                """
-                hfsql_cursor.execute(update_query, (
-                    nom, date_debut, date_fin, description, adresse_chantier, 
-                    cp_chantier, ville_chantier, code_pays_chantier, int_termine, reference
-                ))
-            else:
-                # Insertion (nécessite des valeurs par défaut pour les champs obligatoires)
-                insert_query = """
-                INSERT INTO cod_projet (REFERENCE, NOM, DATE_DEBUT, DATE_FIN, DESCRIPTION, 
-                                      ADRESSE1_CHANTIER, COP_CHANTIER, VILLE_CHANTIER, 
-                                      CODE_PAYS_CHANTIER, CODEREP, INT_TERMINE)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                hfsql_cursor.execute(insert_query, (
-                    reference, nom, date_debut, date_fin, description, adresse_chantier, 
-                    cp_chantier, ville_chantier, code_pays_chantier, coderep, int_termine
-                ))
-            
-            # Marquer comme synchronisé dans PostgreSQL
-            update_postgres = "UPDATE codial_chantiers SET sync = TRUE WHERE id = %s"
-            postgres_cursor.execute(update_postgres, (id,))
+        # Chantiers en attente lus par lots (curseur côté serveur, conservé entre les validations).
+        # La référence Codial est la clé de cod_projet : les chantiers sans référence ne peuvent pas y être écrits.
+        metrics.phase("extract")
+        pending_cursor = postgres_conn.cursor(name="codial_chantiers_pending", withhold=True)
+        pending_cursor.execute("""
+        SELECT id, reference, nom, date_debut, date_fin, description, adresse_chantier,
+               cp_chantier, ville_chantier, code_pays_chantier, coderep, statut
+        FROM codial_chantiers
+        WHERE sync = FALSE
+          AND reference IS NOT NULL
+        """)
+
+        writer = HfsqlBatchWriter(
+            hfsql_conn,
+            "cod_projet",
+            key_columns=["REFERENCE"],
+            update_columns=["NOM", "DATE_DEBUT", "DATE_FIN", "DESCRIPTION", "ADRESSE1_CHANTIER",
+                            "COP_CHANTIER", "VILLE_CHANTIER", "CODE_PAYS_CHANTIER", "INT_TERMINE"],
+            insert_only_columns=["CODEREP"],
+        )
+        batch_size = hfsql_batch_size(creds)
+        inserted = 0
+        updated = 0
+        total = 0
+        while True:
+            metrics.phase("extract")
+            chantiers = pending_cursor.fetchmany(batch_size)
+            if not chantiers:
+                break
+            metrics.add_rows(len(chantiers))
+
+            # Écriture du lot dans HFSQL (clés existantes lues en une fois, UPDATE/INSERT groupés)
+            metrics.phase("load")
+            rows = []
+            ids = []
+            for id, reference, nom, date_debut, date_fin, description, adresse_chantier, \
+                    cp_chantier, ville_chantier, code_pays_chantier, coderep, statut in chantiers:
+                rows.append({
+                    "REFERENCE": reference,
+                    "NOM": nom,
+                    "DATE_DEBUT": date_debut,
+                    "DATE_FIN": date_fin,
+                    "DESCRIPTION": description,
+                    "ADRESSE1_CHANTIER": adresse_chantier,
+                    "COP_CHANTIER": cp_chantier,
+                    "VILLE_CHANTIER": ville_chantier,
+                    "CODE_PAYS_CHANTIER": code_pays_chantier,
+                    # Déterminer INT_TERMINE basé sur le statut
+                    "INT_TERMINE": 1 if statut == "Terminé" else 0,
+                    "CODEREP": coderep,
+                })
+                ids.append(id)
+            batch_inserted, batch_updated = writer.write(rows)
+            inserted += batch_inserted
+            updated += batch_updated
+            total += len(chantiers)
+            metrics.add_rows(len(chantiers))
+
+            # Marquer le lot comme synchronisé dans PostgreSQL (après validation HFSQL)
+            metrics.phase("mark_synced")
+            postgres_cursor.execute("UPDATE codial_chantiers SET sync = TRUE WHERE id = ANY(%s)", (ids,))
+            postgres_conn.commit()
+            metrics.add_rows(len(ids))
 
-        hfsql_conn.commit()
-        postgres_conn.commit()
-        
         # Fermeture des connexions
-        hfsql_cursor.close()
+        pending_cursor.close()
         postgres_cursor.close()
         hfsql_conn.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(chantiers)} chantier(s) transféré(s) vers HFSQL"
+        return True, f"[OK] {total} chantier(s) transféré(s) vers HFSQL ({inserted} créé(s), {updated} mis à jour)"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> HFSQL : {str(e)}"
@@ -178,24 +225,86 @@ def transfer_chantiers_postgres_to_hfsql():
 # TRANSFERT DES HEURES BATISIMPLY -> POSTGRESQL -> HFSQL
 # ============================================================================
 
+def _load_heures_batch(postgres_cursor, heures):
+    """Charge un lot d'heures BatiSimply dans codial_heures ; retourne le nombre de lignes."""
+    if not heures:
+        return 0
+
+    # codial_heures est partitionnée sur date_debut : l'unicité porte sur
+    # (id_heure, date_debut). Les heures dont la date a changé sont d'abord
+    # déplacées pour que l'upsert les retrouve.
+    moved_keys = [(h.get('id'), h.get('startDate')) for h in heures if h.get('id') is not None and h.get('startDate')]
+    if moved_keys:
+        execute_values(
+            postgres_cursor,
+            """
+            UPDATE codial_heures AS h
+            SET date_debut = v.date_debut::timestamp, sync = FALSE
+            FROM (VALUES %s) AS v(id_heure, date_debut)
+            WHERE h.id_heure = v.id_heure::text
+              AND h.date_debut IS DISTINCT FROM v.date_debut::timestamp
+            """,
+            moved_keys,
+            page_size=1000,
+        )
+
+    for heure in heures:
+        id_heure = heure.get('id')
+        id_projet = heure.get('projectId')
+        id_utilisateur = heure.get('userId')
+        date_debut = heure.get('startDate')
+        date_fin = heure.get('endDate')
+        heures_travaillees = heure.get('hours')
+        commentaire = heure.get('comment')
+
+        query_postgres = """
+        INSERT INTO codial_heures (id_heure, id_projet, id_utilisateur, date_debut, date_fin, heures, commentaire, sync)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE)
+        ON CONFLICT (id_heure, date_debut) DO UPDATE SET
+            id_projet = EXCLUDED.id_projet,
+            id_utilisateur = EXCLUDED.id_utilisateur,
+            date_fin = EXCLUDED.date_fin,
+            heures = EXCLUDED.heures,
+            commentaire = EXCLUDED.commentaire,
+            sync = FALSE
+        """
+
+        postgres_cursor.execute(query_postgres, (id_heure, id_projet, id_utilisateur, date_debut, date_fin, heures_travaillees, commentaire))
+    return len(heures)
+
+@metrics.instrumented("codial.heures.batisimply_to_postgres")
 def transfer_heures_batisimply_to_postgres():
     """
     Transfère les heures depuis BatiSimply vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
+        # Vérification des identifiants
+        creds = load_credentials()
+        if not creds or "postgres" not in creds:
+            return False, "[ERREUR] Informations de connexion PostgreSQL manquantes"
+
         # Récupération du token BatiSimply
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
-        postgres_conn = connect_to_postgres()
+        postgres_conn = connect_to_postgres(
+            creds["postgres"]["host"],
+            creds["postgres"]["user"],
+            creds["postgres"]["password"],
+            creds["postgres"]["database"],
+            creds["postgres"].get("port", "5432")
+        )
         if not postgres_conn:
             return False, "[ERREUR] Connexion PostgreSQL échouée"
 
         postgres_cursor = postgres_conn.cursor()
 
         # Récupération des heures depuis BatiSimply (dernières 30 jours)
+        metrics.phase("extract")
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
@@ -204,56 +313,55 @@ def transfer_heures_batisimply_to_postgres():
         # Calcul de la date de début (30 jours en arrière)
         start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         
-        response = requests.get(
-            f'https://api.staging.batisimply.fr/api/timeSlotManagement/allUsers?startDate={start_date}',
-            headers=headers,
-            timeout=30
-        )
+        heures = fetch_all(f'{api_url}/api/timeSlotManagement/allUsers', headers,
+                           params={"startDate": start_date}, size=page_size(creds))
 
-        if response.status_code != 200:
-            return False, f"[ERREUR] Erreur API BatiSimply : {response.status_code}"
+        if heures.status_code != 200:
+            return False, f"[ERREUR] Erreur API BatiSimply : {heures.status_code}"
 
-        heures = response.json()
+        # Partitions mensuelles de la fenêtre d'import et rétention
+        metrics.phase("maintenance")
+        maintain_heures_partitions(postgres_conn, "codial", creds)
 
-        # Insertion dans PostgreSQL avec gestion des conflits
+        # Heures chargées par lots au fil de la lecture de la réponse
+        metrics.phase("load")
+        batch = []
+        loaded_count = 0
+        skipped = 0
         for heure in heures:
-            id_heure = heure.get('id')
-            id_projet = heure.get('projectId')
-            id_utilisateur = heure.get('userId')
-            date_debut = heure.get('startDate')
-            date_fin = heure.get('endDate')
-            heures_travaillees = heure.get('hours')
-            commentaire = heure.get('comment')
-            
-            query_postgres = """
-            INSERT INTO codial_heures (id_heure, id_projet, id_utilisateur, date_debut, date_fin, heures, commentaire, sync)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE)
-            ON CONFLICT (id_heure) DO UPDATE SET
-                id_projet = EXCLUDED.id_projet,
-                id_utilisateur = EXCLUDED.id_utilisateur,
-                date_debut = EXCLUDED.date_debut,
-                date_fin = EXCLUDED.date_fin,
-                heures = EXCLUDED.heures,
-                commentaire = EXCLUDED.commentaire,
-                sync = FALSE
-            """
-            
-            postgres_cursor.execute(query_postgres, (id_heure, id_projet, id_utilisateur, date_debut, date_fin, heures_travaillees, commentaire))
+            if not isinstance(heure, dict):
+                logger.warning("[ATTENTION] Heure ignorée (format inattendu): %s - %s", type(heure), heure)
+                continue
+            if not heure.get('startDate'):
+                # date_debut est la clé de partition (non nulle)
+                logger.warning("[ATTENTION] Heure %s ignorée: date de début absente", heure.get('id'))
+                skipped += 1
+                continue
+            batch.append(heure)
+            if len(batch) >= HEURES_LOAD_BATCH:
+                loaded_count += _load_heures_batch(postgres_cursor, batch)
+                batch = []
+        loaded_count += _load_heures_batch(postgres_cursor, batch)
+        metrics.add_rows(loaded_count, failed=skipped)
 
         postgres_conn.commit()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(heures)} heure(s) transférée(s) depuis BatiSimply vers PostgreSQL"
+        if skipped:
+            return True, f"[ATTENTION] {loaded_count} heure(s) transférée(s) depuis BatiSimply vers PostgreSQL, {skipped} ignorée(s) sans date de début"
+        return True, f"[OK] {loaded_count} heure(s) transférée(s) depuis BatiSimply vers PostgreSQL"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert BatiSimply -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("codial.heures.postgres_to_hfsql")
 def transfer_heures_postgres_to_hfsql():
     """
     Transfère les heures depuis PostgreSQL vers HFSQL (Codial).
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "hfsql" not in creds or "postgres" not in creds:
@@ -265,7 +373,8 @@ def transfer_heures_postgres_to_hfsql():
             creds["hfsql"].get("user", "admin"),
             creds["hfsql"].get("password", ""),
             creds["hfsql"].get("database", "HFSQL"),
-            creds["hfsql"].get("port", "4900")
+            creds["hfsql"].get("port", "4900"),
+            odbc=creds["hfsql"].get("odbc")
         )
         postgres_conn = connect_to_postgres(
             creds["postgres"]["host"],
@@ -278,54 +387,70 @@ def transfer_heures_postgres_to_hfsql():
         if not hfsql_conn or not postgres_conn:
             return False, "[ERREUR] Connexion aux bases échouée"
 
-        # Création des curseurs
-        hfsql_cursor = hfsql_conn.cursor()
         postgres_cursor = postgres_conn.cursor()
 
-        # Récupération des heures non synchronisées
-        query = "SELECT * FROM codial_heures WHERE sync = FALSE"
-        postgres_cursor.execute(query)
-        heures = postgres_cursor.fetchall()
-
-        # Insertion dans HFSQL
-        for heure in heures:
-            id_heure, id_projet, id_utilisateur, date_debut, date_fin, heures_travaillees, commentaire, sync = heure
-            
-            # Vérifier si l'heure existe déjà dans HFSQL
-            check_query = "SELECT COUNT(*) FROM SuiviHeures WHERE CodeChantier = %s AND CodeSalarie = %s AND Date = %s"
-            hfsql_cursor.execute(check_query, (id_projet, id_utilisateur, date_debut.date()))
-            exists = hfsql_cursor.fetchone()[0] > 0
-            
-            if exists:
-                # Mise à jour
-                update_query = """
-                UPDATE SuiviHeures 
-                SET Heures = %s, Commentaire = %s
-                WHERE CodeChantier = %s AND CodeSalarie = %s AND Date = %s
-                """
-                hfsql_cursor.execute(update_query, (heures_travaillees, commentaire, id_projet, id_utilisateur, date_debut.date()))
-            else:
-                # Insertion
-                insert_query = """
-                INSERT INTO SuiviHeures (CodeChantier, CodeSalarie, Date, Heures, Commentaire)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                hfsql_cursor.execute(insert_query, (id_projet, id_utilisateur, date_debut.date(), heures_travaillees, commentaire))
-            
-            # Marquer comme synchronisé dans PostgreSQL
-            update_postgres = "UPDATE codial_heures SET sync = TRUE WHERE id_heure = %s"
-            postgres_cursor.execute(update_postgres, (id_heure,))
+        # Heures en attente lues par lots (curseur côté serveur, conservé entre les validations).
+        # Seules les heures issues de BatiSimply sont écrites : celles lues dans Codial y sont déjà.
+        metrics.phase("extract")
+        pending_cursor = postgres_conn.cursor(name="codial_heures_hfsql_pending", withhold=True)
+        pending_cursor.execute("""
+        SELECT id, id_projet, id_utilisateur, date_debut, heures, commentaire
+        FROM codial_heures
+        WHERE sync = FALSE
+          AND id_heure IS NOT NULL
+          AND date_debut IS NOT NULL
+        """)
+
+        # Clé SuiviHeures : la date en premier (peu de valeurs distinctes par lot)
+        writer = HfsqlBatchWriter(
+            hfsql_conn,
+            "SuiviHeures",
+            key_columns=["Date", "CodeChantier", "CodeSalarie"],
+            update_columns=["Heures", "Commentaire"],
+        )
+        batch_size = hfsql_batch_size(creds)
+        inserted = 0
+        updated = 0
+        total = 0
+        while True:
+            metrics.phase("extract")
+            heures = pending_cursor.fetchmany(batch_size)
+            if not heures:
+                break
+            metrics.add_rows(len(heures))
+
+            # Écriture du lot dans HFSQL (clés existantes lues en une fois, UPDATE/INSERT groupés)
+            metrics.phase("load")
+            rows = []
+            ids = []
+            for id, id_projet, id_utilisateur, date_debut, heures_travaillees, commentaire in heures:
+                rows.append({
+                    "Date": date_debut.date(),
+                    "CodeChantier": id_projet,
+                    "CodeSalarie": id_utilisateur,
+                    "Heures": heures_travaillees,
+                    "Commentaire": commentaire,
+                })
+                ids.append(id)
+            batch_inserted, batch_updated = writer.write(rows)
+            inserted += batch_inserted
+            updated += batch_updated
+            total += len(heures)
+            metrics.add_rows(len(heures))
+
+            # Marquer le lot comme synchronisé dans PostgreSQL (après validation HFSQL)
+            metrics.phase("mark_synced")
+            postgres_cursor.execute("UPDATE codial_heures SET sync = TRUE WHERE id = ANY(%s)", (ids,))
+            postgres_conn.commit()
+            metrics.add_rows(len(ids))
 
-        hfsql_conn.commit()
-        postgres_conn.commit()
-        
         # Fermeture des connexions
-        hfsql_cursor.close()
+        pending_cursor.close()
         postgres_cursor.close()
         hfsql_conn.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(heures)} heure(s) transférée(s) vers HFSQL"
+        return True, f"[OK] {total} heure(s) transférée(s) vers HFSQL ({inserted} créée(s), {updated} mise(s) à jour)"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> HFSQL : {str(e)}"
@@ -334,46 +459,41 @@ def transfer_heures_postgres_to_hfsql():
 # FONCTIONS DE SYNCHRONISATION COMPLÈTE
 # ============================================================================
 
+def batisimply_to_hfsql_steps() -> list:
+    """Étapes de la synchronisation BatiSimply -> PostgreSQL -> HFSQL (app/services/pipeline.py)."""
+    return [
+        # 1. Transfert des chantiers
+        Step("chantiers.batisimply_to_postgres", transfer_chantiers_batisimply_to_postgres,
+             label="[SYNC] Synchronisation des chantiers..."),
+        Step("chantiers.postgres_to_hfsql", transfer_chantiers_postgres_to_hfsql,
+             requires=("chantiers.batisimply_to_postgres",)),
+        # 2. Transfert des heures
+        Step("heures.batisimply_to_postgres", transfer_heures_batisimply_to_postgres,
+             label="[SYNC] Synchronisation des heures..."),
+        Step("heures.postgres_to_hfsql", transfer_heures_postgres_to_hfsql,
+             requires=("heures.batisimply_to_postgres",), after=("chantiers.postgres_to_hfsql",)),
+    ]
+
+@metrics.instrumented("codial.sync_batisimply_to_hfsql")
 def sync_batisimply_to_hfsql():
     """
     Synchronisation complète BatiSimply -> PostgreSQL -> HFSQL.
+
+    Les flux chantiers et heures sont lancés en parallèle (sync_workers) ;
+    l'écriture des heures dans HFSQL attend celle des chantiers.
     """
-    print("=== DÉBUT DE LA SYNCHRONISATION BATISIMPLY -> HFSQL ===")
-    messages = []
-    overall_success = True
+    logger.info("=== DÉBUT DE LA SYNCHRONISATION BATISIMPLY -> HFSQL ===")
     
     try:
-        # 1. Transfert des chantiers
-        print("[SYNC] Synchronisation des chantiers...")
-        success, message = transfer_chantiers_batisimply_to_postgres()
-        print(message)
-        messages.append(message)
-        
-        if success:
-            success, message = transfer_chantiers_postgres_to_hfsql()
-            print(message)
-            messages.append(message)
-            if not success:
-                overall_success = False
-        else:
-            overall_success = False
-        
-        # 2. Transfert des heures
-        print("[SYNC] Synchronisation des heures...")
-        success, message = transfer_heures_batisimply_to_postgres()
-        print(message)
-        messages.append(message)
-        
-        if success:
-            success, message = transfer_heures_postgres_to_hfsql()
-            print(message)
-            messages.append(message)
-            if not success:
-                overall_success = False
-        else:
-            overall_success = False
+        creds = load_credentials() or {}
+        steps = batisimply_to_hfsql_steps()
+
+        started = time.perf_counter()
+        results = run_steps(steps, sync_workers(creds))
+        logger.info(format_report(results, time.perf_counter() - started))
+        overall_success = all_succeeded(steps, results)
         
-        print("=== FIN DE LA SYNCHRONISATION BATISIMPLY -> HFSQL ===")
+        logger.info("=== FIN DE LA SYNCHRONISATION BATISIMPLY -> HFSQL ===")
         
         if overall_success:
             return True, "[OK] Synchronisation BatiSimply -> HFSQL terminée avec succès"
@@ -382,5 +502,5 @@ def sync_batisimply_to_hfsql():
             
     except Exception as e:
         error_msg = f"[ERREUR] Erreur lors de la synchronisation BatiSimply -> HFSQL : {str(e)}"
-        print(error_msg)
+        logger.log(level_for_message(error_msg), error_msg)
         return False, error_msg
@@ -0,0 +1,50 @@
+# app/services/codial/full_sync.py
+# Synchronisation aller-retour Codial <-> BatiSimply
+# Ce fichier enchaîne les deux sens (HFSQL -> BatiSimply puis BatiSimply -> HFSQL)
+# dans une seule session : une connexion HFSQL, une connexion PostgreSQL et
+# un token BatiSimply pour toute l'exécution, au lieu d'une par étape.
+
+import logging
+import time
+from app.services import metrics
+from app.services.pipeline import all_succeeded, format_report, run_steps
+from app.services.sync_session import SyncSession
+from app.services.codial.hfsql_to_batisimply import hfsql_to_batisimply_steps
+from app.services.codial.batisimply_to_hfsql import batisimply_to_hfsql_steps
+from app.utils.logger import level_for_message
+
+logger = logging.getLogger(__name__)
+
+
+@metrics.instrumented("codial.sync_all")
+def sync_all():
+    """
+    Synchronisation complète dans les deux sens : HFSQL -> PostgreSQL -> BatiSimply,
+    puis BatiSimply -> PostgreSQL -> HFSQL.
+
+    Les étapes partagent les connexions de la session : elles s'exécutent l'une
+    après l'autre, chacune dans sa propre transaction.
+    """
+    logger.info("=== DÉBUT DE LA SYNCHRONISATION COMPLÈTE CODIAL <-> BATISIMPLY ===")
+
+    try:
+        steps = hfsql_to_batisimply_steps() + batisimply_to_hfsql_steps()
+
+        with SyncSession() as session:
+            started = time.perf_counter()
+            results = run_steps([step._replace(func=session.step(step.func)) for step in steps], max_workers=1)
+            logger.info(format_report(results, time.perf_counter() - started))
+            logger.info("[INFO] %s connexion(s) ouverte(s) pour %s étape(s)", session.opened, len(steps))
+        overall_success = all_succeeded(steps, results)
+
+        logger.info("=== FIN DE LA SYNCHRONISATION COMPLÈTE CODIAL <-> BATISIMPLY ===")
+
+        if overall_success:
+            return True, "[OK] Synchronisation Codial <-> BatiSimply terminée avec succès"
+        else:
+            return False, "[ATTENTION] Synchronisation Codial <-> BatiSimply terminée avec des erreurs"
+
+    except Exception as e:
+        error_msg = f"[ERREUR] Erreur lors de la synchronisation Codial <-> BatiSimply : {str(e)}"
+        logger.log(level_for_message(error_msg), error_msg)
+        return False, error_msg
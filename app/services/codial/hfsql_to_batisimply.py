@@ -3,20 +3,70 @@
 # Ce fichier contient les fonctions pour transférer les données depuis Codial (HFSQL) vers BatiSimply
 
 import psycopg2
-import requests
+from psycopg2.extras import execute_values
+import hashlib
 import json
+import logging
+import re
+import time
 from datetime import date, datetime
-from app.services.connex import connect_to_hfsql, connect_to_postgres, load_credentials, recup_batisimply_token
+from app.services import metrics
+from app.services.connex import connect_to_hfsql, connect_to_postgres, load_credentials, recup_batisimply_token, get_batisimply_api_url
+from app.services.partitions import maintain_heures_partitions
+from app.services.payloads import JSON_HEADERS, dumps
+from app.services.pipeline import Step, all_succeeded, format_report, run_steps, sync_workers
+from app.services.push import PUSH_BATCH_SIZE, push_concurrently, push_workers
+from app.services.ratelimit import CircuitOpenError
+from app.services.watermarks import get_watermark, set_watermark
+from app.utils.logger import level_for_message
+
+logger = logging.getLogger(__name__)
+
+# Chantiers lus dans HFSQL (fetchmany) et insérés dans PostgreSQL par lot
+CHANTIERS_BATCH_SIZE = 1000
+
+# Point de reprise de l'extraction incrémentale des projets Codial (sync_watermarks)
+CHANTIERS_WATERMARK = "codial.cod_projet"
+_COLUMN_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _projet_modif_column(creds):
+    """
+    Colonne de date de modification de cod_projet (hfsql.projet_modif_column),
+    None si absente ou invalide : extraction complète.
+    """
+    column = ((creds or {}).get("hfsql") or {}).get("projet_modif_column")
+    if not column:
+        return None
+    if not _COLUMN_NAME.match(column):
+        logger.warning("[ATTENTION] Colonne de modification Codial invalide : %s (extraction complète)", column)
+        return None
+    return column
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return None
+
+
+def _row_hash(values):
+    """Empreinte des colonnes d'un chantier (détection des modifications)."""
+    return hashlib.md5(json.dumps(values, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
 
 # ============================================================================
 # TRANSFERT DES CHANTIERS HFSQL -> POSTGRESQL -> BATISIMPLY
 # ============================================================================
 
+@metrics.instrumented("codial.chantiers.hfsql_to_postgres")
 def transfer_chantiers_hfsql_to_postgres():
     """
     Transfère les chantiers depuis HFSQL (Codial) vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "hfsql" not in creds or "postgres" not in creds:
@@ -28,7 +78,8 @@ def transfer_chantiers_hfsql_to_postgres():
             creds["hfsql"].get("user", "admin"),
             creds["hfsql"].get("password", ""),
             creds["hfsql"].get("database", "HFSQL"),
-            creds["hfsql"].get("port", "4900")
+            creds["hfsql"].get("port", "4900"),
+            odbc=creds["hfsql"].get("odbc")
         )
         postgres_conn = connect_to_postgres(
             creds["postgres"]["host"],
@@ -45,79 +96,127 @@ def transfer_chantiers_hfsql_to_postgres():
         hfsql_cursor = hfsql_conn.cursor()
         postgres_cursor = postgres_conn.cursor()
 
-        # Requête pour récupérer les chantiers depuis HFSQL (Codial)
+        # Requête pour récupérer les chantiers depuis HFSQL (Codial).
+        # Si la colonne de date de modification de cod_projet est configurée, seuls
+        # les projets modifiés depuis le dernier point de reprise sont relus.
+        metrics.phase("extract")
+        modif_column = _projet_modif_column(creds)
+        watermark = get_watermark(postgres_cursor, CHANTIERS_WATERMARK) if modif_column else None
         query_hfsql = """
         SELECT cod_projet.INT_TERMINE, cod_projet.NOM, cod_projet.DATE_DEBUT, cod_projet.DATE_FIN, 
                cod_projet.DESCRIPTION, cod_projet.REFERENCE, cod_projet.ADRESSE1_CHANTIER, 
                cod_projet.COP_CHANTIER, cod_projet.VILLE_CHANTIER, cod_projet.CODE_PAYS_CHANTIER, 
-               cod_projet.CODEREP, client.NOM, meca.PRENOM, meca.NOM
+               cod_projet.CODEREP, client.NOM, meca.PRENOM, meca.NOM{modif_select}
         FROM cod_projet
         JOIN client ON client.CODE = cod_projet.CODE_TIERS
         JOIN meca ON meca.CODEREP = cod_projet.CODEREP
-        WHERE cod_projet.INT_TERMINE = 0
-        """
-        
-        hfsql_cursor.execute(query_hfsql)
-        chantiers = hfsql_cursor.fetchall()
+        WHERE cod_projet.INT_TERMINE = 0{modif_filter}
+        """.format(
+            modif_select=f", cod_projet.{modif_column}" if modif_column else "",
+            # ">=" : les projets modifiés à la même date que le point de reprise sont relus,
+            # l'empreinte évite de les réécrire
+            modif_filter=f" AND cod_projet.{modif_column} >= ?" if watermark else "",
+        )
 
-        # Insertion dans PostgreSQL avec gestion des conflits
-        for chantier in chantiers:
-            int_termine, nom, date_debut, date_fin, description, reference, adresse1_chantier, \
-            cop_chantier, ville_chantier, code_pays_chantier, coderep, client_nom, meca_prenom, meca_nom = chantier
-            
-            # Utiliser la référence comme code unique
-            code = reference if reference else f"PROJ_{coderep}"
-            
-            query_postgres = """
-            INSERT INTO codial_chantiers (code, nom, date_debut, date_fin, description, reference, 
-                                        adresse_chantier, cp_chantier, ville_chantier, code_pays_chantier, 
-                                        coderep, client_nom, meca_prenom, meca_nom, statut, sync)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE)
-            ON CONFLICT (code) DO UPDATE SET
-                nom = EXCLUDED.nom,
-                date_debut = EXCLUDED.date_debut,
-                date_fin = EXCLUDED.date_fin,
-                description = EXCLUDED.description,
-                reference = EXCLUDED.reference,
-                adresse_chantier = EXCLUDED.adresse_chantier,
-                cp_chantier = EXCLUDED.cp_chantier,
-                ville_chantier = EXCLUDED.ville_chantier,
-                code_pays_chantier = EXCLUDED.code_pays_chantier,
-                coderep = EXCLUDED.coderep,
-                client_nom = EXCLUDED.client_nom,
-                meca_prenom = EXCLUDED.meca_prenom,
-                meca_nom = EXCLUDED.meca_nom,
-                statut = EXCLUDED.statut,
-                sync = FALSE
-            """
-            
-            # Déterminer le statut basé sur INT_TERMINE
-            statut = "Terminé" if int_termine == 1 else "En cours"
-            
-            postgres_cursor.execute(query_postgres, (
-                code, nom, date_debut, date_fin, description, reference, 
-                adresse1_chantier, cop_chantier, ville_chantier, code_pays_chantier,
-                coderep, client_nom, meca_prenom, meca_nom, statut
-            ))
+        if watermark:
+            hfsql_cursor.execute(query_hfsql, (watermark,))
+        else:
+            hfsql_cursor.execute(query_hfsql)
+
+        # Seuls les chantiers nouveaux ou dont l'empreinte a changé sont écrits
+        # (et repassent à sync = FALSE, donc renvoyés vers BatiSimply).
+        query_postgres = """
+        INSERT INTO codial_chantiers (code, nom, date_debut, date_fin, description, reference,
+                                    adresse_chantier, cp_chantier, ville_chantier, code_pays_chantier,
+                                    coderep, client_nom, meca_prenom, meca_nom, statut, row_hash, sync)
+        VALUES %s
+        ON CONFLICT (code) DO UPDATE SET
+            nom = EXCLUDED.nom,
+            date_debut = EXCLUDED.date_debut,
+            date_fin = EXCLUDED.date_fin,
+            description = EXCLUDED.description,
+            reference = EXCLUDED.reference,
+            adresse_chantier = EXCLUDED.adresse_chantier,
+            cp_chantier = EXCLUDED.cp_chantier,
+            ville_chantier = EXCLUDED.ville_chantier,
+            code_pays_chantier = EXCLUDED.code_pays_chantier,
+            coderep = EXCLUDED.coderep,
+            client_nom = EXCLUDED.client_nom,
+            meca_prenom = EXCLUDED.meca_prenom,
+            meca_nom = EXCLUDED.meca_nom,
+            statut = EXCLUDED.statut,
+            row_hash = EXCLUDED.row_hash,
+            sync = FALSE
+        WHERE codial_chantiers.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+        RETURNING code
+        """
 
+        # Lecture HFSQL par lots, chaque lot inséré en une requête
+        total = 0
+        changed = 0
+        last_modified = None
+        while True:
+            metrics.phase("extract")
+            chantiers = hfsql_cursor.fetchmany(CHANTIERS_BATCH_SIZE)
+            if not chantiers:
+                break
+            metrics.add_rows(len(chantiers))
+
+            metrics.phase("load")
+            # Un code n'apparaît qu'une fois par requête (ON CONFLICT ne peut pas
+            # modifier deux fois la même ligne) : la dernière occurrence l'emporte,
+            # comme avec l'insertion ligne à ligne.
+            rows_by_code = {}
+            for chantier in chantiers:
+                int_termine, nom, date_debut, date_fin, description, reference, adresse1_chantier, \
+                cop_chantier, ville_chantier, code_pays_chantier, coderep, client_nom, meca_prenom, meca_nom = chantier[:14]
+
+                if modif_column:
+                    modified = _as_datetime(chantier[14])
+                    if modified and (last_modified is None or modified > last_modified):
+                        last_modified = modified
+
+                # Utiliser la référence comme code unique
+                code = reference if reference else f"PROJ_{coderep}"
+
+                # Déterminer le statut basé sur INT_TERMINE
+                statut = "Terminé" if int_termine == 1 else "En cours"
+
+                values = (
+                    code, nom, date_debut, date_fin, description, reference,
+                    adresse1_chantier, cop_chantier, ville_chantier, code_pays_chantier,
+                    coderep, client_nom, meca_prenom, meca_nom, statut
+                )
+                rows_by_code[code] = values + (_row_hash(values), False)
+            written = execute_values(postgres_cursor, query_postgres, list(rows_by_code.values()),
+                                     page_size=CHANTIERS_BATCH_SIZE, fetch=True)
+            changed += len(written)
+            metrics.add_rows(len(written))
+            total += len(chantiers)
+
+        # Point de reprise validé avec les chantiers chargés
+        if last_modified is not None:
+            set_watermark(postgres_cursor, CHANTIERS_WATERMARK, last_modified)
         postgres_conn.commit()
-        
+
         # Fermeture des connexions
         hfsql_cursor.close()
         postgres_cursor.close()
         hfsql_conn.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(chantiers)} chantier(s) transféré(s) depuis HFSQL vers PostgreSQL"
+        return True, f"[OK] {total} chantier(s) lu(s) dans HFSQL, {changed} nouveau(x) ou modifié(s) dans PostgreSQL"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert HFSQL -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("codial.chantiers.postgres_to_batisimply")
 def transfer_chantiers_postgres_to_batisimply():
     """
     Transfère les chantiers depuis PostgreSQL vers BatiSimply.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -127,33 +226,43 @@ def transfer_chantiers_postgres_to_batisimply():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
-        postgres_conn = connect_to_postgres()
+        postgres_conn = connect_to_postgres(
+            creds["postgres"]["host"],
+            creds["postgres"]["user"],
+            creds["postgres"]["password"],
+            creds["postgres"]["database"],
+            creds["postgres"].get("port", "5432")
+        )
         if not postgres_conn:
             return False, "[ERREUR] Connexion PostgreSQL échouée"
 
         postgres_cursor = postgres_conn.cursor()
 
         # Récupération des chantiers non synchronisés
-        query = "SELECT * FROM codial_chantiers WHERE sync = FALSE"
+        metrics.phase("extract")
+        query = """
+        SELECT code, nom, date_debut, date_fin, description, reference, adresse_chantier,
+               cp_chantier, ville_chantier, code_pays_chantier, client_nom, meca_prenom, meca_nom, statut
+        FROM codial_chantiers
+        WHERE sync = FALSE
+        """
         postgres_cursor.execute(query)
         chantiers = postgres_cursor.fetchall()
+        metrics.add_rows(len(chantiers))
 
-        # Envoi vers BatiSimply
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-
+        metrics.phase("transform")
+        payloads = []
         for chantier in chantiers:
             # Récupération des données du chantier
-            id, code, nom, date_debut, date_fin, description, reference, adresse_chantier, \
-            cp_chantier, ville_chantier, code_pays_chantier, coderep, client_nom, \
-            meca_prenom, meca_nom, statut, sync = chantier
-            
-            # Préparation des données pour BatiSimply
-            data = {
+            code, nom, date_debut, date_fin, description, reference, adresse_chantier, \
+            cp_chantier, ville_chantier, code_pays_chantier, client_nom, \
+            meca_prenom, meca_nom, statut = chantier
+
+            # Préparation des données pour BatiSimply (sérialisées une fois pour l'envoi)
+            data = dumps({
                 "name": nom,
                 "startDate": date_debut.isoformat() if date_debut else None,
                 "endDate": date_fin.isoformat() if date_fin else None,
@@ -167,28 +276,54 @@ def transfer_chantiers_postgres_to_batisimply():
                 "clientName": client_nom,
                 "managerFirstName": meca_prenom,
                 "managerLastName": meca_nom
-            }
-
-            # Envoi vers l'API BatiSimply
-            response = requests.post(
-                'https://api.staging.batisimply.fr/api/project',
-                headers=headers,
-                json=data,
-                timeout=30
-            )
+            })
+            payloads.append((code, data))
+        metrics.add_rows(len(payloads))
+
+        # Envoi concurrent vers BatiSimply
+        metrics.phase("push")
+        headers = {
+            'Authorization': f'Bearer {token}',
+            **JSON_HEADERS
+        }
 
-            if response.status_code in [200, 201]:
-                # Marquer comme synchronisé
-                update_query = "UPDATE codial_chantiers SET sync = TRUE WHERE code = %s"
-                postgres_cursor.execute(update_query, (code,))
-            else:
-                print(f"[ATTENTION] Erreur lors de l'envoi du chantier {code}: {response.status_code}")
+        def send(session, body):
+            return session.post(f'{api_url}/api/project', headers=headers, data=body, timeout=30)
+
+        sent_codes = []
+        interrupted = None
+        try:
+            for outcome in push_concurrently(payloads, send, push_workers(creds)):
+                for response in outcome.responses:
+                    metrics.record_http(response)
+                if outcome.ok:
+                    sent_codes.append(outcome.key)
+                else:
+                    logger.warning("[ATTENTION] Erreur lors de l'envoi du chantier %s: %s", outcome.key, outcome.error)
+        except CircuitOpenError as e:
+            # Les chantiers acceptés avant l'interruption sont marqués ci-dessous (pas de renvoi en double)
+            interrupted = e
+        failed = len(payloads) - len(sent_codes)
+        metrics.add_rows(len(sent_codes), failed=failed)
+
+        # Marquer comme synchronisés les chantiers acceptés par BatiSimply
+        metrics.phase("mark_synced")
+        if sent_codes:
+            postgres_cursor.execute(
+                "UPDATE codial_chantiers SET sync = TRUE WHERE code = ANY(%s)",
+                (sent_codes,)
+            )
+            metrics.add_rows(len(sent_codes))
 
         postgres_conn.commit()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(chantiers)} chantier(s) envoyé(s) vers BatiSimply"
+        if interrupted is not None:
+            return False, f"[ERREUR] Envoi des chantiers interrompu après {len(sent_codes)} chantier(s) envoyé(s) : {interrupted}"
+        if failed:
+            return True, f"[ATTENTION] {len(sent_codes)} chantier(s) envoyé(s) vers BatiSimply, {failed} en échec"
+        return True, f"[OK] {len(sent_codes)} chantier(s) envoyé(s) vers BatiSimply"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> BatiSimply : {str(e)}"
@@ -197,11 +332,13 @@ def transfer_chantiers_postgres_to_batisimply():
 # TRANSFERT DES HEURES HFSQL -> POSTGRESQL -> BATISIMPLY
 # ============================================================================
 
+@metrics.instrumented("codial.heures.hfsql_to_postgres")
 def transfer_heures_hfsql_to_postgres():
     """
     Transfère les heures depuis HFSQL (Codial) vers PostgreSQL.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "hfsql" not in creds or "postgres" not in creds:
@@ -213,7 +350,8 @@ def transfer_heures_hfsql_to_postgres():
             creds["hfsql"].get("user", "admin"),
             creds["hfsql"].get("password", ""),
             creds["hfsql"].get("database", "HFSQL"),
-            creds["hfsql"].get("port", "4900")
+            creds["hfsql"].get("port", "4900"),
+            odbc=creds["hfsql"].get("odbc")
         )
         postgres_conn = connect_to_postgres(
             creds["postgres"]["host"],
@@ -231,6 +369,7 @@ def transfer_heures_hfsql_to_postgres():
         postgres_cursor = postgres_conn.cursor()
 
         # Requête pour récupérer les heures depuis HFSQL
+        metrics.phase("extract")
         query_hfsql = """
         SELECT CodeChantier, CodeSalarie, Date, Heures, Commentaire
         FROM SuiviHeures
@@ -238,22 +377,36 @@ def transfer_heures_hfsql_to_postgres():
         """
         
         hfsql_cursor.execute(query_hfsql)
-        heures = hfsql_cursor.fetchall()
-
-        # Insertion dans PostgreSQL avec gestion des conflits
-        for heure in heures:
+        heures_rows = hfsql_cursor.fetchall()
+        metrics.add_rows(len(heures_rows))
+
+        # Partitions mensuelles et rétention
+        metrics.phase("maintenance")
+        maintain_heures_partitions(postgres_conn, "codial", creds)
+
+        # Insertion dans PostgreSQL avec gestion des conflits ; date_debut
+        # (clé de partition) reprend la date de saisie HFSQL
+        metrics.phase("load")
+        query_postgres = """
+        INSERT INTO codial_heures (code_chantier, code_salarie, date_heure, date_debut, heures, commentaire, sync)
+        VALUES (%s, %s, %s, %s::date::timestamp, %s, %s, FALSE)
+        ON CONFLICT (code_chantier, code_salarie, date_heure, date_debut) DO UPDATE SET
+            heures = EXCLUDED.heures,
+            commentaire = EXCLUDED.commentaire,
+            sync = FALSE
+        """
+        loaded_count = 0
+        skipped = 0
+        for heure in heures_rows:
             code_chantier, code_salarie, date_heure, heures, commentaire = heure
-            
-            query_postgres = """
-            INSERT INTO codial_heures (code_chantier, code_salarie, date_heure, heures, commentaire, sync)
-            VALUES (%s, %s, %s, %s, %s, FALSE)
-            ON CONFLICT (code_chantier, code_salarie, date_heure) DO UPDATE SET
-                heures = EXCLUDED.heures,
-                commentaire = EXCLUDED.commentaire,
-                sync = FALSE
-            """
-            
-            postgres_cursor.execute(query_postgres, (code_chantier, code_salarie, date_heure, heures, commentaire))
+            if date_heure is None:
+                # date_debut (clé de partition, non nulle) vient de la date de saisie
+                logger.warning("[ATTENTION] Heure %s-%s ignorée: date absente dans HFSQL", code_chantier, code_salarie)
+                skipped += 1
+                continue
+            postgres_cursor.execute(query_postgres, (code_chantier, code_salarie, date_heure, date_heure, heures, commentaire))
+            loaded_count += 1
+        metrics.add_rows(loaded_count, failed=skipped)
 
         postgres_conn.commit()
         
@@ -263,16 +416,20 @@ def transfer_heures_hfsql_to_postgres():
         hfsql_conn.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(heures)} heure(s) transférée(s) depuis HFSQL vers PostgreSQL"
+        if skipped:
+            return True, f"[ATTENTION] {loaded_count} heure(s) transférée(s) depuis HFSQL vers PostgreSQL, {skipped} ignorée(s) sans date"
+        return True, f"[OK] {loaded_count} heure(s) transférée(s) depuis HFSQL vers PostgreSQL"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert HFSQL -> PostgreSQL : {str(e)}"
 
+@metrics.instrumented("codial.heures.postgres_to_batisimply")
 def transfer_heures_postgres_to_batisimply():
     """
     Transfère les heures depuis PostgreSQL vers BatiSimply.
     """
     try:
+        metrics.phase("connect")
         # Vérification des identifiants
         creds = load_credentials()
         if not creds or "postgres" not in creds:
@@ -282,57 +439,106 @@ def transfer_heures_postgres_to_batisimply():
         token = recup_batisimply_token()
         if not token:
             return False, "[ERREUR] Impossible de récupérer le token BatiSimply"
+        api_url = get_batisimply_api_url()
 
         # Connexion PostgreSQL
-        postgres_conn = connect_to_postgres()
+        postgres_conn = connect_to_postgres(
+            creds["postgres"]["host"],
+            creds["postgres"]["user"],
+            creds["postgres"]["password"],
+            creds["postgres"]["database"],
+            creds["postgres"].get("port", "5432")
+        )
         if not postgres_conn:
             return False, "[ERREUR] Connexion PostgreSQL échouée"
 
         postgres_cursor = postgres_conn.cursor()
 
-        # Récupération des heures non synchronisées
-        query = "SELECT * FROM codial_heures WHERE sync = FALSE"
-        postgres_cursor.execute(query)
-        heures = postgres_cursor.fetchall()
+        # Heures en attente lues par lots (curseur côté serveur, conservé entre les validations).
+        # Seules les heures issues de Codial (code chantier et date renseignés) sont envoyées :
+        # les heures importées depuis BatiSimply ne lui sont pas renvoyées.
+        metrics.phase("extract")
+        pending_cursor = postgres_conn.cursor(name="codial_heures_pending", withhold=True)
+        pending_cursor.execute("""
+        SELECT id, code_chantier, code_salarie, date_heure, heures, commentaire
+        FROM codial_heures
+        WHERE sync = FALSE
+          AND code_chantier IS NOT NULL
+          AND date_heure IS NOT NULL
+        """)
 
-        # Envoi vers BatiSimply
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
 
-        for heure in heures:
-            code_chantier, code_salarie, date_heure, heures, commentaire, sync = heure
-            
-            # Préparation des données pour BatiSimply
-            data = {
-                "projectId": code_chantier,
-                "userId": code_salarie,
-                "date": date_heure.isoformat(),
-                "hours": float(heures),
-                "comment": commentaire
-            }
-
-            # Envoi vers l'API BatiSimply
-            response = requests.post(
-                'https://api.staging.batisimply.fr/api/timeSlotManagement',
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-
-            if response.status_code in [200, 201]:
-                # Marquer comme synchronisé
-                update_query = "UPDATE codial_heures SET sync = TRUE WHERE code_chantier = %s AND code_salarie = %s AND date_heure = %s"
-                postgres_cursor.execute(update_query, (code_chantier, code_salarie, date_heure))
-            else:
-                print(f"[ATTENTION] Erreur lors de l'envoi de l'heure {code_chantier}-{code_salarie}: {response.status_code}")
-
-        postgres_conn.commit()
+        def send(session, data):
+            return session.post(f'{api_url}/api/timeSlotManagement', headers=headers, json=data, timeout=30)
+
+        workers = push_workers(creds)
+        sent = 0
+        failed = 0
+        interrupted = None
+        try:
+            while True:
+                metrics.phase("extract")
+                heures_rows = pending_cursor.fetchmany(PUSH_BATCH_SIZE)
+                if not heures_rows:
+                    break
+                metrics.add_rows(len(heures_rows))
+
+                # Préparation des données pour BatiSimply
+                metrics.phase("transform")
+                payloads = []
+                for heure_id, code_chantier, code_salarie, date_heure, heures, commentaire in heures_rows:
+                    data = {
+                        "projectId": code_chantier,
+                        "userId": code_salarie,
+                        "date": date_heure.isoformat(),
+                        "hours": float(heures or 0),
+                        "comment": commentaire
+                    }
+                    payloads.append(((heure_id, code_chantier, code_salarie), data))
+                metrics.add_rows(len(payloads))
+
+                # Envoi concurrent vers BatiSimply (débit réduit sur 429)
+                metrics.phase("push")
+                sent_ids = []
+                try:
+                    for outcome in push_concurrently(payloads, send, workers):
+                        for response in outcome.responses:
+                            metrics.record_http(response)
+                        if outcome.ok:
+                            sent_ids.append(outcome.key[0])
+                        else:
+                            logger.warning("[ATTENTION] Erreur lors de l'envoi de l'heure %s-%s: %s", outcome.key[1], outcome.key[2], outcome.error)
+                except CircuitOpenError as e:
+                    # Les envois acceptés avant l'interruption sont marqués ci-dessous
+                    # (sinon renvoyés en double à la prochaine synchronisation)
+                    interrupted = e
+                batch_failed = len(payloads) - len(sent_ids)
+                metrics.add_rows(len(sent_ids), failed=batch_failed)
+                sent += len(sent_ids)
+                failed += batch_failed
+
+                # Marquer comme synchronisées les heures acceptées par BatiSimply (une requête par lot)
+                metrics.phase("mark_synced")
+                if sent_ids:
+                    postgres_cursor.execute("UPDATE codial_heures SET sync = TRUE WHERE id = ANY(%s)", (sent_ids,))
+                    metrics.add_rows(len(sent_ids))
+                postgres_conn.commit()
+                if interrupted is not None:
+                    break
+        finally:
+            pending_cursor.close()
         postgres_cursor.close()
         postgres_conn.close()
 
-        return True, f"[OK] {len(heures)} heure(s) envoyée(s) vers BatiSimply"
+        if interrupted is not None:
+            return False, f"[ERREUR] Envoi des heures interrompu après {sent} heure(s) envoyée(s) : {interrupted}"
+        if failed:
+            return True, f"[ATTENTION] {sent} heure(s) envoyée(s) vers BatiSimply, {failed} en échec"
+        return True, f"[OK] {sent} heure(s) envoyée(s) vers BatiSimply"
 
     except Exception as e:
         return False, f"[ERREUR] Erreur lors du transfert PostgreSQL -> BatiSimply : {str(e)}"
@@ -341,46 +547,41 @@ def transfer_heures_postgres_to_batisimply():
 # FONCTIONS DE SYNCHRONISATION COMPLÈTE
 # ============================================================================
 
+def hfsql_to_batisimply_steps() -> list:
+    """Étapes de la synchronisation HFSQL -> PostgreSQL -> BatiSimply (app/services/pipeline.py)."""
+    return [
+        # 1. Transfert des chantiers
+        Step("chantiers.hfsql_to_postgres", transfer_chantiers_hfsql_to_postgres,
+             label="[SYNC] Synchronisation des chantiers..."),
+        Step("chantiers.postgres_to_batisimply", transfer_chantiers_postgres_to_batisimply,
+             requires=("chantiers.hfsql_to_postgres",)),
+        # 2. Transfert des heures
+        Step("heures.hfsql_to_postgres", transfer_heures_hfsql_to_postgres,
+             label="[SYNC] Synchronisation des heures..."),
+        Step("heures.postgres_to_batisimply", transfer_heures_postgres_to_batisimply,
+             requires=("heures.hfsql_to_postgres",), after=("chantiers.postgres_to_batisimply",)),
+    ]
+
+@metrics.instrumented("codial.sync_hfsql_to_batisimply")
 def sync_hfsql_to_batisimply():
     """
     Synchronisation complète HFSQL -> PostgreSQL -> BatiSimply.
+
+    Les flux chantiers et heures sont lancés en parallèle (sync_workers) ;
+    l'envoi des heures, qui référencent les projets, attend celui des chantiers.
     """
-    print("=== DÉBUT DE LA SYNCHRONISATION HFSQL -> BATISIMPLY ===")
-    messages = []
-    overall_success = True
+    logger.info("=== DÉBUT DE LA SYNCHRONISATION HFSQL -> BATISIMPLY ===")
     
     try:
-        # 1. Transfert des chantiers
-        print("[SYNC] Synchronisation des chantiers...")
-        success, message = transfer_chantiers_hfsql_to_postgres()
-        print(message)
-        messages.append(message)
-        
-        if success:
-            success, message = transfer_chantiers_postgres_to_batisimply()
-            print(message)
-            messages.append(message)
-            if not success:
-                overall_success = False
-        else:
-            overall_success = False
-        
-        # 2. Transfert des heures
-        print("[SYNC] Synchronisation des heures...")
-        success, message = transfer_heures_hfsql_to_postgres()
-        print(message)
-        messages.append(message)
-        
-        if success:
-            success, message = transfer_heures_postgres_to_batisimply()
-            print(message)
-            messages.append(message)
-            if not success:
-                overall_success = False
-        else:
-            overall_success = False
+        creds = load_credentials() or {}
+        steps = hfsql_to_batisimply_steps()
+
+        started = time.perf_counter()
+        results = run_steps(steps, sync_workers(creds))
+        logger.info(format_report(results, time.perf_counter() - started))
+        overall_success = all_succeeded(steps, results)
         
-        print("=== FIN DE LA SYNCHRONISATION HFSQL -> BATISIMPLY ===")
+        logger.info("=== FIN DE LA SYNCHRONISATION HFSQL -> BATISIMPLY ===")
         
         if overall_success:
             return True, "[OK] Synchronisation HFSQL -> BatiSimply terminée avec succès"
@@ -389,5 +590,5 @@ def sync_hfsql_to_batisimply():
             
     except Exception as e:
         error_msg = f"[ERREUR] Erreur lors de la synchronisation HFSQL -> BatiSimply : {str(e)}"
-        print(error_msg)
+        logger.log(level_for_message(error_msg), error_msg)
         return False, error_msg
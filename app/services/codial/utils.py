@@ -3,7 +3,12 @@
 # Ce fichier contient les fonctions utilitaires pour Codial
 # (initialisation des tables, vérifications, etc.)
 
+import logging
+from datetime import datetime
 from app.services.connex import connect_to_postgres, load_credentials
+from app.services.migrations import apply_migrations
+
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # INITIALISATION DE LA BASE DE DONNÉES CODIAL
@@ -17,12 +22,15 @@ def init_codial_tables():
     1. Crée la table codial_chantiers si elle n'existe pas
     2. Crée la table codial_heures si elle n'existe pas
     3. Crée la table codial_heures_map pour le mapping des heures
+    4. Applique les migrations de schéma (index des lignes en attente, etc.)
+
+    Le DDL est décrit dans app/services/migrations.py.
     """
     try:
         # Connexion à PostgreSQL
         creds = load_credentials()
         if not creds or "postgres" not in creds:
-            print("[ERREUR] Informations PostgreSQL manquantes")
+            logger.error("[ERREUR] Informations PostgreSQL manquantes")
             return False
 
         pg = creds["postgres"]
@@ -30,77 +38,22 @@ def init_codial_tables():
             pg["host"], pg["user"], pg["password"], pg["database"], pg.get("port", "5432")
         )
         if not postgres_conn:
-            print("[ERREUR] Connexion à PostgreSQL échouée")
+            logger.error("[ERREUR] Connexion à PostgreSQL échouée")
             return False
 
-        postgres_cursor = postgres_conn.cursor()
-
-        # Création de la table codial_chantiers si elle n'existe pas
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS codial_chantiers (
-                id SERIAL PRIMARY KEY,
-                id_projet INTEGER UNIQUE,
-                code VARCHAR(50) UNIQUE,
-                nom VARCHAR(255),
-                date_debut DATE,
-                date_fin DATE,
-                description TEXT,
-                reference VARCHAR(100),
-                adresse_chantier VARCHAR(255),
-                cp_chantier VARCHAR(10),
-                ville_chantier VARCHAR(100),
-                code_pays_chantier VARCHAR(10),
-                coderep VARCHAR(50),
-                client_nom VARCHAR(255),
-                meca_prenom VARCHAR(100),
-                meca_nom VARCHAR(100),
-                statut VARCHAR(50),
-                sync BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-
-        # Création de la table codial_heures si elle n'existe pas
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS codial_heures (
-                id SERIAL PRIMARY KEY,
-                id_heure VARCHAR(255) UNIQUE,
-                id_projet INTEGER,
-                id_utilisateur VARCHAR(255),
-                code_chantier VARCHAR(50),
-                code_salarie VARCHAR(50),
-                date_heure DATE,
-                date_debut TIMESTAMP,
-                date_fin TIMESTAMP,
-                heures DECIMAL(5,2),
-                commentaire TEXT,
-                sync BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-
-        # Création de la table codial_heures_map pour le mapping des heures
-        postgres_cursor.execute("""
-            CREATE TABLE IF NOT EXISTS codial_heures_map (
-                id_heure VARCHAR(255) PRIMARY KEY,
-                code_chantier VARCHAR(50) NOT NULL,
-                code_salarie VARCHAR(50) NOT NULL,
-                date_hfsql TIMESTAMP NOT NULL
-            )
-        """)
+        # Tables d'origine et migrations versionnées (app/services/migrations.py)
+        for component in ("core", "codial"):
+            apply_migrations(postgres_conn, component)
 
         # Validation des modifications
         postgres_conn.commit()
-        postgres_cursor.close()
         postgres_conn.close()
 
-        print("[OK] Tables Codial initialisées avec succès")
+        logger.info("[OK] Tables Codial initialisées avec succès")
         return True
 
     except Exception as e:
-        print(f"[ERREUR] Erreur lors de l'initialisation de la table Codial : {e}")
+        logger.error("[ERREUR] Erreur lors de l'initialisation de la table Codial : %s", e)
         return False
 
 def check_codial_connection():
@@ -119,3 +72,137 @@ def check_codial_connection():
             
     except Exception as e:
         return False, f"[ERREUR] Erreur de connexion HFSQL (Codial) : {str(e)}"
+
+# ============================================================================
+# ÉCRITURE PAR LOTS DANS HFSQL
+# ============================================================================
+# Chaque aller-retour ODBC vers le serveur HFSQL est coûteux : au lieu d'un
+# SELECT COUNT(*) puis d'un UPDATE ou INSERT par ligne, un lot se traite en
+# une lecture des clés existantes, un UPDATE et un INSERT en tableaux de
+# paramètres (executemany, marqueurs "?") et une validation.
+
+# Lignes écrites par lot (section hfsql de credentials.json : "batch_size")
+HFSQL_BATCH_SIZE = 500
+# Valeurs par clause IN lors de la lecture des clés existantes
+HFSQL_IN_CHUNK = 200
+
+
+def hfsql_batch_size(creds):
+    """Taille des lots d'écriture HFSQL configurée (hfsql.batch_size), HFSQL_BATCH_SIZE par défaut."""
+    try:
+        size = int(((creds or {}).get("hfsql") or {}).get("batch_size") or HFSQL_BATCH_SIZE)
+    except (TypeError, ValueError):
+        size = HFSQL_BATCH_SIZE
+    return max(1, size)
+
+
+def _hfsql_key_value(value):
+    """Valeur de clé comparable entre PostgreSQL et HFSQL (dates sans heure, textes sans espaces finaux)."""
+    if isinstance(value, datetime):
+        value = value.date()
+    if value is None:
+        return None
+    return str(value).strip()
+
+
+class HfsqlBatchWriter:
+    """
+    Insère ou met à jour des lignes d'une table HFSQL par lots.
+
+    Les lignes sont des dictionnaires colonne -> valeur contenant les colonnes
+    de clé, les colonnes mises à jour et les colonnes écrites seulement à la
+    création. Les clés existantes sont lues avec un IN sur la première colonne
+    de clé (à choisir la plus sélective), puis filtrées en Python.
+    """
+
+    def __init__(self, conn, table, key_columns, update_columns, insert_only_columns=()):
+        self.conn = conn
+        self.table = table
+        self.key_columns = list(key_columns)
+        self.update_columns = list(update_columns)
+        self.insert_columns = self.key_columns + self.update_columns + list(insert_only_columns)
+        self.update_sql = (
+            f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in self.update_columns)} "
+            f"WHERE {' AND '.join(f'{c} = ?' for c in self.key_columns)}"
+        )
+        self.insert_sql = (
+            f"INSERT INTO {table} ({', '.join(self.insert_columns)}) "
+            f"VALUES ({', '.join('?' for _ in self.insert_columns)})"
+        )
+        # Tableaux de paramètres ODBC (pyodbc) tant que le pilote les accepte
+        self.parameter_arrays = True
+
+    def _key(self, row):
+        return tuple(_hfsql_key_value(row[c]) for c in self.key_columns)
+
+    def _existing_keys(self, cursor, rows_by_key):
+        first = self.key_columns[0]
+        # Valeurs d'origine (types attendus par le pilote), une par valeur de clé
+        values_by_key = {}
+        for key, row in rows_by_key.items():
+            if key[0] is not None:
+                values_by_key.setdefault(key[0], row[first])
+        values = list(values_by_key.values())
+        wanted = set(rows_by_key)
+        existing = set()
+        for start in range(0, len(values), HFSQL_IN_CHUNK):
+            chunk = values[start:start + HFSQL_IN_CHUNK]
+            cursor.execute(
+                f"SELECT {', '.join(self.key_columns)} FROM {self.table} "
+                f"WHERE {first} IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            for found in cursor.fetchall():
+                key = tuple(_hfsql_key_value(v) for v in found)
+                if key in wanted:
+                    existing.add(key)
+        return existing
+
+    def _apply(self, cursor, updates, inserts, parameter_arrays):
+        if parameter_arrays:
+            cursor.fast_executemany = True
+        if updates:
+            cursor.executemany(self.update_sql, updates)
+        if inserts:
+            cursor.executemany(self.insert_sql, inserts)
+
+    def write(self, rows):
+        """
+        Écrit un lot et le valide ; retourne (insérées, mises à jour).
+        Une clé présente plusieurs fois dans le lot n'est écrite qu'une fois (dernière valeur).
+        """
+        rows_by_key = {}
+        for row in rows:
+            rows_by_key[self._key(row)] = row
+        if not rows_by_key:
+            return 0, 0
+
+        cursor = self.conn.cursor()
+        try:
+            existing = self._existing_keys(cursor, rows_by_key)
+            updates = []
+            inserts = []
+            for key, row in rows_by_key.items():
+                if key in existing:
+                    updates.append([row[c] for c in self.update_columns] + [row[c] for c in self.key_columns])
+                else:
+                    inserts.append([row.get(c) for c in self.insert_columns])
+
+            # pypyodbc n'a pas de tableaux de paramètres (executemany ligne à ligne)
+            parameter_arrays = self.parameter_arrays and hasattr(cursor, "fast_executemany")
+            try:
+                self._apply(cursor, updates, inserts, parameter_arrays)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                if not parameter_arrays:
+                    raise
+                logger.warning("[ATTENTION] Tableaux de paramètres refusés par le pilote HFSQL (%s) : écriture ligne à ligne", e)
+                self.parameter_arrays = False
+                cursor.close()
+                cursor = self.conn.cursor()
+                self._apply(cursor, updates, inserts, False)
+                self.conn.commit()
+            return len(inserts), len(updates)
+        finally:
+            cursor.close()
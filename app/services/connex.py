@@ -1,16 +1,20 @@
 # Module de connexion aux bases de données
 # Ce fichier contient les fonctions nécessaires pour établir des connexions
 # avec SQL Server et PostgreSQL, ainsi que la gestion des identifiants
+#
+# Les pilotes (pyodbc, pypyodbc, psycopg2) et requests sont importés au premier
+# usage : une installation n'utilise qu'un seul logiciel et le démarrage de
+# l'exécutable n'a pas à charger les pilotes inutiles.
 
-import pyodbc
-import psycopg2
 import json
+import logging
 import os
-import requests
-import pypyodbc
 from dotenv import load_dotenv
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+from app.services import metrics
+from app.services.ratelimit import DEFAULT_MAX_ATTEMPTS, IDEMPOTENT_METHODS, call_with_limits, shared_limits
+from app.services.sync_session import current_session
+
+logger = logging.getLogger(__name__)
 
 
 # Chemin du fichier stockant les identifiants de connexion
@@ -20,6 +24,9 @@ CREDENTIALS_FILE = "app/services/credentials.json"
 # Charger les variables d'environnement depuis .env si présent
 load_dotenv()
 
+# URL de l'API BatiSimply utilisée si ni credentials.json ni BATISIMPLY_API_URL ne la précisent
+DEFAULT_BATISIMPLY_API_URL = "https://api.staging.batisimply.fr"
+
 # ============================================================================
 # CONNEXION SQL SERVER
 # ============================================================================
@@ -36,7 +43,13 @@ def connect_to_sqlserver(server, user, password, database):
         
     Returns:
         pyodbc.Connection: Objet de connexion si réussi, None si échec
+        (connexion de la session en cours dans sync_all)
     """
+    session = current_session()
+    key = ("sqlserver", server, database, user)
+    shared = session.connection(key) if session is not None else None
+    if shared is not None:
+        return shared
     conn_str = (
         f"DRIVER={{ODBC Driver 17 for SQL Server}};"
         f"SERVER={server};"
@@ -46,11 +59,13 @@ def connect_to_sqlserver(server, user, password, database):
         f"TrustServerCertificate=yes;"  # Permet la connexion même avec un certificat auto-signé
     )
     try:
+        import pyodbc
         conn = pyodbc.connect(conn_str)
-        print("[OK] Connexion SQL Server réussie")
-        return conn
+        logger.info("[OK] Connexion SQL Server réussie")
+        conn = metrics.track_connection(conn, "sqlserver")
+        return session.keep(key, conn) if session is not None else conn
     except Exception as e:
-        print("[ERREUR] Connexion SQL Server:", e)
+        logger.error("[ERREUR] Connexion SQL Server: %s", e)
         return None
 
 # ============================================================================
@@ -70,7 +85,16 @@ def connect_to_postgres(host, user, password, database, port="5432"):
         
     Returns:
         psycopg2.connection: Objet de connexion si réussi, None si échec
+        (connexion de la session en cours dans sync_all)
     """
+    import psycopg2
+
+    session = current_session()
+    key = ("postgres", host, str(port), database, user)
+    shared = session.connection(key) if session is not None else None
+    if shared is not None:
+        return shared
+
     try:
         # Paramètres de connexion avec encodage explicite
         conn = psycopg2.connect(
@@ -82,66 +106,112 @@ def connect_to_postgres(host, user, password, database, port="5432"):
             client_encoding='utf8',
             options='-c client_encoding=utf8'
         )
-        print("[OK] Connexion PostgreSQL réussie")
-        return conn
+        logger.info("[OK] Connexion PostgreSQL réussie")
+        conn = metrics.track_connection(conn, "postgres")
+        return session.keep(key, conn) if session is not None else conn
     except psycopg2.OperationalError as e:
-        print(f"[ERREUR] Connexion PostgreSQL : {e}")
+        logger.error("[ERREUR] Connexion PostgreSQL : %s", e)
         return None
     except Exception as e:
-        print(f"[ERREUR] PostgreSQL : {e}")
+        logger.error("[ERREUR] PostgreSQL : %s", e)
         return None
     
 # ============================================================================
 # CONNEXION HFSQL
 # ============================================================================
 
-def connect_to_hfsql(host: str, user: str = "admin", password: str = "", database: str = "HFSQL", port: str = "4900"):
+# Liaisons ODBC essayées dans l'ordre : pyodbc (extension C, nettement plus rapide
+# sur les gros volumes) puis pypyodbc (Python pur), si pyodbc est absent ou si le
+# pilote HFSQL le refuse. "odbc" dans la section hfsql de credentials.json impose l'une des deux.
+HFSQL_ODBC_MODULES = ("pyodbc", "pypyodbc")
+
+# Encodage des colonnes texte non Unicode renvoyées par le pilote HFSQL (ANSI Windows)
+HFSQL_CHAR_ENCODING = "cp1252"
+
+def _hfsql_odbc_modules(odbc=None):
+    """Modules ODBC disponibles, dans l'ordre d'essai."""
+    import importlib
+
+    names = [odbc] if odbc else list(HFSQL_ODBC_MODULES)
+    modules = []
+    for name in names:
+        try:
+            modules.append(importlib.import_module(name))
+        except ImportError as e:
+            logger.debug("[INFO] Liaison ODBC %s indisponible : %s", name, e)
+    return modules
+
+def _open_hfsql(module, conn_str):
+    conn = module.connect(conn_str)
+    if module.__name__ == "pyodbc":
+        # pyodbc décode les colonnes SQL_CHAR en UTF-8 par défaut
+        conn.setdecoding(module.SQL_CHAR, encoding=HFSQL_CHAR_ENCODING)
+    return conn
+
+def connect_to_hfsql(host: str, user: str = "admin", password: str = "", database: str = "HFSQL", port: str = "4900", odbc: str = None):
     """
     Établit une connexion ODBC à HFSQL (Client/Serveur).
 
     - Requiert l'installation du pilote ODBC PC SOFT (HFSQL Client/Serveur)
     - Connexion "DSN-less" avec Driver explicite
     - Supporte un host de type "DSN=NomDeDSN" si vous utilisez un DSN Windows
+    - odbc : "pyodbc" ou "pypyodbc" pour imposer la liaison (par défaut pyodbc, puis pypyodbc)
+    - dans sync_all, la connexion de la session en cours est réutilisée
     """
+    session = current_session()
+    key = ("hfsql", host, str(port), database, user, odbc)
+    shared = session.connection(key) if session is not None else None
+    if shared is not None:
+        return shared
     try:
+        modules = _hfsql_odbc_modules(odbc)
+        if not modules:
+            logger.error("[ERREUR] HFSQL : aucune liaison ODBC disponible (%s)", odbc or ", ".join(HFSQL_ODBC_MODULES))
+            return None
+
         # Si un DSN Windows est fourni (ex: "DSN=MON_DSN"), utiliser tel quel
         if host.upper().startswith("DSN="):
-            conn_str = f"{host};UID={user};PWD={password}"
-            conn = pypyodbc.connect(conn_str)
-            print("[OK] Connexion HFSQL via DSN réussie")
-            return conn
-
-        # Essayer plusieurs noms de driver possibles
-        driver_candidates = [
-            "HFSQL Client/Server (Unicode)",
-            "HFSQL Client/Server",
-            "HFSQL (Unicode)",
-            "HFSQL",
-        ]
-
-        last_error = None
-        for drv in driver_candidates:
-            try:
-                conn_str = (
+            conn_strings = [(None, f"{host};UID={user};PWD={password}")]
+        else:
+            # Essayer plusieurs noms de driver possibles
+            driver_candidates = [
+                "HFSQL Client/Server (Unicode)",
+                "HFSQL Client/Server",
+                "HFSQL (Unicode)",
+                "HFSQL",
+            ]
+            conn_strings = [
+                (drv, (
                     "Driver={{{driver}}};"
                     "Server Name={host};"
                     "Server Port={port};"
                     "Database={database};"
                     "UID={user};"
                     "PWD={password}"
-                ).format(driver=drv, host=host, port=port, database=database, user=user, password=password)
-                conn = pypyodbc.connect(conn_str)
-                print(f"[OK] Connexion HFSQL réussie avec le driver '{drv}'")
-                return conn
-            except Exception as e:  # garder la dernière erreur pour diagnostic
-                last_error = e
-                continue
-
-        print("[ERREUR] HFSQL (pilote/DSN):", last_error)
-        print("[INFO] Vérifiez que le pilote ODBC HFSQL Client/Serveur est installé et que le nom du driver est correct.")
+                ).format(driver=drv, host=host, port=port, database=database, user=user, password=password))
+                for drv in driver_candidates
+            ]
+
+        last_error = None
+        for module in modules:
+            for drv, conn_str in conn_strings:
+                try:
+                    conn = _open_hfsql(module, conn_str)
+                    if drv:
+                        logger.info("[OK] Connexion HFSQL réussie avec le driver '%s' (%s)", drv, module.__name__)
+                    else:
+                        logger.info("[OK] Connexion HFSQL via DSN réussie (%s)", module.__name__)
+                    conn = metrics.track_connection(conn, "hfsql")
+                    return session.keep(key, conn) if session is not None else conn
+                except Exception as e:  # garder la dernière erreur pour diagnostic
+                    last_error = e
+                    continue
+
+        logger.error("[ERREUR] HFSQL (pilote/DSN): %s", last_error)
+        logger.info("[INFO] Vérifiez que le pilote ODBC HFSQL Client/Serveur est installé et que le nom du driver est correct.")
         return None
     except Exception as e:
-        print("[ERREUR] HFSQL :", e)
+        logger.error("[ERREUR] HFSQL : %s", e)
         return None
 
 # ============================================================================
@@ -192,13 +262,29 @@ def load_credentials():
 # AUTHENTIFICATION BATISIMPLY
 # ============================================================================
 
+def get_batisimply_api_url():
+    """
+    Retourne l'URL de base de l'API BatiSimply (sans "/" final).
+    Lit d'abord credentials.json (batisimply.api_url), sinon BATISIMPLY_API_URL.
+    Permet de viser un serveur local (tests/mock_batisimply.py) au lieu du staging.
+    """
+    creds = load_credentials() or {}
+    bcfg = creds.get("batisimply", {}) if isinstance(creds, dict) else {}
+    url = bcfg.get("api_url") or os.getenv("BATISIMPLY_API_URL") or DEFAULT_BATISIMPLY_API_URL
+    return url.strip().rstrip("/")
+
 def recup_batisimply_token():
     """
     Récupère un access_token Keycloak pour l'API BatiSimply.
     - Supporte grant_type=password (ROPC) et client_credentials.
     - Lit d'abord credentials.json (section "batisimply"), sinon variables d'environnement.
     - Retourne une string (access_token) ou None si échec (avec logs explicites).
+    - Dans sync_all, le token est demandé une fois et réutilisé jusqu'à son expiration.
     """
+    sync_session = current_session()
+    if sync_session is not None and sync_session.token():
+        return sync_session.token()
+
     # 1) Lire les creds persistés puis fallback env
     creds = load_credentials() or {}
     bcfg = creds.get("batisimply", {}) if isinstance(creds, dict) else {}
@@ -231,8 +317,8 @@ def recup_batisimply_token():
             missing.append("client_secret")
 
     if missing:
-        print(f"[ERREUR] Paramètres BatiSimply manquants ({grant_type}) : {', '.join(missing)}")
-        print("[INFO] Renseigne la section 'batisimply' dans credentials.json ou les variables d'environnement BATISIMPLY_*.")
+        logger.error("[ERREUR] Paramètres BatiSimply manquants (%s) : %s", grant_type, ', '.join(missing))
+        logger.info("[INFO] Renseigne la section 'batisimply' dans credentials.json ou les variables d'environnement BATISIMPLY_*.")
         return None
 
     # 3) Construire le payload selon le grant
@@ -254,6 +340,10 @@ def recup_batisimply_token():
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
 
     # 4) Session + retries
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
     session = requests.Session()
     retries = Retry(
         total=3,
@@ -266,9 +356,10 @@ def recup_batisimply_token():
 
     try:
         resp = session.post(url, data=payload, headers=headers, timeout=12)
+        metrics.record_http(resp, endpoint="sso/token")
     except requests.RequestException as e:
-        print(f"[ERREUR] Erreur réseau lors de la récupération du token : {e}")
-        print(f"[INFO] URL SSO utilisée: {url} | grant_type={grant_type} | client_id={client_id}")
+        logger.error("[ERREUR] Erreur réseau lors de la récupération du token : %s", e)
+        logger.info("[INFO] URL SSO utilisée: %s | grant_type=%s | client_id=%s", url, grant_type, client_id)
         return None
 
     content_type = resp.headers.get("Content-Type", "")
@@ -283,29 +374,72 @@ def recup_batisimply_token():
                 pass
         if not err_msg:
             err_msg = resp.text[:500].replace("\n", " ")
-        print(f"[ERREUR] Token SSO échec [{resp.status_code}] {err_msg}")
-        print(f"[INFO] URL SSO utilisée: {url} | grant_type={grant_type} | client_id={client_id}")
+        logger.error("[ERREUR] Token SSO échec [%s] %s", resp.status_code, err_msg)
+        logger.info("[INFO] URL SSO utilisée: %s | grant_type=%s | client_id=%s", url, grant_type, client_id)
         return None
 
     # 5) Extraire access_token
     try:
         data = resp.json()
     except ValueError:
-        print(f"[ERREUR] Réponse SSO non JSON: {resp.text[:200]}")
+        logger.error("[ERREUR] Réponse SSO non JSON: %s", resp.text[:200])
         return None
 
     access_token = data.get("access_token")
     if not access_token:
-        print(f"[ERREUR] 'access_token' absent dans la réponse SSO: {data}")
+        logger.error("[ERREUR] 'access_token' absent dans la réponse SSO: %s", data)
         return None
 
     if "expires_in" in data:
-        print(f"[OK] Token récupéré (expire dans {data['expires_in']}s)")
+        logger.info("[OK] Token récupéré (expire dans %ss)", data['expires_in'])
     else:
-        print("[OK] Token récupéré")
+        logger.info("[OK] Token récupéré")
 
+    if sync_session is not None:
+        sync_session.keep_token(access_token, data.get("expires_in"))
     return access_token
 
+# ============================================================================
+# APPELS À L'API BATISIMPLY
+# ============================================================================
+
+def batisimply_limits():
+    """
+    Limiteur de débit et disjoncteur partagés par tous les appels à l'API
+    BatiSimply (créés au premier appel, débit initial : batisimply.api_rate).
+    """
+    def _settings():
+        creds = load_credentials() or {}
+        return creds.get("batisimply", {}) if isinstance(creds, dict) else {}
+    return shared_limits(_settings)
+
+def batisimply_request(method, url, max_attempts=DEFAULT_MAX_ATTEMPTS, **kwargs):
+    """
+    Appel à l'API BatiSimply sous le limiteur et le disjoncteur partagés.
+    Les 429 (Retry-After), erreurs 5xx et erreurs réseau sont réessayés ; un
+    POST ne l'est que sur 429 ou connexion impossible (pas de doublon).
+    La dernière réponse est retournée (à l'appelant d'en vérifier le statut).
+
+    Raises:
+        requests.RequestException: Aucune réponse après tous les essais
+        CircuitOpenError: L'API reste en erreur, appels suspendus
+    """
+    import requests
+
+    # Dans sync_all : session du thread sur le pool HTTP de la synchronisation (connexions réutilisées)
+    session = current_session()
+    http = session.http if session is not None else requests
+    limiter, breaker = batisimply_limits()
+    response, responses, error = call_with_limits(
+        lambda: http.request(method, url, **kwargs), limiter, breaker, max_attempts,
+        idempotent=method.upper() in IDEMPOTENT_METHODS
+    )
+    for r in responses:
+        metrics.record_http(r)
+    if response is None:
+        raise requests.ConnectionError(error)
+    return response
+
 # ============================================================================
 # VÉRIFICATION DES CONNEXIONS
 # ============================================================================
@@ -334,6 +468,7 @@ def check_connection_status():
                     hf.get("password", ""),
                     hf.get("database", "HFSQL"),
                     hf.get("port", "4900"),
+                    odbc=hf.get("odbc"),
                 )
                 sql_connected = conn is not None
                 if conn:
@@ -399,6 +534,7 @@ def connexion():
             hf.get("password", ""),
             hf.get("database", "HFSQL"),
             hf.get("port", "4900"),
+            odbc=hf.get("odbc"),
         )
     else:
         sql = creds.get("sqlserver")
@@ -0,0 +1,93 @@
+# app/services/httpcache.py
+# Cache des listes BatiSimply (requêtes conditionnelles)
+# ------------------------------------------------------
+# Pour chaque page d'une liste (URL, paramètres, page, taille), la table
+# batisimply_http_cache conserve les validateurs HTTP (ETag, Last-Modified)
+# et les éléments lus. La page suivante demande If-None-Match /
+# If-Modified-Since : sur 304, rien n'est téléchargé et les éléments sont
+# relus dans le cache. Sans validateur dans la réponse, rien n'est conservé.
+#
+# Les entrées sont écrites dans la transaction de l'appelant (validées avec
+# les données chargées) et rangées par flux (namespace "batigest", "codial") :
+# une page 304 ne vaut que pour le flux qui l'a chargée. Seul le transfert qui
+# charge la liste en base fait avancer les validateurs ; un autre lecteur de
+# la même liste (update_code_projet_chantiers) ouvre le cache en lecture seule
+# (read_only) : requêtes conditionnelles et pages relues sur 304, sans
+# enregistrement, sinon le transfert recevrait un 304 pour des changements
+# qu'il n'a jamais chargés.
+
+import json
+from typing import Dict, NamedTuple, Optional
+
+
+class CachedPage(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    items: list
+    meta: dict
+
+
+class HttpCache:
+    """Pages de listes BatiSimply mémorisées dans PostgreSQL."""
+
+    def __init__(self, cursor, namespace: str, read_only: bool = False):
+        self.cursor = cursor
+        self.namespace = namespace
+        self.read_only = read_only
+        self._loaded: Dict[str, CachedPage] = {}
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def load(self, prefix: str) -> Dict[str, CachedPage]:
+        """Charge en une requête les pages mémorisées d'une liste (clés commençant par prefix)."""
+        prefix = self._key(prefix)
+        self.cursor.execute(
+            """
+            SELECT cache_key, etag, last_modified, body
+            FROM batisimply_http_cache
+            WHERE cache_key LIKE %s
+            """,
+            (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%",),
+        )
+        for key, etag, last_modified, body in self.cursor.fetchall():
+            self._loaded[key] = CachedPage(etag, last_modified, body.get("items") or [], body.get("meta") or {})
+        return self._loaded
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        return self._loaded.get(self._key(key))
+
+    def conditional_headers(self, key: str) -> dict:
+        """En-têtes de requête conditionnelle pour une page mémorisée."""
+        entry = self.get(key)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, key: str, response, items: list, meta: dict) -> bool:
+        """Mémorise une page reçue (200) si la réponse porte un validateur ; retourne True si conservée."""
+        if self.read_only:
+            return False
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return False
+        body = json.dumps({"items": items, "meta": meta}, ensure_ascii=False, default=str)
+        self.cursor.execute(
+            """
+            INSERT INTO batisimply_http_cache (cache_key, etag, last_modified, body, updated_at)
+            VALUES (%s, %s, %s, %s::jsonb, NOW())
+            ON CONFLICT (cache_key) DO UPDATE SET
+                etag = EXCLUDED.etag,
+                last_modified = EXCLUDED.last_modified,
+                body = EXCLUDED.body,
+                updated_at = NOW()
+            """,
+            (self._key(key), etag, last_modified, body),
+        )
+        self._loaded[self._key(key)] = CachedPage(etag, last_modified, items, meta)
+        return True
@@ -0,0 +1,178 @@
+# app/services/jsonstream.py
+# Lecture des listes renvoyées par BatiSimply
+# -------------------------------------------
+# Les listes de projets et d'heures (/api/project, /api/timeSlotManagement/allUsers)
+# peuvent peser plusieurs dizaines de Mo. iter_items() rend les éléments un à
+# un au fil du téléchargement (ijson, requête faite avec stream=True) : la
+# mémoire ne dépend plus de la taille de la réponse et le chargement en base
+# commence avant la fin du transfert.
+#
+# Les petites réponses (Content-Length connu et sous SMALL_BODY) et les
+# installations sans ijson sont décodées d'un bloc, avec orjson s'il est
+# installé. Dans les deux cas, la liste peut être à la racine ou dans une
+# enveloppe (elements, content, data, items) ; un objet seul compte pour un
+# élément. Les autres champs de l'enveloppe (totalPages, last, page...) sont
+# rendus à l'appelant pour la pagination (app/services/pagination.py).
+
+import json
+from typing import Iterator, Optional, Sequence
+
+from app.services import metrics
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # dépendance optionnelle : décodage d'un bloc
+    ijson = None
+
+LIST_WRAPPERS = ("elements", "content", "data", "items")
+# En dessous de cette taille, la réponse est décodée d'un bloc
+SMALL_BODY = 1024 * 1024
+STREAM_CHUNK = 64 * 1024
+
+
+class JsonStreamError(ValueError):
+    """Réponse JSON illisible ou de format inattendu."""
+
+
+def loads(body):
+    """Décode un corps JSON, avec orjson si disponible."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _unwrap(data, wrappers: Sequence[str], meta: dict) -> list:
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key in wrappers:
+            if isinstance(data.get(key), list):
+                meta.update((k, v) for k, v in data.items() if k != key)
+                return data[key]
+        return [data]
+    raise JsonStreamError(
+        f"Format de réponse inattendu de l'API BatiSimply. Attendu: liste ou dict, reçu: {type(data)}"
+    )
+
+
+class _CountingReader:
+    """Flux brut de la réponse (décompressé), octets lus comptés pour les métriques."""
+
+    def __init__(self, raw):
+        raw.decode_content = True
+        self.raw = raw
+        self.bytes = 0
+        self._pending = b""
+
+    def peek(self) -> bytes:
+        """Premier caractère significatif du corps (b"" si vide), sans le consommer."""
+        while True:
+            chunk = self.raw.read(STREAM_CHUNK)
+            self.bytes += len(chunk)
+            self._pending += chunk
+            head = self._pending.lstrip()
+            if head or not chunk:
+                return head[:1]
+
+    def read(self, size=-1):
+        if self._pending and size != 0:
+            chunk, self._pending = self._pending, b""
+            return chunk
+        chunk = self.raw.read(size)
+        self.bytes += len(chunk)
+        return chunk
+
+
+def _until_end_of(events, key: str) -> Iterator:
+    """Événements de la liste de l'enveloppe, jusqu'à sa fermeture (exclue)."""
+    for prefix, event, value in events:
+        if prefix == key and event == "end_array":
+            return
+        yield prefix, event, value
+
+
+def _stream_items(reader: _CountingReader, wrappers: Sequence[str], meta: dict) -> Iterator:
+    if reader.peek() == b"[":
+        # Liste à la racine : les éléments sont construits par ijson directement
+        yield from ijson.items(reader, "item", buf_size=STREAM_CHUNK, use_float=True)
+        return
+    events = ijson.parse(reader, buf_size=STREAM_CHUNK, use_float=True)
+    first = next(events, None)
+    if first is None:
+        raise JsonStreamError("Erreur de parsing JSON de l'API BatiSimply : réponse vide")
+    prefix, event, value = first
+    if event == "start_array":
+        yield from ijson.items(events, "item")
+        return
+    if event != "start_map":
+        raise JsonStreamError(
+            f"Format de réponse inattendu de l'API BatiSimply. Attendu: liste ou dict, reçu: {event}"
+        )
+    # Objet à la racine : on cherche l'enveloppe de la liste, les autres champs
+    # sont reconstitués (métadonnées de pagination) ; sans enveloppe, l'objet
+    # reconstitué est le seul élément.
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    wrapped = False
+    for prefix, event, value in events:
+        if not wrapped and prefix == "" and event == "map_key" and value in wrappers:
+            key = value
+            prefix, event, value = next(events)
+            if event == "start_array":
+                wrapped = True
+                yield from ijson.items(_until_end_of(events, key), f"{key}.item")
+                continue
+            builder.event("map_key", key)
+        builder.event(event, value)
+    if wrapped:
+        meta.update(builder.value)
+    else:
+        yield builder.value
+
+
+def iter_items(response, wrappers: Sequence[str] = LIST_WRAPPERS, small_body: int = SMALL_BODY,
+               meta: Optional[dict] = None) -> Iterator:
+    """
+    Rend un à un les éléments de la liste JSON d'une réponse BatiSimply, puis
+    ferme la réponse.
+
+    Args:
+        response: Réponse requests (stream=True pour la lecture au fil de l'eau)
+        wrappers: Clés d'enveloppe possibles de la liste, par ordre de préférence
+        small_body (int): Taille (octets) en dessous de laquelle la réponse est décodée d'un bloc
+        meta (dict): Reçoit les autres champs de l'enveloppe (complet une fois la liste parcourue)
+
+    Raises:
+        JsonStreamError: Réponse illisible ou ni liste ni objet
+    """
+    meta = {} if meta is None else meta
+    try:
+        length = response.headers.get("Content-Length")
+        small = length is not None and length.isdigit() and int(length) <= small_body
+        streamed = not getattr(response, "_content_consumed", True)
+        if ijson is None or small or not streamed:
+            try:
+                data = loads(response.content)
+            except ValueError as e:
+                raise JsonStreamError(
+                    f"Erreur de parsing JSON de l'API BatiSimply : {e}. Réponse: {response.text[:200]}"
+                ) from e
+            if streamed:
+                metrics.add_bytes(len(response.content))
+            yield from _unwrap(data, wrappers, meta)
+            return
+
+        reader = _CountingReader(response.raw)
+        try:
+            yield from _stream_items(reader, wrappers, meta)
+        except ijson.JSONError as e:
+            raise JsonStreamError(f"Erreur de parsing JSON de l'API BatiSimply : {str(e).splitlines()[0]}") from e
+        finally:
+            metrics.add_bytes(reader.bytes)
+    finally:
+        response.close()
@@ -2,15 +2,20 @@
 # Ce fichier contient les fonctions nécessaires pour valider et gérer les licences
 # La validation se fait via l'API Supabase pour des raisons de sécurité
 
+import asyncio
 import json
+import logging
 import os
-import requests
+import threading
+import time
 import uuid
 import platform
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -29,6 +34,8 @@ LICENSE_HEARTBEAT_INTERVAL_SECONDS = int(os.getenv("LICENSE_HEARTBEAT_INTERVAL_S
 LICENSE_CLIENT_ID = os.getenv("LICENSE_CLIENT_ID", "connecteur-sages-client")
 LICENSE_CLIENT_VERSION = os.getenv("LICENSE_CLIENT_VERSION", "1.0.0")
 LICENSE_MACHINE_ID = os.getenv("LICENSE_MACHINE_ID")
+# Durée de validité du verdict de licence gardé en mémoire par le middleware
+LICENSE_CACHE_TTL_SECONDS = int(os.getenv("LICENSE_CACHE_TTL_SECONDS", str(LICENSE_HEARTBEAT_INTERVAL_SECONDS)))
 
 def _get_machine_id() -> str:
     if LICENSE_MACHINE_ID:
@@ -49,12 +56,17 @@ def _license_api_headers() -> Dict[str, str]:
     }
 
 
-def _validate_via_license_service(license_key: str) -> Tuple[bool, Optional[Dict]]:
+def _query_license_service(license_key: str) -> Tuple[Optional[bool], Optional[Dict]]:
     """
-    Valide la licence via le service central (licence-manager) si configuré.
+    Interroge le service central (licence-manager) si configuré.
+
+    Returns:
+        Tuple[Optional[bool], Optional[Dict]]: (verdict, informations_normalisées).
+        Le verdict vaut None si le service n'a pas pu répondre (non configuré,
+        erreur réseau, statut HTTP inattendu).
     """
     if not LICENSE_API_BASE_URL or not LICENSE_API_KEY:
-        return False, None
+        return None, None
 
     try:
         url = f"{LICENSE_API_BASE_URL.rstrip('/')}/api/v1/validate"
@@ -64,9 +76,10 @@ def _validate_via_license_service(license_key: str) -> Tuple[bool, Optional[Dict
             "client_version": LICENSE_CLIENT_VERSION,
             "machine_id": _get_machine_id()
         }
+        import requests
         resp = requests.post(url, headers=_license_api_headers(), json=payload, timeout=10)
         if resp.status_code != 200:
-            return False, None
+            return None, None
 
         data = resp.json()
         # data structure expected from API_DOCUMENTATION.md
@@ -86,13 +99,23 @@ def _validate_via_license_service(license_key: str) -> Tuple[bool, Optional[Dict
                 "max_usage": data.get("max_usage"),
                 "is_active": license_info.get("is_active", False)
             }
-            # Sauvegarder localement
-            save_license_info(license_key, normalized)
             return True, normalized
         else:
             return False, None
     except Exception:
-        return False, None
+        return None, None
+
+
+def _validate_via_license_service(license_key: str) -> Tuple[bool, Optional[Dict]]:
+    """
+    Valide la licence via le service central (licence-manager) si configuré.
+    """
+    valid, normalized = _query_license_service(license_key)
+    if valid and normalized:
+        # Sauvegarder localement
+        save_license_info(license_key, normalized)
+        return True, normalized
+    return False, None
 
 
 def send_license_heartbeat(license_key: str) -> bool:
@@ -103,31 +126,20 @@ def send_license_heartbeat(license_key: str) -> bool:
         return False
     try:
         url = f"{LICENSE_API_BASE_URL.rstrip('/')}/api/v1/heartbeat/{license_key}"
+        import requests
         resp = requests.post(url, headers=_license_api_headers(), timeout=8)
         return resp.status_code == 200
     except Exception:
         return False
 
 
-def validate_license_key(license_key: str) -> Tuple[bool, Optional[Dict]]:
+def _test_license(license_key: str) -> Optional[Dict]:
     """
-    Valide une clé de licence via l'API Supabase.
-    
-    Args:
-        license_key (str): Clé de licence à valider
-        
+    Mode test: super-clé 'Cobalt' (activé seulement si debug ou ALLOW_TEST_LICENSE=true).
+
     Returns:
-        Tuple[bool, Optional[Dict]]: (est_valide, informations_licence)
+        Optional[Dict]: Informations de la licence de test, None si la clé n'est pas la super-clé
     """
-    if not license_key:
-        print("[ERREUR] Clé de licence vide")
-        return False, None
-    
-    # Nettoyage
-    license_key = license_key.strip()
-    print(f"[DEBUG] Validation de la clé: {license_key[:8]}...")
-
-    # Mode test: super-clé 'Cobalt' (activé seulement si debug ou ALLOW_TEST_LICENSE=true)
     # Lire le flag debug directement depuis credentials.json pour éviter toute dépendance
     debug_mode = False
     try:
@@ -138,35 +150,36 @@ def validate_license_key(license_key: str) -> Tuple[bool, Optional[Dict]]:
     except Exception:
         debug_mode = False
     allow_test_env = os.getenv("ALLOW_TEST_LICENSE", "false").lower() == "true"
-    if (debug_mode or allow_test_env) and license_key.lower() == "cobalt":
-        print("[TEST] Super-clé de test détectée (Cobalt) – licence acceptée en mode debug")
-        far_future = (datetime.now() + timedelta(days=3650)).isoformat()
-        test_license = {
-            "client_id": "TEST-COBALT",
-            "expires_at": far_future,
-            "usage_count": 0,
-            "max_usage": -1,
-            "is_active": True,
-            "is_archived": False
-        }
-        # Sauvegarder localement au format attendu
-        save_license_info(license_key, test_license)
-        return True, test_license
-    
-    try:
-        # 1) Tenter via service central si configuré
-        if LICENSE_API_BASE_URL and LICENSE_API_KEY:
-            valid, info = _validate_via_license_service(license_key)
-            if valid and info:
-                # Heartbeat optionnel
-                send_license_heartbeat(license_key)
-                print("[OK] Licence valide via service central")
-                return True, info
+    if not ((debug_mode or allow_test_env) and license_key.lower() == "cobalt"):
+        return None
+    logger.info("[TEST] Super-clé de test détectée (Cobalt) – licence acceptée en mode debug")
+    far_future = (datetime.now() + timedelta(days=3650)).isoformat()
+    return {
+        "client_id": "TEST-COBALT",
+        "expires_at": far_future,
+        "usage_count": 0,
+        "max_usage": -1,
+        "is_active": True,
+        "is_archived": False
+    }
 
-        # 2) Fallback Supabase (ancien comportement)
-        if not SUPABASE_KEY:
-            print("[ERREUR] SUPABASE_KEY manquant. Définissez-le dans votre .env")
-            return False, None
+
+def _query_supabase(license_key: str) -> Tuple[Optional[bool], Optional[Dict]]:
+    """
+    Interroge la table licenses de Supabase (ancien comportement).
+
+    Returns:
+        Tuple[Optional[bool], Optional[Dict]]: (verdict, informations_licence).
+        Le verdict vaut None si Supabase n'a pas pu répondre.
+    """
+    if not SUPABASE_KEY:
+        logger.error("[ERREUR] SUPABASE_KEY manquant. Définissez-le dans votre .env")
+        return None, None
+
+    # Import au premier appel réseau (la vérification locale n'en a pas besoin)
+    import requests
+
+    try:
         # Appel à l'API Supabase
         headers = {
             "apikey": SUPABASE_KEY,
@@ -180,8 +193,8 @@ def validate_license_key(license_key: str) -> Tuple[bool, Optional[Dict]]:
             "select": "*",
             "license_key": f"eq.{license_key.strip()}"
         }
-        print(f"[INFO] URL de requête: {url}")
-        print(f"[DEBUG] Paramètres: {params}")
+        logger.debug("[INFO] URL de requête: %s", url)
+        logger.debug("[DEBUG] Paramètres: %s", params)
         
         response = requests.get(
             url,
@@ -190,104 +203,251 @@ def validate_license_key(license_key: str) -> Tuple[bool, Optional[Dict]]:
             timeout=10  # Timeout de 10 secondes
         )
         
-        print(f"[INFO] Statut de la réponse: {response.status_code}")
+        logger.debug("[INFO] Statut de la réponse: %s", response.status_code)
         
-        if response.status_code == 200:
-            data = response.json()
-            print(f"[INFO] Données reçues: {len(data)} licences trouvées")
+        if response.status_code != 200:
+            # Erreur serveur
+            logger.error("[ERREUR] Erreur API Supabase: %s - %s", response.status_code, response.text)
+            return None, None
+
+        data = response.json()
+        logger.debug("[INFO] Données reçues: %s licences trouvées", len(data))
+        try:
+            logger.debug("[INFO] Content-Range: %s", response.headers.get('Content-Range'))
+        except Exception:
+            pass
+
+        # Vérifier si on a des résultats
+        if not data:
+            # Aucune licence trouvée
+            logger.error("[ERREUR] Aucune licence trouvée avec cette clé")
+            return False, None
+
+        license_info = data[0]  # Prendre le premier résultat
+        logger.debug("[INFO] Licence trouvée: ID %s", license_info.get('id'))
+        
+        # Vérifier si la licence est active
+        is_active = license_info.get("is_active", False)
+        logger.debug("[OK] is_active: %s", is_active)
+        if not is_active:
+            logger.error("[ERREUR] Licence inactive")
+            return False, license_info  # Licence inactive
+        
+        # Vérifier si la licence n'est pas expirée
+        expires_at = license_info.get("expires_at")
+        logger.debug("[INFO] expires_at: %s", expires_at)
+        if expires_at:
             try:
-                print(f"[INFO] Content-Range: {response.headers.get('Content-Range')}")
-            except Exception:
-                pass
-            
-            # Vérifier si on a des résultats
-            if data and len(data) > 0:
-                license_info = data[0]  # Prendre le premier résultat
-                print(f"[INFO] Licence trouvée: ID {license_info.get('id')}")
-                
-                # Vérifier si la licence est active
-                is_active = license_info.get("is_active", False)
-                print(f"[OK] is_active: {is_active}")
-                if not is_active:
-                    print("[ERREUR] Licence inactive")
-                    return False, license_info  # Licence inactive
-                
-                # Vérifier si la licence n'est pas expirée
-                expires_at = license_info.get("expires_at")
-                print(f"[INFO] expires_at: {expires_at}")
-                if expires_at:
-                    try:
-                        # Gérer différents formats de date
-                        if 'T' in expires_at:
-                            expiry_datetime = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-                        else:
-                            expiry_datetime = datetime.strptime(expires_at, "%Y-%m-%d")
-                        
-                        now = datetime.now(expiry_datetime.tzinfo)
-                        print(f"[INFO] Maintenant: {now}")
-                        print(f"[INFO] Expire le: {expiry_datetime}")
-                        
-                        if now > expiry_datetime:
-                            print("[ERREUR] Licence expirée")
-                            return False, license_info  # Licence expirée
-                        else:
-                            print("[OK] Licence non expirée")
-                    except ValueError as e:
-                        print(f"[ATTENTION] Erreur de parsing de date: {e}")
-                        # Si la date n'est pas valide, on considère la licence comme valide
-                        pass
-                
-                # Vérifier l'usage count si applicable
-                usage_count = license_info.get("usage_count", 0)
-                max_usage = license_info.get("max_usage")
-                print(f"[INFO] usage_count: {usage_count}, max_usage: {max_usage}")
-                if max_usage and max_usage > 0 and usage_count >= max_usage:
-                    print("[ERREUR] Limite d'usage atteinte")
-                    return False, license_info  # Limite d'usage atteinte
-                elif max_usage == -1:
-                    print("[OK] Usage illimité")
+                # Gérer différents formats de date
+                if 'T' in expires_at:
+                    expiry_datetime = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
                 else:
-                    print("[OK] Usage dans les limites")
+                    expiry_datetime = datetime.strptime(expires_at, "%Y-%m-%d")
                 
-                # Vérifier si la licence n'est pas archivée
-                is_archived = license_info.get("is_archived", False)
-                print(f"[INFO] is_archived: {is_archived}")
-                if is_archived:
-                    print("[ERREUR] Licence archivée")
-                    return False, license_info  # Licence archivée
+                now = datetime.now(expiry_datetime.tzinfo)
+                logger.debug("[INFO] Maintenant: %s", now)
+                logger.debug("[INFO] Expire le: %s", expiry_datetime)
                 
-                print("[OK] Licence valide")
-                # Sauvegarder au format local attendu
-                save_license_info(license_key, {
-                    "key": license_key,
-                    "client_name": f"Client {license_info.get('client_id', 'Inconnu')}",
-                    "expiry_date": license_info.get("expires_at"),
-                    "features": ["chantier", "devis", "heures"],
-                    "updated_at": datetime.now().isoformat(),
-                    "valid": True,
-                    "usage_count": license_info.get("usage_count", 0),
-                    "max_usage": license_info.get("max_usage"),
-                    "is_active": license_info.get("is_active", False)
-                })
-                return True, license_info
-            else:
-                # Aucune licence trouvée
-                print("[ERREUR] Aucune licence trouvée avec cette clé")
-                return False, None
+                if now > expiry_datetime:
+                    logger.error("[ERREUR] Licence expirée")
+                    return False, license_info  # Licence expirée
+                else:
+                    logger.debug("[OK] Licence non expirée")
+            except ValueError as e:
+                logger.warning("[ATTENTION] Erreur de parsing de date: %s", e)
+                # Si la date n'est pas valide, on considère la licence comme valide
+                pass
+        
+        # Vérifier l'usage count si applicable
+        usage_count = license_info.get("usage_count", 0)
+        max_usage = license_info.get("max_usage")
+        logger.debug("[INFO] usage_count: %s, max_usage: %s", usage_count, max_usage)
+        if max_usage and max_usage > 0 and usage_count >= max_usage:
+            logger.error("[ERREUR] Limite d'usage atteinte")
+            return False, license_info  # Limite d'usage atteinte
+        elif max_usage == -1:
+            logger.debug("[OK] Usage illimité")
         else:
-            # Erreur serveur
-            print(f"[ERREUR] Erreur API Supabase: {response.status_code} - {response.text}")
-            return False, None
-            
+            logger.debug("[OK] Usage dans les limites")
+        
+        # Vérifier si la licence n'est pas archivée
+        is_archived = license_info.get("is_archived", False)
+        logger.debug("[INFO] is_archived: %s", is_archived)
+        if is_archived:
+            logger.error("[ERREUR] Licence archivée")
+            return False, license_info  # Licence archivée
+        
+        logger.info("[OK] Licence valide")
+        return True, license_info
+
     except requests.exceptions.RequestException as e:
-        print(f"[ERREUR] Erreur de connexion à Supabase: {e}")
-        return False, None
+        logger.error("[ERREUR] Erreur de connexion à Supabase: %s", e)
+        return None, None
     except json.JSONDecodeError as e:
-        print(f"[ERREUR] Erreur de décodage de la réponse Supabase: {e}")
-        return False, None
+        logger.error("[ERREUR] Erreur de décodage de la réponse Supabase: %s", e)
+        return None, None
     except Exception as e:
-        print(f"[ERREUR] Erreur inattendue: {e}")
+        logger.error("[ERREUR] Erreur inattendue: %s", e)
+        return None, None
+
+
+def _save_supabase_license(license_key: str, license_info: Dict) -> None:
+    """
+    Sauvegarde au format local attendu une licence validée par Supabase.
+    """
+    save_license_info(license_key, {
+        "key": license_key,
+        "client_name": f"Client {license_info.get('client_id', 'Inconnu')}",
+        "expiry_date": license_info.get("expires_at"),
+        "features": ["chantier", "devis", "heures"],
+        "updated_at": datetime.now().isoformat(),
+        "valid": True,
+        "usage_count": license_info.get("usage_count", 0),
+        "max_usage": license_info.get("max_usage"),
+        "is_active": license_info.get("is_active", False)
+    })
+
+
+def validate_license_key(license_key: str) -> Tuple[bool, Optional[Dict]]:
+    """
+    Valide une clé de licence via l'API Supabase.
+    Version bloquante: service central puis Supabase, l'un après l'autre.
+    Depuis une route asynchrone, préférer validate_license_key_async().
+    
+    Args:
+        license_key (str): Clé de licence à valider
+        
+    Returns:
+        Tuple[bool, Optional[Dict]]: (est_valide, informations_licence)
+    """
+    if not license_key:
+        logger.error("[ERREUR] Clé de licence vide")
         return False, None
+    
+    # Nettoyage
+    license_key = license_key.strip()
+    logger.debug("[DEBUG] Validation de la clé: %s...", license_key[:8])
+
+    test_license = _test_license(license_key)
+    if test_license:
+        # Sauvegarder localement au format attendu
+        save_license_info(license_key, test_license)
+        return True, test_license
+    
+    # 1) Tenter via service central si configuré
+    if LICENSE_API_BASE_URL and LICENSE_API_KEY:
+        valid, info = _validate_via_license_service(license_key)
+        if valid and info:
+            # Heartbeat optionnel
+            send_license_heartbeat(license_key)
+            logger.info("[OK] Licence valide via service central")
+            return True, info
+
+    # 2) Fallback Supabase (ancien comportement)
+    valid, license_info = _query_supabase(license_key)
+    if valid:
+        _save_supabase_license(license_key, license_info)
+        return True, license_info
+    return False, license_info
+
+
+# Tâches de fond en cours (heartbeat) : une référence est gardée jusqu'à leur
+# fin, sans quoi la boucle d'événements pourrait les libérer en plein envoi
+_background_tasks = set()
+
+
+def _background_task_done(task: asyncio.Future) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("[ATTENTION] Tâche de fond en échec: %s", task.exception())
+
+
+async def validate_license_key_async(license_key: str) -> Tuple[bool, Optional[Dict]]:
+    """
+    Valide une clé de licence sans bloquer la boucle d'événements.
+    Un service injoignable compte comme un refus (voir _query_license_servers).
+
+    Args:
+        license_key (str): Clé de licence à valider
+
+    Returns:
+        Tuple[bool, Optional[Dict]]: (est_valide, informations_licence)
+    """
+    is_valid, license_info = await _query_license_servers(license_key)
+    return bool(is_valid), license_info
+
+
+async def _query_license_servers(license_key: str) -> Tuple[Optional[bool], Optional[Dict]]:
+    """
+    Interroge les services de licence sans bloquer la boucle d'événements.
+
+    Le service central et Supabase sont interrogés en même temps: le premier
+    verdict positif est retenu immédiatement. Sinon, on attend les deux
+    réponses (même règle que validate_license_key: la licence est valide dès
+    qu'un des deux services la reconnaît). Le temps de réponse est donc borné
+    par le plus lent des deux timeouts et non plus par leur somme.
+
+    Args:
+        license_key (str): Clé de licence à valider
+
+    Returns:
+        Tuple[Optional[bool], Optional[Dict]]: (verdict, informations_licence).
+        Le verdict vaut None si aucun service n'a pu répondre.
+    """
+    if not license_key:
+        logger.error("[ERREUR] Clé de licence vide")
+        return False, None
+
+    license_key = license_key.strip()
+    logger.debug("[DEBUG] Validation concurrente de la clé: %s...", license_key[:8])
+
+    test_license = await asyncio.to_thread(_test_license, license_key)
+    if test_license:
+        await asyncio.to_thread(save_license_info, license_key, test_license)
+        return True, test_license
+
+    backends = {
+        asyncio.ensure_future(asyncio.to_thread(_query_supabase, license_key)): "supabase"
+    }
+    if LICENSE_API_BASE_URL and LICENSE_API_KEY:
+        backends[asyncio.ensure_future(asyncio.to_thread(_query_license_service, license_key))] = "service"
+
+    supabase_info = None
+    answered = False
+    pending = set(backends)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                source = backends[task]
+                try:
+                    valid, info = task.result()
+                except Exception as e:
+                    logger.warning("[ATTENTION] Validation %s impossible: %s", source, e)
+                    continue
+                if source == "supabase":
+                    supabase_info = info
+                if valid is not None:
+                    answered = True
+                if not valid:
+                    continue
+                # Premier verdict positif: sauvegarde locale et réponse immédiate
+                if source == "service":
+                    logger.info("[OK] Licence valide via service central")
+                    await asyncio.to_thread(save_license_info, license_key, info)
+                    heartbeat = asyncio.ensure_future(asyncio.to_thread(send_license_heartbeat, license_key))
+                    _background_tasks.add(heartbeat)
+                    heartbeat.add_done_callback(_background_task_done)
+                else:
+                    await asyncio.to_thread(_save_supabase_license, license_key, info)
+                return True, info
+    finally:
+        # Les requêtes encore en vol se terminent dans leur thread, résultat ignoré
+        for task in pending:
+            task.cancel()
+
+    return (False if answered else None), supabase_info
+
 
 def save_license_info(license_key: str, license_info: Dict) -> None:
     """
@@ -331,6 +491,9 @@ def save_license_info(license_key: str, license_info: Dict) -> None:
     with open(CREDENTIALS_FILE, "w", encoding="utf-8") as f:
         json.dump(creds, f, indent=2, ensure_ascii=False, sort_keys=True)
 
+    # Le fichier a changé: le verdict en mémoire doit être recalculé
+    license_state.mark_stale()
+
 def load_license_info() -> Optional[Dict]:
     """
     Charge les informations de licence depuis le fichier de configuration.
@@ -460,9 +623,184 @@ def refresh_license_validation(license_key: str) -> Tuple[bool, Optional[Dict]]:
         Tuple[bool, Optional[Dict]]: (est_valide, informations_licence)
     """
     is_valid, license_info = validate_license_key(license_key)
-    
+
     if is_valid and license_info:
         # Mettre à jour les informations locales
         save_license_info(license_key, license_info)
-    
-    return is_valid, license_info 
\ No newline at end of file
+
+    # Le verdict réseau le plus récent fait foi pour le middleware
+    license_state.update(is_valid, load_license_info())
+
+    return is_valid, license_info
+
+async def refresh_license_validation_async(license_key: str) -> Tuple[bool, Optional[Dict]]:
+    """
+    Équivalent non bloquant de refresh_license_validation(): les deux services
+    de licence sont interrogés en parallèle (voir validate_license_key_async).
+
+    Args:
+        license_key (str): Clé de licence à valider
+
+    Returns:
+        Tuple[bool, Optional[Dict]]: (est_valide, informations_licence)
+    """
+    is_valid, license_info = await validate_license_key_async(license_key)
+
+    if is_valid and license_info:
+        await asyncio.to_thread(save_license_info, license_key, license_info)
+
+    license_state.update(is_valid, await asyncio.to_thread(load_license_info))
+
+    return is_valid, license_info
+
+# ============================================================================
+# VERDICT DE LICENCE EN MÉMOIRE (MIDDLEWARE)
+# ============================================================================
+
+class LicenseState:
+    """
+    Verdict de licence conservé en mémoire pour le middleware.
+
+    Le middleware ne fait que lire cet état: les lectures de credentials.json
+    et les appels réseau sont faits par revalidate_license_state(), exécutée
+    au démarrage puis périodiquement en tâche de fond.
+    Le dernier verdict positif sert aussi de réponse stale-while-revalidate
+    (voir get_license_verdict).
+    """
+
+    def __init__(self, ttl_seconds: int = LICENSE_CACHE_TTL_SECONDS):
+        self._lock = threading.Lock()
+        self.ttl_seconds = ttl_seconds
+        self.valid = False
+        self.info: Optional[Dict] = None
+        self.checked_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.checked_at is not None
+
+    def update(self, valid: bool, info: Optional[Dict]) -> None:
+        with self._lock:
+            self.valid = bool(valid)
+            self.info = info
+            self.checked_at = time.monotonic()
+
+    def mark_stale(self) -> None:
+        """Force une revalidation au prochain passage, sans perdre le dernier verdict."""
+        with self._lock:
+            if self.checked_at is not None:
+                self.checked_at = time.monotonic() - self.ttl_seconds - 1
+
+    def is_stale(self) -> bool:
+        with self._lock:
+            if self.checked_at is None:
+                return True
+            return (time.monotonic() - self.checked_at) > self.ttl_seconds
+
+    def snapshot(self) -> Tuple[bool, Optional[Dict]]:
+        with self._lock:
+            return self.valid, self.info
+
+
+license_state = LicenseState()
+_revalidation_task: Optional[asyncio.Task] = None
+
+
+async def revalidate_license_state(check_server: bool = False) -> bool:
+    """
+    Recalcule le verdict de licence et met à jour l'état en mémoire.
+    Les lectures de fichier et les appels réseau sont faits hors de la boucle
+    d'événements; depuis le chemin d'une requête, préférer
+    schedule_license_revalidation() qui n'attend pas le résultat.
+
+    Les services de licence sont interrogés (détection d'une révocation) si
+    check_server est vrai, si le verdict en mémoire a expiré ou si la licence
+    locale est invalide. Au premier calcul, seul le fichier local est lu
+    (démarrage sans attendre le réseau). Si aucun service ne répond, une
+    licence locale valide le reste.
+
+    Args:
+        check_server (bool): Interroger les services même si le verdict est récent
+
+    Returns:
+        bool: True si la licence est valide
+    """
+    license_info = await asyncio.to_thread(load_license_info)
+    locally_valid = await asyncio.to_thread(is_license_valid)
+    license_key = (license_info or {}).get("key")
+    stale = license_state.loaded and license_state.is_stale()
+    if not license_key or (locally_valid and not check_server and not stale):
+        license_state.update(locally_valid, license_info)
+        return locally_valid
+
+    is_valid, server_info = await _query_license_servers(license_key)
+    if is_valid is None:
+        if locally_valid:
+            logger.warning("[ATTENTION] Services de licence injoignables: verdict local conservé")
+        license_state.update(locally_valid, license_info)
+        return locally_valid
+
+    if is_valid and server_info:
+        await asyncio.to_thread(save_license_info, license_key, server_info)
+    elif locally_valid:
+        logger.error("[ERREUR] Licence refusée par le serveur (révoquée ou expirée)")
+    license_state.update(is_valid, await asyncio.to_thread(load_license_info))
+    return is_valid
+
+
+def schedule_license_revalidation(check_server: bool = False) -> None:
+    """
+    Lance une revalidation en tâche de fond si aucune n'est déjà en cours.
+    Ne bloque pas la boucle d'événements.
+    """
+    global _revalidation_task
+    if _revalidation_task is not None and not _revalidation_task.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _revalidation_task = loop.create_task(revalidate_license_state(check_server))
+
+
+async def get_license_verdict(license_key: str) -> Tuple[bool, Optional[Dict]]:
+    """
+    Verdict de licence en stale-while-revalidate.
+
+    Si le dernier verdict connu pour cette clé est positif, il est renvoyé
+    immédiatement et, s'il a expiré, une revalidation auprès des services de
+    licence est lancée en tâche de fond. Sinon
+    (clé différente, licence invalide, pas encore de verdict), la validation
+    est attendue.
+
+    Args:
+        license_key (str): Clé de licence à valider
+
+    Returns:
+        Tuple[bool, Optional[Dict]]: (est_valide, informations_licence)
+    """
+    license_key = (license_key or "").strip()
+    is_valid, license_info = license_state.snapshot()
+    if is_valid and license_info and license_info.get("key") == license_key:
+        if license_state.is_stale():
+            schedule_license_revalidation()
+        return True, license_info
+
+    return await refresh_license_validation_async(license_key)
+
+
+async def license_revalidation_loop(interval_seconds: int = LICENSE_HEARTBEAT_INTERVAL_SECONDS) -> None:
+    """
+    Boucle de revalidation périodique de la licence (tâche de fond de l'application).
+    Le verdict initial est calculé au démarrage: la boucle attend d'abord un intervalle,
+    puis interroge les services de licence à chaque passage (révocation détectée).
+
+    Args:
+        interval_seconds (int): Intervalle entre deux revalidations
+    """
+    while True:
+        await asyncio.sleep(max(interval_seconds, 1))
+        try:
+            await revalidate_license_state(check_server=True)
+        except Exception as e:
+            logger.warning("[ATTENTION] Revalidation de la licence impossible: %s", e)
\ No newline at end of file
@@ -0,0 +1,583 @@
+# -*- coding: utf-8 -*-
+# Module de métriques des synchronisations
+# -----------------------------------------
+# Chaque fonction de transfert décorée par @instrumented("...") ouvre une
+# exécution (SyncRun) et découpe son travail en phases :
+#
+#   connect → extract → transform → load | push → mark_synced
+#
+# metrics.phase("extract") ferme la phase en cours et ouvre la suivante (pas de
+# bloc `with`, le code existant n'a pas à être réindenté). Pour chaque phase on
+# mesure : durée, lignes, octets, allers-retours base de données (curseurs
+# suivis par connex.connect_to_*) et requêtes HTTP (record_http).
+#
+# Les exécutions imbriquées (transfer_* appelée par sync_*) sont rattachées à
+# l'exécution parente. À la fin d'une exécution de premier niveau :
+#   - les agrégats sont exposés au format Prometheus (render_prometheus → /metrics),
+#     histogramme de latence HTTP par flux et par phase compris
+#   - l'exécution est enregistrée dans la table PostgreSQL sync_history
+
+import functools
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bornes (secondes) de l'histogramme de latence HTTP
+HTTP_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_run: ContextVar[Optional["SyncRun"]] = ContextVar("sync_run", default=None)
+
+# Listes alimentées par collect_runs() (benchmarks)
+_run_collectors: List[List["SyncRun"]] = []
+
+
+# ============================================================================
+# EXÉCUTIONS ET PHASES
+# ============================================================================
+
+class PhaseStats:
+    """Mesures d'une phase d'une exécution."""
+
+    __slots__ = ("name", "duration_s", "rows", "rows_failed", "bytes",
+                 "db_roundtrips", "http_requests", "http_errors", "http_latency_s",
+                 "http_latency_buckets")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.duration_s = 0.0
+        self.rows = 0
+        self.rows_failed = 0
+        self.bytes = 0
+        self.db_roundtrips = 0
+        self.http_requests = 0
+        self.http_errors = 0
+        self.http_latency_s = 0.0
+        # Histogramme cumulé (bornes HTTP_LATENCY_BUCKETS), comme dans /metrics
+        self.http_latency_buckets = [0] * len(HTTP_LATENCY_BUCKETS)
+
+    def to_dict(self) -> Dict:
+        return {
+            "duration_ms": round(self.duration_s * 1000, 1),
+            "rows": self.rows,
+            "rows_failed": self.rows_failed,
+            "bytes": self.bytes,
+            "db_roundtrips": self.db_roundtrips,
+            "http_requests": self.http_requests,
+            "http_errors": self.http_errors,
+            "http_latency_ms": round(self.http_latency_s * 1000, 1),
+            "http_latency_buckets": _bucket_dict(self.http_latency_buckets, self.http_requests),
+        }
+
+
+class SyncRun:
+    """
+    Exécution d'une fonction de transfert ou de synchronisation.
+    Les phases sont ordonnées ; une phase réouverte cumule ses mesures.
+    """
+
+    def __init__(self, flow: str, parent: Optional["SyncRun"] = None):
+        self.flow = flow
+        self.parent = parent
+        self.children: List["SyncRun"] = []
+        self.phases: Dict[str, PhaseStats] = {}
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.success: Optional[bool] = None
+        self.message: Optional[str] = None
+        self._started = time.perf_counter()
+        self._phase: Optional[PhaseStats] = None
+        self._phase_started = 0.0
+        self.duration_s = 0.0
+
+    # -- phases ---------------------------------------------------------------
+
+    def enter_phase(self, name: str) -> PhaseStats:
+        self._close_phase()
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name)
+        self._phase = stats
+        self._phase_started = time.perf_counter()
+        return stats
+
+    def _close_phase(self) -> None:
+        if self._phase is not None:
+            self._phase.duration_s += time.perf_counter() - self._phase_started
+            self._phase = None
+
+    @property
+    def current_phase(self) -> PhaseStats:
+        # Mesures hors phase explicite : phase "other"
+        return self._phase or self.phases.setdefault("other", PhaseStats("other"))
+
+    def finish(self, success: bool, message: Optional[str]) -> None:
+        self._close_phase()
+        self.duration_s = time.perf_counter() - self._started
+        self.finished_at = datetime.now()
+        self.success = bool(success)
+        self.message = message
+
+    # -- agrégats -------------------------------------------------------------
+
+    def totals(self) -> Dict[str, int]:
+        """
+        Totaux de l'exécution, exécutions imbriquées comprises. Les mêmes
+        lignes sont comptées dans plusieurs phases (extract, load, mark_synced) :
+        les lignes d'une exécution sont celles de sa phase la plus chargée, le
+        détail par phase reste dans to_dict(). Allers-retours et requêtes
+        s'additionnent.
+        """
+        totals = {"rows": 0, "rows_failed": 0, "db_roundtrips": 0, "http_requests": 0}
+        for stats in self.phases.values():
+            totals["rows"] = max(totals["rows"], stats.rows)
+            totals["rows_failed"] = max(totals["rows_failed"], stats.rows_failed)
+            totals["db_roundtrips"] += stats.db_roundtrips
+            totals["http_requests"] += stats.http_requests
+        for child in self.children:
+            for key, value in child.totals().items():
+                totals[key] += value
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "flow": self.flow,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_s * 1000, 1),
+            "success": self.success,
+            "message": self.message,
+            "phases": {name: stats.to_dict() for name, stats in self.phases.items()},
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def current_run() -> Optional[SyncRun]:
+    """Exécution en cours dans le contexte courant (None hors synchronisation)."""
+    return _current_run.get()
+
+
+def phase(name: str) -> Optional[PhaseStats]:
+    """Termine la phase en cours et démarre la phase `name` de l'exécution courante."""
+    run = _current_run.get()
+    if run is None:
+        return None
+    return run.enter_phase(name)
+
+
+def add_rows(count: int = 1, failed: int = 0) -> None:
+    """Ajoute des lignes traitées (et en échec) à la phase en cours."""
+    run = _current_run.get()
+    if run is not None:
+        stats = run.current_phase
+        stats.rows += count
+        stats.rows_failed += failed
+
+
+def add_bytes(count: int) -> None:
+    """Ajoute un volume (octets) à la phase en cours."""
+    run = _current_run.get()
+    if run is not None:
+        run.current_phase.bytes += count
+
+
+def record_db_roundtrip(database: str, count: int = 1) -> None:
+    """Compte des allers-retours vers une base (appelé par les curseurs suivis)."""
+    run = _current_run.get()
+    if run is not None:
+        stats = run.current_phase
+        stats.db_roundtrips += count
+        _registry.add_db_roundtrips(run.flow, stats.name, database, count)
+
+
+def record_http(response, endpoint: Optional[str] = None) -> None:
+    """
+    Enregistre une réponse `requests` : latence (response.elapsed), statut et
+    taille du corps, dans la phase en cours et dans l'histogramme global.
+    Le corps d'une réponse lue en flux (stream=True) n'est pas chargé ici :
+    sa taille est comptée par le lecteur (jsonstream).
+    """
+    try:
+        latency = response.elapsed.total_seconds()
+        size = len(response.content or b"") if getattr(response, "_content_consumed", True) else 0
+        method = response.request.method if response.request is not None else "GET"
+        endpoint = endpoint or _endpoint_label(response.url)
+        status = response.status_code
+    except Exception:
+        return
+
+    run = _current_run.get()
+    if run is None:
+        _registry.observe_http("none", "none", method, endpoint, status, latency)
+    else:
+        stats = run.current_phase
+        _registry.observe_http(run.flow, stats.name, method, endpoint, status, latency)
+        stats.http_requests += 1
+        stats.http_latency_s += latency
+        _observe_bucket(stats.http_latency_buckets, latency)
+        stats.bytes += size
+        if status >= 400:
+            stats.http_errors += 1
+
+
+def _observe_bucket(buckets: List[int], latency: float) -> None:
+    """Compte une latence dans un histogramme cumulé (bornes HTTP_LATENCY_BUCKETS)."""
+    for index, bound in enumerate(HTTP_LATENCY_BUCKETS):
+        if latency <= bound:
+            buckets[index] += 1
+
+
+def _bucket_dict(buckets: List[int], count: int) -> Dict[str, int]:
+    """Histogramme cumulé sous forme {borne: nombre}, "+Inf" compris (sync_history)."""
+    result = {_format_value(bound): value for bound, value in zip(HTTP_LATENCY_BUCKETS, buckets)}
+    result["+Inf"] = count
+    return result
+
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{32,36})$")
+
+
+def _endpoint_label(url: str) -> str:
+    """Chemin de l'URL avec les identifiants remplacés par {id} (cardinalité bornée)."""
+    path = re.sub(r"^[a-z]+://[^/]+", "", url or "").split("?", 1)[0]
+    return "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in path.split("/")) or "/"
+
+
+# ============================================================================
+# DÉCORATEUR
+# ============================================================================
+
+def instrumented(flow: str):
+    """
+    Décore une fonction renvoyant (success, message) : ouvre une exécution,
+    la clôture au retour et, pour une exécution de premier niveau, publie
+    les agrégats et l'enregistre dans sync_history.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _current_run.get()
+            run = SyncRun(flow, parent)
+            if parent is not None:
+                parent.children.append(run)
+            token = _current_run.set(run)
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                _current_run.reset(token)
+                success, message = _result_status(result)
+                run.finish(success, message)
+                _registry.record_run(run)
+                if parent is None:
+                    for collector in list(_run_collectors):
+                        collector.append(run)
+                    save_sync_history(run)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_runs() -> Iterator[List[SyncRun]]:
+    """
+    Collecte les exécutions de premier niveau terminées dans le bloc
+    (benchmarks : détail des phases de chaque synchronisation).
+    """
+    runs: List[SyncRun] = []
+    _run_collectors.append(runs)
+    try:
+        yield runs
+    finally:
+        _run_collectors.remove(runs)
+
+
+def _result_status(result) -> Tuple[bool, Optional[str]]:
+    if isinstance(result, tuple) and len(result) == 2:
+        return bool(result[0]), str(result[1])
+    if result is None:
+        return False, "[ERREUR] Exception non gérée"
+    return bool(result), None
+
+
+# ============================================================================
+# CURSEURS SUIVIS (allers-retours base de données)
+# ============================================================================
+
+class TrackedCursor:
+    """
+    Proxy de curseur DB-API qui compte les allers-retours (execute/executemany).
+    Les lectures (fetch*) ne sont pas comptées : psycopg2 reçoit tout le
+    résultat lors de l'execute.
+    """
+
+    __slots__ = ("_cursor", "_database")
+
+    def __init__(self, cursor, database: str):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_database", database)
+
+    def execute(self, *args, **kwargs):
+        record_db_roundtrip(self._database)
+        result = self._cursor.execute(*args, **kwargs)
+        # pyodbc renvoie le curseur lui-même (chaînage cursor.execute(...).fetchone())
+        return self if result is self._cursor else result
+
+    def executemany(self, sql, params, *args, **kwargs):
+        if getattr(self._cursor, "fast_executemany", False) or not hasattr(params, "__len__"):
+            count = 1
+        else:
+            count = max(len(params), 1)
+        record_db_roundtrip(self._database, count)
+        result = self._cursor.executemany(sql, params, *args, **kwargs)
+        return self if result is self._cursor else result
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+
+class TrackedConnection:
+    """Proxy de connexion dont les curseurs sont des TrackedCursor."""
+
+    __slots__ = ("_connection", "_database")
+
+    def __init__(self, connection, database: str):
+        object.__setattr__(self, "_connection", connection)
+        object.__setattr__(self, "_database", database)
+
+    @property
+    def raw_connection(self):
+        """Connexion du pilote (pour les API qui exigent le type natif)."""
+        return self._connection
+
+    def cursor(self, *args, **kwargs):
+        return TrackedCursor(self._connection.cursor(*args, **kwargs), self._database)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._connection.__exit__(*exc)
+
+
+def track_connection(connection, database: str):
+    """Enveloppe une connexion pour compter ses allers-retours (None reste None)."""
+    if connection is None:
+        return None
+    return TrackedConnection(connection, database)
+
+
+# ============================================================================
+# AGRÉGATS PROMETHEUS
+# ============================================================================
+
+class _Registry:
+    """Compteurs et histogrammes en mémoire du processus (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs: Dict[Tuple[str, str], int] = {}
+        self.last_run: Dict[str, Tuple[float, bool, float]] = {}
+        self.phase_seconds: Dict[Tuple[str, str], float] = {}
+        self.phase_count: Dict[Tuple[str, str], int] = {}
+        self.phase_rows: Dict[Tuple[str, str], int] = {}
+        self.phase_rows_failed: Dict[Tuple[str, str], int] = {}
+        self.phase_bytes: Dict[Tuple[str, str], int] = {}
+        self.db_roundtrips: Dict[Tuple[str, str, str], int] = {}
+        self.http_requests: Dict[Tuple[str, str, str], int] = {}
+        # Histogramme de latence : (flux, phase, méthode, point d'accès)
+        self.http_buckets: Dict[Tuple[str, str, str, str], List[int]] = {}
+        self.http_sum: Dict[Tuple[str, str, str, str], float] = {}
+        self.http_count: Dict[Tuple[str, str, str, str], int] = {}
+
+    def record_run(self, run: SyncRun) -> None:
+        status = "success" if run.success else "failure"
+        with self._lock:
+            key = (run.flow, status)
+            self.runs[key] = self.runs.get(key, 0) + 1
+            self.last_run[run.flow] = (time.time(), bool(run.success), run.duration_s)
+            for name, stats in run.phases.items():
+                key = (run.flow, name)
+                self.phase_seconds[key] = self.phase_seconds.get(key, 0.0) + stats.duration_s
+                self.phase_count[key] = self.phase_count.get(key, 0) + 1
+                self.phase_rows[key] = self.phase_rows.get(key, 0) + stats.rows
+                self.phase_rows_failed[key] = self.phase_rows_failed.get(key, 0) + stats.rows_failed
+                self.phase_bytes[key] = self.phase_bytes.get(key, 0) + stats.bytes
+
+    def add_db_roundtrips(self, flow: str, phase_name: str, database: str, count: int) -> None:
+        key = (flow, phase_name, database)
+        with self._lock:
+            self.db_roundtrips[key] = self.db_roundtrips.get(key, 0) + count
+
+    def observe_http(self, flow: str, phase_name: str, method: str, endpoint: str,
+                     status: int, latency: float) -> None:
+        with self._lock:
+            key = (method, endpoint, str(status))
+            self.http_requests[key] = self.http_requests.get(key, 0) + 1
+            hkey = (flow, phase_name, method, endpoint)
+            _observe_bucket(self.http_buckets.setdefault(hkey, [0] * len(HTTP_LATENCY_BUCKETS)), latency)
+            self.http_sum[hkey] = self.http_sum.get(hkey, 0.0) + latency
+            self.http_count[hkey] = self.http_count.get(hkey, 0) + 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str, samples):
+            # samples : (suffixe, labels, valeur) ; suffixe "_sum", "_count", "_bucket" ou ""
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+        with self._lock:
+            family("connecteur_sync_runs_total", "counter", "Exécutions de synchronisation par flux et statut",
+                   [("", {"flow": f, "status": s}, v) for (f, s), v in sorted(self.runs.items())])
+            family("connecteur_sync_last_run_timestamp_seconds", "gauge", "Fin de la dernière exécution",
+                   [("", {"flow": f}, v[0]) for f, v in sorted(self.last_run.items())])
+            family("connecteur_sync_last_run_success", "gauge", "Succès (1) ou échec (0) de la dernière exécution",
+                   [("", {"flow": f}, v[1]) for f, v in sorted(self.last_run.items())])
+            family("connecteur_sync_last_run_duration_seconds", "gauge", "Durée de la dernière exécution",
+                   [("", {"flow": f}, v[2]) for f, v in sorted(self.last_run.items())])
+
+            phase_samples = []
+            for (f, p), seconds in sorted(self.phase_seconds.items()):
+                phase_samples.append(("_sum", {"flow": f, "phase": p}, seconds))
+                phase_samples.append(("_count", {"flow": f, "phase": p}, self.phase_count[(f, p)]))
+            family("connecteur_phase_duration_seconds", "summary", "Durée des phases", phase_samples)
+
+            family("connecteur_phase_rows_total", "counter", "Lignes traitées par phase",
+                   [("", {"flow": f, "phase": p}, v) for (f, p), v in sorted(self.phase_rows.items())])
+            family("connecteur_phase_rows_failed_total", "counter", "Lignes en échec par phase",
+                   [("", {"flow": f, "phase": p}, v) for (f, p), v in sorted(self.phase_rows_failed.items())])
+            family("connecteur_phase_bytes_total", "counter", "Octets échangés par phase",
+                   [("", {"flow": f, "phase": p}, v) for (f, p), v in sorted(self.phase_bytes.items())])
+            family("connecteur_db_roundtrips_total", "counter", "Allers-retours base de données par phase",
+                   [("", {"flow": f, "phase": p, "database": d}, v)
+                    for (f, p, d), v in sorted(self.db_roundtrips.items())])
+            family("connecteur_http_requests_total", "counter", "Requêtes HTTP par point d'accès et statut",
+                   [("", {"method": m, "endpoint": e, "status": s}, v)
+                    for (m, e, s), v in sorted(self.http_requests.items())])
+
+            histogram = []
+            for hkey, buckets in sorted(self.http_buckets.items()):
+                flow, phase_name, method, endpoint = hkey
+                labels = {"flow": flow, "phase": phase_name, "method": method, "endpoint": endpoint}
+                count = self.http_count[hkey]
+                for bound, bucket_count in zip(HTTP_LATENCY_BUCKETS, buckets):
+                    histogram.append(("_bucket", {**labels, "le": _format_value(bound)}, bucket_count))
+                histogram.append(("_bucket", {**labels, "le": "+Inf"}, count))
+                histogram.append(("_sum", labels, self.http_sum[hkey]))
+                histogram.append(("_count", labels, count))
+            family("connecteur_http_request_duration_seconds", "histogram",
+                   "Latence des requêtes HTTP par flux et phase (hors synchronisation : none)", histogram)
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+_registry = _Registry()
+
+
+def render_prometheus() -> str:
+    """Métriques du processus au format texte Prometheus (exposition 0.0.4)."""
+    return _registry.render()
+
+
+# ============================================================================
+# HISTORIQUE POSTGRESQL
+# ============================================================================
+
+
+
+def save_sync_history(run: SyncRun) -> bool:
+    """
+    Enregistre une exécution de premier niveau dans sync_history
+    (table créée par app/services/migrations.py).
+    Best effort : une erreur d'enregistrement ne fait jamais échouer la synchronisation.
+    """
+    try:
+        from app.services.connex import connect_to_postgres, load_credentials
+
+        creds = load_credentials() or {}
+        pg = creds.get("postgres")
+        if not pg:
+            return False
+        conn = connect_to_postgres(pg["host"], pg["user"], pg["password"], pg["database"], pg.get("port", "5432"))
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor()
+            totals = run.totals()
+            cursor.execute(
+                """
+                INSERT INTO sync_history (
+                    flow, started_at, finished_at, duration_ms, success, message,
+                    rows_total, rows_failed, db_roundtrips, http_requests, details
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                (
+                    run.flow,
+                    run.started_at,
+                    run.finished_at,
+                    round(run.duration_s * 1000, 1),
+                    bool(run.success),
+                    run.message,
+                    totals["rows"],
+                    totals["rows_failed"],
+                    totals["db_roundtrips"],
+                    totals["http_requests"],
+                    json.dumps(run.to_dict(), ensure_ascii=False),
+                ),
+            )
+            conn.commit()
+            cursor.close()
+            return True
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning("[ATTENTION] Historique de synchronisation non enregistré: %s", e)
+        return False
@@ -0,0 +1,460 @@
+# app/services/migrations.py
+# Migrations versionnées du schéma PostgreSQL (base tampon)
+# ---------------------------------------------------------
+# Tout le DDL de la base tampon est décrit ici, par composant :
+#   - "core"     : tables communes (historique des synchronisations)
+#   - "batigest" : tables batigest_*
+#   - "codial"   : tables codial_*
+#
+# Pour chaque composant, BASELINE_TABLES contient les tables d'origine
+# (CREATE TABLE IF NOT EXISTS) et MIGRATIONS les évolutions numérotées,
+# appliquées une seule fois : les versions appliquées sont enregistrées dans
+# la table schema_version. Le schéma est vérifié une fois au démarrage
+# (ensure_schema) et par init_batigest_tables / init_codial_tables ; les
+# fonctions de synchronisation n'exécutent jamais de DDL.
+#
+# Règles pour ajouter une migration :
+#   - ajouter une entrée à la fin de la liste du composant, avec la version suivante
+#   - ne jamais modifier une migration déjà livrée (elle ne serait pas rejouée)
+#   - instructions idempotentes de préférence (IF NOT EXISTS), pour les bases
+#     où l'objet aurait été créé à la main
+#   - une instruction peut être une fonction (cursor) quand la migration dépend
+#     des données (ex. partitions à créer selon les dates présentes)
+
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from app.services.partitions import convert_heures_to_partitioned
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    component VARCHAR(50) NOT NULL,
+    version INTEGER NOT NULL,
+    description VARCHAR(200),
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (component, version)
+)
+"""
+
+# Verrou consultatif : deux processus (interface web + tâche planifiée)
+# n'appliquent pas les mêmes migrations en même temps.
+_ADVISORY_LOCK_KEY = 7351842
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: Sequence[Union[str, Callable]]
+
+
+# ============================================================================
+# TABLES D'ORIGINE
+# ============================================================================
+
+BASELINE_TABLES: Dict[str, List[str]] = {
+    "core": [
+        """
+        CREATE TABLE IF NOT EXISTS sync_history (
+            id SERIAL PRIMARY KEY,
+            flow VARCHAR(100) NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP NOT NULL,
+            duration_ms DOUBLE PRECISION NOT NULL,
+            success BOOLEAN NOT NULL,
+            message TEXT,
+            rows_total INTEGER NOT NULL DEFAULT 0,
+            rows_failed INTEGER NOT NULL DEFAULT 0,
+            db_roundtrips INTEGER NOT NULL DEFAULT 0,
+            http_requests INTEGER NOT NULL DEFAULT 0,
+            details JSONB
+        )
+        """,
+    ],
+    "batigest": [
+        """
+        CREATE TABLE IF NOT EXISTS batigest_chantiers (
+            id SERIAL PRIMARY KEY,
+            code VARCHAR(50) UNIQUE,
+            date_debut DATE,
+            date_fin DATE,
+            nom_client VARCHAR(100),
+            description VARCHAR(200),
+            adr_chantier TEXT,
+            cp_chantier VARCHAR(10),
+            ville_chantier VARCHAR(45),
+            sync_date TIMESTAMP,
+            sync BOOLEAN DEFAULT FALSE,
+            total_mo REAL,
+            last_modified_batisimply TIMESTAMP WITH TIME ZONE,
+            last_modified_batigest TIMESTAMP WITH TIME ZONE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS batigest_heures (
+            id SERIAL PRIMARY KEY,
+            id_heure VARCHAR(50) UNIQUE,
+            date_debut TIMESTAMP NOT NULL,
+            date_fin TIMESTAMP NOT NULL,
+            id_utilisateur UUID NOT NULL,
+            id_projet INTEGER,
+            status_management VARCHAR(50),
+            total_heure NUMERIC(5,2),
+            panier BOOLEAN,
+            trajet BOOLEAN,
+            code_projet VARCHAR(100),
+            sync BOOLEAN DEFAULT FALSE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS batigest_devis (
+            code VARCHAR(50) PRIMARY KEY,
+            date DATE,
+            nom VARCHAR(100),
+            adr TEXT,
+            cp VARCHAR(10),
+            ville VARCHAR(100),
+            sujet TEXT,
+            dateconcretis DATE,
+            tempsmo REAL,
+            sync_date TIMESTAMP,
+            sync BOOLEAN DEFAULT FALSE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS batigest_heures_map (
+            id_heure VARCHAR PRIMARY KEY,
+            code_chantier VARCHAR NOT NULL,
+            code_salarie VARCHAR NOT NULL,
+            date_sqlserver TIMESTAMP NOT NULL
+        )
+        """,
+    ],
+    "codial": [
+        """
+        CREATE TABLE IF NOT EXISTS codial_chantiers (
+            id SERIAL PRIMARY KEY,
+            id_projet INTEGER UNIQUE,
+            code VARCHAR(50) UNIQUE,
+            nom VARCHAR(255),
+            date_debut DATE,
+            date_fin DATE,
+            description TEXT,
+            reference VARCHAR(100),
+            adresse_chantier VARCHAR(255),
+            cp_chantier VARCHAR(10),
+            ville_chantier VARCHAR(100),
+            code_pays_chantier VARCHAR(10),
+            coderep VARCHAR(50),
+            client_nom VARCHAR(255),
+            meca_prenom VARCHAR(100),
+            meca_nom VARCHAR(100),
+            statut VARCHAR(50),
+            sync BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS codial_heures (
+            id SERIAL PRIMARY KEY,
+            id_heure VARCHAR(255) UNIQUE,
+            id_projet INTEGER,
+            id_utilisateur VARCHAR(255),
+            code_chantier VARCHAR(50),
+            code_salarie VARCHAR(50),
+            date_heure DATE,
+            date_debut TIMESTAMP,
+            date_fin TIMESTAMP,
+            heures DECIMAL(5,2),
+            commentaire TEXT,
+            sync BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS codial_heures_map (
+            id_heure VARCHAR(255) PRIMARY KEY,
+            code_chantier VARCHAR(50) NOT NULL,
+            code_salarie VARCHAR(50) NOT NULL,
+            date_hfsql TIMESTAMP NOT NULL
+        )
+        """,
+    ],
+}
+
+
+# ============================================================================
+# MIGRATIONS
+# ============================================================================
+# Les requêtes de travail en attente filtrent sur "sync = FALSE" (ou "NOT sync",
+# équivalent pour le planificateur) : les index partiels ne contiennent que les
+# lignes en attente, ils restent petits quel que soit l'historique.
+
+MIGRATIONS: Dict[str, List[Migration]] = {
+    "core": [
+        Migration(1, "Index de l'historique par flux", [
+            """CREATE INDEX IF NOT EXISTS idx_sync_history_flow_started
+               ON sync_history (flow, started_at DESC)""",
+        ]),
+        # Extractions incrémentales (app/services/watermarks.py)
+        Migration(2, "Table des points de reprise des extractions", [
+            """CREATE TABLE IF NOT EXISTS sync_watermarks (
+                   source VARCHAR(100) PRIMARY KEY,
+                   value TIMESTAMP NOT NULL,
+                   updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+               )""",
+        ]),
+        # Requêtes conditionnelles sur les listes BatiSimply (app/services/httpcache.py)
+        Migration(3, "Cache des listes BatiSimply", [
+            """CREATE TABLE IF NOT EXISTS batisimply_http_cache (
+                   cache_key TEXT PRIMARY KEY,
+                   etag TEXT,
+                   last_modified TEXT,
+                   body JSONB NOT NULL,
+                   updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+               )""",
+        ]),
+    ],
+    "batigest": [
+        Migration(1, "Index des lignes en attente et des correspondances projet", [
+            # SELECT * FROM batigest_chantiers WHERE sync = FALSE (les deux sens)
+            """CREATE INDEX IF NOT EXISTS idx_batigest_chantiers_pending
+               ON batigest_chantiers (code) WHERE NOT sync""",
+            # SELECT * FROM batigest_devis WHERE sync = FALSE
+            """CREATE INDEX IF NOT EXISTS idx_batigest_devis_pending
+               ON batigest_devis (code) WHERE NOT sync""",
+            # SELECT * FROM batigest_heures WHERE sync = FALSE
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_pending
+               ON batigest_heures (id) WHERE NOT sync""",
+            # Heures validées à écrire dans SuiviMO (transfer_heures_postgres_to_sqlserver)
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_validated_pending
+               ON batigest_heures (id_heure)
+               WHERE status_management = 'VALIDATED' AND NOT sync AND code_projet IS NOT NULL""",
+            # Mises à jour du code projet par id_projet (update_code_projet_chantiers)
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_id_projet
+               ON batigest_heures (id_projet)""",
+            # Correspondance LPAD(id_projet, 8, '0') = code chantier (codes Batigest '00000001')
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_projet_lpad
+               ON batigest_heures ((LPAD(id_projet::text, 8, '0')))
+               WHERE id_projet IS NOT NULL""",
+        ]),
+        # Les heures SuiviMO -> BatiSimply étaient écrites dans batigest_heures avec des
+        # colonnes (code_chantier, code_salarie, date_heure...) qui n'y existent pas :
+        # elles ont leur propre table, clé naturelle de SuiviMO.
+        Migration(2, "Table batigest_suivimo (heures Batigest -> BatiSimply)", [
+            """CREATE TABLE IF NOT EXISTS batigest_suivimo (
+                   code_chantier VARCHAR(50) NOT NULL,
+                   code_salarie VARCHAR(50) NOT NULL,
+                   date_heure TIMESTAMP NOT NULL,
+                   heures NUMERIC(7,2),
+                   commentaire TEXT,
+                   sync BOOLEAN DEFAULT FALSE,
+                   PRIMARY KEY (code_chantier, code_salarie, date_heure)
+               )""",
+            """CREATE INDEX IF NOT EXISTS idx_batigest_suivimo_pending
+               ON batigest_suivimo (code_chantier) WHERE NOT sync""",
+        ]),
+        # Partitionnement mensuel (app/services/partitions.py) ; les index de la
+        # migration 1 disparaissent avec l'ancienne table et sont recréés sur la
+        # table partitionnée (propagés à chaque partition).
+        Migration(3, "Partitionnement mensuel de batigest_heures", [
+            convert_heures_to_partitioned("batigest"),
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_pending
+               ON batigest_heures (id) WHERE NOT sync""",
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_validated_pending
+               ON batigest_heures (id_heure)
+               WHERE status_management = 'VALIDATED' AND NOT sync AND code_projet IS NOT NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_id_projet
+               ON batigest_heures (id_projet)""",
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_projet_lpad
+               ON batigest_heures ((LPAD(id_projet::text, 8, '0')))
+               WHERE id_projet IS NOT NULL""",
+        ]),
+        # Correspondance heures -> chantiers (update_code_projet_chantiers) : les
+        # trois formes acceptées (code = id_projet, code numérique, code complété
+        # de zéros "00000001") reviennent à comparer id_projet à la valeur
+        # numérique du code, calculée une fois par chantier et indexée.
+        Migration(4, "Code chantier numérique pour la correspondance des heures", [
+            """ALTER TABLE batigest_chantiers ADD COLUMN IF NOT EXISTS code_numerique BIGINT
+               GENERATED ALWAYS AS (CASE WHEN code ~ '^[0-9]{1,18}$' THEN code::bigint END) STORED""",
+            """CREATE INDEX IF NOT EXISTS idx_batigest_chantiers_code_numerique
+               ON batigest_chantiers (code_numerique) WHERE code_numerique IS NOT NULL""",
+            # Heures sans code projet : seules lignes visées par la correspondance
+            """CREATE INDEX IF NOT EXISTS idx_batigest_heures_code_projet_manquant
+               ON batigest_heures (id_projet) WHERE code_projet IS NULL""",
+            # Plus utilisé par aucune requête
+            "DROP INDEX IF EXISTS idx_batigest_heures_projet_lpad",
+        ]),
+    ],
+    "codial": [
+        Migration(1, "Index des lignes en attente", [
+            """CREATE INDEX IF NOT EXISTS idx_codial_chantiers_pending
+               ON codial_chantiers (id) WHERE NOT sync""",
+            """CREATE INDEX IF NOT EXISTS idx_codial_heures_pending
+               ON codial_heures (id) WHERE NOT sync""",
+            """CREATE INDEX IF NOT EXISTS idx_codial_heures_id_projet
+               ON codial_heures (id_projet)""",
+            # Marquage des heures envoyées (hfsql_to_batisimply)
+            """CREATE INDEX IF NOT EXISTS idx_codial_heures_chantier_salarie_date
+               ON codial_heures (code_chantier, code_salarie, date_heure)""",
+        ]),
+        # Partitionnement mensuel ; la contrainte codial_heures_suivi_key couvre
+        # aussi la recherche (code_chantier, code_salarie, date_heure).
+        Migration(2, "Partitionnement mensuel de codial_heures", [
+            convert_heures_to_partitioned("codial"),
+            """CREATE INDEX IF NOT EXISTS idx_codial_heures_pending
+               ON codial_heures (id) WHERE NOT sync""",
+            """CREATE INDEX IF NOT EXISTS idx_codial_heures_id_projet
+               ON codial_heures (id_projet)""",
+        ]),
+        # Empreinte des colonnes lues dans Codial : un chantier inchangé n'est
+        # plus réécrit ni renvoyé vers BatiSimply.
+        Migration(3, "Empreinte des chantiers Codial", [
+            "ALTER TABLE codial_chantiers ADD COLUMN IF NOT EXISTS row_hash VARCHAR(32)",
+        ]),
+    ],
+}
+
+
+# ============================================================================
+# APPLICATION
+# ============================================================================
+
+def current_version(cursor, component: str) -> int:
+    """Dernière version appliquée pour un composant (0 si aucune)."""
+    cursor.execute(
+        "SELECT COALESCE(MAX(version), 0) FROM schema_version WHERE component = %s",
+        (component,),
+    )
+    return cursor.fetchone()[0]
+
+
+def apply_migrations(postgres_conn, component: str) -> List[Migration]:
+    """
+    Crée les tables d'origine d'un composant puis applique ses migrations en
+    attente, dans l'ordre des versions.
+
+    Tout est exécuté dans la transaction courante : l'appelant valide (commit)
+    ou annule l'ensemble, une migration n'est donc jamais enregistrée à moitié.
+
+    Args:
+        postgres_conn: Connexion PostgreSQL
+        component (str): "core", "batigest" ou "codial"
+
+    Returns:
+        List[Migration]: Migrations appliquées par cet appel
+    """
+    cursor = postgres_conn.cursor()
+    cursor.execute(SCHEMA_VERSION_DDL)
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_ADVISORY_LOCK_KEY,))
+
+    for statement in BASELINE_TABLES.get(component, []):
+        cursor.execute(statement)
+
+    version = current_version(cursor, component)
+    applied = []
+    for migration in sorted(MIGRATIONS.get(component, []), key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+        for statement in migration.statements:
+            if callable(statement):
+                statement(cursor)
+            else:
+                cursor.execute(statement)
+        cursor.execute(
+            "INSERT INTO schema_version (component, version, description) VALUES (%s, %s, %s)",
+            (component, migration.version, migration.description),
+        )
+        logger.info("[INFO] Migration %s %d appliquée : %s", component, migration.version, migration.description)
+        applied.append(migration)
+    cursor.close()
+    return applied
+
+
+def latest_version(component: str) -> int:
+    """Version attendue d'un composant (dernière migration déclarée)."""
+    return max((m.version for m in MIGRATIONS.get(component, [])), default=0)
+
+
+def pending_components(cursor, components: Iterable[str]) -> List[str]:
+    """Composants dont le schéma n'est pas à jour (une seule requête)."""
+    components = list(components)
+    cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return components
+    cursor.execute(
+        "SELECT component, MAX(version) FROM schema_version WHERE component = ANY(%s) GROUP BY component",
+        (components,),
+    )
+    versions = dict(cursor.fetchall())
+    return [c for c in components if versions.get(c, 0) < latest_version(c)]
+
+
+def components_for(creds: dict) -> List[str]:
+    """Composants utilisés par la configuration (logiciel choisi)."""
+    software = (creds.get("software") or "batigest").strip().lower()
+    return ["core", "codial" if software == "codial" else "batigest"]
+
+
+# ============================================================================
+# VÉRIFICATION AU DÉMARRAGE
+# ============================================================================
+
+_checked_components = set()
+_check_lock = threading.Lock()
+
+
+def ensure_schema(components: Optional[Sequence[str]] = None) -> Tuple[bool, str]:
+    """
+    Met le schéma à jour si nécessaire, une seule fois par processus.
+
+    Appelée au démarrage de l'application et de la ligne de commande : quand
+    tout est à jour, le coût se limite à une connexion et une requête.
+
+    Args:
+        components: Composants à vérifier (par défaut : ceux du logiciel configuré)
+
+    Returns:
+        Tuple[bool, str]: (succès, message)
+    """
+    from app.services.connex import connect_to_postgres, load_credentials
+
+    creds = load_credentials() or {}
+    pg = creds.get("postgres")
+    if not pg:
+        return False, "[ATTENTION] Configuration PostgreSQL manquante, schéma non vérifié"
+    components = list(components or components_for(creds))
+
+    with _check_lock:
+        to_check = [c for c in components if c not in _checked_components]
+        if not to_check:
+            return True, "[OK] Schéma PostgreSQL déjà vérifié"
+
+        postgres_conn = connect_to_postgres(
+            pg["host"], pg["user"], pg["password"], pg["database"], pg.get("port", "5432")
+        )
+        if not postgres_conn:
+            return False, "[ERREUR] Connexion PostgreSQL échouée, schéma non vérifié"
+        try:
+            cursor = postgres_conn.cursor()
+            pending = pending_components(cursor, to_check)
+            cursor.close()
+            applied = []
+            for component in pending:
+                applied.extend(apply_migrations(postgres_conn, component))
+            postgres_conn.commit()
+        except Exception as e:
+            postgres_conn.rollback()
+            return False, f"[ERREUR] Mise à jour du schéma PostgreSQL impossible : {str(e)}"
+        finally:
+            postgres_conn.close()
+
+        _checked_components.update(to_check)
+
+    if applied:
+        return True, f"[OK] Schéma PostgreSQL mis à jour ({len(applied)} migration(s))"
+    return True, "[OK] Schéma PostgreSQL à jour"
@@ -0,0 +1,227 @@
+# app/services/pagination.py
+# Listes paginées de l'API BatiSimply
+# -----------------------------------
+# fetch_all() lit toutes les pages d'une liste BatiSimply et rend les éléments
+# un à un (jsonstream.iter_items). Formats reconnus :
+#   - page Spring : {"content": [...], "number", "totalPages", "totalElements", "last"}
+#     (ou métadonnées regroupées dans "page")
+#   - enveloppe {"elements": [...]} (ou data / items), avec les mêmes métadonnées
+#   - liste à la racine : une seule page
+# Les pages sont demandées avec ?page=N&size=M. Dès que le nombre de pages est
+# connu, la page suivante est demandée pendant le traitement de la page en cours.
+#
+# Un échec sur une page suivante lève BatiSimplyPageError : la synchronisation
+# échoue au lieu de ne charger qu'une partie de la liste.
+#
+# Avec un cache (app/services/httpcache.py), chaque page est demandée avec
+# If-None-Match / If-Modified-Since : une page 304 est relue dans le cache, une
+# page 200 y est enregistrée (ses éléments sont alors gardés en mémoire le temps
+# de la page). not_modified indique que toutes les pages ont répondu 304 :
+# l'appelant peut ne pas recharger la liste.
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Sequence
+from urllib.parse import urlencode
+
+from app.services.connex import batisimply_request, load_credentials
+from app.services.jsonstream import LIST_WRAPPERS, iter_items
+
+DEFAULT_PAGE_SIZE = 500
+# Garde-fou contre une API qui ignorerait le paramètre page
+MAX_PAGES = 10000
+
+
+class BatiSimplyPageError(Exception):
+    """Page suivante d'une liste BatiSimply en erreur."""
+
+
+def page_size(creds: Optional[dict] = None) -> int:
+    """Taille des pages demandées (batisimply.page_size dans credentials.json)."""
+    if creds is None:
+        creds = load_credentials() or {}
+    try:
+        size = int(((creds or {}).get("batisimply") or {}).get("page_size", DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, size)
+
+
+def _page_info(meta: dict) -> dict:
+    # Spring HATEOAS regroupe les métadonnées dans "page"
+    info = dict(meta.get("page")) if isinstance(meta.get("page"), dict) else {}
+    info.update((k, v) for k, v in meta.items() if k != "page")
+    return info
+
+
+def _has_next(info: dict, index: int, count: int, seen: int) -> bool:
+    """Page suivante attendue d'après les métadonnées de la page index (0 pour la première)."""
+    if count == 0:
+        return False
+    if isinstance(info.get("last"), bool):
+        return not info["last"]
+    if isinstance(info.get("totalPages"), int):
+        return index + 1 < info["totalPages"]
+    if isinstance(info.get("totalElements"), int):
+        return seen < info["totalElements"]
+    return False
+
+
+class PagedList:
+    """
+    Liste BatiSimply paginée. La première page est demandée à la création :
+    status_code et text permettent à l'appelant de traiter l'erreur comme
+    pour une requête simple ; l'itération rend les éléments de toutes les pages.
+    Une première page 304 servie par le cache compte comme un 200.
+    """
+
+    def __init__(self, url: str, headers: dict, params: Optional[dict] = None, size: Optional[int] = None,
+                 wrappers: Sequence[str] = LIST_WRAPPERS, timeout: float = 30, cache=None):
+        self.url = url
+        self.headers = headers
+        self.params = dict(params or {})
+        self.size = size or page_size()
+        self.wrappers = wrappers
+        self.timeout = timeout
+        self.cache = cache
+        self.pages = 0
+        self.not_modified = False
+        # Réponses déjà reçues (revalidation des pages suivantes), par numéro de page
+        self._responses = {}
+        if cache is not None:
+            # Chargé ici (thread appelant) : les requêtes de préchargement ne touchent pas la base
+            cache.load(f"{url}?")
+        self.response = self._fetch(0)
+        self.status_code = self.response.status_code
+        if self.status_code == 304 and self._cached(0) is not None:
+            self.status_code = 200
+            self.not_modified = self._revalidate()
+
+    @property
+    def text(self) -> str:
+        return self.response.text
+
+    def _key(self, page: int) -> str:
+        params = dict(self.params, page=page, size=self.size)
+        return f"{self.url}?{urlencode(sorted(params.items()))}"
+
+    def _cached(self, page: int):
+        return self.cache.get(self._key(page)) if self.cache is not None else None
+
+    def _fetch(self, page: int):
+        params = dict(self.params, page=page, size=self.size)
+        headers = self.headers
+        if self.cache is not None:
+            headers = dict(headers, **self.cache.conditional_headers(self._key(page)))
+        return batisimply_request("GET", self.url, headers=headers, params=params,
+                                  timeout=self.timeout, stream=True)
+
+    def _revalidate(self) -> bool:
+        """
+        Première page inchangée : revalide les pages suivantes connues du cache,
+        jusqu'à la première modifiée. Retourne True si toute la liste est inchangée.
+        """
+        entry = self._cached(0)
+        info = _page_info(entry.meta)
+        first_number = info["number"] if isinstance(info.get("number"), int) else 0
+        count = seen = len(entry.items)
+        index = 0
+        while _has_next(info, index, count, seen):
+            index += 1
+            if index >= MAX_PAGES:
+                return False
+            response = self._fetch(first_number + index)
+            self._responses[first_number + index] = response
+            entry = self._cached(first_number + index)
+            if response.status_code != 304 or entry is None:
+                return False
+            info = _page_info(entry.meta)
+            count = len(entry.items)
+            seen += count
+        return True
+
+    def _page_items(self, response, number: int, meta: dict) -> Iterator:
+        """Éléments d'une page : lus dans le cache (304) ou dans la réponse (enregistrée si cache)."""
+        if response.status_code == 304:
+            response.close()
+            entry = self._cached(number)
+            if entry is None:
+                raise BatiSimplyPageError(f"Page {number} de {self.url} inchangée mais absente du cache")
+            meta.update(entry.meta)
+            yield from entry.items
+            return
+        if self.cache is None:
+            yield from iter_items(response, self.wrappers, meta=meta)
+            return
+        items = []
+        for item in iter_items(response, self.wrappers, meta=meta):
+            items.append(item)
+            yield item
+        self.cache.store(self._key(number), response, items, meta)
+
+    def _prefetch(self, executor: ThreadPoolExecutor, page: int):
+        # Les métriques HTTP sont rattachées à la synchronisation en cours (variable de contexte)
+        return executor.submit(contextvars.copy_context().run, self._fetch, page)
+
+    def __iter__(self) -> Iterator:
+        response = self.response
+        first_number = None
+        total_pages = None
+        seen = 0
+        number = 0
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="batisimply-page") as executor:
+            upcoming = None
+            for index in range(MAX_PAGES):
+                if index > 0 and response.status_code not in (200, 304):
+                    raise BatiSimplyPageError(
+                        f"Erreur API BatiSimply sur la page {index + 1} de {self.url} : {response.status_code}"
+                    )
+                # Nombre de pages connu : la suivante est demandée pendant la lecture de celle-ci
+                if (total_pages is not None and index + 1 < total_pages
+                        and first_number + index + 1 not in self._responses):
+                    upcoming = self._prefetch(executor, first_number + index + 1)
+                meta = {}
+                count = 0
+                for item in self._page_items(response, number, meta):
+                    count += 1
+                    yield item
+                seen += count
+                self.pages = index + 1
+
+                info = _page_info(meta)
+                if first_number is None:
+                    # Pages numérotées à partir de 0 (Spring) ou de 1
+                    first_number = info["number"] if isinstance(info.get("number"), int) else 0
+                if isinstance(info.get("totalPages"), int):
+                    total_pages = info["totalPages"]
+                if not _has_next(info, index, count, seen):
+                    if upcoming is not None:
+                        upcoming.result().close()
+                    for pending in self._responses.values():
+                        pending.close()
+                    return
+                number = first_number + index + 1
+                if number in self._responses:
+                    response = self._responses.pop(number)
+                else:
+                    response = upcoming.result() if upcoming is not None else self._fetch(number)
+                upcoming = None
+
+
+def fetch_all(url: str, headers: dict, params: Optional[dict] = None, size: Optional[int] = None,
+              wrappers: Sequence[str] = LIST_WRAPPERS, timeout: float = 30, cache=None) -> PagedList:
+    """
+    Demande la première page d'une liste BatiSimply.
+
+    Args:
+        url (str): Adresse de la liste (ex. {api_url}/api/project)
+        headers (dict): En-têtes (jeton)
+        params (dict): Paramètres de la requête, hors pagination
+        size (int): Éléments par page (batisimply.page_size par défaut)
+        wrappers: Clés d'enveloppe possibles de la liste
+        cache (HttpCache): Requêtes conditionnelles et pages mémorisées (optionnel)
+
+    Returns:
+        PagedList: status_code de la première page ; itérer rend tous les éléments
+    """
+    return PagedList(url, headers, params=params, size=size, wrappers=wrappers, timeout=timeout, cache=cache)
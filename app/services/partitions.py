@@ -0,0 +1,332 @@
+# app/services/partitions.py
+# Partitionnement mensuel des tables d'heures (batigest_heures, codial_heures)
+# ---------------------------------------------------------------------------
+# Les heures sont partitionnées par mois sur date_debut :
+#   - <table>_pAAAAMM : une partition par mois
+#   - <table>_default : lignes hors des mois créés (dates anciennes, date_debut NULL)
+#
+# Les imports ne touchent ainsi que les partitions récentes, et l'historique
+# ne pèse plus sur le VACUUM ni sur la maintenance des index. La maintenance
+# (maintain_heures_partitions) est appelée avant chaque import d'heures :
+#   - crée les partitions de la fenêtre d'import et des mois à venir
+#     (les lignes déjà tombées dans la partition par défaut y sont déplacées)
+#   - retire les partitions plus anciennes que la rétention configurée
+#
+# Rétention (credentials.json) :
+#   "heures_retention_months": 24          nombre de mois conservés dans la table
+#   "heures_retention_mode": "detach"      "detach" : la partition devient une table
+#                                          d'archive autonome (même nom) ; "drop" : supprimée
+# La rétention ne descend jamais sous la fenêtre d'import (heures_window_days).
+
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEURES_TABLES = {
+    "batigest": "batigest_heures",
+    "codial": "codial_heures",
+}
+
+DEFAULT_RETENTION_MONTHS = 24
+RETENTION_MODES = ("detach", "drop")
+# Partitions créées à l'avance (mois à venir)
+MONTHS_AHEAD = 2
+
+
+# ============================================================================
+# CALCUL DES MOIS
+# ============================================================================
+
+def month_start(value) -> date:
+    """Premier jour du mois d'une date ou d'un datetime."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    """Ajoute (ou retire) des mois à un premier jour de mois."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(base: str, month: date) -> str:
+    return f"{base}_p{month.year:04d}{month.month:02d}"
+
+
+def window_months(window_days: int) -> int:
+    """Nombre de mois couverts par la fenêtre d'import (mois courant inclus)."""
+    return (max(0, window_days) + 30) // 31 + 1
+
+
+def retention_settings(creds: dict) -> Tuple[int, str]:
+    """
+    Rétention configurée : (nombre de mois conservés, mode).
+    Jamais inférieure à la fenêtre d'import, pour ne pas retirer des heures
+    encore mises à jour par les synchronisations.
+    """
+    months = DEFAULT_RETENTION_MONTHS
+    try:
+        months = int(creds.get("heures_retention_months", months))
+    except (TypeError, ValueError):
+        pass
+    window_days = 180
+    try:
+        window_days = int(creds.get("heures_window_days", window_days))
+    except (TypeError, ValueError):
+        pass
+    months = max(months, window_months(window_days) + 1)
+
+    mode = str(creds.get("heures_retention_mode") or "detach").strip().lower()
+    if mode not in RETENTION_MODES:
+        logger.warning("[ATTENTION] heures_retention_mode '%s' inconnu, 'detach' utilisé", mode)
+        mode = "detach"
+    return months, mode
+
+
+# ============================================================================
+# PARTITIONS
+# ============================================================================
+
+def list_partitions(cursor, table: str) -> Dict[date, str]:
+    """Partitions mensuelles attachées à une table : {premier jour du mois: nom}."""
+    cursor.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (table,),
+    )
+    pattern = re.compile(r"_p(\d{4})(\d{2})$")
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = pattern.search(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_month_partition(cursor, table: str, month: date, base: Optional[str] = None) -> str:
+    """
+    Crée la partition d'un mois. Les lignes de ce mois déjà présentes dans la
+    partition par défaut y sont déplacées avant l'attachement (sinon
+    PostgreSQL refuse de créer la partition).
+
+    Args:
+        cursor: Curseur PostgreSQL
+        table (str): Table partitionnée
+        month (date): Premier jour du mois
+        base (str): Préfixe des noms de partition (par défaut : table)
+
+    Returns:
+        str: Nom de la partition
+    """
+    base = base or table
+    name = partition_name(base, month)
+    lower, upper = month, add_months(month, 1)
+    cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {base}_default
+            WHERE date_debut >= %s AND date_debut < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        (lower, upper),
+    )
+    # Bornes en littéraux simples (PostgreSQL < 12 n'accepte pas d'expression)
+    cursor.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    )
+    return name
+
+
+def ensure_partitions(cursor, table: str, first_month: date, last_month: date,
+                      base: Optional[str] = None) -> List[str]:
+    """Crée les partitions manquantes entre deux mois (inclus)."""
+    existing = list_partitions(cursor, table)
+    created = []
+    month = first_month
+    while month <= last_month:
+        if month not in existing:
+            created.append(create_month_partition(cursor, table, month, base))
+        month = add_months(month, 1)
+    return created
+
+
+def apply_retention(cursor, table: str, months: int, mode: str, today: Optional[date] = None) -> List[str]:
+    """Détache (ou supprime) les partitions entièrement antérieures à la rétention."""
+    cutoff = add_months(month_start(today or date.today()), -(months - 1))
+    retired = []
+    for month, name in sorted(list_partitions(cursor, table).items()):
+        if month >= cutoff:
+            continue
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+        if mode == "drop":
+            cursor.execute(f"DROP TABLE {name}")
+        retired.append(name)
+    return retired
+
+
+def maintain_heures_partitions(postgres_conn, component: str, creds: dict) -> Tuple[List[str], List[str]]:
+    """
+    Maintenance des partitions d'heures avant un import : partitions de la
+    fenêtre d'import et des mois à venir, puis rétention. Sans partition
+    manquante ni expirée, seules deux requêtes de catalogue sont exécutées.
+
+    Args:
+        postgres_conn: Connexion PostgreSQL (validée par cette fonction)
+        component (str): "batigest" ou "codial"
+        creds (dict): Configuration (fenêtre d'import, rétention)
+
+    Returns:
+        Tuple[List[str], List[str]]: (partitions créées, partitions retirées)
+    """
+    table = HEURES_TABLES[component]
+    months, mode = retention_settings(creds)
+    window_days = 180
+    try:
+        window_days = int(creds.get("heures_window_days", window_days))
+    except (TypeError, ValueError):
+        pass
+
+    today = date.today()
+    current = month_start(today)
+    first = month_start(today - timedelta(days=window_days))
+
+    cursor = postgres_conn.cursor()
+    created = ensure_partitions(cursor, table, first, add_months(current, MONTHS_AHEAD))
+    retired = apply_retention(cursor, table, months, mode, today)
+    postgres_conn.commit()
+    cursor.close()
+
+    if created:
+        logger.info("[INFO] Partition(s) créée(s) pour %s : %s", table, ", ".join(created))
+    if retired:
+        action = "supprimée(s)" if mode == "drop" else "archivée(s) (détachée(s))"
+        logger.info("[INFO] Partition(s) %s pour %s : %s", action, table, ", ".join(retired))
+    return created, retired
+
+
+# ============================================================================
+# CONVERSION (MIGRATIONS)
+# ============================================================================
+# Colonnes copiées depuis la table non partitionnée : expressions SELECT par
+# colonne. Pour Codial, les heures HFSQL n'ont qu'une date (date_heure) :
+# date_debut en est déduite pour qu'elles tombent dans leur partition. Les
+# lignes restées sans date_debut (clé de partition, non nulle) sont mises de
+# côté dans la table non partitionnée <table>_sans_date au lieu de faire
+# échouer la migration.
+
+_HEURES_COLUMNS = {
+    "batigest": [
+        ("id", "id"), ("id_heure", "id_heure"), ("date_debut", "date_debut"), ("date_fin", "date_fin"),
+        ("id_utilisateur", "id_utilisateur"), ("id_projet", "id_projet"),
+        ("status_management", "status_management"), ("total_heure", "total_heure"),
+        ("panier", "panier"), ("trajet", "trajet"), ("code_projet", "code_projet"), ("sync", "sync"),
+    ],
+    "codial": [
+        ("id", "id"), ("id_heure", "id_heure"), ("id_projet", "id_projet"),
+        ("id_utilisateur", "id_utilisateur"), ("code_chantier", "code_chantier"),
+        ("code_salarie", "code_salarie"), ("date_heure", "date_heure"),
+        ("date_debut", "COALESCE(date_debut, date_heure::timestamp)"), ("date_fin", "date_fin"),
+        ("heures", "heures"), ("commentaire", "commentaire"), ("sync", "sync"),
+        ("created_at", "created_at"), ("updated_at", "updated_at"),
+    ],
+}
+
+_PARTITIONED_DDL = {
+    "batigest": """
+        CREATE TABLE batigest_heures_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('batigest_heures_id_seq'),
+            id_heure VARCHAR(50),
+            date_debut TIMESTAMP NOT NULL,
+            date_fin TIMESTAMP NOT NULL,
+            id_utilisateur UUID NOT NULL,
+            id_projet INTEGER,
+            status_management VARCHAR(50),
+            total_heure NUMERIC(5,2),
+            panier BOOLEAN,
+            trajet BOOLEAN,
+            code_projet VARCHAR(100),
+            sync BOOLEAN DEFAULT FALSE,
+            CONSTRAINT batigest_heures_pk PRIMARY KEY (id, date_debut),
+            CONSTRAINT batigest_heures_id_heure_date_key UNIQUE (id_heure, date_debut)
+        ) PARTITION BY RANGE (date_debut)
+    """,
+    "codial": """
+        CREATE TABLE codial_heures_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('codial_heures_id_seq'),
+            id_heure VARCHAR(255),
+            id_projet INTEGER,
+            id_utilisateur VARCHAR(255),
+            code_chantier VARCHAR(50),
+            code_salarie VARCHAR(50),
+            date_heure DATE,
+            date_debut TIMESTAMP,
+            date_fin TIMESTAMP,
+            heures DECIMAL(5,2),
+            commentaire TEXT,
+            sync BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT NOW(),
+            updated_at TIMESTAMP DEFAULT NOW(),
+            CONSTRAINT codial_heures_pk PRIMARY KEY (id, date_debut),
+            CONSTRAINT codial_heures_id_heure_date_key UNIQUE (id_heure, date_debut),
+            CONSTRAINT codial_heures_suivi_key UNIQUE (code_chantier, code_salarie, date_heure, date_debut)
+        ) PARTITION BY RANGE (date_debut)
+    """,
+}
+
+
+def convert_heures_to_partitioned(component: str):
+    """
+    Migration : remplace la table d'heures d'un composant par une table
+    partitionnée par mois, en conservant les lignes, les identifiants et la
+    séquence. Retourne la fonction (cursor) exécutée par le moteur de migrations.
+
+    Les contraintes d'unicité d'une table partitionnée doivent contenir la clé
+    de partition : id_heure devient unique avec date_debut (les imports
+    déplacent d'abord les heures dont la date a changé, voir les transferts).
+    """
+    table = HEURES_TABLES[component]
+    staging = f"{table}_partitioned"
+    columns = _HEURES_COLUMNS[component]
+
+    def migrate(cursor):
+        cursor.execute(_PARTITIONED_DDL[component])
+        # Partition par défaut nommée d'après la table finale
+        cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {staging} DEFAULT")
+
+        date_debut = dict(columns)["date_debut"]
+        cursor.execute(
+            f"SELECT MIN({date_debut}) FROM {table}"
+        )
+        oldest = cursor.fetchone()[0]
+        current = month_start(datetime.now())
+        first = month_start(oldest) if oldest else current
+        ensure_partitions(cursor, staging, min(first, current), add_months(current, MONTHS_AHEAD), base=table)
+
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE ({date_debut}) IS NULL")
+        undated = cursor.fetchone()[0]
+        if undated:
+            cursor.execute(f"CREATE TABLE {table}_sans_date AS SELECT * FROM {table} WHERE ({date_debut}) IS NULL")
+            logger.warning("[ATTENTION] %s heure(s) sans date de début mises de côté dans %s_sans_date", undated, table)
+
+        cursor.execute(
+            f"INSERT INTO {staging} ({', '.join(c for c, _ in columns)}) "
+            f"SELECT {', '.join(expr for _, expr in columns)} FROM {table} "
+            f"WHERE ({date_debut}) IS NOT NULL"
+        )
+        # La séquence appartient à l'ancienne colonne id : la détacher avant la suppression
+        cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+        cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+    return migrate
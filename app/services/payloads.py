@@ -0,0 +1,97 @@
+# app/services/payloads.py
+# Corps des requêtes envoyées à BatiSimply
+# ----------------------------------------
+# Les parties constantes d'un projet (siège, budget, couleur, responsable,
+# coordonnées par défaut) sont lues une fois par exécution dans la section
+# "batisimply" de credentials.json ; la boucle d'envoi ne renseigne que les
+# champs propres à chaque chantier.
+#
+# dumps() sérialise avec orjson s'il est installé (nettement plus rapide que
+# json pour ces petits objets), sinon avec json.
+
+import json
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle
+    orjson = None
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+DEFAULT_HEAD_QUARTER_ID = 33
+DEFAULT_PROJECT_BUDGET = 500000.0
+DEFAULT_PROJECT_CURRENCY = "EUR"
+DEFAULT_PROJECT_COLOR = "#9b1ff1"
+DEFAULT_PROJECT_MANAGER = "DEFINIR"
+# Coordonnées attribuées aux chantiers (BatiSimply les exige, Batigest ne les fournit pas)
+DEFAULT_GEO_POINT = {"xLon": 3.8777, "yLat": 43.6119}
+
+
+def dumps(data) -> bytes:
+    """Sérialise en JSON (UTF-8), avec orjson si disponible."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def format_address(*parts) -> str:
+    """Adresse sur une ligne ("rue, code postal, ville, France"), sans segment vide."""
+    segments = []
+    for part in parts:
+        if part:
+            segments.extend(segment.strip() for segment in str(part).split(","))
+    return ", ".join(segment for segment in segments if segment)
+
+
+def _date(value) -> Optional[str]:
+    return value.strftime("%Y-%m-%d") if value else None
+
+
+class ProjectPayloadBuilder:
+    """Corps JSON de création d'un projet BatiSimply (POST /api/project)."""
+
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings or {}
+        self.country = settings.get("project_country", "France")
+        self.country_code = settings.get("project_country_code", "FR")
+        # Objets constants partagés par tous les corps (jamais modifiés)
+        self._geo_point = dict(settings.get("project_geo_point") or DEFAULT_GEO_POINT)
+        self._budget = {
+            "amount": float(settings.get("project_budget", DEFAULT_PROJECT_BUDGET)),
+            "currency": settings.get("project_currency", DEFAULT_PROJECT_CURRENCY),
+        }
+        self._head_quarter = {"id": int(settings.get("head_quarter_id", DEFAULT_HEAD_QUARTER_ID))}
+        self._color = settings.get("project_color", DEFAULT_PROJECT_COLOR)
+        self._manager = settings.get("project_manager", DEFAULT_PROJECT_MANAGER)
+
+    @classmethod
+    def from_credentials(cls, creds: Optional[dict]) -> "ProjectPayloadBuilder":
+        return cls((creds or {}).get("batisimply") or {})
+
+    def build(self, code, nom_client, description, street, postal_code, city,
+              date_debut, date_fin, hours_sold) -> bytes:
+        label = nom_client or f"Chantier {code}"
+        return dumps({
+            "address": {
+                "city": city or "",
+                "countryCode": self.country_code,
+                "geoPoint": self._geo_point,
+                "googleFormattedAddress": format_address(street, postal_code, city, self.country),
+                "postalCode": postal_code or "",
+                "street": street or "",
+            },
+            "budget": self._budget,
+            "endEstimated": _date(date_fin),
+            "headQuarter": self._head_quarter,
+            "hoursSold": float(hours_sold) if hours_sold is not None else 0,
+            "projectCode": code,
+            "comment": description or f"Chantier {code}",
+            "projectName": label,
+            "customerName": label,
+            "projectManager": self._manager,
+            "startEstimated": _date(date_debut),
+            "isArchived": False,
+            "isFinished": False,
+            "projectColor": self._color,
+        })
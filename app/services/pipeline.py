@@ -0,0 +1,170 @@
+# app/services/pipeline.py
+# Exécution des étapes d'une synchronisation complète
+# ---------------------------------------------------
+# Une synchronisation (sync_*) est décrite comme un graphe d'étapes (Step) :
+#   - requires : étapes qui doivent avoir réussi (sinon l'étape est ignorée)
+#   - after    : étapes qui doivent être terminées, quel que soit leur résultat
+#   - required : False pour une étape dont l'échec n'invalide pas la synchronisation
+# run_steps() lance en même temps les étapes dont les prédécesseurs sont
+# terminés, dans la limite de "sync_workers" (credentials.json, 3 par défaut ;
+# 1 : exécution séquentielle dans l'ordre de déclaration, comme avant).
+#
+# Chaque étape ouvre ses propres connexions : les transferts n'ont pas d'état
+# partagé (sauf dans sync_all, qui partage ses connexions et exécute donc ses
+# étapes l'une après l'autre, voir app/services/sync_session.py). Les threads
+# reçoivent une copie du contexte de l'appelant, les exécutions imbriquées
+# restent donc rattachées à la synchronisation dans les métriques
+# (app/services/metrics.py). Le rapport (format_report) donne le début et la
+# durée de chaque étape.
+
+import contextvars
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.utils.logger import level_for_message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_WORKERS = 3
+
+STATUS_OK = "ok"
+STATUS_FAILED = "échec"
+STATUS_SKIPPED = "ignorée"
+
+
+class Step(NamedTuple):
+    name: str
+    func: Callable[[], Tuple[bool, str]]
+    requires: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()
+    # Message journalisé au démarrage de l'étape ("[SYNC] Synchronisation des chantiers...")
+    label: Optional[str] = None
+    required: bool = True
+
+
+class StepResult(NamedTuple):
+    name: str
+    status: str
+    message: str
+    started_s: float
+    duration_s: float
+
+    @property
+    def success(self) -> bool:
+        return self.status == STATUS_OK
+
+
+def sync_workers(creds: dict) -> int:
+    """Nombre d'étapes exécutées en même temps (sync_workers dans credentials.json)."""
+    try:
+        workers = int((creds or {}).get("sync_workers", DEFAULT_SYNC_WORKERS))
+    except (TypeError, ValueError):
+        workers = DEFAULT_SYNC_WORKERS
+    return max(1, workers)
+
+
+def _check_graph(steps: Sequence[Step]) -> None:
+    """Noms uniques, prédécesseurs déclarés avant l'étape (donc pas de cycle)."""
+    declared = set()
+    for step in steps:
+        if step.name in declared:
+            raise ValueError(f"Étape en double : {step.name}")
+        unknown = [name for name in step.requires + step.after if name not in declared]
+        if unknown:
+            raise ValueError(f"Étape {step.name} : prédécesseur(s) inconnu(s) ou déclaré(s) après : {', '.join(unknown)}")
+        declared.add(step.name)
+
+
+def _run_step(step: Step, origin: float) -> StepResult:
+    if step.label:
+        logger.info(step.label)
+    started = time.perf_counter()
+    try:
+        success, message = step.func()
+    except Exception as e:
+        success, message = False, f"[ERREUR] Étape {step.name} : {e}"
+    finished = time.perf_counter()
+    logger.log(level_for_message(message), message)
+    return StepResult(step.name, STATUS_OK if success else STATUS_FAILED, message,
+                      started - origin, finished - started)
+
+
+def _blocked_by(step: Step, results: Dict[str, StepResult]) -> Optional[str]:
+    for name in step.requires:
+        if not results[name].success:
+            return name
+    return None
+
+
+def run_steps(steps: Sequence[Step], max_workers: int = DEFAULT_SYNC_WORKERS) -> List[StepResult]:
+    """
+    Exécute un graphe d'étapes et retourne leurs résultats, dans l'ordre de déclaration.
+
+    Args:
+        steps: Étapes, chacune déclarée après ses prédécesseurs
+        max_workers (int): Nombre maximal d'étapes simultanées
+
+    Raises:
+        ValueError: Graphe invalide (nom en double, prédécesseur inconnu)
+    """
+    _check_graph(steps)
+    origin = time.perf_counter()
+    results: Dict[str, StepResult] = {}
+
+    def skip(step: Step, blocker: str) -> None:
+        message = f"[ATTENTION] Étape {step.name} ignorée : {blocker} en échec"
+        logger.log(level_for_message(message), message)
+        results[step.name] = StepResult(step.name, STATUS_SKIPPED, message, time.perf_counter() - origin, 0.0)
+
+    if max_workers <= 1:
+        for step in steps:
+            blocker = _blocked_by(step, results)
+            if blocker:
+                skip(step, blocker)
+            else:
+                results[step.name] = _run_step(step, origin)
+        return [results[step.name] for step in steps]
+
+    pending = list(steps)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync-step") as executor:
+        while pending or running:
+            for step in list(pending):
+                if not all(name in results for name in step.requires + step.after):
+                    continue
+                pending.remove(step)
+                blocker = _blocked_by(step, results)
+                if blocker:
+                    skip(step, blocker)
+                    continue
+                # Copie du contexte : métriques de l'étape rattachées à la synchronisation
+                future = executor.submit(contextvars.copy_context().run, _run_step, step, origin)
+                running[future] = step
+            if not running:
+                # Étapes ignorées : leurs successeurs sont peut-être prêts
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                results[step.name] = future.result()
+    return [results[step.name] for step in steps]
+
+
+def all_succeeded(steps: Sequence[Step], results: Sequence[StepResult]) -> bool:
+    """Résultat global : toutes les étapes obligatoires (required) ont réussi."""
+    required = {step.name for step in steps if step.required}
+    return all(r.success for r in results if r.name in required)
+
+
+def format_report(results: Sequence[StepResult], total_s: Optional[float] = None) -> str:
+    """Début, durée et statut de chaque étape (journal de fin de synchronisation)."""
+    width = max((len(r.name) for r in results), default=0)
+    lines = ["[INFO] Étapes de la synchronisation (début / durée) :"]
+    for r in results:
+        lines.append(f"  {r.name.ljust(width)}  +{r.started_s:7.2f} s  {r.duration_s:7.2f} s  {r.status}")
+    if total_s is not None:
+        busy = sum(r.duration_s for r in results)
+        lines.append(f"  {'total'.ljust(width)}  {total_s:17.2f} s  (somme des étapes : {busy:.2f} s)")
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+# app/services/push.py
+# Envoi concurrent vers BatiSimply
+# --------------------------------
+# push_concurrently() envoie une suite de (clé, données) avec un nombre borné
+# de threads : les éléments sont consommés au fil de l'eau (au plus deux fois
+# plus d'envois en cours que de threads), les résultats rendus dès qu'ils
+# arrivent. Chaque envoi passe par le limiteur de débit et le disjoncteur
+# partagés par tous les appels BatiSimply (ratelimit.call_with_limits). Les
+# envois sont des créations (POST) : seuls les 429 et les connexions
+# impossibles sont réessayés ; une erreur 5xx ou un délai de lecture dépassé
+# laisse l'élément en échec (renvoyé à la prochaine synchronisation) plutôt
+# que de risquer un doublon dans BatiSimply.
+#
+# Les métriques (metrics.record_http) reposent sur une variable de contexte
+# non transmise aux threads : les réponses sont donc rendues à l'appelant,
+# qui les enregistre depuis le thread de la synchronisation.
+#
+# Dans sync_all, les sessions des threads d'envoi utilisent le pool de
+# connexions HTTP de la synchronisation (app/services/sync_session.py).
+#
+# Si le disjoncteur s'ouvre (CircuitOpenError), les envois pas encore
+# commencés sont annulés, ceux en cours sont attendus et tous les résultats
+# obtenus sont rendus avant l'exception : l'appelant peut marquer les éléments
+# acceptés par BatiSimply avant d'abandonner.
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import requests
+
+from app.services.connex import batisimply_limits
+from app.services.sync_session import current_session
+from app.services.ratelimit import DEFAULT_MAX_ATTEMPTS, AdaptiveRateLimiter, CircuitBreaker, call_with_limits
+
+DEFAULT_PUSH_WORKERS = 8
+# Lignes en attente lues (et marquées synchronisées) par lot
+PUSH_BATCH_SIZE = 500
+ACCEPTED_STATUS = (200, 201, 204)
+
+
+class PushOutcome(NamedTuple):
+    key: object
+    ok: bool
+    status: Optional[int]
+    responses: List[requests.Response]
+    error: Optional[str]
+
+
+def push_workers(creds: dict) -> int:
+    """Nombre de threads d'envoi configuré dans credentials.json (batisimply.push_workers)."""
+    batisimply = (creds or {}).get("batisimply") or {}
+    try:
+        workers = int(batisimply.get("push_workers", DEFAULT_PUSH_WORKERS))
+    except (TypeError, ValueError):
+        workers = DEFAULT_PUSH_WORKERS
+    return max(1, workers)
+
+
+class _SessionPool:
+    """
+    Sessions HTTP des threads d'un envoi (une par thread), fermées avec le pool.
+    Avec une session de synchronisation, elles partagent son pool de connexions,
+    fermé en fin de synchronisation.
+    """
+
+    def __init__(self, sync_session=None):
+        self._sync_session = sync_session
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions: List[requests.Session] = []
+
+    def get(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            if self._sync_session is not None:
+                session = self._sync_session.new_http_session()
+            else:
+                session = requests.Session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        if self._sync_session is not None:
+            # Pool de connexions de la synchronisation : fermé par SyncSession.close()
+            return
+        for session in sessions:
+            session.close()
+
+
+def _push_one(key, payload, send, sessions: _SessionPool, limiter: AdaptiveRateLimiter,
+              breaker: CircuitBreaker, max_attempts: int) -> PushOutcome:
+    response, responses, error = call_with_limits(
+        lambda: send(sessions.get(), payload), limiter, breaker, max_attempts, idempotent=False
+    )
+    status = response.status_code if response is not None else None
+    ok = error is None and status in ACCEPTED_STATUS
+    if error is None and not ok:
+        error = f"{status}: {response.text[:200]}"
+    return PushOutcome(key, ok, status, responses, error)
+
+
+def push_concurrently(items: Iterable[Tuple[object, object]],
+                      send: Callable[[requests.Session, object], requests.Response],
+                      max_workers: int = DEFAULT_PUSH_WORKERS,
+                      max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                      limiter: Optional[AdaptiveRateLimiter] = None,
+                      breaker: Optional[CircuitBreaker] = None) -> Iterator[PushOutcome]:
+    """
+    Envoie des éléments en parallèle et rend un PushOutcome par élément, dans
+    l'ordre d'arrivée des réponses.
+
+    Args:
+        items: Itérable de (clé, données) ; consommé au fil de l'eau
+        send: Fonction (session, données) -> requests.Response
+        max_workers (int): Nombre maximal d'envois simultanés
+        max_attempts (int): Essais par élément (429, connexion impossible)
+        limiter, breaker: Limiteur et disjoncteur (ceux partagés par les appels BatiSimply par défaut)
+
+    Raises:
+        CircuitOpenError: L'API BatiSimply reste en erreur ; levée après les
+            résultats des envois déjà faits, les envois pas encore commencés sont annulés
+    """
+    if limiter is None or breaker is None:
+        shared_limiter, shared_breaker = batisimply_limits()
+        limiter = limiter or shared_limiter
+        breaker = breaker or shared_breaker
+    max_workers = max(1, max_workers)
+    iterator = iter(items)
+    # Contexte de l'appelant : les threads d'envoi ne voient pas la session de synchronisation
+    sessions = _SessionPool(current_session())
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batisimply-push")
+    try:
+        in_flight = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max_workers * 2:
+                try:
+                    key, payload = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.add(executor.submit(_push_one, key, payload, send, sessions,
+                                              limiter, breaker, max_attempts))
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            failure = None
+            for future in done:
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    failure = failure or e
+                    continue
+                yield outcome
+            if failure is not None:
+                # Envois en attente annulés, envois en cours attendus : leurs
+                # résultats sont rendus pour que l'appelant les marque
+                executor.shutdown(wait=True, cancel_futures=True)
+                for future in in_flight:
+                    if future.cancelled() or future.exception() is not None:
+                        continue
+                    yield future.result()
+                raise failure
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        sessions.close()
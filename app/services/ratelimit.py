@@ -0,0 +1,311 @@
+# app/services/ratelimit.py
+# Limitation de débit adaptative des appels BatiSimply
+# ----------------------------------------------------
+# Seau à jetons dont le débit s'adapte aux réponses de l'API (AIMD) :
+#   - chaque réponse acceptée augmente le débit d'un pas fixe (additive increase)
+#   - chaque 429 divise le débit (multiplicative decrease) et suspend les envois
+#     pendant la durée indiquée par Retry-After
+# Le limiteur est partagé par les threads d'envoi (thread-safe).
+#
+# Un disjoncteur (CircuitBreaker) complète le limiteur : quand la part d'erreurs
+# 5xx ou réseau dépasse un seuil, les appels sont suspendus pendant un délai,
+# puis un seul appel d'essai décide de la reprise. Si l'API reste en erreur,
+# les appels échouent immédiatement (CircuitOpenError) au lieu d'insister.
+#
+# Tous les appels BatiSimply du processus passent par le même couple
+# limiteur/disjoncteur (shared_limits) via call_with_limits(). Un appel non
+# idempotent (POST de création) n'est réessayé que si le serveur ne l'a pas
+# traité : 429 ou connexion impossible. Après une erreur 5xx ou un délai de
+# lecture dépassé, l'enregistrement a pu être créé : l'erreur est rendue à
+# l'appelant au lieu de risquer un doublon.
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Optional, Tuple
+
+DEFAULT_RATE = 20.0        # requêtes/s au démarrage
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_MAX_RATE = 100.0
+DEFAULT_INCREASE = 1.0     # requêtes/s ajoutées par réponse acceptée
+DEFAULT_DECREASE = 0.5     # facteur appliqué sur 429
+# Pause par défaut après un 429 sans Retry-After, et pause maximale acceptée
+DEFAULT_THROTTLE_PAUSE = 1.0
+MAX_RETRY_AFTER = 120.0
+
+# Disjoncteur : ouverture si au moins la moitié des 20 derniers appels (10 au
+# minimum) sont en erreur ; pause doublée à chaque essai manqué.
+DEFAULT_FAILURE_RATIO = 0.5
+DEFAULT_WINDOW = 20
+DEFAULT_MIN_CALLS = 10
+DEFAULT_COOLDOWN = 15.0
+MAX_COOLDOWN = 120.0
+# Essais de reprise manqués au-delà desquels les appels échouent sans attendre
+DEFAULT_MAX_FAILED_PROBES = 2
+
+DEFAULT_MAX_ATTEMPTS = 4
+# Attente avant nouvel essai après une erreur 5xx ou réseau (doublée à chaque essai)
+RETRY_BACKOFF = 0.5
+# Méthodes HTTP réessayables quelle que soit l'erreur
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Durée d'attente (secondes) d'un en-tête Retry-After : nombre de secondes
+    ou date HTTP. None si l'en-tête est absent ou illisible.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Seau à jetons à débit adaptatif (AIMD), suspendu sur 429."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, min_rate: float = DEFAULT_MIN_RATE,
+                 max_rate: float = DEFAULT_MAX_RATE, increase: float = DEFAULT_INCREASE,
+                 decrease: float = DEFAULT_DECREASE, burst: Optional[float] = None):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, min_rate), self.max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.throttled = 0
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _capacity(self) -> float:
+        # Rafale autorisée : une seconde de débit par défaut
+        return self.burst if self.burst is not None else max(1.0, self.rate)
+
+    def acquire(self) -> float:
+        """Attend un jeton ; retourne le temps passé à attendre (secondes)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity(), self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                else:
+                    delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self) -> None:
+        """Réponse acceptée : augmentation additive du débit."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """429 : diminution multiplicative du débit et pause (Retry-After)."""
+        pause = DEFAULT_THROTTLE_PAUSE if retry_after is None else min(retry_after, MAX_RETRY_AFTER)
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+
+class CircuitOpenError(Exception):
+    """Appels BatiSimply suspendus : l'API reste en erreur."""
+
+
+class CircuitBreaker:
+    """Disjoncteur sur le taux d'erreurs 5xx/réseau (fermé, ouvert, demi-ouvert)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_ratio: float = DEFAULT_FAILURE_RATIO, window: int = DEFAULT_WINDOW,
+                 min_calls: int = DEFAULT_MIN_CALLS, cooldown: float = DEFAULT_COOLDOWN,
+                 max_cooldown: float = MAX_COOLDOWN, max_failed_probes: int = DEFAULT_MAX_FAILED_PROBES):
+        self.failure_ratio = failure_ratio
+        self.min_calls = max(1, min_calls)
+        self.cooldown = cooldown
+        self.max_cooldown = max(max_cooldown, cooldown)
+        self.max_failed_probes = max_failed_probes
+        self.state = self.CLOSED
+        self.opened = 0
+        self._results = deque(maxlen=max(window, self.min_calls))
+        self._failed_probes = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        pause = min(self.cooldown * (2 ** self._failed_probes), self.max_cooldown)
+        self.state = self.OPEN
+        self.opened += 1
+        self._open_until = time.monotonic() + pause
+        self._results.clear()
+
+    def before_call(self) -> float:
+        """
+        Attend que les appels soient autorisés ; retourne le temps d'attente
+        (secondes). Lève CircuitOpenError si l'API ne s'est pas rétablie.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.state == self.CLOSED:
+                    return waited
+                if self.state == self.OPEN:
+                    if now >= self._open_until:
+                        self.state = self.HALF_OPEN
+                        self._probe_in_flight = True
+                        return waited
+                    if self._failed_probes >= self.max_failed_probes:
+                        raise CircuitOpenError(
+                            f"API BatiSimply indisponible, nouvel essai dans {self._open_until - now:.0f} s"
+                        )
+                    delay = self._open_until - now
+                elif not self._probe_in_flight:
+                    self._probe_in_flight = True
+                    return waited
+                else:
+                    # Demi-ouvert : on attend le résultat de l'appel d'essai
+                    delay = 0.1
+            time.sleep(delay)
+            waited += delay
+
+    def record(self, success: bool) -> None:
+        """Enregistre le résultat d'un appel (False : erreur 5xx ou réseau)."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if success:
+                    self.state = self.CLOSED
+                    self._failed_probes = 0
+                else:
+                    self._failed_probes += 1
+                    self._open()
+                return
+            if self.state == self.OPEN:
+                # Réponse tardive d'un appel lancé avant l'ouverture
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures >= self.failure_ratio * len(self._results):
+                self._open()
+
+
+def _request_not_sent(error) -> bool:
+    """Erreur réseau survenue avant que le serveur ne reçoive la requête."""
+    import requests
+    from urllib3.exceptions import ProtocolError
+
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        # Connexion coupée pendant l'échange (ProtocolError) : requête peut-être traitée
+        return not any(isinstance(arg, ProtocolError) for arg in error.args)
+    return False
+
+
+def call_with_limits(send: Callable[[], object], limiter: AdaptiveRateLimiter, breaker: CircuitBreaker,
+                     max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                     idempotent: bool = True) -> Tuple[Optional[object], List[object], Optional[str]]:
+    """
+    Exécute un appel HTTP (send() -> requests.Response) sous le limiteur et le
+    disjoncteur, avec nouvel essai sur 429, 5xx et erreur réseau. Les réponses
+    écartées par un nouvel essai sont fermées (connexion rendue au pool).
+
+    Args:
+        idempotent (bool): False pour un POST : nouvel essai seulement sur 429
+            ou connexion impossible ; une erreur 5xx ou un délai de lecture
+            dépassé est rendu tel quel
+
+    Returns:
+        tuple: (dernière réponse ou None, toutes les réponses reçues, dernière erreur)
+    """
+    import requests
+
+    responses = []
+    response = None
+    error = None
+    attempts = max(1, max_attempts)
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        breaker.before_call()
+        limiter.acquire()
+        try:
+            response = send()
+        except requests.RequestException as e:
+            breaker.record(False)
+            response = None
+            error = str(e)
+            if last or not (idempotent or _request_not_sent(e)):
+                break
+            time.sleep(RETRY_BACKOFF * (2 ** attempt))
+            continue
+        except Exception:
+            breaker.record(False)
+            raise
+        responses.append(response)
+        status = response.status_code
+        if status == 429:
+            # Le débit est l'affaire du limiteur ; le disjoncteur n'en tient pas compte
+            breaker.record(True)
+            limiter.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+            error = "429 Too Many Requests"
+            if not last:
+                response.close()
+            continue
+        if status >= 500:
+            breaker.record(False)
+            error = f"{status}"
+            if last or not idempotent:
+                break
+            response.close()
+            time.sleep(RETRY_BACKOFF * (2 ** attempt))
+            continue
+        breaker.record(True)
+        limiter.on_success()
+        return response, responses, None
+    return response, responses, error
+
+
+_shared_lock = threading.Lock()
+_shared: Optional[Tuple[AdaptiveRateLimiter, CircuitBreaker]] = None
+
+
+def shared_limits(load_settings: Optional[Callable[[], dict]] = None) -> Tuple[AdaptiveRateLimiter, CircuitBreaker]:
+    """
+    Limiteur et disjoncteur communs à tous les appels BatiSimply du processus.
+    load_settings (section "batisimply" de credentials.json) n'est lu qu'à la
+    création : "api_rate" fixe le débit initial (requêtes/s).
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            settings = (load_settings() if load_settings else None) or {}
+            try:
+                rate = float(settings.get("api_rate") or DEFAULT_RATE)
+            except (TypeError, ValueError):
+                rate = DEFAULT_RATE
+            _shared = (AdaptiveRateLimiter(rate=rate), CircuitBreaker())
+        return _shared
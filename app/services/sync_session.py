@@ -0,0 +1,189 @@
+# app/services/sync_session.py
+# Connexions partagées par les étapes d'une synchronisation
+# ---------------------------------------------------------
+# Sans session, chaque fonction de transfert ouvre et ferme ses connexions
+# (PostgreSQL, SQL Server ou HFSQL) et demande un token BatiSimply. Dans un
+# bloc `with SyncSession():` (sync_all), connect_to_* et recup_batisimply_token
+# (app/services/connex.py) consultent la session courante, portée par une
+# variable de contexte comme les métriques : une connexion par base, un token
+# et un pool de connexions HTTP BatiSimply pour toute l'exécution, sans
+# modifier la signature des transferts.
+#
+# Chaque étape garde sa propre transaction : elle valide son travail comme
+# avant, close() ne ferme plus la connexion, et end_step() annule ce qu'une
+# étape en échec aurait laissé en cours. Une connexion rompue est rouverte à
+# l'étape suivante. Les connexions aux bases ne sont pas partagées entre
+# threads : les étapes d'une session s'exécutent l'une après l'autre.
+#
+# Côté HTTP, seul le pool de connexions (adaptateur urllib3, thread-safe) est
+# partagé : chaque thread (étape, préchargement des pages, envois concurrents
+# de push.py) reçoit sa propre requests.Session montée sur ce pool.
+
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marge (secondes) avant l'expiration du token BatiSimply
+TOKEN_EXPIRY_MARGIN = 30
+# Durée de vie supposée d'un token dont la réponse SSO n'indique pas expires_in
+DEFAULT_TOKEN_TTL = 300
+# Connexions HTTP gardées ouvertes par hôte (envois concurrents compris)
+HTTP_POOL_SIZE = 32
+
+_current_session: ContextVar[Optional["SyncSession"]] = ContextVar("sync_session", default=None)
+
+
+def current_session() -> Optional["SyncSession"]:
+    """Session de synchronisation en cours (None hors de sync_all)."""
+    return _current_session.get()
+
+
+class SharedConnection:
+    """Connexion de la session prêtée à une étape : close() la laisse ouverte."""
+
+    __slots__ = ("_connection",)
+
+    def __init__(self, connection):
+        object.__setattr__(self, "_connection", connection)
+
+    def close(self):
+        # Fermée par SyncSession.close() en fin de synchronisation
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._connection.__exit__(*exc)
+
+
+class SyncSession:
+    """Connexions, token et session HTTP BatiSimply d'une synchronisation."""
+
+    def __init__(self):
+        self._connections: Dict[tuple, object] = {}
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._http_adapter = None
+        self._http_local = threading.local()
+        self._http_lock = threading.Lock()
+        self._context_token = None
+        self.opened = 0
+
+    # -- bases de données -------------------------------------------------------
+
+    def connection(self, key: tuple) -> Optional[SharedConnection]:
+        """Connexion déjà ouverte pour ces paramètres (None : à ouvrir)."""
+        connection = self._connections.get(key)
+        if connection is None:
+            return None
+        if getattr(connection, "closed", False):
+            self._connections.pop(key, None)
+            return None
+        return SharedConnection(connection)
+
+    def keep(self, key: tuple, connection):
+        """Conserve une connexion ouverte pour les étapes suivantes (None reste None)."""
+        if connection is None:
+            return None
+        self._connections[key] = connection
+        self.opened += 1
+        return SharedConnection(connection)
+
+    def end_step(self) -> None:
+        """Fin d'une étape : annule les écritures non validées, écarte les connexions rompues."""
+        for key, connection in list(self._connections.items()):
+            try:
+                connection.rollback()
+            except Exception as e:
+                logger.warning("[ATTENTION] Connexion %s abandonnée (sera rouverte) : %s", key[0], e)
+                self._connections.pop(key, None)
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+    def step(self, func):
+        """Enveloppe une fonction de transfert : end_step() après chaque appel."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.end_step()
+        return wrapper
+
+    # -- BatiSimply ---------------------------------------------------------------
+
+    def token(self) -> Optional[str]:
+        """Token BatiSimply encore valide (None : à demander)."""
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        return None
+
+    def keep_token(self, token: str, expires_in=None) -> None:
+        try:
+            ttl = float(expires_in) if expires_in is not None else DEFAULT_TOKEN_TTL
+        except (TypeError, ValueError):
+            ttl = DEFAULT_TOKEN_TTL
+        self._token = token
+        self._token_expires_at = time.monotonic() + max(0.0, ttl - TOKEN_EXPIRY_MARGIN)
+
+    def new_http_session(self):
+        """Nouvelle session requests sur le pool de connexions de la synchronisation (un thread)."""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._http_lock:
+            if self._http_adapter is None:
+                self._http_adapter = HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE)
+            adapter = self._http_adapter
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def http(self):
+        """Session requests du thread courant (batisimply_request), sur le pool partagé."""
+        session = getattr(self._http_local, "session", None)
+        if session is None:
+            session = self._http_local.session = self.new_http_session()
+        return session
+
+    # -- cycle de vie -------------------------------------------------------------
+
+    def close(self) -> None:
+        for connection in self._connections.values():
+            try:
+                connection.rollback()
+                connection.close()
+            except Exception:
+                pass
+        self._connections.clear()
+        # Les sessions des threads ne tiennent que l'adaptateur : le fermer suffit
+        with self._http_lock:
+            adapter, self._http_adapter = self._http_adapter, None
+        if adapter is not None:
+            adapter.close()
+
+    def __enter__(self) -> "SyncSession":
+        self._context_token = _current_session.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current_session.reset(self._context_token)
+        self.close()
+        return False
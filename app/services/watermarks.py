@@ -0,0 +1,30 @@
+# app/services/watermarks.py
+# Points de reprise des extractions incrémentales
+# -----------------------------------------------
+# Une extraction incrémentale ne relit que les lignes modifiées depuis la
+# dernière exécution réussie : la plus grande date de modification lue est
+# enregistrée dans sync_watermarks (une ligne par source), dans la même
+# transaction que les données chargées.
+
+from datetime import datetime
+from typing import Optional
+
+
+def get_watermark(cursor, source: str) -> Optional[datetime]:
+    """Dernier point de reprise enregistré pour une source (None : extraction complète)."""
+    cursor.execute("SELECT value FROM sync_watermarks WHERE source = %s", (source,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(cursor, source: str, value: datetime) -> None:
+    """Enregistre le point de reprise (validé avec la transaction de l'appelant)."""
+    cursor.execute(
+        """
+        INSERT INTO sync_watermarks (source, value, updated_at)
+        VALUES (%s, %s, NOW())
+        ON CONFLICT (source) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW()
+        """,
+        (source, value),
+    )
+
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Journalisation de l'application
+# --------------------------------
+# Tous les modules écrivent via `logging.getLogger(__name__)` (loggers enfants
+# de "app"). Les messages gardent leurs balises habituelles ([OK], [ERREUR],
+# [ATTENTION], [INFO], [SYNC], [DEBUG]...) et le niveau correspond à la balise :
+#   [ERREUR] → ERROR, [ATTENTION] → WARNING, [DEBUG] et lignes par enregistrement → DEBUG,
+#   le reste → INFO.
+#
+# setup_logging() installe un pipeline non bloquant :
+#   logger "app" → QueueHandler → QueueListener (thread dédié) → console et/ou fichier
+# L'appelant ne fait que déposer l'enregistrement dans une file ; l'écriture
+# (et la colorisation des balises, uniquement sur un terminal interactif) se
+# fait dans le thread du listener. Le fichier est écrit par blocs (MemoryHandler).
+#
+# Variables d'environnement :
+#   LOG_LEVEL              niveau minimal (défaut INFO, DEBUG si DEBUG_CONNECTEUR=true)
+#   CONNECTEUR_LOG_FILE    fichier de log (défaut : connecteur.log à côté de l'exécutable)
+
+import atexit
+import io
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+LOGGER_NAME = "app"
+
+CONSOLE_FORMAT = "%(message)s"
+FILE_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Nombre d'enregistrements gardés en mémoire avant écriture dans le fichier
+# (un message WARNING ou plus déclenche l'écriture immédiate)
+FILE_BUFFER_CAPACITY = 200
+
+_TAG_LEVELS = {
+    "ERREUR": logging.ERROR,
+    "ATTENTION": logging.WARNING,
+    "DEBUG": logging.DEBUG,
+}
+
+_TAG_REGEX = re.compile(r"\[(OK|ERREUR|ATTENTION|INFO|SYNC|DEBUG|CALENDRIER|IGNORE|TEST)\]")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def level_for_message(message) -> int:
+    """
+    Niveau de log correspondant à la balise d'un message "[TAG] ...".
+
+    Utile pour journaliser les messages renvoyés par les fonctions
+    (success, message) : logger.log(level_for_message(message), message)
+    """
+    match = _TAG_REGEX.match(str(message).lstrip())
+    if not match:
+        return logging.INFO
+    return _TAG_LEVELS.get(match.group(1), logging.INFO)
+
+
+class TagColorFormatter(logging.Formatter):
+    """
+    Formatter qui colorise les balises ([OK], [ERREUR]...) et les encadrés
+    "=== ... ===". À n'utiliser que sur un terminal interactif.
+    """
+
+    def __init__(self, fmt: str = CONSOLE_FORMAT):
+        super().__init__(fmt)
+        from colorama import Fore, Style
+
+        self._reset = Style.RESET_ALL
+        self._banner = Fore.BLUE + Style.BRIGHT
+        self._colors = {
+            "OK": Fore.GREEN + Style.BRIGHT,
+            "ERREUR": Fore.RED + Style.BRIGHT,
+            "ATTENTION": Fore.YELLOW + Style.BRIGHT,
+            "INFO": Fore.CYAN,
+            "SYNC": Fore.MAGENTA,
+            "DEBUG": Fore.WHITE,
+            "CALENDRIER": Fore.BLUE,
+            "IGNORE": Fore.WHITE,
+            "TEST": Fore.GREEN,
+        }
+
+    def _colorize_tag(self, match) -> str:
+        tag = match.group(1)
+        return f"{self._colors.get(tag, '')}[{tag}]{self._reset}"
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        if text.startswith("=== ") and text.rstrip().endswith(" ==="):
+            return f"{self._banner}{text}{self._reset}"
+        return _TAG_REGEX.sub(self._colorize_tag, text)
+
+
+def _default_level() -> int:
+    level_name = os.getenv("LOG_LEVEL")
+    if not level_name and os.getenv("DEBUG_CONNECTEUR", "false").lower() == "true":
+        level_name = "DEBUG"
+    level = logging.getLevelName((level_name or "INFO").upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+def _default_log_file() -> Optional[str]:
+    log_file = os.getenv("CONNECTEUR_LOG_FILE")
+    if log_file:
+        return log_file
+    if getattr(sys, "frozen", False):
+        return os.path.join(os.path.dirname(sys.executable), "connecteur.log")
+    return None
+
+
+def _console_handler(stream) -> logging.Handler:
+    handler = logging.StreamHandler(stream)
+    formatter = logging.Formatter(CONSOLE_FORMAT)
+    try:
+        if stream.isatty():
+            # Colorama gère les séquences ANSI sous Windows
+            from colorama import just_fix_windows_console
+            just_fix_windows_console()
+            formatter = TagColorFormatter()
+    except Exception:
+        pass
+    handler.setFormatter(formatter)
+    return handler
+
+
+def _file_handler(log_file: str) -> logging.Handler:
+    file_handler = logging.FileHandler(log_file, mode="a", encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+    return logging.handlers.MemoryHandler(
+        FILE_BUFFER_CAPACITY,
+        flushLevel=logging.WARNING,
+        target=file_handler,
+    )
+
+
+def setup_logging(level: Optional[int] = None, log_file: Optional[str] = None, stream=None) -> None:
+    """
+    Configure le logger "app" (idempotent : un second appel remplace la configuration).
+
+    Args:
+        level (int): Niveau minimal (par défaut LOG_LEVEL / DEBUG_CONNECTEUR)
+        log_file (str): Fichier de log (par défaut CONNECTEUR_LOG_FILE ou connecteur.log en exécutable)
+        stream: Flux console (par défaut sys.stdout ; aucun en l'absence de console)
+    """
+    global _listener, _queue_handler
+
+    shutdown_logging()
+
+    level = _default_level() if level is None else level
+    log_file = log_file or _default_log_file()
+    stream = stream if stream is not None else sys.stdout
+
+    handlers = []
+    # Exécutable sans console : sys.stdout vaut None
+    if stream is not None:
+        handlers.append(_console_handler(stream))
+    if log_file:
+        try:
+            handlers.append(_file_handler(log_file))
+        except OSError as e:
+            if sys.stderr is not None:
+                sys.stderr.write(f"[ATTENTION] Fichier de log inaccessible ({log_file}) : {e}\n")
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=False)
+    _listener.start()
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [_queue_handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def shutdown_logging() -> None:
+    """Vide la file et ferme les handlers (appelé automatiquement à la sortie)."""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    logging.getLogger(LOGGER_NAME).removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+
+
+atexit.register(shutdown_logging)
+
+
+@contextmanager
+def capture_logs(level: int = logging.DEBUG) -> Iterator[io.StringIO]:
+    """
+    Capture les messages du logger "app" dans un tampon (affichage des détails
+    dans l'interface en mode debug). La capture est synchrone : le tampon est
+    complet à la sortie du bloc.
+
+    Le niveau du logger est abaissé le temps de la capture ; la console et le
+    fichier gardent leur propre niveau.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    buffer = io.StringIO()
+    handler = logging.StreamHandler(buffer)
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    previous_level = logger.level
+    logger.addHandler(handler)
+    if previous_level == logging.NOTSET or previous_level > level:
+        logger.setLevel(level)
+    try:
+        yield buffer
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(previous_level)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Benchmark de update_code_projet_chantiers
+# -----------------------------------------
+# Rapprochement des heures BatiSimply (batigest_heures.id_projet) avec les codes
+# chantier, sur une base PostgreSQL de test et le serveur BatiSimply simulé :
+#   - toutes les heures sont chargées sans code projet
+#   - une part des projets existe dans batigest_chantiers (1re passe, SQL)
+#   - les autres sont résolus par la liste des projets de l'API (2e passe)
+#
+# Le rapport donne p50/p95 de la durée totale et de chaque phase
+# (match_chantiers, match_api) ainsi que le nombre d'heures mises à jour.
+#
+# Connexion : BENCH_POSTGRES_HOST / _PORT / _USER / _PASSWORD / _DATABASE (voir sync.py) ;
+# le nom de la base doit contenir "bench" (tables vidées), sauf --force.
+#
+# Usage (depuis la racine du projet) :
+#   python benchmarks/code_projet.py                      # 100k heures, 3 exécutions
+#   python benchmarks/code_projet.py --timeslots 10000 --matched-ratio 0.8
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import datagen  # noqa: E402
+from benchmarks.sync import RESULTS_DIR, _env_config, _git_revision, _percentile, _write_credentials  # noqa: E402
+
+
+def prepare(config: dict, dataset, matched_ratio: float, seed: int) -> dict:
+    """Vide les tables batigest_*, charge les chantiers retenus et toutes les heures sans code projet."""
+    from app.services.batigest.utils import init_batigest_tables
+    from app.services.connex import connect_to_postgres
+
+    rng = random.Random(seed)
+    pg = config["postgres"]
+    if not init_batigest_tables():
+        raise RuntimeError("initialisation des tables batigest_* impossible")
+    conn = connect_to_postgres(pg["host"], pg["user"], pg["password"], pg["database"], pg["port"])
+    if not conn:
+        raise RuntimeError("connexion PostgreSQL de benchmark impossible")
+    try:
+        datagen.reset_postgres(conn)
+        project_ids = [pid for pid in dataset.projects if rng.random() < matched_ratio]
+        counts = {
+            "batigest_chantiers": datagen.load_batigest_chantiers(conn, datagen.generate_batigest_chantiers(project_ids)),
+            "batigest_heures": datagen.load_batigest_heures(
+                conn, datagen.generate_batigest_heures(dataset.timeslots, 1.0, rng, with_code_projet=False)),
+        }
+        cursor = conn.cursor()
+        cursor.execute("ANALYZE batigest_chantiers")
+        cursor.execute("ANALYZE batigest_heures")
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return counts
+
+
+def run_once(config: dict, args, seed: int) -> dict:
+    from app.services import connex, metrics
+    from app.services.batigest.batisimply_to_sqlserver import update_code_projet_chantiers
+    from tests.mock_batisimply import MockBatiSimplyServer, MockSettings
+
+    profile = datagen.scale_profile(args.timeslots)
+    settings = MockSettings(
+        latency_ms=args.latency_ms,
+        projects=profile["projects"],
+        timeslots=profile["timeslots"],
+        users=profile["users"],
+        quotes=1,
+        seed=seed,
+    )
+    with MockBatiSimplyServer(settings) as server, tempfile.TemporaryDirectory() as tmp:
+        credentials_path = os.path.join(tmp, "credentials.json")
+        _write_credentials(credentials_path, config, server, "chantier")
+        previous_credentials = connex.CREDENTIALS_FILE
+        connex.CREDENTIALS_FILE = credentials_path
+        try:
+            counts = prepare(config, server.dataset, args.matched_ratio, seed)
+            with metrics.collect_runs() as runs:
+                started = time.perf_counter()
+                success, message = update_code_projet_chantiers()
+                elapsed = time.perf_counter() - started
+        finally:
+            connex.CREDENTIALS_FILE = previous_credentials
+    run = runs[-1].to_dict() if runs else {"phases": {}}
+    return {
+        "success": bool(success),
+        "message": message,
+        "duration_s": elapsed,
+        "phases": run["phases"],
+        "_seed_rows": counts,
+    }
+
+
+def summarize(samples: list) -> dict:
+    durations = [s["duration_s"] for s in samples]
+    phases = {}
+    for name in samples[-1]["phases"]:
+        values = [s["phases"][name]["duration_ms"] for s in samples if name in s["phases"]]
+        phases[name] = {
+            "p50_ms": round(_percentile(values, 0.5), 1),
+            "p95_ms": round(_percentile(values, 0.95), 1),
+            "rows": samples[-1]["phases"][name]["rows"],
+            "db_roundtrips": samples[-1]["phases"][name]["db_roundtrips"],
+        }
+    return {
+        "runs": len(samples),
+        "successes": sum(1 for s in samples if s["success"]),
+        "p50_s": round(_percentile(durations, 0.5), 3),
+        "p95_s": round(_percentile(durations, 0.95), 3),
+        "last_message": samples[-1]["message"],
+        "phases": phases,
+        "_seed_rows": samples[-1]["_seed_rows"],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de update_code_projet_chantiers")
+    parser.add_argument("--timeslots", type=int, default=datagen.SCALES["100k"], help="Heures chargées")
+    parser.add_argument("--matched-ratio", type=float, default=0.5,
+                        help="Part des projets présents dans batigest_chantiers (le reste passe par l'API)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latence du serveur simulé")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichier JSON du rapport (défaut : benchmarks/results/code_projet-<date>.json)")
+    parser.add_argument("--force", action="store_true", help="Autoriser une base dont le nom ne contient pas 'bench'")
+    args = parser.parse_args(argv)
+
+    config = _env_config()
+    database = config["postgres"]["database"]
+    if "bench" not in database.lower() and not args.force:
+        raise SystemExit(
+            f"[ERREUR] La base postgres '{database}' ne semble pas dédiée aux benchmarks "
+            f"(le nom doit contenir 'bench') ; ses tables seraient vidées. Utiliser --force pour passer outre."
+        )
+
+    from app.utils.logger import setup_logging
+    setup_logging(level=logging.WARNING, stream=sys.stderr)
+
+    samples = []
+    for index in range(args.runs):
+        sys.stderr.write(f"[INFO] exécution {index + 1}/{args.runs}\n")
+        samples.append(run_once(config, args, args.seed))
+
+    report = {
+        "benchmark": "code_projet",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "settings": {
+            "timeslots": args.timeslots, "matched_ratio": args.matched_ratio, "runs": args.runs,
+            "latency_ms": args.latency_ms, "seed": args.seed,
+        },
+        "result": summarize(samples),
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"code_projet-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps({"report": output, "p50_s": report["result"]["p50_s"]}, ensure_ascii=False))
+    return 0 if report["result"]["successes"] == len(samples) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
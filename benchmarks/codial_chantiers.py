@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# Benchmark de transfer_chantiers_hfsql_to_postgres (Codial)
+# ----------------------------------------------------------
+# Régénère les tables Codial lues par le flux (cod_projet, client, meca) dans
+# une base HFSQL de test et vide codial_chantiers dans une base PostgreSQL de
+# test, puis exécute le transfert pour chaque liaison ODBC demandée (pyodbc,
+# pypyodbc). Le rapport donne p50/p95 de la durée totale et des phases
+# extract / load, ainsi que les allers-retours par base.
+# --incremental mesure en plus une seconde exécution sur des données
+# inchangées, avec l'extraction incrémentale (colonne DATE_MODIF).
+#
+# Connexions (variables d'environnement) :
+#   BENCH_HFSQL_HOST / _PORT / _USER / _PASSWORD / _DATABASE (défaut : localhost, 4900, admin, -, connecteur_bench)
+#   BENCH_POSTGRES_*  (voir sync.py)
+# Les noms de base doivent contenir "bench" (tables supprimées et recréées), sauf --force.
+#
+# Usage (depuis la racine du projet) :
+#   python benchmarks/codial_chantiers.py                       # 5000 projets, pyodbc et pypyodbc
+#   python benchmarks/codial_chantiers.py --projects 20000 --odbc pyodbc
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import datagen  # noqa: E402
+from benchmarks.sync import RESULTS_DIR, _env_config, _git_revision, _percentile  # noqa: E402
+
+
+def _hfsql_config(odbc: str, incremental: bool = False) -> dict:
+    config = {
+        "host": os.getenv("BENCH_HFSQL_HOST", "localhost"),
+        "port": os.getenv("BENCH_HFSQL_PORT", "4900"),
+        "user": os.getenv("BENCH_HFSQL_USER", "admin"),
+        "password": os.getenv("BENCH_HFSQL_PASSWORD", ""),
+        "database": os.getenv("BENCH_HFSQL_DATABASE", "connecteur_bench"),
+        "odbc": odbc,
+    }
+    if incremental:
+        config["projet_modif_column"] = "DATE_MODIF"
+    return config
+
+
+def prepare(hfsql: dict, postgres: dict, projects: int, seed: int) -> dict:
+    """Régénère les tables Codial (HFSQL) et vide codial_chantiers ; retourne les lignes par table."""
+    from app.services.codial.utils import init_codial_tables
+    from app.services.connex import connect_to_hfsql, connect_to_postgres
+
+    hfsql_conn = connect_to_hfsql(hfsql["host"], hfsql["user"], hfsql["password"], hfsql["database"],
+                                  hfsql["port"], odbc=hfsql["odbc"])
+    if not hfsql_conn:
+        raise RuntimeError("connexion HFSQL de benchmark impossible")
+    counts = {}
+    try:
+        datagen.reset_hfsql(hfsql_conn)
+        for table, rows in datagen.generate_codial(projects, random.Random(seed)).items():
+            counts[table] = datagen.load_hfsql(hfsql_conn, table, rows)
+    finally:
+        hfsql_conn.close()
+
+    if not init_codial_tables():
+        raise RuntimeError("initialisation des tables codial_* impossible")
+    postgres_conn = connect_to_postgres(postgres["host"], postgres["user"], postgres["password"],
+                                        postgres["database"], postgres["port"])
+    if not postgres_conn:
+        raise RuntimeError("connexion PostgreSQL de benchmark impossible")
+    try:
+        datagen.reset_codial_postgres(postgres_conn)
+    finally:
+        postgres_conn.close()
+    return counts
+
+
+def run_once(hfsql: dict, postgres: dict, projects: int, seed: int) -> dict:
+    from app.services import connex, metrics
+    from app.services.codial.hfsql_to_batisimply import transfer_chantiers_hfsql_to_postgres
+
+    with tempfile.TemporaryDirectory() as tmp:
+        credentials_path = os.path.join(tmp, "credentials.json")
+        with open(credentials_path, "w", encoding="utf-8") as f:
+            json.dump({"software": "codial", "hfsql": hfsql, "postgres": postgres}, f)
+        previous_credentials = connex.CREDENTIALS_FILE
+        connex.CREDENTIALS_FILE = credentials_path
+        try:
+            counts = prepare(hfsql, postgres, projects, seed)
+            with metrics.collect_runs() as runs:
+                started = time.perf_counter()
+                success, message = transfer_chantiers_hfsql_to_postgres()
+                elapsed = time.perf_counter() - started
+            rerun = None
+            if "projet_modif_column" in hfsql:
+                # Seconde exécution, rien n'a changé dans Codial
+                with metrics.collect_runs() as reruns:
+                    started = time.perf_counter()
+                    rerun_success, rerun_message = transfer_chantiers_hfsql_to_postgres()
+                    rerun = {"success": bool(rerun_success), "message": rerun_message,
+                             "duration_s": time.perf_counter() - started,
+                             "phases": reruns[-1].to_dict()["phases"] if reruns else {},
+                             "_seed_rows": counts}
+        finally:
+            connex.CREDENTIALS_FILE = previous_credentials
+    run = runs[-1].to_dict() if runs else {"phases": {}}
+    return {"success": bool(success), "message": message, "duration_s": elapsed,
+            "phases": run["phases"], "_seed_rows": counts, "_rerun": rerun}
+
+
+def summarize(samples: list) -> dict:
+    durations = [s["duration_s"] for s in samples]
+    phases = {}
+    for name in samples[-1]["phases"]:
+        values = [s["phases"][name]["duration_ms"] for s in samples if name in s["phases"]]
+        stats = samples[-1]["phases"][name]
+        p50 = _percentile(values, 0.5)
+        phases[name] = {
+            "p50_ms": round(p50, 1),
+            "p95_ms": round(_percentile(values, 0.95), 1),
+            "rows": stats["rows"],
+            "rows_per_s": round(stats["rows"] / (p50 / 1000), 1) if p50 > 0 and stats["rows"] else None,
+            "db_roundtrips": stats["db_roundtrips"],
+        }
+    return {
+        "runs": len(samples),
+        "successes": sum(1 for s in samples if s["success"]),
+        "p50_s": round(_percentile(durations, 0.5), 3),
+        "p95_s": round(_percentile(durations, 0.95), 3),
+        "last_message": samples[-1]["message"],
+        "phases": phases,
+        "_seed_rows": samples[-1]["_seed_rows"],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de transfer_chantiers_hfsql_to_postgres (Codial)")
+    parser.add_argument("--projects", type=int, default=5000, help="Projets Codial générés")
+    parser.add_argument("--odbc", default="pyodbc,pypyodbc", help="Liaisons ODBC à comparer, séparées par des virgules")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Mesurer aussi une seconde exécution incrémentale (données inchangées)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichier JSON du rapport (défaut : benchmarks/results/codial_chantiers-<date>.json)")
+    parser.add_argument("--force", action="store_true", help="Autoriser des bases dont le nom ne contient pas 'bench'")
+    args = parser.parse_args(argv)
+
+    postgres = _env_config()["postgres"]
+    for section, name in (("hfsql", _hfsql_config("")["database"]), ("postgres", postgres["database"])):
+        if "bench" not in name.lower() and not args.force:
+            raise SystemExit(
+                f"[ERREUR] La base {section} '{name}' ne semble pas dédiée aux benchmarks "
+                f"(le nom doit contenir 'bench') ; ses tables seraient écrasées. Utiliser --force pour passer outre."
+            )
+
+    from app.utils.logger import setup_logging
+    setup_logging(level=logging.WARNING, stream=sys.stderr)
+
+    report = {
+        "benchmark": "codial_chantiers",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "settings": {"projects": args.projects, "runs": args.runs, "seed": args.seed,
+                     "incremental": args.incremental},
+        "odbc": {},
+    }
+    for odbc in [o.strip() for o in args.odbc.split(",") if o.strip()]:
+        samples = []
+        for index in range(args.runs):
+            sys.stderr.write(f"[INFO] {odbc} : exécution {index + 1}/{args.runs}\n")
+            samples.append(run_once(_hfsql_config(odbc, args.incremental), postgres, args.projects, args.seed))
+        report["odbc"][odbc] = summarize(samples)
+        if args.incremental:
+            report["odbc"][odbc]["incremental"] = summarize([s["_rerun"] for s in samples])
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"codial_chantiers-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps({"report": output, "p50_s": {k: v["p50_s"] for k, v in report["odbc"].items()}},
+                     ensure_ascii=False))
+    return 0 if all(v["successes"] == v["runs"] for v in report["odbc"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+# Générateurs de données pour les benchmarks de synchronisation
+# -------------------------------------------------------------
+# Remplit une base SQL Server de test (ChantierDef, Devis, Salarie, SuiviMO)
+# et les tables batigest_* d'une base PostgreSQL de test, en cohérence avec le
+# jeu de données du serveur BatiSimply simulé (tests/mock_batisimply.py) :
+#   - les codes chantier "00000001"... correspondent aux projectCode simulés
+#   - Salarie.codebs reprend les identifiants utilisateurs (UUID) simulés
+#
+# Les tables SQL Server sont supprimées puis recréées : ces fonctions ne
+# doivent viser que des bases dédiées aux benchmarks (voir sync.py).
+
+import random
+from datetime import datetime, timedelta
+from typing import Iterable, List, Sequence
+
+# Tailles de jeu de données : nombre d'heures (créneaux) BatiSimply
+SCALES = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+}
+
+
+def scale_profile(timeslots: int) -> dict:
+    """Volumes dérivés du nombre d'heures (chantiers, salariés, devis, historique)."""
+    return {
+        "timeslots": timeslots,
+        "projects": max(20, timeslots // 20),
+        "users": max(5, timeslots // 500),
+        "quotes": max(10, timeslots // 100),
+        # Heures déjà présentes dans SuiviMO / batigest_heures (chemin "mise à jour")
+        "existing_ratio": 0.5,
+    }
+
+
+# ============================================================================
+# SQL SERVER (BATIGEST)
+# ============================================================================
+
+SQLSERVER_TABLES = {
+    "ChantierDef": """
+        CREATE TABLE dbo.ChantierDef (
+            Code VARCHAR(8) PRIMARY KEY,
+            NomClient VARCHAR(30),
+            DateDebut DATETIME,
+            DateFin DATETIME,
+            Etat CHAR(1),
+            AdrChantier VARCHAR(100),
+            CPChantier VARCHAR(10),
+            VilleChantier VARCHAR(45),
+            TotalMO FLOAT
+        )
+    """,
+    "Devis": """
+        CREATE TABLE dbo.Devis (
+            Code VARCHAR(20) PRIMARY KEY,
+            [Date] DATETIME,
+            Nom VARCHAR(100),
+            Adr VARCHAR(100),
+            CP VARCHAR(10),
+            Ville VARCHAR(45),
+            Sujet VARCHAR(200),
+            DateConcretis DATETIME,
+            TempsMO FLOAT,
+            Etat INT
+        )
+    """,
+    "Salarie": """
+        CREATE TABLE dbo.Salarie (
+            Code VARCHAR(10) PRIMARY KEY,
+            Nom VARCHAR(50),
+            Prenom VARCHAR(50),
+            codebs VARCHAR(50)
+        )
+    """,
+    "SuiviMO": """
+        CREATE TABLE dbo.SuiviMO (
+            CodeChantier VARCHAR(8) NOT NULL,
+            CodeSalarie VARCHAR(10) NOT NULL,
+            [Date] DATETIME NOT NULL,
+            NbH0 FLOAT,
+            NbH3 FLOAT,
+            NbH4 FLOAT,
+            Heures FLOAT,
+            Commentaire VARCHAR(200)
+        )
+    """,
+}
+
+SQLSERVER_COLUMNS = {
+    "ChantierDef": ["Code", "NomClient", "DateDebut", "DateFin", "Etat",
+                    "AdrChantier", "CPChantier", "VilleChantier", "TotalMO"],
+    "Devis": ["Code", "[Date]", "Nom", "Adr", "CP", "Ville", "Sujet", "DateConcretis", "TempsMO", "Etat"],
+    "Salarie": ["Code", "Nom", "Prenom", "codebs"],
+    "SuiviMO": ["CodeChantier", "CodeSalarie", "[Date]", "NbH0", "NbH3", "NbH4", "Heures", "Commentaire"],
+}
+
+_VILLES = [("Lyon", "69003"), ("Nantes", "44000"), ("Lille", "59000"), ("Rennes", "35000"), ("Dijon", "21000")]
+
+
+def salarie_code(index: int) -> str:
+    return f"S{index:05d}"
+
+
+def generate_chantiers(count: int, rng: random.Random) -> List[tuple]:
+    """Lignes ChantierDef ; Code = "00000001"... (projectCode du serveur simulé)."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    for index in range(1, count + 1):
+        ville, cp = rng.choice(_VILLES)
+        start = today - timedelta(days=rng.randint(0, 90))
+        rows.append((
+            str(index).zfill(8),
+            f"Client {index}"[:30],
+            start,
+            start + timedelta(days=rng.randint(10, 120)),
+            rng.choice(["E", "E", "T"]),
+            f"{rng.randint(1, 120)} rue du Chantier",
+            cp,
+            ville,
+            round(rng.uniform(10, 800), 2),
+        ))
+    return rows
+
+
+def generate_devis(count: int, rng: random.Random) -> List[tuple]:
+    """Lignes Devis (états 0, 3 et 4 : ceux extraits par le connecteur)."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    for index in range(1, count + 1):
+        ville, cp = rng.choice(_VILLES)
+        created = today - timedelta(days=rng.randint(0, 90))
+        rows.append((
+            f"D{index:07d}",
+            created,
+            f"Devis {index}",
+            f"{rng.randint(1, 120)} avenue du Devis",
+            cp,
+            ville,
+            f"Travaux {index}",
+            created + timedelta(days=rng.randint(5, 30)) if rng.random() < 0.3 else None,
+            round(rng.uniform(5, 300), 2),
+            rng.choice([0, 3, 4]),
+        ))
+    return rows
+
+
+def generate_salaries(user_ids: Sequence[str]) -> List[tuple]:
+    """Un salarié Batigest par utilisateur BatiSimply (codebs = UUID Keycloak)."""
+    return [
+        (salarie_code(index), f"Nom{index}", f"Prenom{index}", user_id)
+        for index, user_id in enumerate(user_ids, start=1)
+    ]
+
+
+def generate_suivimo(timeslots: Sequence[dict], user_ids: Sequence[str], ratio: float,
+                     rng: random.Random) -> List[tuple]:
+    """
+    Heures déjà saisies dans SuiviMO pour une part des créneaux simulés
+    (la moitié avec des valeurs différentes, pour exercer les mises à jour).
+    """
+    codes = {user_id: salarie_code(index) for index, user_id in enumerate(user_ids, start=1)}
+    rows = []
+    for slot in timeslots:
+        if rng.random() >= ratio:
+            continue
+        project = slot.get("project") or {}
+        user_id = (slot.get("user") or {}).get("id")
+        if not project.get("projectCode") or user_id not in codes:
+            continue
+        start = datetime.strptime(slot["startDate"], "%Y-%m-%dT%H:%M:%SZ")
+        hours = slot["totalTimeMinutes"] / 60.0
+        if rng.random() < 0.5:
+            hours += 1
+        rows.append((
+            project["projectCode"],
+            codes[user_id],
+            start,
+            hours,
+            1 if slot.get("hasHomeToWorkJourney") else 0,
+            1 if slot.get("hasPackedLunch") else 0,
+            hours,
+            None,
+        ))
+    return rows
+
+
+def reset_sqlserver(conn) -> None:
+    """Supprime et recrée les tables Batigest de test."""
+    cursor = conn.cursor()
+    for table, ddl in SQLSERVER_TABLES.items():
+        cursor.execute(f"IF OBJECT_ID('dbo.{table}', 'U') IS NOT NULL DROP TABLE dbo.{table}")
+        cursor.execute(ddl)
+    conn.commit()
+    cursor.close()
+
+
+def load_sqlserver(conn, table: str, rows: Iterable[tuple]) -> int:
+    """Insère des lignes dans une table SQL Server (fast_executemany)."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    columns = SQLSERVER_COLUMNS[table]
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    cursor.executemany(
+        f"INSERT INTO dbo.{table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        rows,
+    )
+    conn.commit()
+    cursor.close()
+    return len(rows)
+
+
+# ============================================================================
+# POSTGRESQL (TABLES TAMPON batigest_*)
+# ============================================================================
+
+POSTGRES_TABLES = [
+    "batigest_chantiers", "batigest_heures", "batigest_devis", "batigest_heures_map", "batigest_suivimo",
+]
+
+
+def generate_batigest_heures(timeslots: Sequence[dict], ratio: float, rng: random.Random,
+                             with_code_projet: bool = True) -> List[tuple]:
+    """
+    Heures déjà importées et synchronisées dans batigest_heures pour une part
+    des créneaux simulés (chemin "aucune modification" de l'upsert).
+    Sans with_code_projet, code_projet reste NULL (heures à rapprocher des chantiers).
+    """
+    rows = []
+    for slot in timeslots:
+        if rng.random() >= ratio:
+            continue
+        project = slot.get("project") or {}
+        user_id = (slot.get("user") or {}).get("id")
+        if not user_id:
+            continue
+        rows.append((
+            str(slot["id"]),
+            datetime.strptime(slot["startDate"], "%Y-%m-%dT%H:%M:%SZ"),
+            datetime.strptime(slot["endDate"], "%Y-%m-%dT%H:%M:%SZ"),
+            user_id,
+            project.get("id"),
+            slot.get("managementStatus"),
+            slot.get("totalTimeMinutes"),
+            slot.get("hasPackedLunch"),
+            slot.get("hasHomeToWorkJourney"),
+            project.get("projectCode") if with_code_projet else None,
+            with_code_projet,
+        ))
+    return rows
+
+
+def generate_batigest_chantiers(project_ids: Iterable[int]) -> List[tuple]:
+    """Lignes batigest_chantiers (code "00000001"... comme ChantierDef), déjà synchronisées."""
+    return [(str(pid).zfill(8), f"Client {pid}"[:30], True) for pid in project_ids]
+
+
+def reset_postgres(conn) -> None:
+    """Vide les tables batigest_* (créées au préalable par init_batigest_tables) et le cache des listes."""
+    cursor = conn.cursor()
+    cursor.execute(f"TRUNCATE {', '.join(POSTGRES_TABLES)} RESTART IDENTITY")
+    cursor.execute("DELETE FROM batisimply_http_cache WHERE cache_key LIKE 'batigest:%'")
+    conn.commit()
+    cursor.close()
+
+
+def load_batigest_chantiers(conn, rows: Sequence[tuple]) -> int:
+    """Insère des chantiers dans batigest_chantiers (execute_values)."""
+    if not rows:
+        return 0
+    from psycopg2.extras import execute_values
+
+    cursor = conn.cursor()
+    execute_values(
+        cursor,
+        "INSERT INTO batigest_chantiers (code, nom_client, sync) VALUES %s",
+        rows,
+        page_size=1000,
+    )
+    conn.commit()
+    cursor.close()
+    return len(rows)
+
+
+def load_batigest_heures(conn, rows: Sequence[tuple]) -> int:
+    """Insère des heures dans batigest_heures (execute_values, par pages de 1000)."""
+    if not rows:
+        return 0
+    from psycopg2.extras import execute_values
+
+    cursor = conn.cursor()
+    execute_values(
+        cursor,
+        """
+        INSERT INTO batigest_heures (
+            id_heure, date_debut, date_fin, id_utilisateur, id_projet, status_management,
+            total_heure, panier, trajet, code_projet, sync
+        ) VALUES %s
+        """,
+        rows,
+        page_size=1000,
+    )
+    conn.commit()
+    cursor.close()
+    return len(rows)
+
+
+# ============================================================================
+# HFSQL (CODIAL)
+# ============================================================================
+# Sous-ensemble des tables Codial lues par transfer_chantiers_hfsql_to_postgres.
+
+HFSQL_TABLES = {
+    "client": """
+        CREATE TABLE client (
+            CODE VARCHAR(20) NOT NULL PRIMARY KEY,
+            NOM VARCHAR(100)
+        )
+    """,
+    "meca": """
+        CREATE TABLE meca (
+            CODEREP VARCHAR(20) NOT NULL PRIMARY KEY,
+            PRENOM VARCHAR(50),
+            NOM VARCHAR(50)
+        )
+    """,
+    "cod_projet": """
+        CREATE TABLE cod_projet (
+            REFERENCE VARCHAR(50) NOT NULL PRIMARY KEY,
+            INT_TERMINE INTEGER,
+            NOM VARCHAR(100),
+            DATE_DEBUT DATE,
+            DATE_FIN DATE,
+            DESCRIPTION VARCHAR(255),
+            ADRESSE1_CHANTIER VARCHAR(100),
+            COP_CHANTIER VARCHAR(10),
+            VILLE_CHANTIER VARCHAR(50),
+            CODE_PAYS_CHANTIER VARCHAR(5),
+            CODEREP VARCHAR(20),
+            CODE_TIERS VARCHAR(20),
+            DATE_MODIF DATETIME
+        )
+    """,
+}
+
+HFSQL_COLUMNS = {
+    "client": ["CODE", "NOM"],
+    "meca": ["CODEREP", "PRENOM", "NOM"],
+    "cod_projet": ["REFERENCE", "INT_TERMINE", "NOM", "DATE_DEBUT", "DATE_FIN", "DESCRIPTION",
+                   "ADRESSE1_CHANTIER", "COP_CHANTIER", "VILLE_CHANTIER", "CODE_PAYS_CHANTIER",
+                   "CODEREP", "CODE_TIERS", "DATE_MODIF"],
+}
+
+
+def generate_codial(projects: int, rng: random.Random) -> dict:
+    """Clients, chargés d'affaires (meca) et projets Codial ; 10 % des projets terminés."""
+    now = datetime.now().replace(microsecond=0)
+    today = now.date()
+    clients = [(f"C{index:05d}", f"Client é{index}") for index in range(1, max(10, projects // 5) + 1)]
+    mecas = [(f"R{index:03d}", f"Prénom{index}", f"Nom{index}") for index in range(1, max(3, projects // 200) + 1)]
+    rows = []
+    for index in range(1, projects + 1):
+        ville, cp = rng.choice(_VILLES)
+        start = today - timedelta(days=rng.randint(0, 180))
+        rows.append((
+            f"PRJ{index:06d}",
+            1 if rng.random() < 0.1 else 0,
+            f"Projet {index}",
+            start,
+            start + timedelta(days=rng.randint(10, 120)),
+            f"Travaux de rénovation n°{index}",
+            f"{rng.randint(1, 120)} rue du Chantier",
+            cp,
+            ville,
+            "FR",
+            rng.choice(mecas)[0],
+            rng.choice(clients)[0],
+            now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        ))
+    return {"client": clients, "meca": mecas, "cod_projet": rows}
+
+
+def reset_hfsql(conn) -> None:
+    """Supprime et recrée les tables Codial de test."""
+    cursor = conn.cursor()
+    for table, ddl in HFSQL_TABLES.items():
+        try:
+            cursor.execute(f"DROP TABLE {table}")
+        except Exception:
+            pass  # table absente
+        cursor.execute(ddl)
+    conn.commit()
+    cursor.close()
+
+
+def load_hfsql(conn, table: str, rows: Iterable[tuple]) -> int:
+    """Insère des lignes dans une table HFSQL (executemany)."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    columns = HFSQL_COLUMNS[table]
+    cursor = conn.cursor()
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        rows,
+    )
+    conn.commit()
+    cursor.close()
+    return len(rows)
+
+
+def reset_codial_postgres(conn) -> None:
+    """Vide codial_chantiers (créée au préalable par init_codial_tables), ses points de reprise et le cache des listes."""
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE codial_chantiers RESTART IDENTITY")
+    cursor.execute("DELETE FROM sync_watermarks WHERE source LIKE 'codial.%'")
+    cursor.execute("DELETE FROM batisimply_http_cache WHERE cache_key LIKE 'codial:%'")
+    conn.commit()
+    cursor.close()
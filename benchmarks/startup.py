@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# Benchmark du temps de démarrage
+# --------------------------------
+# Mesure, dans des processus Python neufs (donc sans cache de modules) :
+#   - import : durée de `import app.main` et modules lourds chargés au passage
+#   - serve  : délai entre le lancement d'uvicorn et la première réponse de /health
+#              (c'est ce délai que l'utilisateur perçoit avant l'ouverture du navigateur)
+#
+# Usage (depuis la racine du projet) :
+#   python benchmarks/startup.py                 # import + serve, 5 répétitions
+#   python benchmarks/startup.py --mode import --runs 10
+#   python benchmarks/startup.py --importtime 15 # 15 modules les plus coûteux (-X importtime)
+#
+# Le résultat est imprimé en JSON pour pouvoir comparer deux versions.
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules qui ne doivent être chargés qu'au premier usage
+HEAVY_MODULES = [
+    "pyodbc",
+    "pypyodbc",
+    "psycopg2",
+    "requests",
+    "app.services.batigest",
+    "app.services.codial",
+]
+
+IMPORT_PROBE = (
+    "import json, sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "import app.main\n"
+    "elapsed = time.perf_counter() - t0\n"
+    "print(json.dumps({'elapsed_ms': elapsed * 1000,\n"
+    "                  'loaded': [m for m in %r if m in sys.modules]}))\n"
+) % (HEAVY_MODULES,)
+
+
+def _run_python(args, **kwargs):
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        **kwargs,
+    )
+
+
+def bench_import(runs: int) -> dict:
+    """Durée de `import app.main` dans un interpréteur neuf."""
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        proc = _run_python(["-c", IMPORT_PROBE])
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import impossible")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(result["elapsed_ms"])
+        loaded = result["loaded"]
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "heavy_modules_loaded": loaded,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_serve(runs: int, timeout: float = 30.0) -> dict:
+    """Délai entre le lancement d'uvicorn et la première réponse de /health."""
+    timings = []
+    for _ in range(runs):
+        port = _free_port()
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError("uvicorn s'est arrêté avant de répondre")
+                if time.perf_counter() - t0 > timeout:
+                    raise RuntimeError(f"pas de réponse de /health après {timeout}s")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                        if resp.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.02)
+            timings.append((time.perf_counter() - t0) * 1000)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+    }
+
+
+def top_imports(count: int) -> list:
+    """Modules les plus coûteux (temps cumulé) d'après `python -X importtime`."""
+    proc = _run_python(["-X", "importtime", "-c", "import app.main"])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # Format : "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({"module": name.strip(), "cumulative_ms": round(int(cumulative_us) / 1000, 1)})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:count]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage du connecteur")
+    parser.add_argument("--mode", choices=["import", "serve", "all"], default="all")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="Afficher les N modules les plus coûteux à importer")
+    args = parser.parse_args(argv)
+
+    report = {"python": sys.version.split()[0]}
+    if args.mode in ("import", "all"):
+        report["import"] = bench_import(args.runs)
+    if args.mode in ("serve", "all"):
+        report["serve"] = bench_serve(args.runs)
+    if args.importtime:
+        report["top_imports"] = top_imports(args.importtime)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+# Benchmark des synchronisations Batigest <-> BatiSimply
+# ------------------------------------------------------
+# Exécute sync_sqlserver_to_batisimply puis sync_batisimply_to_sqlserver contre :
+#   - une base SQL Server de test (ex. conteneur mcr.microsoft.com/mssql/server)
+#   - une base PostgreSQL de test
+#   - le serveur BatiSimply simulé (tests/mock_batisimply.py, lancé dans un thread)
+# Les bases sont régénérées avant chaque exécution (benchmarks/datagen.py),
+# les résultats sont donc reproductibles à graine égale.
+#
+# Pour chaque taille (1k, 10k, 100k heures) et chaque flux, le rapport donne
+# p50/p95 de la durée de chaque phase (metrics.phase) et le débit en lignes/s.
+# Le rapport JSON est écrit dans benchmarks/results/ ; --baseline compare avec
+# un rapport précédent et signale les phases ralenties.
+#
+# Connexions (variables d'environnement) :
+#   BENCH_SQLSERVER_SERVER / _USER / _PASSWORD / _DATABASE  (défaut : localhost, sa, -, connecteur_bench)
+#   BENCH_POSTGRES_HOST / _PORT / _USER / _PASSWORD / _DATABASE (défaut : localhost, 5432, postgres, -, connecteur_bench)
+# Les noms de base doivent contenir "bench" (tables supprimées et recréées), sauf --force.
+#
+# Usage (depuis la racine du projet) :
+#   python benchmarks/sync.py --scales 1k,10k --runs 3 --latency-ms 20
+#   python benchmarks/sync.py --scales 1k --baseline benchmarks/results/sync-20260101-120000.json
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import datagen  # noqa: E402
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+FLOWS = [
+    ("sqlserver_to_batisimply", "app.services.batigest.sqlserver_to_batisimply", "sync_sqlserver_to_batisimply"),
+    ("batisimply_to_sqlserver", "app.services.batigest.batisimply_to_sqlserver", "sync_batisimply_to_sqlserver"),
+]
+
+
+def _env_config() -> dict:
+    return {
+        "sqlserver": {
+            "server": os.getenv("BENCH_SQLSERVER_SERVER", "localhost"),
+            "user": os.getenv("BENCH_SQLSERVER_USER", "sa"),
+            "password": os.getenv("BENCH_SQLSERVER_PASSWORD", ""),
+            "database": os.getenv("BENCH_SQLSERVER_DATABASE", "connecteur_bench"),
+        },
+        "postgres": {
+            "host": os.getenv("BENCH_POSTGRES_HOST", "localhost"),
+            "port": os.getenv("BENCH_POSTGRES_PORT", "5432"),
+            "user": os.getenv("BENCH_POSTGRES_USER", "postgres"),
+            "password": os.getenv("BENCH_POSTGRES_PASSWORD", ""),
+            "database": os.getenv("BENCH_POSTGRES_DATABASE", "connecteur_bench"),
+        },
+    }
+
+
+def _percentile(values, q: float) -> float:
+    """Percentile par interpolation linéaire (q entre 0 et 1)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _git_revision() -> str:
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=10)
+        return proc.stdout.strip() or "inconnue"
+    except Exception:
+        return "inconnue"
+
+
+# ============================================================================
+# PRÉPARATION
+# ============================================================================
+
+def _write_credentials(path: str, config: dict, server, mode: str) -> None:
+    """credentials.json de benchmark : bases de test + serveur simulé."""
+    creds = {
+        "sqlserver": config["sqlserver"],
+        "postgres": config["postgres"],
+        "mode": mode,
+        "heures_window_days": 180,
+        "batisimply": {
+            "api_url": server.base_url,
+            "sso_url": server.sso_url,
+            "client_id": server.client_id,
+            "client_secret": "benchmark",
+            "username": "benchmark",
+            "password": "benchmark",
+            "grant_type": "password",
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(creds, f)
+
+
+def prepare_databases(config: dict, dataset, profile: dict, seed: int) -> dict:
+    """Régénère SQL Server et PostgreSQL ; retourne le nombre de lignes par table."""
+    from app.services.batigest.utils import init_batigest_tables
+    from app.services.connex import connect_to_postgres, connect_to_sqlserver
+
+    rng = random.Random(seed)
+    sql = config["sqlserver"]
+    pg = config["postgres"]
+
+    sqlserver_conn = connect_to_sqlserver(sql["server"], sql["user"], sql["password"], sql["database"])
+    if not sqlserver_conn:
+        raise RuntimeError("connexion SQL Server de benchmark impossible")
+    counts = {}
+    try:
+        datagen.reset_sqlserver(sqlserver_conn)
+        counts["ChantierDef"] = datagen.load_sqlserver(
+            sqlserver_conn, "ChantierDef", datagen.generate_chantiers(profile["projects"], rng))
+        counts["Devis"] = datagen.load_sqlserver(
+            sqlserver_conn, "Devis", datagen.generate_devis(profile["quotes"], rng))
+        counts["Salarie"] = datagen.load_sqlserver(
+            sqlserver_conn, "Salarie", datagen.generate_salaries(dataset.users))
+        counts["SuiviMO"] = datagen.load_sqlserver(
+            sqlserver_conn, "SuiviMO",
+            datagen.generate_suivimo(dataset.timeslots, dataset.users, profile["existing_ratio"], rng))
+    finally:
+        sqlserver_conn.close()
+
+    if not init_batigest_tables():
+        raise RuntimeError("initialisation des tables batigest_* impossible")
+    postgres_conn = connect_to_postgres(pg["host"], pg["user"], pg["password"], pg["database"], pg["port"])
+    if not postgres_conn:
+        raise RuntimeError("connexion PostgreSQL de benchmark impossible")
+    try:
+        datagen.reset_postgres(postgres_conn)
+        counts["batigest_heures"] = datagen.load_batigest_heures(
+            postgres_conn, datagen.generate_batigest_heures(dataset.timeslots, profile["existing_ratio"], rng))
+    finally:
+        postgres_conn.close()
+    return counts
+
+
+# ============================================================================
+# EXÉCUTION
+# ============================================================================
+
+def _flatten_phases(run: dict, prefix: str = "") -> dict:
+    """Phases d'une exécution et de ses sous-exécutions : {"flux/phase": mesures}."""
+    phases = {}
+    for name, stats in run["phases"].items():
+        phases[f"{prefix}{run['flow']}/{name}"] = stats
+    for child in run["children"]:
+        phases.update(_flatten_phases(child))
+    return phases
+
+
+def run_once(config: dict, profile: dict, args, seed: int) -> dict:
+    """Une exécution complète (données régénérées) ; retourne les exécutions par flux."""
+    import importlib
+
+    from app.services import connex, metrics
+    from tests.mock_batisimply import MockBatiSimplyServer, MockSettings
+
+    settings = MockSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        projects=profile["projects"],
+        timeslots=profile["timeslots"],
+        quotes=profile["quotes"],
+        users=profile["users"],
+        seed=seed,
+    )
+    results = {}
+    with MockBatiSimplyServer(settings) as server, tempfile.TemporaryDirectory() as tmp:
+        credentials_path = os.path.join(tmp, "credentials.json")
+        _write_credentials(credentials_path, config, server, args.mode)
+        previous_credentials = connex.CREDENTIALS_FILE
+        connex.CREDENTIALS_FILE = credentials_path
+        try:
+            counts = prepare_databases(config, server.dataset, profile, seed)
+            for key, module_name, function_name in FLOWS:
+                sync_function = getattr(importlib.import_module(module_name), function_name)
+                with metrics.collect_runs() as runs:
+                    started = time.perf_counter()
+                    success, message = sync_function()
+                    elapsed = time.perf_counter() - started
+                run = runs[-1].to_dict() if runs else {"flow": function_name, "phases": {}, "children": []}
+                results[key] = {
+                    "success": bool(success),
+                    "message": message,
+                    "duration_s": elapsed,
+                    "phases": _flatten_phases(run),
+                }
+            results["_seed_rows"] = counts
+            results["_mock_requests"] = sum(server.dataset.received.values())
+        finally:
+            connex.CREDENTIALS_FILE = previous_credentials
+    return results
+
+
+def summarize(samples: list) -> dict:
+    """p50/p95 par flux et par phase, débit (lignes/s) calculé sur la médiane."""
+    summary = {}
+    for key, _, _ in FLOWS:
+        runs = [sample[key] for sample in samples]
+        durations = [run["duration_s"] for run in runs]
+        phase_names = []
+        for run in runs:
+            for name in run["phases"]:
+                if name not in phase_names:
+                    phase_names.append(name)
+        phases = {}
+        for name in phase_names:
+            stats = [run["phases"][name] for run in runs if name in run["phases"]]
+            durations_ms = [s["duration_ms"] for s in stats]
+            rows = statistics.median([s["rows"] for s in stats])
+            p50 = _percentile(durations_ms, 0.5)
+            phases[name] = {
+                "p50_ms": round(p50, 1),
+                "p95_ms": round(_percentile(durations_ms, 0.95), 1),
+                "rows": rows,
+                "rows_per_s": round(rows / (p50 / 1000), 1) if p50 > 0 and rows else None,
+                "db_roundtrips": statistics.median([s["db_roundtrips"] for s in stats]),
+                "http_requests": statistics.median([s["http_requests"] for s in stats]),
+            }
+        summary[key] = {
+            "runs": len(runs),
+            "successes": sum(1 for run in runs if run["success"]),
+            "p50_s": round(_percentile(durations, 0.5), 3),
+            "p95_s": round(_percentile(durations, 0.95), 3),
+            "last_message": runs[-1]["message"] if runs else None,
+            "phases": phases,
+        }
+    return summary
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Phases dont le p50 dépasse celui du rapport de référence de plus de `threshold`."""
+    regressions = []
+    for scale, flows in report["scales"].items():
+        base_flows = baseline.get("scales", {}).get(scale, {})
+        for flow, summary in flows.items():
+            for phase_name, stats in summary["phases"].items():
+                base = base_flows.get(flow, {}).get("phases", {}).get(phase_name)
+                if not base or not base.get("p50_ms"):
+                    continue
+                ratio = stats["p50_ms"] / base["p50_ms"]
+                if ratio > 1 + threshold:
+                    regressions.append({
+                        "scale": scale, "flow": flow, "phase": phase_name,
+                        "baseline_p50_ms": base["p50_ms"], "p50_ms": stats["p50_ms"],
+                        "ratio": round(ratio, 2),
+                    })
+    return regressions
+
+
+def _check_scratch_databases(config: dict, force: bool) -> None:
+    for section in ("sqlserver", "postgres"):
+        name = config[section]["database"]
+        if "bench" not in name.lower() and not force:
+            raise SystemExit(
+                f"[ERREUR] La base {section} '{name}' ne semble pas dédiée aux benchmarks "
+                f"(le nom doit contenir 'bench') ; ses tables seraient écrasées. Utiliser --force pour passer outre."
+            )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark des synchronisations Batigest <-> BatiSimply")
+    parser.add_argument("--scales", default="1k,10k",
+                        help=f"Tailles séparées par des virgules parmi {', '.join(datagen.SCALES)}")
+    parser.add_argument("--runs", type=int, default=3, help="Exécutions par taille")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latence du serveur simulé")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--mode", choices=["chantier", "devis"], default="chantier")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichier JSON du rapport (défaut : benchmarks/results/sync-<date>.json)")
+    parser.add_argument("--baseline", help="Rapport de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Ralentissement toléré par phase avant signalement (0.2 = +20%%)")
+    parser.add_argument("--force", action="store_true", help="Autoriser des bases dont le nom ne contient pas 'bench'")
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in datagen.SCALES]
+    if unknown:
+        parser.error(f"taille(s) inconnue(s) : {', '.join(unknown)}")
+
+    config = _env_config()
+    _check_scratch_databases(config, args.force)
+
+    from app.utils.logger import setup_logging
+    setup_logging(level=logging.WARNING, stream=sys.stderr)
+
+    report = {
+        "benchmark": "sync",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "settings": {
+            "runs": args.runs, "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate, "rate_limit": args.rate_limit, "mode": args.mode, "seed": args.seed,
+        },
+        "scales": {},
+    }
+    for scale in scales:
+        profile = datagen.scale_profile(datagen.SCALES[scale])
+        samples = []
+        for index in range(args.runs):
+            sys.stderr.write(f"[INFO] {scale} : exécution {index + 1}/{args.runs}\n")
+            samples.append(run_once(config, profile, args, args.seed))
+        report["scales"][scale] = summarize(samples)
+        report["scales"][scale]["_profile"] = profile
+        report["scales"][scale]["_seed_rows"] = samples[-1]["_seed_rows"]
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        # Les entrées "_profile" / "_seed_rows" ne sont pas des flux
+        flows_only = {"scales": {scale: {k: v for k, v in flows.items() if not k.startswith("_")}
+                                 for scale, flows in report["scales"].items()}}
+        report["regressions"] = compare(flows_only, baseline, args.threshold)
+        report["baseline"] = {"file": args.baseline, "revision": baseline.get("revision")}
+        for regression in report["regressions"]:
+            sys.stderr.write(
+                f"[ATTENTION] {regression['scale']} {regression['phase']} : "
+                f"{regression['baseline_p50_ms']} ms -> {regression['p50_ms']} ms (x{regression['ratio']})\n"
+            )
+        if report["regressions"]:
+            exit_code = 1
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"sync-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps({"report": output, "regressions": len(report.get("regressions", []))}, ensure_ascii=False))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,528 @@
+# -*- coding: utf-8 -*-
+# Serveur BatiSimply + Keycloak simulé
+# ------------------------------------
+# Remplace api.staging.batisimply.fr et sso.staging.batisimply.fr pour mesurer
+# et reproduire hors ligne les flux du connecteur (benchmarks, essais manuels).
+#
+# Routes simulées :
+#   POST <chemin du token>                      token Keycloak (password / client_credentials)
+#   GET  /api/project        POST /api/project  chantiers
+#   GET  /api/project/{id}                      détail d'un chantier
+#   GET  /api/timeSlotManagement/allUsers       heures (filtre startDate / endDate)
+#   POST /api/timeSlotManagement                envoi d'une heure
+#   GET  /api/quote          POST /api/quote    devis
+#   GET  /__mock__/stats     POST /__mock__/reset
+#
+# Le chemin du token et le client_id attendu sont lus dans
+# docs/BATISIMPLY.postman_collection.json ; le jeu de données est généré
+# (taille et graine configurables). Latence, taux d'erreur 5xx et limitation
+# de débit (429 + Retry-After) sont réglables. Avec --page-size, les listes
+# sont rendues en pages Spring ({"content": [...], "totalPages": ...},
+# paramètres page et size). La liste des chantiers porte un ETag et répond
+# 304 à un If-None-Match identique.
+#
+# Usage (depuis la racine du projet) :
+#   python -m tests.mock_batisimply --port 8765 --latency-ms 40 --error-rate 0.01 --rate-limit 20
+# puis, pour le connecteur :
+#   BATISIMPLY_API_URL=http://127.0.0.1:8765
+#   BATISIMPLY_SSO_URL=http://127.0.0.1:8765/auth/realms/jhipster/protocol/openid-connect/token
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import secrets
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_COLLECTION = os.path.join(PROJECT_ROOT, "docs", "BATISIMPLY.postman_collection.json")
+
+DEFAULT_TOKEN_PATH = "/auth/realms/jhipster/protocol/openid-connect/token"
+DEFAULT_CLIENT_ID = "bridge-data"
+
+
+class MockSettings:
+    """Paramètres du serveur simulé."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        projects: int = 50,
+        timeslots: int = 500,
+        quotes: int = 20,
+        users: int = 10,
+        window_days: int = 60,
+        token_ttl: int = 300,
+        seed: int = 42,
+        collection: Optional[str] = DEFAULT_COLLECTION,
+        page_size: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # Requêtes par seconde acceptées sur /api (0 = pas de limite)
+        self.rate_limit = rate_limit
+        self.projects = projects
+        self.timeslots = timeslots
+        self.quotes = quotes
+        self.users = users
+        self.window_days = window_days
+        self.token_ttl = token_ttl
+        self.seed = seed
+        self.collection = collection
+        # Taille de page par défaut des listes (0 = liste complète, sans pagination)
+        self.page_size = page_size
+
+
+# ============================================================================
+# COLLECTION POSTMAN
+# ============================================================================
+
+def load_collection_routes(path: Optional[str]) -> dict:
+    """
+    Extrait de la collection Postman le chemin du token et le client_id.
+    Valeurs par défaut si la collection est absente ou illisible.
+    """
+    routes = {"token_path": DEFAULT_TOKEN_PATH, "client_id": DEFAULT_CLIENT_ID}
+    if not path or not os.path.exists(path):
+        return routes
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            collection = json.load(f)
+    except (OSError, ValueError):
+        return routes
+
+    for item in collection.get("item", []):
+        request = item.get("request", {})
+        url = request.get("url", {})
+        segments = url.get("path", []) if isinstance(url, dict) else []
+        if request.get("method") == "POST" and segments and segments[-1] == "token":
+            routes["token_path"] = "/" + "/".join(segments)
+            for field in (request.get("body") or {}).get("urlencoded", []):
+                if field.get("key") == "client_id" and field.get("value"):
+                    routes["client_id"] = field["value"]
+    return routes
+
+
+# ============================================================================
+# JEU DE DONNÉES
+# ============================================================================
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Accepte "2025-01-31", "2025-01-31T00:00:00Z" ou "2025-01-31T00:00:00+00:00"."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+class MockDataset:
+    """Chantiers, heures et devis générés de façon déterministe (graine)."""
+
+    def __init__(self, settings: MockSettings):
+        rng = random.Random(settings.seed)
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+        self.projects = {}
+        for project_id in range(1, settings.projects + 1):
+            start = now - timedelta(days=rng.randint(0, settings.window_days))
+            self.projects[project_id] = {
+                "id": project_id,
+                "projectCode": str(project_id).zfill(8),
+                "name": f"Chantier {project_id}",
+                "startDate": start.date().isoformat(),
+                "endDate": (start + timedelta(days=rng.randint(10, 120))).date().isoformat(),
+                "status": rng.choice(["IN_PROGRESS", "IN_PROGRESS", "FINISHED"]),
+            }
+
+        # Identifiants Keycloak (UUID), comme batigest_heures.id_utilisateur et Salarie.codebs
+        self.users = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(settings.users)]
+        self.timeslots = []
+        for timeslot_id in range(1, settings.timeslots + 1):
+            project = self.projects[rng.randint(1, settings.projects)] if self.projects else {}
+            start = now - timedelta(days=rng.randint(0, settings.window_days), hours=rng.randint(0, 10))
+            minutes = rng.choice([120, 240, 360, 420, 480])
+            self.timeslots.append({
+                "id": timeslot_id,
+                "startDate": _iso(start),
+                "endDate": _iso(start + timedelta(minutes=minutes)),
+                "user": {"id": rng.choice(self.users) if self.users else None},
+                "project": {"id": project.get("id"), "projectCode": project.get("projectCode")},
+                "managementStatus": rng.choice(["VALIDATED", "VALIDATED", "PENDING"]),
+                "totalTimeMinutes": minutes,
+                "hasPackedLunch": rng.random() < 0.5,
+                "hasHomeToWorkJourney": rng.random() < 0.3,
+            })
+
+        self.quotes = {}
+        for quote_id in range(1, settings.quotes + 1):
+            self.quotes[quote_id] = {
+                "id": quote_id,
+                "name": f"Devis {quote_id}",
+                "creationDate": (now - timedelta(days=rng.randint(0, settings.window_days))).date().isoformat(),
+                "description": f"Sujet du devis {quote_id}",
+            }
+
+        # Objets reçus par POST (vérifiables via /__mock__/stats)
+        self.received = Counter()
+
+    def next_id(self, collection) -> int:
+        return max(collection, default=0) + 1
+
+
+# ============================================================================
+# APPLICATION
+# ============================================================================
+
+class _RateLimiter:
+    """Seau à jetons : `rate` requêtes par seconde, rafale de `rate` requêtes."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Retourne 0 si la requête passe, sinon le délai d'attente conseillé (s)."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+def create_app(settings: Optional[MockSettings] = None) -> FastAPI:
+    """Construit l'application FastAPI du serveur simulé."""
+    settings = settings or MockSettings()
+    routes = load_collection_routes(settings.collection)
+    state = {"dataset": MockDataset(settings)}
+    tokens = {}
+    stats = Counter()
+    rng = random.Random(settings.seed)
+    limiter = _RateLimiter(settings.rate_limit) if settings.rate_limit > 0 else None
+
+    app = FastAPI(title="BatiSimply simulé")
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/__mock__"):
+            return await call_next(request)
+
+        if limiter is not None and path.startswith("/api"):
+            retry_after = limiter.acquire()
+            if retry_after:
+                stats[f"{request.method} {path} 429"] += 1
+                return JSONResponse(
+                    {"title": "Too Many Requests", "status": 429},
+                    status_code=429,
+                    headers={"Retry-After": str(max(1, round(retry_after)))},
+                )
+
+        delay = settings.latency_ms + (rng.uniform(-1, 1) * settings.jitter_ms if settings.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if settings.error_rate and rng.random() < settings.error_rate:
+            stats[f"{request.method} {path} 503"] += 1
+            return JSONResponse({"title": "Service Unavailable", "status": 503}, status_code=503)
+
+        response = await call_next(request)
+        stats[f"{request.method} {path} {response.status_code}"] += 1
+        return response
+
+    def _authorized(request: Request) -> bool:
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return False
+        expires_at = tokens.get(header[len("Bearer "):])
+        return expires_at is not None and expires_at > time.time()
+
+    def _unauthorized():
+        return JSONResponse({"title": "Unauthorized", "status": 401}, status_code=401)
+
+    def _paged(items: list, request: Request):
+        """Liste complète, ou page Spring si la pagination est activée."""
+        if not settings.page_size:
+            return items
+        try:
+            page = max(0, int(request.query_params.get("page", 0)))
+            size = max(1, int(request.query_params.get("size", settings.page_size)))
+        except ValueError:
+            return JSONResponse({"title": "Bad Request", "status": 400}, status_code=400)
+        total_pages = (len(items) + size - 1) // size
+        return {
+            "content": items[page * size:(page + 1) * size],
+            "number": page,
+            "size": size,
+            "totalElements": len(items),
+            "totalPages": total_pages,
+            "last": page + 1 >= total_pages,
+        }
+
+    def _with_etag(body, request: Request):
+        """Réponse JSON avec ETag (empreinte du corps), 304 si le client a déjà cette version."""
+        if isinstance(body, Response):
+            return body
+        content = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.md5(content).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content, media_type="application/json", headers={"ETag": etag})
+
+    # --- Keycloak ---------------------------------------------------------
+
+    @app.post(routes["token_path"])
+    async def token(request: Request):
+        form = await request.form()
+        grant_type = form.get("grant_type")
+        if form.get("client_id") != routes["client_id"]:
+            return JSONResponse({"error": "unauthorized_client",
+                                 "error_description": "Invalid client credentials"}, status_code=401)
+        if grant_type == "password" and not (form.get("username") and form.get("password")):
+            return JSONResponse({"error": "invalid_grant",
+                                 "error_description": "Invalid user credentials"}, status_code=401)
+        if grant_type not in ("password", "client_credentials"):
+            return JSONResponse({"error": "unsupported_grant_type"}, status_code=400)
+
+        access_token = secrets.token_urlsafe(32)
+        tokens[access_token] = time.time() + settings.token_ttl
+        return {
+            "access_token": access_token,
+            "expires_in": settings.token_ttl,
+            "token_type": "Bearer",
+            "scope": form.get("scope") or "openid",
+        }
+
+    # --- Chantiers ----------------------------------------------------------
+
+    @app.get("/api/project")
+    async def list_projects(request: Request):
+        if not _authorized(request):
+            return _unauthorized()
+        return _with_etag(_paged(list(state["dataset"].projects.values()), request), request)
+
+    @app.get("/api/project/{project_id}")
+    async def get_project(project_id: int, request: Request):
+        if not _authorized(request):
+            return _unauthorized()
+        project = state["dataset"].projects.get(project_id)
+        if project is None:
+            return JSONResponse({"title": "Not Found", "status": 404}, status_code=404)
+        return project
+
+    @app.post("/api/project")
+    async def create_project(request: Request):
+        if not _authorized(request):
+            return _unauthorized()
+        body = await request.json()
+        if not body.get("name"):
+            return JSONResponse({"title": "Bad Request", "detail": "name obligatoire"}, status_code=400)
+        dataset = state["dataset"]
+        project_id = dataset.next_id(dataset.projects)
+        dataset.projects[project_id] = dict(body, id=project_id)
+        dataset.received["project"] += 1
+        return JSONResponse(dataset.projects[project_id], status_code=201)
+
+    # --- Heures ---------------------------------------------------------------
+
+    @app.get("/api/timeSlotManagement/allUsers")
+    async def list_timeslots(request: Request, startDate: Optional[str] = None, endDate: Optional[str] = None):
+        if not _authorized(request):
+            return _unauthorized()
+        start, end = _parse_date(startDate), _parse_date(endDate)
+        result = []
+        for slot in state["dataset"].timeslots:
+            slot_start = _parse_date(slot["startDate"])
+            if start and slot_start < start:
+                continue
+            if end and slot_start > end:
+                continue
+            result.append(slot)
+        return _paged(result, request)
+
+    @app.post("/api/timeSlotManagement")
+    async def create_timeslot(request: Request):
+        if not _authorized(request):
+            return _unauthorized()
+        body = await request.json()
+        dataset = state["dataset"]
+        dataset.received["timeSlotManagement"] += 1
+        return JSONResponse(dict(body, id=len(dataset.timeslots) + dataset.received["timeSlotManagement"]),
+                            status_code=201)
+
+    # --- Devis ----------------------------------------------------------------
+
+    @app.get("/api/quote")
+    async def list_quotes(request: Request):
+        if not _authorized(request):
+            return _unauthorized()
+        return _paged(list(state["dataset"].quotes.values()), request)
+
+    @app.post("/api/quote")
+    async def create_quote(request: Request):
+        if not _authorized(request):
+            return _unauthorized()
+        body = await request.json()
+        dataset = state["dataset"]
+        quote_id = dataset.next_id(dataset.quotes)
+        dataset.quotes[quote_id] = dict(body, id=quote_id)
+        dataset.received["quote"] += 1
+        return JSONResponse(dataset.quotes[quote_id], status_code=201)
+
+    # --- Pilotage -------------------------------------------------------------
+
+    @app.get("/__mock__/stats")
+    async def mock_stats():
+        return {"requests": dict(stats), "received": dict(state["dataset"].received)}
+
+    @app.post("/__mock__/reset")
+    async def mock_reset():
+        stats.clear()
+        state["dataset"] = MockDataset(settings)
+        return {"status": "reset"}
+
+    app.state.settings = settings
+    app.state.routes = routes
+    app.state.mock_state = state
+    return app
+
+
+# ============================================================================
+# LANCEMENT
+# ============================================================================
+
+class MockBatiSimplyServer:
+    """
+    Serveur simulé lancé dans un thread (benchmarks) :
+
+        with MockBatiSimplyServer(MockSettings(latency_ms=30)) as server:
+            os.environ["BATISIMPLY_API_URL"] = server.base_url
+            os.environ["BATISIMPLY_SSO_URL"] = server.sso_url
+    """
+
+    def __init__(self, settings: Optional[MockSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+
+        self.app = create_app(settings)
+        self.host = host
+        self.port = port or _free_port(host)
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def sso_url(self) -> str:
+        return self.base_url + self.app.state.routes["token_path"]
+
+    @property
+    def client_id(self) -> str:
+        return self.app.state.routes["client_id"]
+
+    @property
+    def dataset(self) -> MockDataset:
+        return self.app.state.mock_state["dataset"]
+
+    def start(self, timeout: float = 10.0) -> "MockBatiSimplyServer":
+        self._thread = threading.Thread(target=self._server.run, name="mock-batisimply", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("le serveur simulé n'a pas démarré")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _free_port(host: str) -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serveur BatiSimply + Keycloak simulé")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latence ajoutée à chaque réponse")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variation aléatoire de la latence (±)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses 503 (0-1)")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Requêtes /api par seconde avant réponse 429 (0 = illimité)")
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--timeslots", type=int, default=500)
+    parser.add_argument("--quotes", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--page-size", type=int, default=0,
+                        help="Taille de page par défaut des listes (0 = liste complète)")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION, help="Collection Postman BatiSimply")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    settings = MockSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        projects=args.projects,
+        timeslots=args.timeslots,
+        quotes=args.quotes,
+        users=args.users,
+        seed=args.seed,
+        collection=args.collection,
+        page_size=args.page_size,
+    )
+    app = create_app(settings)
+    base_url = f"http://{args.host}:{args.port}"
+    print(f"[INFO] BATISIMPLY_API_URL={base_url}")
+    print(f"[INFO] BATISIMPLY_SSO_URL={base_url}{app.state.routes['token_path']}")
+    print(f"[INFO] client_id attendu : {app.state.routes['client_id']}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())